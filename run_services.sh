@@ -5,6 +5,7 @@
 # Kill existing services to prevent "address already in use" errors
 echo "Attempting to stop any existing services..."
 pkill -f "src.services.broadcaster"
+pkill -f "src.services.trend_analysis_server"
 pkill -f "src.data.ingestion.live_ingester"
 pkill -f "src.analysis.analyzer_service"
 echo "Waiting for ports to release..."
@@ -29,6 +30,10 @@ nohup python3 -m src.data.ingestion.live_ingester > logs/ingester.log 2>&1 &
 echo "Starting broadcaster.py in background (see logs/broadcaster.log)..."
 nohup python3 -m src.services.broadcaster > logs/broadcaster.log 2>&1 &
 
+# Start the trend analysis server used by the web API's /api/trend-analysis route
+echo "Starting trend_analysis_server.py in background (see logs/trend_analysis_server.log)..."
+nohup python3 -m src.services.trend_analysis_server > logs/trend_analysis_server.log 2>&1 &
+
 # Add a small delay to allow background services to attempt startup and potentially fail fast
 sleep 2
 
@@ -0,0 +1,126 @@
+"""
+Benchmark: per-timeframe Decimal aggregators vs one ContractBarAggregator per contract.
+
+"legacy" feeds every tick to one aggregator per timeframe, each aligning the timestamp
+to its own bar and doing Decimal max/min (the live ingester's previous OHLCAggregator,
+trimmed of logging). "decimal" and "ticks" feed a single ContractBarAggregator with
+Decimal prices and integer tick counts respectively. Prints ticks/sec for 1 to 6
+timeframes, so the scaling with the number of timeframes can be compared.
+
+Usage (from the project root):
+    python scripts/benchmark_bar_aggregation.py [--ticks 200000] [--repeat 3]
+"""
+import argparse
+import datetime
+import decimal
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.ingestion.bar_aggregation import ContractBarAggregator
+
+TIMEFRAME_SETS = [[60], [60, 300, 900], [60, 300, 900, 1800, 3600, 14400]]
+TICK_SIZE = 0.125
+
+
+class LegacyAggregator:
+    """The previous one-timeframe OHLCAggregator.add_tick logic."""
+    def __init__(self, timeframe_seconds, callback):
+        self.timeframe_seconds = timeframe_seconds
+        self.callback = callback
+        self.current_bar_start_time = None
+        self.open = self.high = self.low = self.close = None
+        self.volume = decimal.Decimal('0')
+
+    def _get_aligned_bar_start_time(self, timestamp):
+        current_epoch_seconds = int(timestamp.timestamp())
+        bar_start_epoch_seconds = current_epoch_seconds - (current_epoch_seconds % self.timeframe_seconds)
+        return datetime.datetime.fromtimestamp(bar_start_epoch_seconds, tz=datetime.timezone.utc)
+
+    def _reset_bar(self, start, price, volume):
+        self.current_bar_start_time = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = volume
+
+    def add_tick(self, timestamp, price, volume_tick=decimal.Decimal('0')):
+        if timestamp.tzinfo is None or timestamp.tzinfo.utcoffset(timestamp) is None:
+            timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+        elif timestamp.tzinfo != datetime.timezone.utc:
+            timestamp = timestamp.astimezone(datetime.timezone.utc)
+        price = decimal.Decimal(str(price)) if not isinstance(price, decimal.Decimal) else price
+        volume_tick = decimal.Decimal(str(volume_tick)) if not isinstance(volume_tick, decimal.Decimal) else volume_tick
+        new_bar_start_time = self._get_aligned_bar_start_time(timestamp)
+        if self.current_bar_start_time is None:
+            self._reset_bar(new_bar_start_time, price, volume_tick)
+            return
+        if timestamp >= self.current_bar_start_time + datetime.timedelta(seconds=self.timeframe_seconds):
+            self.callback(self.current_bar_start_time, self.open, self.high, self.low, self.close, self.volume)
+            self._reset_bar(new_bar_start_time, price, volume_tick)
+            return
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.close = price
+        self.volume += volume_tick
+
+
+def make_ticks(count, seed=7):
+    """(timestamp, Decimal price, tick count, volume) every ~50ms around a random walk."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 5, 19, 13, 30, tzinfo=datetime.timezone.utc)
+    ticks = []
+    level = 47878
+    for k in range(count):
+        level += rng.choice((-2, 0, 0, 2))
+        ticks.append((start + datetime.timedelta(microseconds=k * 50000),
+                      decimal.Decimal(level) * decimal.Decimal(str(TICK_SIZE)), level, rng.randrange(0, 4)))
+    return ticks
+
+
+def time_path(ticks, mode, timeframes, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        bars = []
+        if mode == "legacy":
+            aggregators = [LegacyAggregator(tf, lambda *bar: bars.append(bar)) for tf in timeframes]
+            start = time.perf_counter()
+            for timestamp, price, _, volume in ticks:
+                volume = decimal.Decimal(volume)
+                for aggregator in aggregators:
+                    aggregator.add_tick(timestamp, price, volume)
+        else:
+            tick_size = TICK_SIZE if mode == "ticks" else None
+            aggregator = ContractBarAggregator("C", timeframes, lambda *bar: bars.append(bar), tick_size=tick_size)
+            start = time.perf_counter()
+            if tick_size is None:
+                for timestamp, price, _, volume in ticks:
+                    aggregator.add_tick(timestamp, price, volume)
+            else:
+                for timestamp, _, level, volume in ticks:
+                    aggregator.add_tick(timestamp, level, volume)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    import logging
+    logging.getLogger("LiveIngester").setLevel(logging.WARNING) # Completed-bar logging is not what is measured
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ticks', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    ticks = make_ticks(args.ticks)
+    print(f"{args.ticks} ticks, best of {args.repeat}")
+    print(f"{'timeframes':>10} {'path':>8} {'ticks/sec':>12} {'us/tick':>9}")
+    for timeframes in TIMEFRAME_SETS:
+        for mode in ("legacy", "decimal", "ticks"):
+            elapsed = time_path(ticks, mode, timeframes, args.repeat)
+            print(f"{len(timeframes):>10} {mode:>8} {args.ticks / elapsed:>12,.0f} {1e6 * elapsed / args.ticks:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
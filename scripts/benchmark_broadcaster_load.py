@@ -0,0 +1,181 @@
+"""
+Load benchmark: thousands of WebSocket clients against the multi-process broadcaster.
+
+A synthetic feed stands in for PostgreSQL: this process runs the FeedPublisher the real
+feed process would run and publishes 'tick_batch' payloads (round-robin over --contracts,
+at --rate payloads/sec) carrying their send time. For each worker count, broadcaster
+worker processes are started on one port (SO_REUSEPORT) and --client-procs processes open
+--clients WebSocket connections between them, each subscribed to one contract's ticks.
+Prints delivered messages/sec and end-to-end latency (feed publish -> client receive).
+
+Usage (from the project root):
+    python scripts/benchmark_broadcaster_load.py [--clients 2000] [--workers 1 4] [--rate 200] [--duration 10]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LATENCY_SAMPLE_EVERY = 10 # Keep every n-th latency per client
+
+
+def run_clients(first_client, count, port, contracts, start_event, stop_event, results):
+    """Client process: opens `count` connections, counts messages until stop_event, reports once."""
+    import websockets
+
+    async def client(number, stats):
+        contract_id = f"BENCH.{number % contracts}"
+        try:
+            async with websockets.connect(f"ws://127.0.0.1:{port}", open_timeout=60, max_queue=None) as ws:
+                await ws.send(json.dumps({"action": "subscribe", "snapshot": 0,
+                                          "topics": [{"type": "tick", "contract_id": contract_id}]}))
+                stats['connected'] += 1
+                seen = 0
+                async for frame in ws:
+                    received_at = time.time()
+                    parsed = json.loads(frame)
+                    for message in parsed if isinstance(parsed, list) else [parsed]:
+                        stats['messages'] += 1
+                        seen += 1
+                        if seen % LATENCY_SAMPLE_EVERY == 0:
+                            stats['latencies'].append(received_at - message['sent_at'])
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException):
+            stats['failed'] += 1
+
+    async def main():
+        stats = {'connected': 0, 'failed': 0, 'messages': 0, 'latencies': []}
+        tasks = []
+        for number in range(first_client, first_client + count):
+            tasks.append(asyncio.ensure_future(client(number, stats)))
+            if len(tasks) % 100 == 0:
+                await asyncio.sleep(0.05) # Don't overflow the accept backlog
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, start_event.wait)
+        stats['connected_at_start'] = stats['connected']
+        stats['messages'] = 0
+        stats['latencies'].clear()
+        await loop.run_in_executor(None, stop_event.wait)
+        received = stats['messages']
+        for task in tasks:
+            task.cancel()
+        results.put({'connected': stats['connected_at_start'], 'failed': stats['failed'],
+                     'messages': received, 'latencies': stats['latencies']})
+
+    asyncio.run(main())
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Broadcaster workers did not open port {port}")
+
+
+async def feed(publisher, contracts, rate, duration):
+    interval = 1.0 / rate
+    sent = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        contract_id = f"BENCH.{sent % contracts}"
+        price = 5000 + (sent % 40) * 0.25
+        publisher.publish(json.dumps({"type": "tick_batch", "contract_id": contract_id,
+                                      "ticks": [{"timestamp": "2025-05-19T17:00:00+00:00", "price": price, "tick_type": "trade"}],
+                                      "sent_at": time.time()}))
+        sent += 1
+        delay = started + sent * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    return sent
+
+
+def run_case(broadcaster, workers, args):
+    from src.services.feed_bus import FeedPublisher
+
+    context = multiprocessing.get_context("spawn")
+    feed_path = os.path.join(tempfile.gettempdir(), f"broadcaster-bench-{os.getpid()}.sock")
+
+    async def case():
+        publisher = FeedPublisher(feed_path)
+        await publisher.start()
+        processes = [broadcaster.start_worker(context, number, feed_path) for number in range(workers)]
+        clients = []
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, wait_for_port, args.port)
+            while publisher.subscriber_count < workers:
+                await asyncio.sleep(0.1)
+            start_event, stop_event, results = context.Event(), context.Event(), context.Queue()
+            per_proc = -(-args.clients // args.client_procs)
+            for first in range(0, args.clients, per_proc):
+                process = context.Process(target=run_clients, args=(
+                    first, min(per_proc, args.clients - first), args.port, args.contracts, start_event, stop_event, results))
+                process.start()
+                clients.append(process)
+            await asyncio.sleep(args.connect_seconds)
+            start_event.set()
+            await asyncio.sleep(0.5)
+            sent = await feed(publisher, args.contracts, args.rate, args.duration)
+            await asyncio.sleep(1.0) # Let the last frames arrive
+            stop_event.set()
+            reports = [await asyncio.get_running_loop().run_in_executor(None, results.get) for _ in clients]
+            return sent, reports
+        finally:
+            for process in clients:
+                process.join(10)
+            for process in processes:
+                process.terminate()
+                process.join(5)
+            await publisher.close()
+
+    sent, reports = asyncio.run(case())
+    latencies = sorted(latency for report in reports for latency in report['latencies'])
+    connected = sum(report['connected'] for report in reports)
+    delivered = sum(report['messages'] for report in reports)
+    expected = sent * connected / args.contracts
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else float('nan')
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+    mean = statistics.fmean(latencies) * 1000 if latencies else float('nan')
+    print(f"workers={workers:<3} clients={connected:<6} failed={sum(r['failed'] for r in reports):<4} "
+          f"published={sent:<6} delivered={delivered:>9,} ({delivered / args.duration:>10,.0f}/s, "
+          f"{delivered / expected if expected else 0:.0%} of published after tick coalescing) "
+          f"latency mean={mean:.1f}ms p50={p50:.1f}ms p99={p99:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--contracts', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=200, help='Feed payloads per second')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--client-procs', type=int, default=max(1, min(os.cpu_count() or 1, 8)))
+    parser.add_argument('--connect-seconds', type=float, default=10, help='Time allowed for the clients to connect')
+    parser.add_argument('--port', type=int, default=8799)
+    args = parser.parse_args()
+
+    # The workers are spawned processes that import the broadcaster and read these at import
+    os.environ['WEBSOCKET_HOST'] = '127.0.0.1'
+    os.environ['WEBSOCKET_PORT'] = str(args.port)
+    import logging
+    from src.services import broadcaster
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{args.clients} clients over {args.contracts} contracts, {args.rate:.0f} payloads/s for {args.duration:.0f}s, "
+          f"{args.client_procs} client processes, {os.cpu_count()} CPUs")
+    for workers in args.workers:
+        run_case(broadcaster, workers, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: linear "no higher high / no lower low between" scans vs the RangeExtremumIndex.
+
+Runs the per-bar trend logic over growing prefixes of the bundled data/*_ohlc.csv files,
+once with a plain list of bars (rules fall back to walking the bars) and once with a
+BarSeries (rules use the sparse-table range queries), and prints time per bar so the
+scaling of both paths can be compared.
+
+Usage (from the project root):
+    python scripts/benchmark_range_index.py [--repeat 3] [--csv data/CON.F.US.MES.M25_5_2_ohlc.csv ...]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trend_analysis.trend_models import Bar, State
+from trend_analysis import trend_utils
+from trend_analysis.range_index import BarSeries
+from trend_analysis.trend_start_og_fixed import process_bar_at_index
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_detector(bars, use_index: bool) -> int:
+    """Processes all bars and returns the number of raw signals (to keep the work observable)."""
+    all_bars = BarSeries(bars) if use_index else list(bars)
+    state = State()
+    signals = []
+    for k in range(len(all_bars)):
+        process_bar_at_index(k, all_bars, state, signals)
+    return len(signals)
+
+
+def time_detector(bars, use_index: bool, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_detector(bars, use_index)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def containment_stretch(bars, length: int):
+    """
+    Appends `length` inside bars to a real series: each copies the range of the last real
+    bar, shrunk slightly, which keeps the detector in containment with a long-lived candidate.
+    """
+    last = bars[-1]
+    mid = (last.h + last.l) / 2
+    half = (last.h - last.l) / 4
+    stretched = list(bars)
+    for i in range(length):
+        offset = half * (0.5 if i % 2 else 0.25)
+        stretched.append(Bar(timestamp=last.timestamp, o=mid, h=mid + offset, l=mid - offset,
+                             c=mid, volume=0.0, index=len(stretched) + 1))
+    return stretched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Range-extremum index benchmark for the trend detector")
+    parser.add_argument("--csv", nargs="*", default=sorted(glob.glob(os.path.join(PROJECT_ROOT, "data", "*_ohlc.csv"))))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'dataset':<46} {'bars':>7} {'linear s':>10} {'index s':>10} {'linear us/bar':>14} {'index us/bar':>13} {'speedup':>8}")
+    for csv_path in args.csv:
+        bars = trend_utils.load_bars_from_alt_csv(filename=csv_path, BarClass=Bar)
+        name = os.path.basename(csv_path)
+        sizes = sorted({n for n in (250, 1000, 2500, 5000, len(bars)) if n <= len(bars)})
+        workloads = [(f"{name}[:{n}]", bars[:n]) for n in sizes]
+        workloads += [(f"{name}+containment {n}", containment_stretch(bars, n)) for n in (1000, 4000)]
+        for label, workload in workloads:
+            linear = time_detector(workload, use_index=False, repeat=args.repeat)
+            indexed = time_detector(workload, use_index=True, repeat=args.repeat)
+            n = len(workload)
+            print(f"{label:<46} {n:>7} {linear:>10.3f} {indexed:>10.3f} {linear / n * 1e6:>14.1f} {indexed / n * 1e6:>13.1f} {linear / indexed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
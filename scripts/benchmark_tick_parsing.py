@@ -0,0 +1,167 @@
+"""
+Benchmark: per-tick parsing and routing in the live ingester, before vs after the fast path.
+
+"legacy" replays the original process_single_data_item logic (key-probe cascade,
+timestamp string surgery, Decimal prices, routing by scanning the live_contracts config
+for every tick); "decimal" and "ticks" use src.data.ingestion.tick_parsing with the
+precompiled routing table, the latter converting prices to integer half-tick counts
+instead of Decimal. Aggregators are replaced by counting sinks so only parsing and
+routing are measured (scripts/benchmark_bar_aggregation.py covers the aggregators). Prints ticks/sec for a synthetic quote/trade stream.
+
+Usage (from the project root):
+    python scripts/benchmark_tick_parsing.py [--ticks 200000] [--repeat 3]
+"""
+import argparse
+import datetime
+import decimal
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.ingestion.tick_parsing import (
+    ZERO_VOLUME, parse_gateway_timestamp, get_field_extractor,
+    to_decimal, parse_trade_volume, build_contract_routes
+)
+
+CONTRACT_ID = "CON.F.US.MES.M25"
+TIMEFRAMES = [60, 300, 900]
+LIVE_CONTRACTS = [
+    {'contract_id': "CON.F.US.MNQ.M25", 'timeframes_seconds': TIMEFRAMES},
+    # Half the MES tick, so bid/ask mid-prices stay exact in integer-tick mode
+    {'contract_id': CONTRACT_ID, 'timeframes_seconds': TIMEFRAMES, 'tick_size': 0.125},
+]
+
+
+class CountingSink:
+    """Stands in for an OHLCAggregator."""
+    def __init__(self):
+        self.ticks = 0
+
+    def add_tick(self, timestamp, price, volume_tick=ZERO_VOLUME, tick_type=None):
+        self.ticks += 1
+
+
+def make_messages(count, seed=7):
+    """Synthetic gateway payloads: ~80% quotes (bid/ask only), ~20% single trades, 7-digit fractions."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 5, 19, 17, 15, tzinfo=datetime.timezone.utc)
+    messages = []
+    for k in range(count):
+        ts = (start + datetime.timedelta(microseconds=k * 2500)).strftime('%Y-%m-%dT%H:%M:%S.%f')
+        ts = f"{ts}{rng.randrange(10)}+00:00"
+        bid = 5984.75 + rng.randrange(-20, 20) * 0.25
+        if rng.random() < 0.8:
+            messages.append(("quote", {"symbol": "F.US.MES", "bestBid": bid, "bestAsk": bid + 0.25,
+                                       "lastUpdated": ts, "timestamp": ts}))
+        else:
+            messages.append(("trade", {"symbolId": "F.US.MES", "price": bid, "timestamp": ts,
+                                       "type": 1, "volume": rng.randrange(1, 5)}))
+    return messages
+
+
+# --- Legacy path (pre fast-path logic, trimmed of logging) ---
+def legacy_process(data_item, contract_id_from_stream, message_type, aggregators):
+    price = None
+    volume = decimal.Decimal('0')
+    if message_type == "quote":
+        if "lastPrice" in data_item and data_item["lastPrice"] is not None:
+            price = data_item.get("lastPrice")
+        elif "last" in data_item and data_item["last"] is not None:
+            price = data_item.get("last")
+        elif "bestAsk" in data_item and data_item["bestAsk"] is not None and \
+             "bestBid" in data_item and data_item["bestBid"] is not None:
+            price = (decimal.Decimal(str(data_item["bestAsk"])) + decimal.Decimal(str(data_item["bestBid"]))) / 2
+        elif "price" in data_item and data_item["price"] is not None:
+            price = data_item.get("price")
+        timestamp_str = data_item.get("lastUpdated")
+        if not timestamp_str: timestamp_str = data_item.get("timestamp")
+        if not timestamp_str: timestamp_str = data_item.get("DateTime")
+    else:
+        price = data_item.get("price")
+        if price is None: price = data_item.get("Price")
+        raw_volume = data_item.get("volume")
+        if raw_volume is None: raw_volume = data_item.get("Volume")
+        if raw_volume is not None:
+            volume = decimal.Decimal(str(raw_volume))
+        timestamp_str = data_item.get("timestamp")
+        if not timestamp_str: timestamp_str = data_item.get("DateTime")
+
+    if timestamp_str.endswith('Z'):
+        timestamp_dt = datetime.datetime.fromisoformat(timestamp_str[:-1] + '+00:00')
+    elif '.' in timestamp_str and '+' in timestamp_str.split('.')[1]:
+        base_part, micro_tz_part = timestamp_str.split('.')
+        micro_part = micro_tz_part[:6]
+        tz_part = micro_tz_part[len(micro_part):]
+        timestamp_dt = datetime.datetime.fromisoformat(f"{base_part}.{micro_part}{tz_part}")
+    else:
+        timestamp_dt = datetime.datetime.fromisoformat(timestamp_str)
+    if timestamp_dt.tzinfo is None or timestamp_dt.tzinfo.utcoffset(timestamp_dt) is None:
+        timestamp_dt = timestamp_dt.replace(tzinfo=datetime.timezone.utc)
+    elif timestamp_dt.tzinfo != datetime.timezone.utc:
+        timestamp_dt = timestamp_dt.astimezone(datetime.timezone.utc)
+    price_decimal = decimal.Decimal(str(price))
+
+    for contract_config in LIVE_CONTRACTS:
+        if contract_config['contract_id'] == contract_id_from_stream:
+            for tf_seconds in contract_config.get('timeframes_seconds', []):
+                aggregator_key = (contract_id_from_stream, tf_seconds)
+                if aggregator_key in aggregators:
+                    aggregators[aggregator_key].add_tick(timestamp_dt, price_decimal, volume, tick_type=message_type)
+
+
+# --- Fast path (mirrors live_ingester.process_single_data_item) ---
+def fast_process(data_item, contract_id_from_stream, message_type, routes):
+    route = routes.get(contract_id_from_stream)
+    price, raw_volume, timestamp_str = get_field_extractor(message_type, data_item).extract(data_item, route.tick_size)
+    timestamp_dt = parse_gateway_timestamp(timestamp_str)
+    if route.tick_size is None:
+        price = to_decimal(price)
+    volume = parse_trade_volume(raw_volume) if message_type == "trade" else ZERO_VOLUME
+    route.aggregator.add_tick(timestamp_dt, price, volume, tick_type=message_type)
+
+
+def time_path(messages, mode, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        if mode == "legacy":
+            # One aggregator per (contract, timeframe), as before the multi-timeframe aggregator
+            aggregators = {(c['contract_id'], tf): CountingSink() for c in LIVE_CONTRACTS for tf in c['timeframes_seconds']}
+            sink = aggregators[(CONTRACT_ID, TIMEFRAMES[0])]
+            start = time.perf_counter()
+            for message_type, item in messages:
+                legacy_process(item, CONTRACT_ID, message_type, aggregators)
+        else:
+            aggregators = {c['contract_id']: CountingSink() for c in LIVE_CONTRACTS}
+            sink = aggregators[CONTRACT_ID]
+            contracts = LIVE_CONTRACTS if mode == "ticks" else [{k: v for k, v in c.items() if k != 'tick_size'} for c in LIVE_CONTRACTS]
+            routes = build_contract_routes(contracts, aggregators)
+            start = time.perf_counter()
+            for message_type, item in messages:
+                fast_process(item, CONTRACT_ID, message_type, routes)
+        best = min(best, time.perf_counter() - start)
+        assert sink.ticks == len(messages)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ticks', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    messages = make_messages(args.ticks)
+    print(f"{args.ticks} ticks, {len(TIMEFRAMES)} timeframes per contract, best of {args.repeat}")
+    print(f"{'path':>8} {'ticks/sec':>12} {'us/tick':>9}")
+    baseline = None
+    for mode in ("legacy", "decimal", "ticks"):
+        elapsed = time_path(messages, mode, args.repeat)
+        rate = args.ticks / elapsed
+        baseline = baseline or rate
+        print(f"{mode:>8} {rate:>12,.0f} {1e6 * elapsed / args.ticks:>9.2f}  ({rate / baseline:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 import asyncio
+import functools
+import multiprocessing
 import pandas as pd
 from datetime import datetime, timezone
 import logging
@@ -6,34 +8,64 @@ import logging.config
 import json
 import asyncpg
 import numpy as np
-from typing import List, Dict, Any, Callable, Optional
+from typing import List, Dict, Any, Callable, Optional, Tuple
 import os
 import csv
+from concurrent.futures import ProcessPoolExecutor
 
 from src.core.config import Config
 from src.strategies.trend_start_finder import generate_trend_starts
+from trend_analysis.trend_start_forward_test import ForwardTrendAnalyzer
+from trend_analysis.bar_store import BarStore
 from src.core.utils import parse_timeframe, format_timeframe_from_unit_value
+from src.analysis.dispatcher import AnalysisDispatcher, AnalysisTarget, DEFAULT_MAX_CONCURRENT_RUNS, build_target_map
+from src.analysis.ohlc_window import OHLCWindowCache
+from src.analysis.signal_sinks import (
+    SIGNAL_COLUMNS, DEFAULT_FLUSH_INTERVAL_SECONDS, DEFAULT_MAX_BATCH_ROWS, DEFAULT_MAX_QUEUED_ROWS,
+    SignalSinkPipeline, create_signal_sinks,
+)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 config = Config()
 BAR_HISTORY_COUNT = 200
+DEFAULT_CATCH_UP_CHUNK_BARS = 5000
 
 STRATEGY_MAPPING = {
     "cus_cds_trend_finder": generate_trend_starts
 }
 
+# Strategies that can run as a resident, bar-at-a-time analyzer instead of re-running
+# the strategy function over a BAR_HISTORY_COUNT window on every notification.
+STREAMING_STRATEGY_MAPPING = {
+    "cus_cds_trend_finder": ForwardTrendAnalyzer
+}
+
+# Resident analyzers keyed by (analyzer_id, contract_id, timeframe)
+RESIDENT_ANALYZERS: Dict[Tuple[str, str, str], ForwardTrendAnalyzer] = {}
+
 DB_POOL_MAIN_FOR_HANDLER: Optional[asyncpg.Pool] = None
 
+# Routes ohlc_update bars to their targets (see src/analysis/dispatcher.py); set by main_analyzer_loop
+DISPATCHER: Optional[AnalysisDispatcher] = None
+# Worker processes for the CPU-bound strategy functions; None runs them inline
+STRATEGY_EXECUTOR: Optional[ProcessPoolExecutor] = None
+# Worker processes for the startup backlog catch-up, one target per process at a time; None runs it in this process
+CATCH_UP_EXECUTOR: Optional[ProcessPoolExecutor] = None
+# asyncpg.connect() arguments of the analysis DB, for processes that open their own pool; set with the main pool
+DB_CONNECTION_PARAMS: Optional[Dict[str, Any]] = None
+# Resident OHLC windows of the targeted contracts/timeframes (see src/analysis/ohlc_window.py); set by main_analyzer_loop
+OHLC_WINDOWS: Optional[OHLCWindowCache] = None
+# Batched signal/debug-log writer (see src/analysis/signal_sinks.py); set by start_signal_sinks
+SIGNAL_SINKS: Optional[SignalSinkPipeline] = None
+
+# NOTIFY channel announcing newly inserted detected_signals rows (consumed by the SignalCoordinator)
+SIGNAL_NOTIFY_CHANNEL = "signal_inserted"
+
 CSV_LOG_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'logs')
 CSV_FILE_PATH = os.path.join(CSV_LOG_DIR, 'detected_signals_history.csv')
-CSV_HEADERS = [
-    'analyzer_id', 'timestamp', 'trigger_timestamp', 'contract_id', 'timeframe',
-    'signal_type', 'signal_price',
-    'signal_open', 'signal_high', 'signal_low', 'signal_close', 'signal_volume',
-    'details'
-]
+CSV_HEADERS = list(SIGNAL_COLUMNS)
 
 def ensure_csv_headers():
     os.makedirs(CSV_LOG_DIR, exist_ok=True)
@@ -195,42 +227,56 @@ async def store_signals(
             json.dumps(convert_np_types(signal.get('details', {})))
         ))
     
-    if signals_to_store:
+    if not signals_to_store:
+        return 0
+    if SIGNAL_SINKS is not None:
+        # Resolves once the batch holding these rows is committed, so callers may advance their watermark after it
+        num_stored = await SIGNAL_SINKS.submit(signals_to_store)
+    else:
+        # No pipeline running (one-off use): write through the configured sinks right away
+        pipeline = create_signal_sink_pipeline(pool, config.settings.get('analysis', {}))
+        pipeline.start()
         try:
-            with open(CSV_FILE_PATH, 'a', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                for signal_row_tuple in signals_to_store:
-                    csv_row = [item.isoformat() if isinstance(item, datetime) else item for item in signal_row_tuple]
-                    writer.writerow(csv_row)
-            logger.info(f"Appended {len(signals_to_store)} signal(s) to {CSV_FILE_PATH}")
-        except Exception as e:
-            logger.error(f"Error writing signals to CSV {CSV_FILE_PATH}: {e}", exc_info=True)
-
-    insert_query = """
-        INSERT INTO detected_signals (
-            analyzer_id, timestamp, trigger_timestamp, contract_id, timeframe, 
-            signal_type, signal_price, signal_open, signal_high, signal_low, signal_close, signal_volume, details
-        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
-        ON CONFLICT ON CONSTRAINT detected_signals_unique_idx DO UPDATE SET
-            trigger_timestamp = EXCLUDED.trigger_timestamp, signal_price = EXCLUDED.signal_price,
-            signal_open = EXCLUDED.signal_open, signal_high = EXCLUDED.signal_high,
-            signal_low = EXCLUDED.signal_low, signal_close = EXCLUDED.signal_close,
-            signal_volume = EXCLUDED.signal_volume, details = EXCLUDED.details
-        RETURNING signal_id;
-    """
-    conn = None
-    num_stored = 0
-    try:
-        conn = await pool.acquire()
-        await conn.executemany(insert_query, signals_to_store)
-        num_stored = len(signals_to_store)
+            num_stored = await pipeline.submit(signals_to_store)
+        finally:
+            await pipeline.close()
+    if num_stored:
         logger.info(f"Successfully stored/updated {num_stored} signals for {analyzer_id} ({contract_id} [{timeframe_str}]).")
-    except Exception as e:
-        logger.error(f"Error storing signals for {analyzer_id} ({contract_id} [{timeframe_str}]): {e}", exc_info=True)
-    finally:
-        if conn: await pool.release(conn)
+    else:
+        logger.error(f"Signals for {analyzer_id} ({contract_id} [{timeframe_str}]) were not stored.")
     return num_stored
 
+def queue_strategy_debug_logs(
+    debug_log_entries: List[Dict[str, Any]], analyzer_id: str, contract_id: str, timeframe_str: str
+):
+    """Hands a run's debug logs to SIGNAL_SINKS for its next off-loop flush; writes them now without a pipeline."""
+    if SIGNAL_SINKS is None:
+        write_strategy_debug_logs_to_csv(debug_log_entries, analyzer_id, contract_id, timeframe_str)
+    else:
+        SIGNAL_SINKS.submit_debug_logs(debug_log_entries, analyzer_id, contract_id, timeframe_str)
+
+def create_signal_sink_pipeline(pool: Optional[asyncpg.Pool], analysis_config: Dict[str, Any]) -> SignalSinkPipeline:
+    sinks_config = analysis_config.get('signal_sinks', {})
+    return SignalSinkPipeline(
+        create_signal_sinks(sinks_config, pool, SIGNAL_NOTIFY_CHANNEL, CSV_FILE_PATH),
+        flush_interval=sinks_config.get('flush_interval_seconds', DEFAULT_FLUSH_INTERVAL_SECONDS),
+        max_batch_rows=sinks_config.get('max_batch_rows', DEFAULT_MAX_BATCH_ROWS),
+        max_queued_rows=sinks_config.get('max_queued_rows', DEFAULT_MAX_QUEUED_ROWS),
+        debug_log_writer=write_strategy_debug_logs_to_csv,
+    )
+
+async def start_signal_sinks(pool: asyncpg.Pool, analysis_config: Dict[str, Any]) -> SignalSinkPipeline:
+    global SIGNAL_SINKS
+    SIGNAL_SINKS = create_signal_sink_pipeline(pool, analysis_config)
+    SIGNAL_SINKS.start()
+    return SIGNAL_SINKS
+
+async def close_signal_sinks():
+    global SIGNAL_SINKS
+    if SIGNAL_SINKS is not None:
+        pipeline, SIGNAL_SINKS = SIGNAL_SINKS, None
+        await pipeline.close()
+
 async def fetch_ohlc_bars_for_analysis(
     pool: asyncpg.Pool, contract_id: str, timeframe_unit: int, 
     timeframe_value: int, last_processed_timestamp: Optional[datetime]
@@ -282,6 +328,30 @@ async def fetch_ohlc_bars_for_analysis_window(
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     return df
 
+async def get_analysis_window(
+    pool: asyncpg.Pool, contract_id: str, timeframe_unit: int,
+    timeframe_value: int, end_timestamp: datetime, bar_count: int
+) -> pd.DataFrame:
+    """The last bar_count bars up to end_timestamp: from OHLC_WINDOWS when it holds them, else from the DB."""
+    if OHLC_WINDOWS is not None:
+        bars_df = OHLC_WINDOWS.window(contract_id, timeframe_unit, timeframe_value, end_timestamp, bar_count)
+        if bars_df is not None:
+            return bars_df
+    return await fetch_ohlc_bars_for_analysis_window(
+        pool, contract_id, timeframe_unit, timeframe_value, end_timestamp, bar_count
+    )
+
+def create_ohlc_window_cache(pool: asyncpg.Pool, analysis_config: Dict[str, Any]) -> OHLCWindowCache:
+    async def fetch_window(contract_id, timeframe_unit, timeframe_value, end_timestamp, bar_count):
+        return await fetch_ohlc_bars_for_analysis_window(pool, contract_id, timeframe_unit, timeframe_value, end_timestamp, bar_count)
+
+    async def fetch_since(contract_id, timeframe_unit, timeframe_value, after_timestamp):
+        return await fetch_ohlc_bars_for_analysis(pool, contract_id, timeframe_unit, timeframe_value, after_timestamp)
+
+    # Headroom over BAR_HISTORY_COUNT so a run that starts after newer bars were appended still finds its full window
+    capacity = analysis_config.get('window_cache_bars', 2 * BAR_HISTORY_COUNT)
+    return OHLCWindowCache(fetch_window, fetch_since, max(capacity, BAR_HISTORY_COUNT))
+
 async def get_analyzer_watermark(pool: asyncpg.Pool, analyzer_id: str, contract_id: str, timeframe: str) -> Optional[datetime]:
     if not pool: return None
     query = "SELECT last_processed_timestamp FROM analyzer_watermarks WHERE analyzer_id = $1 AND contract_id = $2 AND timeframe = $3;"
@@ -326,10 +396,10 @@ async def run_analyzer_for_target(
 
     logger.info(f"    Fetched {len(new_bars_df)} new OHLC bars for {contract_id} [{timeframe_str}].")
     
-    generated_signals, debug_logs = strategy_func(new_bars_df, contract_id=contract_id, timeframe_str=timeframe_str)
+    generated_signals, debug_logs = await run_strategy(strategy_func, new_bars_df, contract_id, timeframe_str)
 
     if debug_logs:
-        write_strategy_debug_logs_to_csv(debug_logs, analyzer_id, contract_id, timeframe_str)
+        queue_strategy_debug_logs(debug_logs, analyzer_id, contract_id, timeframe_str)
 
     if not generated_signals:
         logger.info(f"    No signals by '{analyzer_id}' for {contract_id} [{timeframe_str}].")
@@ -350,6 +420,247 @@ async def run_analyzer_for_target(
         logger.warning(f"    Could not get new watermark for {analyzer_id}/{contract_id}/{timeframe_str}.")
     logger.info(f"Finished analysis cycle for {analyzer_id} - {contract_id} [{timeframe_str}].")
 
+CATCH_UP_QUERY = """
+    SELECT "timestamp", "open", "high", "low", "close", "volume"
+    FROM ohlc_bars
+    WHERE contract_id = $1 AND timeframe_unit = $2 AND timeframe_value = $3 AND "timestamp" > $4
+    ORDER BY "timestamp" ASC;
+"""
+
+async def catch_up_target_in_chunks(
+    pool: asyncpg.Pool, analyzer_cls: Callable, analyzer_id: str, contract_id: str,
+    timeframe_str: str, chunk_size: int
+) -> Dict[str, Any]:
+    """
+    Streaming backlog catch-up: reads the bars after the target's watermark through a
+    server-side cursor, chunk_size bars at a time, and feeds them to one resident analyzer,
+    whose trend State carries across chunks (the signals are the same as one batch run over
+    the whole backlog). Each chunk's signals are stored and the watermark advanced to its
+    last bar before the next chunk is read, so an interrupted catch-up resumes from there;
+    a resumed run warms the analyzer up on the BAR_HISTORY_COUNT bars up to the watermark
+    first. Needs two pool connections (the cursor's and one for the writes).
+    """
+    watermark_ts = await get_analyzer_watermark(pool, analyzer_id, contract_id, timeframe_str)
+    logger.info(f"  Catching up {analyzer_id}/{contract_id}/{timeframe_str} in chunks of {chunk_size} bars from {watermark_ts or 'the beginning'}.")
+    tf_unit, tf_value = parse_timeframe(timeframe_str)
+    analyzer = analyzer_cls(contract_id=contract_id, timeframe_str=timeframe_str)
+    if watermark_ts is not None:
+        history_df = await fetch_ohlc_bars_for_analysis_window(
+            pool, contract_id, tf_unit, tf_value, watermark_ts, BAR_HISTORY_COUNT
+        )
+        # Signals confirmed up to the watermark were stored by the run that set it
+        for bar in BarStore.from_dataframe(history_df):
+            analyzer.process_new_bar(bar)
+        analyzer.get_debug_logs()
+
+    summary = {'analyzer_id': analyzer_id, 'contract_id': contract_id, 'timeframe': timeframe_str,
+               'bars': 0, 'chunks': 0, 'signals_stored': 0}
+    async with pool.acquire() as conn:
+        # Cursors only live inside a transaction; the writes below commit on their own connections
+        async with conn.transaction(isolation='repeatable_read', readonly=True):
+            cursor = await conn.cursor(
+                CATCH_UP_QUERY, contract_id, tf_unit, tf_value,
+                watermark_ts or datetime(1970, 1, 1, tzinfo=timezone.utc)
+            )
+            while True:
+                records = await cursor.fetch(chunk_size)
+                if not records:
+                    break
+                chunk_signals = []
+                for record in records:
+                    bar = analyzer.make_next_bar(
+                        record['timestamp'], float(record['open']), float(record['high']),
+                        float(record['low']), float(record['close']), float(record['volume'] or 0.0)
+                    )
+                    chunk_signals.extend(analyzer.process_new_bar(bar))
+                debug_logs = analyzer.get_debug_logs() # Collected per chunk so they don't pile up
+                if debug_logs:
+                    queue_strategy_debug_logs(debug_logs, analyzer_id, contract_id, timeframe_str)
+                if chunk_signals:
+                    summary['signals_stored'] += await store_signals(
+                        pool, analyzer_id, contract_id, tf_unit, tf_value, chunk_signals
+                    )
+                chunk_end = records[-1]['timestamp']
+                if chunk_end.tzinfo is None: chunk_end = chunk_end.replace(tzinfo=timezone.utc)
+                await update_analyzer_watermark(pool, analyzer_id, contract_id, timeframe_str, chunk_end)
+                summary['bars'] += len(records)
+                summary['chunks'] += 1
+                logger.info(f"    Caught up {analyzer_id}/{contract_id}/{timeframe_str} to {chunk_end} "
+                            f"({summary['bars']} bars, {summary['signals_stored']} signals so far).")
+    logger.info(f"Finished catch-up for {analyzer_id}/{contract_id}/{timeframe_str}: {summary}")
+    return summary
+
+def catch_up_target_in_process(
+    db_params: Dict[str, Any], strategy_name: str, analyzer_id: str, contract_id: str,
+    timeframe_str: str, chunk_size: int
+) -> Dict[str, Any]:
+    """CATCH_UP_EXECUTOR entry point: catch_up_target_in_chunks on this process's own small pool and signal sinks."""
+    async def run():
+        pool = await asyncpg.create_pool(**db_params, min_size=1, max_size=2)
+        await start_signal_sinks(pool, config.settings.get('analysis', {}))
+        try:
+            return await catch_up_target_in_chunks(
+                pool, STREAMING_STRATEGY_MAPPING[strategy_name], analyzer_id, contract_id, timeframe_str, chunk_size
+            )
+        finally:
+            await close_signal_sinks()
+            await pool.close()
+    return asyncio.run(run())
+
+async def catch_up_target(
+    pool: asyncpg.Pool, target: AnalysisTarget, chunk_size: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Backlog catch-up of one target: chunked on a CATCH_UP_EXECUTOR process when the
+    strategy has a resident analyzer (in this process without an executor), else one
+    run_analyzer_for_target pass over the whole backlog.
+    """
+    analyzer_id, contract_id, timeframe_str = target.key
+    analyzer_cls = STREAMING_STRATEGY_MAPPING.get(target.strategy_name)
+    try:
+        if analyzer_cls is None:
+            target_config = {'analyzer_id': analyzer_id, 'contract_id': contract_id, 'timeframe': timeframe_str}
+            await run_analyzer_for_target(pool, target_config, STRATEGY_MAPPING[target.strategy_name])
+            return None
+        if CATCH_UP_EXECUTOR is None or DB_CONNECTION_PARAMS is None:
+            return await catch_up_target_in_chunks(pool, analyzer_cls, analyzer_id, contract_id, timeframe_str, chunk_size)
+        return await asyncio.get_running_loop().run_in_executor(CATCH_UP_EXECUTOR, functools.partial(
+            catch_up_target_in_process, DB_CONNECTION_PARAMS, target.strategy_name,
+            analyzer_id, contract_id, timeframe_str, chunk_size
+        ))
+    except Exception as e:
+        logger.error(f"Backlog catch-up failed for {analyzer_id}/{contract_id}/{timeframe_str}: {e}", exc_info=True)
+        return None
+
+async def seed_resident_analyzer(
+    pool: asyncpg.Pool, analyzer_cls: Callable, analyzer_id: str, contract_id: str,
+    timeframe_str: str, end_timestamp: datetime
+) -> Tuple[Optional[ForwardTrendAnalyzer], List[Dict[str, Any]]]:
+    """
+    Creates a resident analyzer for a target and warms it up on the last BAR_HISTORY_COUNT
+    bars up to and including end_timestamp. Returns (analyzer, signals emitted while seeding),
+    or (None, []) if there is not enough history yet.
+    """
+    tf_unit, tf_value = parse_timeframe(timeframe_str)
+    history_df = await get_analysis_window(
+        pool, contract_id, tf_unit, tf_value, end_timestamp, BAR_HISTORY_COUNT
+    )
+    min_bars = config.settings.get('analysis', {}).get('min_bars_for_notification_trigger', 50)
+    if history_df.empty or len(history_df) < min_bars:
+        logger.info(f"    Not enough history ({len(history_df)}) to seed resident analyzer for {contract_id} [{timeframe_str}].")
+        return None, []
+
+    analyzer = analyzer_cls(contract_id=contract_id, timeframe_str=timeframe_str)
+    seed_signals = []
+    # Store views are indexed 1..n, which is exactly the sequence a fresh analyzer expects
+    for bar in BarStore.from_dataframe(history_df):
+        seed_signals.extend(analyzer.process_new_bar(bar))
+    RESIDENT_ANALYZERS[(analyzer_id, contract_id, timeframe_str)] = analyzer
+    logger.info(f"    Seeded resident analyzer {analyzer_id}/{contract_id}/{timeframe_str} with {analyzer.current_bar_index} bars.")
+    return analyzer, seed_signals
+
+async def process_bar_with_resident_analyzer(
+    pool: asyncpg.Pool, analyzer_cls: Callable, analyzer_id: str, contract_id: str,
+    timeframe_str: str, bar_timestamp: datetime, payload: Dict[str, Any]
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Feeds the bar carried by an ohlc_update payload to the resident analyzer for the target,
+    seeding it from the DB on first use. Returns only newly confirmed signals, or None if the
+    bar could not be processed (not enough history yet).
+    """
+    key = (analyzer_id, contract_id, timeframe_str)
+    analyzer = RESIDENT_ANALYZERS.get(key)
+    if analyzer is None:
+        analyzer, seed_signals = await seed_resident_analyzer(
+            pool, analyzer_cls, analyzer_id, contract_id, timeframe_str, bar_timestamp
+        )
+        return seed_signals if analyzer is not None else None
+
+    if analyzer.last_bar_timestamp is not None and bar_timestamp <= analyzer.last_bar_timestamp:
+        logger.info(f"    Bar {bar_timestamp} already processed by resident analyzer {analyzer_id}/{contract_id}/{timeframe_str}. Skipping.")
+        return []
+
+    new_bar = analyzer.make_next_bar(
+        bar_timestamp, payload['open'], payload['high'], payload['low'], payload['close'],
+        payload.get('volume') or 0.0
+    )
+    return analyzer.process_new_bar(new_bar)
+
+async def run_strategy(
+    strategy_func: Callable, bars_df: pd.DataFrame, contract_id: str, timeframe_str: str
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Runs a (CPU-bound) strategy function on STRATEGY_EXECUTOR so the event loop keeps
+    receiving notifications meanwhile; inline if no executor has been started.
+    """
+    if STRATEGY_EXECUTOR is None:
+        return strategy_func(bars_df, contract_id=contract_id, timeframe_str=timeframe_str)
+    return await asyncio.get_running_loop().run_in_executor(
+        STRATEGY_EXECUTOR, functools.partial(strategy_func, bars_df, contract_id=contract_id, timeframe_str=timeframe_str)
+    )
+
+def is_resident_target(target: AnalysisTarget) -> bool:
+    return target.strategy_name in STREAMING_STRATEGY_MAPPING
+
+async def process_target_bar(target: AnalysisTarget, bar_timestamp: datetime, payload: Dict[str, Any]) -> int:
+    """
+    Analyzes one ohlc_update bar for one target, stores its signals and advances the
+    target's watermark. Returns the number of signals stored. Called by the dispatcher,
+    which never runs two bars of the same target at once.
+    """
+    analyzer_id, contract_id, timeframe_str = target.key
+    logger.info(f"  MATCH: Analyzer='{analyzer_id}', Contract='{contract_id}', TF='{timeframe_str}'. Triggering.")
+    tf_unit, tf_value = parse_timeframe(timeframe_str)
+    num_stored = 0
+
+    analyzer_cls = STREAMING_STRATEGY_MAPPING.get(target.strategy_name)
+    if analyzer_cls is not None:
+        generated_signals = await process_bar_with_resident_analyzer(
+            DB_POOL_MAIN_FOR_HANDLER, analyzer_cls, analyzer_id, contract_id,
+            timeframe_str, bar_timestamp, payload
+        )
+        if generated_signals is None:
+            return 0
+        if generated_signals:
+            num_stored = await store_signals(
+                DB_POOL_MAIN_FOR_HANDLER, analyzer_id, contract_id, tf_unit, tf_value, generated_signals
+            )
+            logger.info(f"    Stored {num_stored} new signals for {analyzer_id}/{contract_id}/{timeframe_str} from resident analyzer.")
+        await update_analyzer_watermark(DB_POOL_MAIN_FOR_HANDLER, analyzer_id, contract_id, timeframe_str, bar_timestamp)
+        return num_stored
+
+    historical_bars_df = await get_analysis_window(
+        DB_POOL_MAIN_FOR_HANDLER, contract_id, tf_unit, tf_value, bar_timestamp, BAR_HISTORY_COUNT
+    )
+    if historical_bars_df.empty or len(historical_bars_df) < config.settings.get('analysis',{}).get('min_bars_for_notification_trigger', 50): # Use a config value
+        logger.info(f"    Not enough history ({len(historical_bars_df)}) for {contract_id} [{timeframe_str}]. Skipping.")
+        return 0
+
+    generated_signals, debug_logs = await run_strategy(
+        STRATEGY_MAPPING[target.strategy_name], historical_bars_df, contract_id, timeframe_str
+    )
+    if debug_logs:
+        queue_strategy_debug_logs(debug_logs, analyzer_id, contract_id, timeframe_str)
+    if generated_signals:
+        num_stored = await store_signals(
+            DB_POOL_MAIN_FOR_HANDLER, analyzer_id, contract_id, tf_unit, tf_value, generated_signals
+        )
+        logger.info(f"    Stored {num_stored} signals for {analyzer_id}/{contract_id}/{timeframe_str} from notification.")
+
+    await update_analyzer_watermark(DB_POOL_MAIN_FOR_HANDLER, analyzer_id, contract_id, timeframe_str, bar_timestamp)
+    logger.info(f"    Updated watermark for {analyzer_id}/{contract_id}/{timeframe_str} to {bar_timestamp} from notification.")
+    return num_stored
+
+def create_dispatcher(analysis_config: Dict[str, Any]) -> AnalysisDispatcher:
+    dispatch_config = analysis_config.get('dispatch', {})
+    return AnalysisDispatcher(
+        build_target_map(analysis_config.get('targets', []), STRATEGY_MAPPING),
+        process_target_bar,
+        # Resident analyzers must see every bar; windowed strategies only need the newest one
+        coalesce=lambda target: not is_resident_target(target),
+        max_concurrent=dispatch_config.get('max_concurrent_runs', DEFAULT_MAX_CONCURRENT_RUNS),
+    )
+
 async def handle_new_bar_notification(connection, pid, channel, payload_str):
     logger.info(f"Notification on '{channel}'. Raw: {payload_str[:200]}...")
     try:
@@ -371,55 +682,61 @@ async def handle_new_bar_notification(connection, pid, channel, payload_str):
         
         logger.info(f"OHLC bar: Contract={contract_id_notif}, TS={bar_timestamp}, TF={timeframe_str_notif}")
 
-        analysis_config = config.settings.get('analysis', {})
-        configured_targets = analysis_config.get('targets', [])
-        
-        for target_config in configured_targets:
-            analyzer_id = target_config.get('analyzer_id')
-            config_contract_id = target_config.get('contract_id')
-            if not analyzer_id or not config_contract_id: continue
-
-            strategy_func_name = target_config.get('strategy', 'cus_cds_trend_finder')
-            strategy_func = STRATEGY_MAPPING.get(strategy_func_name)
-            if not strategy_func:
-                logger.error(f"Strategy '{strategy_func_name}' for analyzer '{analyzer_id}' not found. Cannot process notification.")
-                continue
-
-            if contract_id_notif == config_contract_id:
-                for config_timeframe_str in target_config.get('timeframes', []):
-                    if timeframe_str_notif == config_timeframe_str:
-                        logger.info(f"  MATCH: Analyzer='{analyzer_id}', Contract='{contract_id_notif}', TF='{timeframe_str_notif}'. Triggering.")
-                        tf_unit_for_query, tf_value_for_query = parse_timeframe(config_timeframe_str)
-                        
-                        historical_bars_df = await fetch_ohlc_bars_for_analysis_window(
-                            DB_POOL_MAIN_FOR_HANDLER, contract_id_notif, 
-                            tf_unit_for_query, tf_value_for_query, bar_timestamp, BAR_HISTORY_COUNT
-                        )
-                        if historical_bars_df.empty or len(historical_bars_df) < config.settings.get('analysis',{}).get('min_bars_for_notification_trigger', 50): # Use a config value
-                            logger.info(f"    Not enough history ({len(historical_bars_df)}) for {contract_id_notif} [{config_timeframe_str}]. Skipping.")
-                            continue
-                        
-                        generated_signals, debug_logs = strategy_func(
-                            historical_bars_df, contract_id=contract_id_notif, timeframe_str=config_timeframe_str
-                        )
-                        if debug_logs:
-                            write_strategy_debug_logs_to_csv(
-                                debug_logs, analyzer_id, contract_id_notif, config_timeframe_str
-                            )
-                        if generated_signals:
-                            num_stored = await store_signals(
-                                DB_POOL_MAIN_FOR_HANDLER, analyzer_id, contract_id_notif,
-                                tf_unit_for_query, tf_value_for_query, generated_signals
-                            )
-                            logger.info(f"    Stored {num_stored} signals for {analyzer_id}/{contract_id_notif}/{config_timeframe_str} from notification.")
-                        
-                        await update_analyzer_watermark(DB_POOL_MAIN_FOR_HANDLER, analyzer_id, contract_id_notif, config_timeframe_str, bar_timestamp)
-                        logger.info(f"    Updated watermark for {analyzer_id}/{contract_id_notif}/{config_timeframe_str} to {bar_timestamp} from notification.")
-                        break 
+        if DISPATCHER is None:
+            logger.warning("Notification received before the dispatcher was started. Skipping.")
+            return
+        if OHLC_WINDOWS is not None and DISPATCHER.targets_for(contract_id_notif, timeframe_str_notif):
+            await OHLC_WINDOWS.ingest(contract_id_notif, timeframe_unit_notif, timeframe_value_notif, bar_timestamp, payload)
+        # Only queues the bar; the analysis runs on the dispatcher's tasks, off this callback
+        DISPATCHER.submit(contract_id_notif, timeframe_str_notif, bar_timestamp, payload)
     except Exception as e:
         logger.error(f"Error processing notification: {e}", exc_info=True)
 
+async def log_dispatcher_stats_periodically(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if DISPATCHER is not None:
+            logger.info(f"Dispatcher stats: {DISPATCHER.stats()}")
+        if OHLC_WINDOWS is not None:
+            logger.info(f"OHLC window cache stats: {OHLC_WINDOWS.stats()}")
+        if SIGNAL_SINKS is not None:
+            logger.info(f"Signal sink stats: {SIGNAL_SINKS.stats()}")
+
+def start_strategy_executor(analysis_config: Dict[str, Any]) -> Optional[ProcessPoolExecutor]:
+    global STRATEGY_EXECUTOR
+    workers = analysis_config.get('dispatch', {}).get('process_pool_workers', os.cpu_count() or 1)
+    if workers < 1:
+        logger.info("Strategy process pool disabled; strategies run on the event loop.")
+        return None
+    # spawn: forking a process that runs an event loop and holds DB connections is not safe
+    STRATEGY_EXECUTOR = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    logger.info(f"Started strategy process pool with {workers} worker(s).")
+    return STRATEGY_EXECUTOR
+
+def start_catch_up_executor(analysis_config: Dict[str, Any]) -> Optional[ProcessPoolExecutor]:
+    global CATCH_UP_EXECUTOR
+    workers = analysis_config.get('catch_up', {}).get('workers', os.cpu_count() or 1)
+    if workers < 1:
+        return None
+    CATCH_UP_EXECUTOR = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    logger.info(f"Started backlog catch-up process pool with {workers} worker(s).")
+    return CATCH_UP_EXECUTOR
+
+def shutdown_catch_up_executor():
+    global CATCH_UP_EXECUTOR
+    if CATCH_UP_EXECUTOR is not None:
+        CATCH_UP_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        CATCH_UP_EXECUTOR = None
+
+def shutdown_strategy_executor():
+    global STRATEGY_EXECUTOR
+    if STRATEGY_EXECUTOR is not None:
+        STRATEGY_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        STRATEGY_EXECUTOR = None
+        logger.info("Strategy process pool shut down.")
+
 async def main_analyzer_loop(app_config: Config, pool: asyncpg.Pool):
+    global DISPATCHER, OHLC_WINDOWS
     logger.info("Starting Analyzer Service event loop...")
     await create_signals_table_if_not_exists(pool)
     await create_watermarks_table_if_not_exists(pool)
@@ -427,49 +744,49 @@ async def main_analyzer_loop(app_config: Config, pool: asyncpg.Pool):
     analysis_config = app_config.settings.get('analysis', {})
     analysis_targets = analysis_config.get('targets', [])
     if not analysis_targets: logger.warning("No analysis targets configured. Analyzer will be idle.")
+    DISPATCHER = create_dispatcher(analysis_config)
+    OHLC_WINDOWS = create_ohlc_window_cache(pool, analysis_config)
+    start_strategy_executor(analysis_config)
+    await start_signal_sinks(pool, analysis_config)
+    stats_interval = analysis_config.get('dispatch', {}).get('stats_log_interval_seconds', 60)
 
     try:
         async with pool.acquire() as conn:
             await conn.add_listener('ohlc_update', handle_new_bar_notification)
             logger.info("Listening for new OHLC bar notifications on 'ohlc_update'...")
 
-            logger.info("Performing initial analysis run for configured targets (1D only for debug)...")
-            initial_analysis_tasks = []
-            for target_config in analysis_targets:
-                analyzer_id = target_config.get('analyzer_id')
-                strategy_func_name = target_config.get('strategy', 'cus_cds_trend_finder')
-                strategy_func = STRATEGY_MAPPING.get(strategy_func_name)
-                if not analyzer_id or not strategy_func: continue
-                contract_id = target_config.get('contract_id')
-                if not contract_id: continue
-
-                for tf_str in target_config.get('timeframes', []):
-                    single_target_run_config_for_backlog = {
-                        'analyzer_id': analyzer_id, 'contract_id': contract_id, 'timeframe': tf_str,
-                    }
-                    logger.info(f"Queueing {tf_str} backlog analysis for: {analyzer_id} - {contract_id} [{tf_str}]")
-                    task = run_analyzer_for_target(pool, single_target_run_config_for_backlog, strategy_func)
-                    initial_analysis_tasks.append(task)
-            
-            if initial_analysis_tasks:
-                await asyncio.gather(*initial_analysis_tasks)
-            logger.info("Initial backlog processing complete (1D only). Switching to full notification-driven mode.")
+            # Seeded after LISTEN starts, so no bar falls between the seed and the first notification
+            await asyncio.gather(*(
+                OHLC_WINDOWS.seed(contract_id, *parse_timeframe(tf_str)) for contract_id, tf_str in DISPATCHER.targets_by_bar
+            ))
 
-            while True:
-                await asyncio.sleep(3600)
-                logger.debug("Analyzer service alive...")
+            logger.info("Performing initial backlog catch-up for configured targets...")
+            chunk_size = analysis_config.get('catch_up', {}).get('chunk_bars', DEFAULT_CATCH_UP_CHUNK_BARS)
+            start_catch_up_executor(analysis_config)
+            try:
+                await asyncio.gather(*(
+                    catch_up_target(pool, target, chunk_size)
+                    for targets in DISPATCHER.targets_by_bar.values() for target in targets
+                ))
+            finally:
+                shutdown_catch_up_executor()
+            logger.info("Initial backlog processing complete. Switching to full notification-driven mode.")
+
+            await log_dispatcher_stats_periodically(stats_interval)
     except asyncio.CancelledError:
         logger.info("Analyzer service loop cancelled.")
     except Exception as e:
         logger.error(f"Critical error in analyzer service loop: {e}", exc_info=True)
     finally:
+        await DISPATCHER.close()
+        shutdown_strategy_executor()
+        await close_signal_sinks()
         logger.info("Analyzer service loop finished.")
 
 DB_POOL_MAIN: Optional[asyncpg.Pool] = None # Renamed from db_pool_main to avoid conflict
 
-async def init_db_pool_main_runner(): # Renamed
-    global DB_POOL_MAIN 
-    global DB_POOL_MAIN_FOR_HANDLER
+def resolve_db_connection_params() -> Optional[Dict[str, Any]]:
+    """asyncpg connection arguments (user, password, database, host, port) of the analysis DB, or None."""
     database_configs = config.settings['database']
     active_db_key = database_configs.get('default_analysis_db', 'local_timescaledb') 
     db_conn_details = database_configs.get(active_db_key)
@@ -486,16 +803,31 @@ async def init_db_pool_main_runner(): # Renamed
     if not password:
         logger.critical(f"DB password for '{active_db_key}' not resolved.")
         return None
+    return {
+        'user': db_conn_details.get('user'), 'password': password,
+        'database': db_conn_details.get('dbname'), 'host': db_conn_details.get('host'),
+        'port': db_conn_details.get('port'),
+    }
+
+async def init_db_pool_main_runner(): # Renamed
+    global DB_POOL_MAIN 
+    global DB_POOL_MAIN_FOR_HANDLER
+    global DB_CONNECTION_PARAMS
+    database_configs = config.settings['database']
+    active_db_key = database_configs.get('default_analysis_db', 'local_timescaledb') 
+    db_conn_details = database_configs.get(active_db_key)
+    db_params = resolve_db_connection_params()
+    if not db_params:
+        return None
 
     try:
         DB_POOL_MAIN = await asyncpg.create_pool(
-            user=db_conn_details.get('user'), password=password,
-            database=db_conn_details.get('dbname'), host=db_conn_details.get('host'),
-            port=db_conn_details.get('port'),
+            **db_params,
             min_size=db_conn_details.get('min_pool_size', 1),
             max_size=db_conn_details.get('max_pool_size', 10)
         )
         DB_POOL_MAIN_FOR_HANDLER = DB_POOL_MAIN
+        DB_CONNECTION_PARAMS = db_params
         logger.info(f"Created DB pool for AnalyzerService (main) using '{active_db_key}'.")
         return DB_POOL_MAIN
     except Exception as e:
@@ -0,0 +1,198 @@
+"""
+Concurrent, bounded dispatch of ohlc_update bars to the analyzer targets they concern.
+
+The configured targets are compiled once into a (contract_id, timeframe) -> targets map, so a
+notification costs one dict lookup instead of a scan of the configuration. Each target gets
+its own drain task that processes its bars one at a time (a target's runs never overlap, so
+its watermark and resident analyzer state stay ordered), while different targets run
+concurrently up to a global limit of max_concurrent runs.
+
+Bars that pile up for a busy target are coalesced when the target allows it: a windowed
+strategy re-analyzes the last BAR_HISTORY_COUNT bars up to the newest bar anyway, so only
+the latest pending bar is run and the older ones are dropped (latest wins). Targets that
+must see every bar (resident, bar-at-a-time analyzers) get all pending bars in order.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT_RUNS = 4
+
+
+class AnalysisTarget(NamedTuple):
+    analyzer_id: str
+    contract_id: str
+    timeframe_str: str
+    strategy_name: str
+
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return (self.analyzer_id, self.contract_id, self.timeframe_str)
+
+
+def build_target_map(
+    targets_config: Iterable[Dict[str, Any]], strategy_mapping: Dict[str, Callable]
+) -> Dict[Tuple[str, str], List[AnalysisTarget]]:
+    """
+    The analysis.targets configuration as (contract_id, timeframe_str) -> targets, in
+    configuration order. Targets without an analyzer_id or contract_id, or with an unknown
+    strategy, are left out (and logged once, here, instead of on every notification).
+    """
+    targets_by_bar: Dict[Tuple[str, str], List[AnalysisTarget]] = {}
+    for target_config in targets_config:
+        analyzer_id = target_config.get('analyzer_id')
+        contract_id = target_config.get('contract_id')
+        if not analyzer_id or not contract_id: continue
+        strategy_name = target_config.get('strategy', 'cus_cds_trend_finder')
+        if strategy_name not in strategy_mapping:
+            logger.error(f"Strategy '{strategy_name}' for analyzer '{analyzer_id}' not found. Its notifications will be ignored.")
+            continue
+        for timeframe_str in target_config.get('timeframes', []):
+            targets = targets_by_bar.setdefault((contract_id, timeframe_str), [])
+            # Runs are serialized per analyzer/contract/timeframe, so a duplicate entry would only run it twice
+            if all(t.analyzer_id != analyzer_id for t in targets):
+                targets.append(AnalysisTarget(analyzer_id, contract_id, timeframe_str, strategy_name))
+    return targets_by_bar
+
+
+class _TargetQueue:
+    __slots__ = ('pending', 'task')
+
+    def __init__(self):
+        self.pending: Dict[datetime, Tuple[Dict[str, Any], float]] = {} # bar timestamp -> (payload, received_at)
+        self.task: Optional[asyncio.Task] = None
+
+
+class AnalysisDispatcher:
+    """
+    Routes bars to targets and runs them. process_bar(target, bar_timestamp, payload) is
+    awaited for each bar to run and returns the number of signals it stored;
+    coalesce(target) says whether the target's pending bars may be collapsed to the latest.
+    """
+
+    def __init__(
+        self,
+        targets_by_bar: Dict[Tuple[str, str], List[AnalysisTarget]],
+        process_bar: Callable[[AnalysisTarget, datetime, Dict[str, Any]], Awaitable[int]],
+        coalesce: Callable[[AnalysisTarget], bool] = lambda target: True,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT_RUNS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.targets_by_bar = targets_by_bar
+        self.process_bar = process_bar
+        self.coalesce = coalesce
+        self.max_concurrent = max_concurrent
+        self.clock = clock
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._queues: Dict[Tuple[str, str, str], _TargetQueue] = {}
+        self.in_flight = 0
+        self.bars_received = 0
+        self.bars_coalesced = 0
+        self.runs = 0
+        self.failed_runs = 0
+        self.signals_stored = 0
+        self.peak_in_flight = 0
+        self.max_run_seconds = 0.0
+        self.last_signal_latency_seconds: Optional[float] = None
+        self.max_signal_latency_seconds = 0.0
+
+    def targets_for(self, contract_id: str, timeframe_str: str) -> List[AnalysisTarget]:
+        return self.targets_by_bar.get((contract_id, timeframe_str), [])
+
+    def submit(self, contract_id: str, timeframe_str: str, bar_timestamp: datetime, payload: Dict[str, Any]) -> int:
+        """
+        Queues a bar for every target of its contract and timeframe without waiting for any
+        analysis; safe to call from the asyncpg listener callback. Returns the number of
+        targets the bar was queued for.
+        """
+        targets = self.targets_for(contract_id, timeframe_str)
+        received_at = self.clock()
+        for target in targets:
+            queue = self._queues.get(target.key)
+            if queue is None:
+                queue = self._queues[target.key] = _TargetQueue()
+            self.bars_received += 1
+            queue.pending[bar_timestamp] = (payload, received_at)
+            if queue.task is None:
+                queue.task = asyncio.ensure_future(self._drain(target, queue))
+        return len(targets)
+
+    def _next_bars(self, target: AnalysisTarget, queue: _TargetQueue) -> List[Tuple[datetime, Dict[str, Any], float]]:
+        bars = sorted((ts, payload, received_at) for ts, (payload, received_at) in queue.pending.items())
+        queue.pending.clear()
+        if len(bars) > 1 and self.coalesce(target):
+            self.bars_coalesced += len(bars) - 1
+            logger.info(f"Coalesced {len(bars) - 1} pending bar(s) for {'/'.join(target.key)}; running the latest ({bars[-1][0]}).")
+            bars = bars[-1:]
+        return bars
+
+    async def _drain(self, target: AnalysisTarget, queue: _TargetQueue):
+        try:
+            while queue.pending:
+                for bar_timestamp, payload, received_at in self._next_bars(target, queue):
+                    await self._run(target, bar_timestamp, payload, received_at)
+        finally:
+            queue.task = None
+
+    async def _run(self, target: AnalysisTarget, bar_timestamp: datetime, payload: Dict[str, Any], received_at: float):
+        async with self._slots:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            started = self.clock()
+            try:
+                num_stored = await self.process_bar(target, bar_timestamp, payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed_runs += 1
+                logger.error(f"Error analyzing bar {bar_timestamp} for {'/'.join(target.key)}: {e}", exc_info=True)
+                return
+            finally:
+                self.in_flight -= 1
+        finished = self.clock()
+        self.runs += 1
+        self.max_run_seconds = max(self.max_run_seconds, finished - started)
+        if num_stored:
+            self.signals_stored += num_stored
+            latency = finished - bar_timestamp.timestamp()
+            self.last_signal_latency_seconds = latency
+            self.max_signal_latency_seconds = max(self.max_signal_latency_seconds, latency)
+            logger.info(f"    {num_stored} signal(s) for {'/'.join(target.key)} stored {latency:.3f}s after bar {bar_timestamp} "
+                        f"({finished - received_at:.3f}s after its notification).")
+
+    async def wait_idle(self):
+        """Waits until every queued bar has been processed."""
+        while True:
+            tasks = [queue.task for queue in self._queues.values() if queue.task is not None]
+            if not tasks:
+                return
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        """Cancels pending and running analyses."""
+        tasks = [queue.task for queue in self._queues.values() if queue.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in self._queues.values():
+            queue.pending.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'targets': sum(len(targets) for targets in self.targets_by_bar.values()),
+            'bars_received': self.bars_received,
+            'bars_coalesced': self.bars_coalesced,
+            'runs': self.runs,
+            'failed_runs': self.failed_runs,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'queued_bars': sum(len(queue.pending) for queue in self._queues.values()),
+            'signals_stored': self.signals_stored,
+            'max_run_seconds': round(self.max_run_seconds, 3),
+            'last_signal_latency_seconds': self.last_signal_latency_seconds,
+            'max_signal_latency_seconds': round(self.max_signal_latency_seconds, 3),
+        }
@@ -0,0 +1,247 @@
+"""
+Resident rolling OHLC windows for the analyzer, one per (contract_id, timeframe).
+
+Windows are seeded once from ohlc_bars and then appended from the ohlc_update payloads,
+which already carry the complete bar, so a strategy run takes its BAR_HISTORY_COUNT-bar
+window from memory instead of an ORDER BY ... DESC LIMIT query plus DataFrame conversion.
+The database is only consulted again when the payloads alone can't prove the window is
+complete:
+
+- a bar that does not directly follow the last one (more than one timeframe step later,
+  e.g. after a session break or a dropped LISTEN connection) fills the window with the
+  stored bars after the last one;
+- a bar older than the last one that the window doesn't hold (out of order) re-seeds the
+  whole window.
+
+A bar the window already holds (a repeated NOTIFY) is ignored.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+# Bar length per timeframe unit; months (6) vary, so every monthly bar is checked against the DB
+TIMEFRAME_UNIT_SECONDS = {1: 1, 2: 60, 3: 3600, 4: 86400, 5: 7 * 86400}
+
+WindowKey = Tuple[str, int, int] # (contract_id, timeframe_unit, timeframe_value)
+
+
+def to_epoch_ns(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(pd.Timestamp(timestamp).value)
+
+
+class OHLCWindow:
+    """
+    The last `capacity` bars of one contract/timeframe in timestamp order, as an int64
+    epoch-ns column and a float64 (5, n) open/high/low/close/volume block. The live bars
+    are [_start:_end] of buffers twice the capacity, so appending is amortized O(1).
+    `complete` is true while the window holds every stored bar (nothing was evicted and
+    the seed returned less than asked for), so a short window is still a full history.
+    """
+
+    def __init__(self, capacity: int, step_seconds: Optional[int]):
+        self.capacity = capacity
+        self.step_ns = step_seconds * 1_000_000_000 if step_seconds else None
+        self._timestamps = np.empty(2 * capacity, dtype=np.int64)
+        self._values = np.empty((len(PRICE_COLUMNS), 2 * capacity), dtype=np.float64)
+        self._start = self._end = 0
+        self.complete = False
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def last_timestamp_ns(self) -> Optional[int]:
+        return int(self._timestamps[self._end - 1]) if self._end > self._start else None
+
+    def load(self, bars_df: pd.DataFrame, complete: bool):
+        """Replaces the window with the bars of a DataFrame (ascending, as the fetch functions return them)."""
+        self._start = self._end = 0
+        self.complete = complete
+        self.extend(bars_df)
+
+    def extend(self, bars_df: pd.DataFrame):
+        """Appends DataFrame bars newer than the last one."""
+        if bars_df.empty:
+            return
+        timestamps = pd.to_datetime(bars_df['timestamp'], utc=True).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        values = np.vstack([bars_df[column].to_numpy(dtype=np.float64, na_value=np.nan) for column in PRICE_COLUMNS])
+        last = self.last_timestamp_ns
+        if last is not None:
+            newer = timestamps > last
+            timestamps, values = timestamps[newer], values[:, newer]
+        if len(timestamps) > self.capacity:
+            self.complete = False
+            timestamps, values = timestamps[-self.capacity:], values[:, -self.capacity:]
+        self._make_room(len(timestamps))
+        self._timestamps[self._end:self._end + len(timestamps)] = timestamps
+        self._values[:, self._end:self._end + len(timestamps)] = values
+        self._end += len(timestamps)
+
+    def append(self, timestamp_ns: int, bar: Dict[str, Any]):
+        """Appends one bar newer than the last one from an ohlc_update payload."""
+        self._make_room(1)
+        self._timestamps[self._end] = timestamp_ns
+        self._values[:, self._end] = (bar['open'], bar['high'], bar['low'], bar['close'], bar.get('volume') or 0.0)
+        self._end += 1
+
+    def _make_room(self, count: int):
+        keep = min(len(self), self.capacity - count)
+        if keep < len(self):
+            self.complete = False
+            self._start = self._end - keep
+        if self._end + count > len(self._timestamps):
+            self._timestamps[:keep] = self._timestamps[self._start:self._end]
+            self._values[:, :keep] = self._values[:, self._start:self._end]
+            self._start, self._end = 0, keep
+
+    def follows(self, timestamp_ns: int) -> bool:
+        """Whether a bar at timestamp_ns is the one directly after the last bar."""
+        last = self.last_timestamp_ns
+        return last is not None and self.step_ns is not None and timestamp_ns - last == self.step_ns
+
+    def contains(self, timestamp_ns: int) -> bool:
+        position = np.searchsorted(self._timestamps[self._start:self._end], timestamp_ns)
+        return position < len(self) and self._timestamps[self._start + position] == timestamp_ns
+
+    def frame(self, end_timestamp_ns: int, bar_count: int) -> Optional[pd.DataFrame]:
+        """
+        The last bar_count bars up to and including end_timestamp_ns, as the DataFrame
+        fetch_ohlc_bars_for_analysis_window would build; None if the window can't tell
+        (fewer bars than that and older ones were evicted or never loaded).
+        """
+        end = self._start + int(np.searchsorted(self._timestamps[self._start:self._end], end_timestamp_ns, side='right'))
+        start = max(self._start, end - bar_count)
+        if end - start < bar_count and not self.complete:
+            return None
+        frame = pd.DataFrame({column: self._values[i, start:end].copy() for i, column in enumerate(PRICE_COLUMNS)})
+        frame.insert(0, 'timestamp', pd.to_datetime(self._timestamps[start:end].copy(), utc=True))
+        return frame
+
+
+class OHLCWindowCache:
+    """
+    OHLCWindows by (contract_id, timeframe_unit, timeframe_value). fetch_window(contract_id,
+    unit, value, end_timestamp, bar_count) and fetch_since(contract_id, unit, value,
+    after_timestamp) load stored bars as ascending DataFrames (the analyzer's
+    fetch_ohlc_bars_for_analysis_window / fetch_ohlc_bars_for_analysis with the pool bound).
+    Updates of a window are serialized by a per-window lock, in notification order.
+    """
+
+    def __init__(
+        self,
+        fetch_window: Callable[[str, int, int, datetime, int], Awaitable[pd.DataFrame]],
+        fetch_since: Callable[[str, int, int, Optional[datetime]], Awaitable[pd.DataFrame]],
+        capacity: int,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.fetch_window = fetch_window
+        self.fetch_since = fetch_since
+        self.capacity = capacity
+        self.clock = clock
+        self.started_at = clock()
+        self._windows: Dict[WindowKey, OHLCWindow] = {}
+        self._locks: Dict[WindowKey, asyncio.Lock] = {}
+        self.appended = 0
+        self.duplicates = 0
+        self.gap_fills = 0
+        self.resyncs = 0
+        self.db_queries = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _lock(self, key: WindowKey) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def _seed(self, key: WindowKey, end_timestamp: datetime) -> OHLCWindow:
+        contract_id, unit, value = key
+        self.db_queries += 1
+        bars_df = await self.fetch_window(contract_id, unit, value, end_timestamp, self.capacity)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = OHLCWindow(self.capacity, TIMEFRAME_UNIT_SECONDS.get(unit, 0) * value)
+        # An empty result may just be a failed query, so it never counts as the full history
+        window.load(bars_df, complete=0 < len(bars_df) < self.capacity)
+        logger.info(f"Seeded OHLC window {contract_id} [{unit}/{value}] with {len(window)} bars.")
+        return window
+
+    async def seed(self, contract_id: str, timeframe_unit: int, timeframe_value: int, end_timestamp: Optional[datetime] = None):
+        """Loads a window from the database (up to end_timestamp, default now)."""
+        key = (contract_id, timeframe_unit, timeframe_value)
+        async with self._lock(key):
+            await self._seed(key, end_timestamp or datetime.now(timezone.utc))
+
+    async def ingest(self, contract_id: str, timeframe_unit: int, timeframe_value: int,
+                     bar_timestamp: datetime, bar: Dict[str, Any]):
+        """Adds the bar of an ohlc_update payload to its window (seeding, filling or re-syncing it as needed)."""
+        key = (contract_id, timeframe_unit, timeframe_value)
+        timestamp_ns = to_epoch_ns(bar_timestamp)
+        async with self._lock(key):
+            window = self._windows.get(key)
+            if window is None or not len(window):
+                await self._seed(key, bar_timestamp) # The bar is committed before it is notified
+                return
+            last = window.last_timestamp_ns
+            if window.follows(timestamp_ns):
+                window.append(timestamp_ns, bar)
+                self.appended += 1
+            elif timestamp_ns > last:
+                logger.info(f"Bar {bar_timestamp} of {contract_id} [{timeframe_unit}/{timeframe_value}] does not follow "
+                            f"the cached window; filling it from the database.")
+                self.gap_fills += 1
+                self.db_queries += 1
+                missing_df = await self.fetch_since(
+                    contract_id, timeframe_unit, timeframe_value, pd.Timestamp(last, tz='UTC').to_pydatetime()
+                )
+                if missing_df.empty:
+                    # At least this bar is stored, so the query failed: drop the window rather than leave a hole
+                    logger.warning(f"Could not fill the cached window of {contract_id} [{timeframe_unit}/{timeframe_value}]; "
+                                   f"it will be re-seeded.")
+                    del self._windows[key]
+                    return
+                window.extend(missing_df)
+            elif window.contains(timestamp_ns):
+                self.duplicates += 1
+            else:
+                logger.warning(f"Out-of-order bar {bar_timestamp} for {contract_id} [{timeframe_unit}/{timeframe_value}]; "
+                               f"re-syncing the cached window from the database.")
+                self.resyncs += 1
+                await self._seed(key, pd.Timestamp(last, tz='UTC').to_pydatetime())
+
+    def window(self, contract_id: str, timeframe_unit: int, timeframe_value: int,
+               end_timestamp: datetime, bar_count: int) -> Optional[pd.DataFrame]:
+        """The last bar_count bars up to end_timestamp from memory, or None if the cache can't serve them."""
+        window = self._windows.get((contract_id, timeframe_unit, timeframe_value))
+        frame = window.frame(to_epoch_ns(end_timestamp), bar_count) if window is not None else None
+        if frame is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return frame
+
+    def stats(self) -> Dict[str, Any]:
+        hours = max(self.clock() - self.started_at, 1.0) / 3600
+        return {
+            'windows': len(self._windows),
+            'appended_bars': self.appended,
+            'duplicate_bars': self.duplicates,
+            'gap_fills': self.gap_fills,
+            'resyncs': self.resyncs,
+            'db_queries': self.db_queries,
+            'windows_served': self.hits,
+            'windows_missed': self.misses,
+            # Every window served from memory is one ORDER BY ... DESC LIMIT query not issued
+            'db_queries_avoided_per_hour': round(self.hits / hours, 1),
+        }
@@ -0,0 +1,381 @@
+"""
+Batched, asynchronous sinks for the signals the analyzer detects.
+
+store_signals only queues its rows on a SignalSinkPipeline; one background task drains the
+queue and hands every batch (up to max_batch_rows, from however many targets submitted
+meanwhile) to each configured sink:
+
+- PostgresSignalSink COPYs the batch into a temporary staging table and merges it into
+  detected_signals with a single INSERT ... SELECT ... ON CONFLICT statement, which also
+  sends the signal_inserted NOTIFY for the rows that are new. A submission resolves once
+  its batch is committed, so callers can still advance their watermark after it.
+- CSVSignalSink and ParquetSignalSink buffer rows in memory and write them from a worker
+  thread every flush_interval seconds (and on close), so file I/O never runs on the event
+  loop and a burst of notifications costs one append instead of one per call.
+
+Strategy debug logs take the same periodic, off-loop flush: only the latest entries of each
+target are kept between flushes, since each write replaces the target's whole debug CSV.
+"""
+import asyncio
+import collections
+import csv
+import importlib.util
+import itertools
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import asyncpg
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Column order of a signal row, as stored in detected_signals and the signal history CSV
+SIGNAL_COLUMNS = (
+    'analyzer_id', 'timestamp', 'trigger_timestamp', 'contract_id', 'timeframe',
+    'signal_type', 'signal_price',
+    'signal_open', 'signal_high', 'signal_low', 'signal_close', 'signal_volume',
+    'details'
+)
+SIGNAL_KEY_COLUMNS = ('analyzer_id', 'contract_id', 'timeframe', 'timestamp', 'signal_type')
+
+DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+DEFAULT_MAX_BATCH_ROWS = 1000
+DEFAULT_MAX_QUEUED_ROWS = 10000
+
+SignalRow = Tuple[Any, ...] # Values in SIGNAL_COLUMNS order; details is a JSON string
+DebugLogKey = Tuple[str, str, str] # (analyzer_id, contract_id, timeframe_str)
+
+
+class SignalSink:
+    """
+    A destination for signal rows. write(rows) returns how many rows it stored. Buffered
+    sinks only collect rows in write() and do their I/O in flush(), which the pipeline
+    calls every flush interval; unbuffered sinks store each batch in write().
+    """
+    name = 'sink'
+    buffered = False
+
+    async def write(self, rows: List[SignalRow]) -> int:
+        raise NotImplementedError
+
+    async def flush(self):
+        pass
+
+
+class PostgresSignalSink(SignalSink):
+    name = 'postgres'
+
+    STAGING_TABLE = 'detected_signals_staging'
+    CREATE_STAGING_SQL = f"""
+        CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+            analyzer_id TEXT, timestamp TIMESTAMPTZ, trigger_timestamp TIMESTAMPTZ,
+            contract_id TEXT, timeframe TEXT, signal_type TEXT, signal_price REAL,
+            signal_open REAL, signal_high REAL, signal_low REAL, signal_close REAL,
+            signal_volume REAL, details JSONB
+        ) ON COMMIT DELETE ROWS;
+    """
+
+    def __init__(self, pool: asyncpg.Pool, notify_channel: str):
+        self.pool = pool
+        key = ', '.join(SIGNAL_KEY_COLUMNS)
+        # DISTINCT ON: a batch may repeat a signal (e.g. a target re-run), and one INSERT
+        # cannot update the same row twice; the last triggered copy wins, as it did per row.
+        # Rows that were really inserted (xmax = 0) are announced with the columns the
+        # coordinator matches on; details is left out to stay under the 8000-byte NOTIFY limit.
+        self.merge_sql = f"""
+            WITH upserted AS (
+                INSERT INTO detected_signals (
+                    analyzer_id, timestamp, trigger_timestamp, contract_id, timeframe,
+                    signal_type, signal_price, signal_open, signal_high, signal_low, signal_close, signal_volume, details
+                )
+                SELECT DISTINCT ON ({key}) {', '.join(SIGNAL_COLUMNS)}
+                FROM {self.STAGING_TABLE}
+                ORDER BY {key}, trigger_timestamp DESC
+                ON CONFLICT ON CONSTRAINT detected_signals_unique_idx DO UPDATE SET
+                    trigger_timestamp = EXCLUDED.trigger_timestamp, signal_price = EXCLUDED.signal_price,
+                    signal_open = EXCLUDED.signal_open, signal_high = EXCLUDED.signal_high,
+                    signal_low = EXCLUDED.signal_low, signal_close = EXCLUDED.signal_close,
+                    signal_volume = EXCLUDED.signal_volume, details = EXCLUDED.details
+                RETURNING signal_id, analyzer_id, timestamp, trigger_timestamp, contract_id, timeframe,
+                          signal_type, signal_price, (xmax = 0) AS inserted
+            ), notified AS (
+                SELECT pg_notify('{notify_channel}', json_build_object(
+                    'signal_id', signal_id, 'analyzer_id', analyzer_id, 'timestamp', timestamp,
+                    'trigger_timestamp', trigger_timestamp, 'contract_id', contract_id, 'timeframe', timeframe,
+                    'signal_type', signal_type, 'signal_price', signal_price)::text)
+                FROM upserted WHERE inserted
+            )
+            SELECT (SELECT count(*) FROM upserted) AS merged, (SELECT count(*) FROM notified) AS inserted;
+        """
+
+    async def write(self, rows: List[SignalRow]) -> int:
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(self.CREATE_STAGING_SQL)
+                    await conn.copy_records_to_table(self.STAGING_TABLE, records=rows, columns=SIGNAL_COLUMNS)
+                    result = await conn.fetchrow(self.merge_sql)
+        except Exception as e:
+            logger.error(f"Error merging {len(rows)} signal(s) into detected_signals: {e}", exc_info=True)
+            return 0
+        logger.info(f"Merged {len(rows)} signal row(s) into detected_signals ({result['inserted']} new, {result['merged']} stored).")
+        return len(rows)
+
+
+class CSVSignalSink(SignalSink):
+    """Appends rows to a CSV file (with SIGNAL_COLUMNS headers if it is new or empty)."""
+    name = 'csv'
+    buffered = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending: List[SignalRow] = []
+
+    async def write(self, rows: List[SignalRow]) -> int:
+        self._pending.extend(rows)
+        return len(rows)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        await asyncio.to_thread(self._append, rows)
+
+    def _append(self, rows: List[SignalRow]):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, 'a', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                if new_file:
+                    writer.writerow(SIGNAL_COLUMNS)
+                writer.writerows(
+                    [item.isoformat() if isinstance(item, datetime) else item for item in row] for row in rows
+                )
+            logger.info(f"Appended {len(rows)} signal(s) to {self.path}")
+        except Exception as e:
+            logger.error(f"Error writing signals to CSV {self.path}: {e}", exc_info=True)
+
+
+class ParquetSignalSink(SignalSink):
+    """
+    Writes each flush as one Parquet file under `directory` (Parquet files can't be appended
+    to); the file names sort by flush time. Needs pyarrow or fastparquet.
+    """
+    name = 'parquet'
+    buffered = True
+
+    def __init__(self, directory: str):
+        if not any(importlib.util.find_spec(engine) for engine in ('pyarrow', 'fastparquet')):
+            raise ImportError("The Parquet signal sink needs pyarrow or fastparquet. Install it with: pip install pyarrow")
+        self.directory = directory
+        self._pending: List[SignalRow] = []
+        self._sequence = itertools.count()
+
+    async def write(self, rows: List[SignalRow]) -> int:
+        self._pending.extend(rows)
+        return len(rows)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        await asyncio.to_thread(self._write_file, rows)
+
+    def _write_file(self, rows: List[SignalRow]):
+        filename = f"signals_{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{os.getpid()}_{next(self._sequence):06d}.parquet"
+        path = os.path.join(self.directory, filename)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            pd.DataFrame(rows, columns=SIGNAL_COLUMNS).to_parquet(path, index=False)
+            logger.info(f"Wrote {len(rows)} signal(s) to {path}")
+        except Exception as e:
+            logger.error(f"Error writing signals to Parquet {path}: {e}", exc_info=True)
+
+
+class _Submission:
+    __slots__ = ('rows', 'future')
+
+    def __init__(self, rows: List[SignalRow], future: asyncio.Future):
+        self.rows = rows
+        self.future = future
+
+
+class SignalSinkPipeline:
+    """
+    Feeds submitted signal rows to the sinks from one background task. submit() resolves
+    with the number of rows stored once the unbuffered sinks have written its batch (all
+    of them, or 0 if one failed); buffered sinks are flushed every flush_interval seconds.
+    submit() waits while more than max_queued_rows are queued.
+    """
+
+    def __init__(
+        self,
+        sinks: Sequence[SignalSink],
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+        max_batch_rows: int = DEFAULT_MAX_BATCH_ROWS,
+        max_queued_rows: int = DEFAULT_MAX_QUEUED_ROWS,
+        debug_log_writer: Optional[Callable[[List[Dict[str, Any]], str, str, str], None]] = None,
+    ):
+        self.sinks = list(sinks)
+        self.flush_interval = flush_interval
+        self.max_batch_rows = max_batch_rows
+        self.max_queued_rows = max_queued_rows
+        self.debug_log_writer = debug_log_writer
+        self._queue: Deque[_Submission] = collections.deque()
+        self._queued_rows = 0
+        self._debug_logs: Dict[DebugLogKey, List[Dict[str, Any]]] = {}
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.rows_submitted = 0
+        self.rows_stored = 0
+        self.failed_batches = 0
+        self.batches = 0
+        self.flushes = 0
+        self.debug_logs_superseded = 0
+        self.max_batch_seconds = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+            logger.info(f"Started signal sink pipeline ({', '.join(sink.name for sink in self.sinks) or 'no sinks'}).")
+
+    async def submit(self, rows: List[SignalRow]) -> int:
+        if not rows:
+            return 0
+        while self._queued_rows >= self.max_queued_rows:
+            self._drained.clear()
+            await self._drained.wait()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append(_Submission(rows, future))
+        self._queued_rows += len(rows)
+        self.rows_submitted += len(rows)
+        self._wakeup.set()
+        return await future
+
+    def submit_debug_logs(self, entries: List[Dict[str, Any]], analyzer_id: str, contract_id: str, timeframe_str: str):
+        """Queues a target's debug log for the next flush, replacing one that is still pending."""
+        key = (analyzer_id, contract_id, timeframe_str)
+        if key in self._debug_logs:
+            self.debug_logs_superseded += 1
+        self._debug_logs[key] = entries
+
+    def _next_batch(self) -> List[_Submission]:
+        batch, batch_rows = [], 0
+        while self._queue and (not batch or batch_rows + len(self._queue[0].rows) <= self.max_batch_rows):
+            submission = self._queue.popleft()
+            batch.append(submission)
+            batch_rows += len(submission.rows)
+        self._queued_rows -= batch_rows
+        self._drained.set()
+        return batch
+
+    async def _write_batch(self, batch: List[_Submission]):
+        rows = [row for submission in batch for row in submission.rows]
+        started = time.monotonic()
+        stored = len(rows)
+        for sink in self.sinks:
+            written = await sink.write(rows)
+            if not sink.buffered:
+                stored = min(stored, written)
+        self.batches += 1
+        self.max_batch_seconds = max(self.max_batch_seconds, time.monotonic() - started)
+        ok = stored == len(rows)
+        if ok:
+            self.rows_stored += stored
+        else:
+            self.failed_batches += 1
+        for submission in batch:
+            if not submission.future.done():
+                submission.future.set_result(len(submission.rows) if ok else 0)
+
+    async def flush(self):
+        """Writes the buffered sinks' rows and the pending debug logs."""
+        debug_logs, self._debug_logs = self._debug_logs, {}
+        for sink in self.sinks:
+            if sink.buffered:
+                await sink.flush()
+        if self.debug_log_writer is not None and debug_logs:
+            await asyncio.to_thread(self._write_debug_logs, debug_logs)
+        self.flushes += 1
+
+    def _write_debug_logs(self, debug_logs: Dict[DebugLogKey, List[Dict[str, Any]]]):
+        for (analyzer_id, contract_id, timeframe_str), entries in debug_logs.items():
+            self.debug_log_writer(entries, analyzer_id, contract_id, timeframe_str)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_flush = loop.time() + self.flush_interval
+        while True:
+            if not self._queue:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.0, next_flush - loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            if self._queue:
+                try:
+                    await self._write_batch(self._next_batch())
+                except Exception as e:
+                    logger.error(f"Error in signal sink pipeline: {e}", exc_info=True)
+            if loop.time() >= next_flush:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error(f"Error flushing signal sinks: {e}", exc_info=True)
+                next_flush = loop.time() + self.flush_interval
+
+    async def close(self):
+        """Writes everything still queued, flushes the buffered sinks and stops the task."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._queue:
+            await self._write_batch(self._next_batch())
+        await self.flush()
+        logger.info(f"Signal sink pipeline closed: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'sinks': [sink.name for sink in self.sinks],
+            'queued_rows': self._queued_rows,
+            'rows_submitted': self.rows_submitted,
+            'rows_stored': self.rows_stored,
+            'batches': self.batches,
+            'failed_batches': self.failed_batches,
+            'flushes': self.flushes,
+            'pending_debug_logs': len(self._debug_logs),
+            'debug_logs_superseded': self.debug_logs_superseded,
+            'max_batch_seconds': round(self.max_batch_seconds, 3),
+        }
+
+
+def create_signal_sinks(
+    sinks_config: Dict[str, Any], pool: Optional[asyncpg.Pool], notify_channel: str, csv_path: str
+) -> List[SignalSink]:
+    """
+    The sinks named in sinks_config['sinks'] (default: postgres and csv). A sink that can't
+    be created (no pool, missing Parquet engine) is logged and left out.
+    """
+    sinks: List[SignalSink] = []
+    for name in sinks_config.get('sinks', ['postgres', 'csv']):
+        try:
+            if name == 'postgres':
+                if pool is None:
+                    logger.error("Postgres signal sink configured without a DB pool. Skipping it.")
+                    continue
+                sinks.append(PostgresSignalSink(pool, notify_channel))
+            elif name == 'csv':
+                sinks.append(CSVSignalSink(sinks_config.get('csv_path', csv_path)))
+            elif name == 'parquet':
+                sinks.append(ParquetSignalSink(sinks_config.get('parquet_dir', os.path.join(os.path.dirname(csv_path), 'signals_parquet'))))
+            else:
+                logger.error(f"Unknown signal sink '{name}'. Skipping it.")
+        except ImportError as e:
+            logger.error(f"Signal sink '{name}' not available: {e}")
+    return sinks
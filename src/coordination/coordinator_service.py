@@ -1,17 +1,22 @@
 import asyncio
 import asyncpg
+import collections
+import json
 import logging
 import logging.config # Added for dictConfig
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional
 import datetime
 import os
 
 from src.core.config import Config, load_config # Added load_config
+from src.coordination.signal_index import SignalCache, compile_rules
 # from src.core.db_utils import create_db_pool, close_db_pool # Removed this import
 
 # Configure logging
 logger = logging.getLogger(__name__)
 DB_CONN_RETRY_INTERVAL = 5 # For initial connection in main
+DEFAULT_NOTIFY_CHANNEL = "signal_inserted" # Sent by the analyzer's store_signals for every new signal
+SEEN_SIGNAL_IDS_LIMIT = 10000 # Recently processed signal IDs remembered to skip duplicates
 
 async def get_coordinator_watermark(pool: asyncpg.Pool, coordinator_id: str) -> Optional[int]:
     """Fetches the last processed signal ID for the given coordinator."""
@@ -77,6 +82,20 @@ async def fetch_new_signals(pool: asyncpg.Pool, last_processed_signal_id: Option
         logger.error(f"Error fetching new signals: {e}")
         return []
 
+def signal_from_notification(payload: str) -> Optional[Dict[str, Any]]:
+    """Parses a signal_inserted NOTIFY payload into the dict shape fetch_new_signals returns."""
+    try:
+        signal = json.loads(payload)
+        for key in ("timestamp", "trigger_timestamp"):
+            if isinstance(signal.get(key), str):
+                signal[key] = datetime.datetime.fromisoformat(signal[key])
+        if not isinstance(signal.get("signal_id"), int):
+            raise ValueError("signal_id missing")
+        return signal
+    except (ValueError, TypeError, AttributeError) as e: # json.JSONDecodeError is a ValueError
+        logger.error(f"Ignoring malformed signal notification ({e}): {payload[:200]}")
+        return None
+
 class SignalCoordinator:
     def __init__(self, config: Config, pool: asyncpg.Pool):
         self.config = config
@@ -89,10 +108,25 @@ class SignalCoordinator:
         self.loop_interval = self.coordination_config.get("loop_interval_seconds", 60)
         self.db_fetch_limit = self.coordination_config.get("db_fetch_limit", 100)
         self.rules = self.coordination_config.get("rules", [])
+        # "listen": react to signal NOTIFYs, using the watermark only to catch up after a (re)start
+        # "poll": query detected_signals every loop_interval_seconds
+        self.mode = self.coordination_config.get("mode", "listen")
+        self.notify_channel = self.coordination_config.get("notify_channel", DEFAULT_NOTIFY_CHANNEL)
+        self.watermark_flush_seconds = self.coordination_config.get("watermark_flush_seconds", 5)
+
+        self._last_processed_id: Optional[int] = None # Highest signal_id processed
+        self._persisted_id: Optional[int] = None # Last value written to coordinator_watermarks
+        self._seen_ids = collections.deque(maxlen=SEEN_SIGNAL_IDS_LIMIT)
+        self._seen_id_set = set()
+        self._notifications: asyncio.Queue = asyncio.Queue()
+        self.signals_processed = 0
+        self.max_latency_seconds = 0.0 # Worst trigger_timestamp -> processed delay seen in listen mode
         
-        # State for coordination logic (e.g., recently seen signals)
-        # Key: (contract_id, timeframe), Value: list of {'timestamp': datetime, 'signal_type': str, 'signal_id': int, 'signal_price': float}
-        self.recent_signals_cache: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        # Enabled rules by primary timeframe, so a primary signal only meets the rules that can apply
+        self.rules_by_primary_timeframe = compile_rules(self.rules)
+
+        # State for coordination logic: recently seen signals, time-ordered per (contract_id, timeframe, signal_type)
+        self.signal_cache = SignalCache()
         # Determine max window needed for cache based on rule offsets, ensure it's positive
         self.cache_window_minutes = 60 # Default cache window
         if self.rules:
@@ -105,57 +139,17 @@ class SignalCoordinator:
             self.cache_window_minutes = max(max_offset, 60) # Ensure at least a 60 min window or largest offset
         logger.info(f"Signal cache window set to {self.cache_window_minutes} minutes.")
 
-    def _add_signal_to_cache(self, signal: Dict[str, Any]):
-        """Adds a signal to the internal cache and ensures timestamps are datetime objects."""
-        # Ensure timestamp is a datetime object and UTC (or consistently timezone-aware)
-        # asyncpg typically returns timestamptz as timezone-aware datetime objects.
-        sig_timestamp = signal.get('timestamp')
-        if not isinstance(sig_timestamp, datetime.datetime):
-            try:
-                # Attempt to parse if it's an ISO format string (common from JSON or other sources)
-                sig_timestamp = datetime.datetime.fromisoformat(str(sig_timestamp))
-            except (TypeError, ValueError) as e:
-                logger.warning(f"Could not parse timestamp for signal {signal.get('signal_id')}: {sig_timestamp}, error: {e}. Skipping cache add.")
-                return
-        
-        # Ensure timezone awareness (preferably UTC)
-        if sig_timestamp.tzinfo is None:
-            logger.warning(f"Signal {signal.get('signal_id')} timestamp {sig_timestamp} is naive. Assuming UTC for caching.")
-            sig_timestamp = sig_timestamp.replace(tzinfo=datetime.timezone.utc)
-        else:
-            sig_timestamp = sig_timestamp.astimezone(datetime.timezone.utc) # Convert to UTC if not already
-
-        key = (signal["contract_id"], signal["timeframe"])
-        if key not in self.recent_signals_cache:
-            self.recent_signals_cache[key] = []
-        
-        # Store essential info for matching, keep it lean
-        cached_signal_info = {
-            "timestamp": sig_timestamp,
-            "signal_type": signal["signal_type"],
-            "signal_id": signal["signal_id"],
-            "signal_price": signal.get("signal_price") # Include price for potential future use in coordinated signal details
-        }
-        
-        self.recent_signals_cache[key].append(cached_signal_info)
-        # Keep cache sorted by timestamp for efficient searching/pruning (newest last)
-        self.recent_signals_cache[key].sort(key=lambda s: s["timestamp"])
+    def _add_signal_to_cache(self, signal: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Adds a signal to the internal cache; returns its cache entry (timestamp as a UTC datetime) or None."""
+        return self.signal_cache.add(signal)
 
-    def _prune_cache(self):
-        """Prunes signals older than self.cache_window_minutes from the cache."""
+    def _prune_cache(self) -> datetime.datetime:
+        """Prunes signals older than self.cache_window_minutes from the cache; returns the cutoff used."""
         now_utc = datetime.datetime.now(datetime.timezone.utc)
         cutoff_time = now_utc - datetime.timedelta(minutes=self.cache_window_minutes)
-        
-        keys_to_prune = []
-        for key, signals_list in self.recent_signals_cache.items():
-            # Filter out old signals. Since list is sorted, can optimize, but simple filter is fine for now.
-            self.recent_signals_cache[key] = [s for s in signals_list if s["timestamp"] >= cutoff_time]
-            if not self.recent_signals_cache[key]:
-                keys_to_prune.append(key) # Mark for deletion if list becomes empty
-        
-        for key in keys_to_prune:
-            del self.recent_signals_cache[key]
-        logger.debug(f"Cache pruned. Cutoff: {cutoff_time}. Current cache size: {sum(len(v) for v in self.recent_signals_cache.values())} signals.")
+        self.signal_cache.prune_before(cutoff_time)
+        logger.debug(f"Cache pruned. Cutoff: {cutoff_time}. Current cache size: {len(self.signal_cache)} signals.")
+        return cutoff_time
 
     async def process_signals(self, signals: List[Dict[str, Any]]):
         """Processes fetched signals according to defined coordination rules."""
@@ -165,75 +159,135 @@ class SignalCoordinator:
         coordinated_signals_log = [] # Store log messages for coordinated signals
         
         # First, add all new signals to cache and prune the cache
-        for signal in signals:
-            self._add_signal_to_cache(signal)
-        self._prune_cache()
-
-        # Then, iterate through (potentially only the new) signals to find primary rule matches
-        # For simplicity, we re-evaluate all rules against all new signals as potential primary signals.
-        # More advanced: only check new signals as primary, or use a more event-driven approach if performance is critical.
-        for primary_signal in signals: 
-            # Ensure primary_signal's timestamp is prepared (done if it came through _add_signal_to_cache)
-            # Re-fetch from cache to ensure we have the processed datetime object
-            key_ps = (primary_signal["contract_id"], primary_signal["timeframe"])
-            processed_primary_signal_info = None
-            if key_ps in self.recent_signals_cache:
-                for s_info in reversed(self.recent_signals_cache[key_ps]): # Search newest first
-                    if s_info["signal_id"] == primary_signal["signal_id"]:
-                        processed_primary_signal_info = s_info
-                        break
-            
-            if not processed_primary_signal_info:
+        primary_entries = [(signal, self._add_signal_to_cache(signal)) for signal in signals]
+        cutoff_time = self._prune_cache()
+
+        # Then check every new signal as a primary against the rules for its timeframe
+        for primary_signal, primary_info in primary_entries:
+            if primary_info is None or primary_info["timestamp"] < cutoff_time:
                 logger.debug(f"Primary signal {primary_signal.get('signal_id')} not found in processed cache, skipping rule check for it.")
                 continue
             
-            primary_ts = processed_primary_signal_info["timestamp"]
+            primary_ts = primary_info["timestamp"]
+            contract_id = primary_signal["contract_id"]
+            primary_signal_type = primary_signal["signal_type"]
 
-            for rule in self.rules:
-                if not rule.get("enabled", False):
+            for rule in self.rules_by_primary_timeframe.get(primary_signal["timeframe"], ()):
+                if not rule.applies_to(contract_id):
                     continue
 
-                if rule.get("contract_id") != "ALL" and rule.get("contract_id") != primary_signal["contract_id"]:
-                    continue
+                expected_confirming_signal_type = rule.confirming_type(primary_signal_type)
+                confirming_signals = self.signal_cache.window(
+                    contract_id, rule.confirming_timeframe, expected_confirming_signal_type,
+                    primary_ts + rule.min_offset, primary_ts + rule.max_offset)
 
-                if primary_signal["timeframe"] == rule.get("primary_timeframe"):
-                    primary_signal_type = primary_signal["signal_type"]
-                    confirming_timeframe = rule.get("confirming_timeframe")
-                    min_offset_minutes = rule.get("min_time_offset_minutes", 0)
-                    max_offset_minutes = rule.get("max_time_offset_minutes", 60)
-
-                    expected_confirming_signal_type = ""
-                    if rule.get("signal_type_match") == "any_matching_trend":
-                        expected_confirming_signal_type = primary_signal_type
-                    # Add other signal_type_match logic here if needed (e.g., opposite_trend)
-                    else:
-                        expected_confirming_signal_type = rule.get("signal_type_match", primary_signal_type)
-
-                    confirming_cache_key = (primary_signal["contract_id"], confirming_timeframe)
-                    if confirming_cache_key not in self.recent_signals_cache:
-                        continue # No signals for this contract/confirming_timeframe in cache
-
-                    # Search for a confirming signal in the cache
-                    for confirming_signal_info in self.recent_signals_cache[confirming_cache_key]:
-                        if confirming_signal_info["signal_type"] == expected_confirming_signal_type:
-                            confirming_ts = confirming_signal_info["timestamp"]
-                            time_diff_minutes = (confirming_ts - primary_ts).total_seconds() / 60
-
-                            if min_offset_minutes <= time_diff_minutes <= max_offset_minutes:
-                                log_msg = (
-                                    f"COORDINATED SIGNAL by rule '{rule['rule_name']}': "
-                                    f"Primary: ID {primary_signal['signal_id']} ({primary_signal['contract_id']}@{primary_signal['timeframe']} {primary_signal_type} @ {primary_ts.strftime('%Y-%m-%d %H:%M:%S %Z')}), "
-                                    f"Confirming: ID {confirming_signal_info['signal_id']} ({primary_signal['contract_id']}@{confirming_timeframe} {expected_confirming_signal_type} @ {confirming_ts.strftime('%Y-%m-%d %H:%M:%S %Z')}), "
-                                    f"Time Diff: {time_diff_minutes:.2f} mins."
-                                )
-                                logger.info(log_msg)
-                                coordinated_signals_log.append(log_msg)
-                                # Optional: Break if one confirming signal is enough per primary signal/rule
-                                # break 
-        # No separate coordinated_signals_found list needed if just logging
-        # if coordinated_signals_log:
-        #     logger.info(f"Found {len(coordinated_signals_log)} coordinated signal instances in this cycle.")
+                for confirming_signal_info in confirming_signals:
+                    confirming_ts = confirming_signal_info["timestamp"]
+                    time_diff_minutes = (confirming_ts - primary_ts).total_seconds() / 60
+                    log_msg = (
+                        f"COORDINATED SIGNAL by rule '{rule.name}': "
+                        f"Primary: ID {primary_signal['signal_id']} ({contract_id}@{primary_signal['timeframe']} {primary_signal_type} @ {primary_ts.strftime('%Y-%m-%d %H:%M:%S %Z')}), "
+                        f"Confirming: ID {confirming_signal_info['signal_id']} ({contract_id}@{rule.confirming_timeframe} {expected_confirming_signal_type} @ {confirming_ts.strftime('%Y-%m-%d %H:%M:%S %Z')}), "
+                        f"Time Diff: {time_diff_minutes:.2f} mins."
+                    )
+                    logger.info(log_msg)
+                    coordinated_signals_log.append(log_msg)
+                    # Optional: Break if one confirming signal is enough per primary signal/rule
+                    # break 
+        return coordinated_signals_log
 
+    async def handle_signal_batch(self, signals: List[Dict[str, Any]], track_latency: bool = False):
+        """Runs process_signals on the signals not processed yet and advances the in-memory watermark."""
+        fresh = [s for s in signals if s["signal_id"] not in self._seen_id_set]
+        if not fresh:
+            return
+        await self.process_signals(fresh)
+        for signal in fresh:
+            if len(self._seen_ids) == self._seen_ids.maxlen:
+                self._seen_id_set.discard(self._seen_ids[0])
+            self._seen_ids.append(signal["signal_id"])
+            self._seen_id_set.add(signal["signal_id"])
+        highest = max(s["signal_id"] for s in fresh)
+        if self._last_processed_id is None or highest > self._last_processed_id:
+            self._last_processed_id = highest
+        self.signals_processed += len(fresh)
+        if track_latency:
+            now_utc = datetime.datetime.now(datetime.timezone.utc)
+            for signal in fresh:
+                trigger = signal.get("trigger_timestamp")
+                if isinstance(trigger, datetime.datetime) and trigger.tzinfo is not None:
+                    self.max_latency_seconds = max(self.max_latency_seconds, (now_utc - trigger).total_seconds())
+
+    async def flush_watermark(self):
+        """Persists the in-memory watermark if it moved since the last write."""
+        if self._last_processed_id is not None and self._last_processed_id != self._persisted_id:
+            await update_coordinator_watermark(self.pool, self.coordinator_id, self._last_processed_id)
+            self._persisted_id = self._last_processed_id
+
+    async def catch_up(self):
+        """Processes every signal stored after the watermark, e.g. while the coordinator was down."""
+        if self._last_processed_id is None:
+            self._last_processed_id = self._persisted_id = await get_coordinator_watermark(self.pool, self.coordinator_id)
+        caught_up = 0
+        while True:
+            signals = await fetch_new_signals(self.pool, self._last_processed_id, self.db_fetch_limit)
+            if not signals:
+                break
+            await self.handle_signal_batch(signals)
+            # Fetched in signal_id order; advance past the batch even if it was all seen already
+            self._last_processed_id = max(self._last_processed_id or 0, signals[-1]["signal_id"])
+            caught_up += len(signals)
+            if len(signals) < self.db_fetch_limit:
+                break
+        await self.flush_watermark()
+        logger.info(f"Catch-up complete: {caught_up} signal(s) since the watermark; now at {self._last_processed_id}.")
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self._notifications.put_nowait(payload)
+
+    async def _consume_notifications(self, conn, shutdown_event: asyncio.Event):
+        """Processes notified signals as they arrive (together when several are queued) until shutdown or connection loss."""
+        loop = asyncio.get_running_loop()
+        next_flush = loop.time() + self.watermark_flush_seconds
+        while not shutdown_event.is_set() and not conn.is_closed():
+            try:
+                payloads = [await asyncio.wait_for(self._notifications.get(), max(next_flush - loop.time(), 0))]
+            except asyncio.TimeoutError:
+                payloads = []
+            while not self._notifications.empty():
+                payloads.append(self._notifications.get_nowait())
+            signals = [signal for signal in map(signal_from_notification, payloads) if signal is not None]
+            if signals:
+                signals.sort(key=lambda s: s["signal_id"])
+                await self.handle_signal_batch(signals, track_latency=True)
+            if loop.time() >= next_flush:
+                await self.flush_watermark()
+                next_flush = loop.time() + self.watermark_flush_seconds
+
+    async def run_listening(self, shutdown_event: asyncio.Event):
+        """
+        LISTEN mode main loop. The listener is registered before catching up from the
+        watermark, so signals committed in between are not missed (ones seen by both are
+        skipped). A lost connection is re-established and followed by another catch-up.
+        """
+        while not shutdown_event.is_set():
+            try:
+                async with self.pool.acquire() as conn:
+                    await conn.add_listener(self.notify_channel, self._on_notification)
+                    logger.info(f"Listening for new signals on '{self.notify_channel}'...")
+                    try:
+                        await self.catch_up()
+                        await self._consume_notifications(conn, shutdown_event)
+                    finally:
+                        if not conn.is_closed():
+                            await conn.remove_listener(self.notify_channel, self._on_notification)
+                if not shutdown_event.is_set():
+                    logger.warning("Signal LISTEN connection closed. Reconnecting...")
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.error(f"Signal LISTEN connection failed: {e}. Retrying in {DB_CONN_RETRY_INTERVAL}s...")
+                await asyncio.sleep(DB_CONN_RETRY_INTERVAL)
+        await self.flush_watermark()
+        logger.info(f"Listen mode stopped after {self.signals_processed} signal(s); max latency {self.max_latency_seconds * 1000:.0f} ms.")
 
     async def run_cycle(self):
         """Runs a single cycle of fetching and processing signals."""
@@ -311,14 +365,17 @@ async def main():
     shutdown_event = asyncio.Event()
 
     try:
-        logger.info("SignalCoordinator running. Press Ctrl+C to stop.")
-        while not shutdown_event.is_set():
-            await coordinator.run_cycle()
-            try:
-                # Wait for the loop interval or until shutdown_event is set
-                await asyncio.wait_for(shutdown_event.wait(), timeout=coordinator.loop_interval)
-            except asyncio.TimeoutError:
-                pass # Loop interval passed, continue to next cycle
+        logger.info(f"SignalCoordinator running in {coordinator.mode} mode. Press Ctrl+C to stop.")
+        if coordinator.mode == "listen":
+            await coordinator.run_listening(shutdown_event)
+        else:
+            while not shutdown_event.is_set():
+                await coordinator.run_cycle()
+                try:
+                    # Wait for the loop interval or until shutdown_event is set
+                    await asyncio.wait_for(shutdown_event.wait(), timeout=coordinator.loop_interval)
+                except asyncio.TimeoutError:
+                    pass # Loop interval passed, continue to next cycle
     except KeyboardInterrupt:
         logger.info("KeyboardInterrupt received, stopping coordinator...")
     except asyncio.CancelledError:
@@ -0,0 +1,165 @@
+"""
+Time-ordered signal cache and compiled coordination rules for the SignalCoordinator.
+
+Cached signals are indexed by (contract_id, timeframe, signal_type), each key holding its
+signals in timestamp order. A rule's confirming window [primary + min_offset, primary +
+max_offset] is then two binary searches on the one key that can match, and pruning the
+oldest signals only advances a start offset (amortized O(1) per signal).
+
+Rules are compiled once into a table keyed by primary timeframe, so a primary signal is
+only checked against the rules that can apply to it.
+"""
+import bisect
+import datetime
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SignalKey = Tuple[str, str, str] # (contract_id, timeframe, signal_type)
+
+
+class SignalTimeIndex:
+    """
+    Cached signals of one key in timestamp order. The live list is
+    _entries[_start:]; pruning moves _start and compacts once half the list is dead.
+    """
+
+    def __init__(self):
+        self._times: List[datetime.datetime] = []
+        self._entries: List[Dict[str, Any]] = []
+        self._start = 0
+
+    def __len__(self):
+        return len(self._entries) - self._start
+
+    def add(self, entry: Dict[str, Any]):
+        timestamp = entry["timestamp"]
+        if not self._times or timestamp >= self._times[-1]:
+            self._times.append(timestamp) # The usual case: signals arrive in time order
+            self._entries.append(entry)
+        else:
+            position = bisect.bisect_right(self._times, timestamp, self._start)
+            self._times.insert(position, timestamp)
+            self._entries.insert(position, entry)
+
+    def window(self, start: datetime.datetime, end: datetime.datetime) -> List[Dict[str, Any]]:
+        """Entries with start <= timestamp <= end, oldest first."""
+        low = bisect.bisect_left(self._times, start, self._start)
+        high = bisect.bisect_right(self._times, end, low)
+        return self._entries[low:high]
+
+    def prune_before(self, cutoff: datetime.datetime) -> List[Dict[str, Any]]:
+        """Drops and returns the entries older than cutoff."""
+        end = bisect.bisect_left(self._times, cutoff, self._start)
+        removed = self._entries[self._start:end]
+        self._start = end
+        if self._start > len(self._entries) // 2:
+            del self._times[:self._start]
+            del self._entries[:self._start]
+            self._start = 0
+        return removed
+
+
+class SignalCache:
+    """Recent signals by (contract_id, timeframe, signal_type), plus a signal_id lookup."""
+
+    def __init__(self):
+        self._indexes: Dict[SignalKey, SignalTimeIndex] = {}
+        self._by_id: Dict[Any, Dict[str, Any]] = {}
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, signal_id):
+        return signal_id in self._by_id
+
+    def add(self, signal: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Caches the signal's matching fields with its timestamp as a UTC datetime and returns
+        the cached entry; None if the timestamp can't be parsed. A signal_id already cached
+        returns the existing entry.
+        """
+        cached = self._by_id.get(signal["signal_id"])
+        if cached is not None:
+            return cached
+        sig_timestamp = signal.get("timestamp")
+        if not isinstance(sig_timestamp, datetime.datetime):
+            try:
+                # Attempt to parse if it's an ISO format string (common from JSON or other sources)
+                sig_timestamp = datetime.datetime.fromisoformat(str(sig_timestamp))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Could not parse timestamp for signal {signal.get('signal_id')}: {sig_timestamp}, error: {e}. Skipping cache add.")
+                return None
+        if sig_timestamp.tzinfo is None:
+            logger.warning(f"Signal {signal.get('signal_id')} timestamp {sig_timestamp} is naive. Assuming UTC for caching.")
+            sig_timestamp = sig_timestamp.replace(tzinfo=datetime.timezone.utc)
+        else:
+            sig_timestamp = sig_timestamp.astimezone(datetime.timezone.utc)
+
+        entry = {
+            "timestamp": sig_timestamp,
+            "contract_id": signal["contract_id"],
+            "timeframe": signal["timeframe"],
+            "signal_type": signal["signal_type"],
+            "signal_id": signal["signal_id"],
+            "signal_price": signal.get("signal_price"),
+        }
+        key = (entry["contract_id"], entry["timeframe"], entry["signal_type"])
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = SignalTimeIndex()
+        index.add(entry)
+        self._by_id[entry["signal_id"]] = entry
+        return entry
+
+    def window(self, contract_id: str, timeframe: str, signal_type: str,
+               start: datetime.datetime, end: datetime.datetime) -> List[Dict[str, Any]]:
+        index = self._indexes.get((contract_id, timeframe, signal_type))
+        return index.window(start, end) if index is not None else []
+
+    def prune_before(self, cutoff: datetime.datetime) -> int:
+        """Drops signals older than cutoff; returns how many were dropped."""
+        removed = 0
+        for key in list(self._indexes):
+            index = self._indexes[key]
+            for entry in index.prune_before(cutoff):
+                self._by_id.pop(entry["signal_id"], None)
+                removed += 1
+            if not index:
+                del self._indexes[key]
+        return removed
+
+
+class CompiledRule(NamedTuple):
+    name: str
+    contract_id: Optional[str] # "ALL" matches every contract
+    confirming_timeframe: str
+    min_offset: datetime.timedelta
+    max_offset: datetime.timedelta
+    signal_type_match: Optional[str] # None: the confirming signal must have the primary's type
+
+    def applies_to(self, contract_id: str) -> bool:
+        return self.contract_id == "ALL" or self.contract_id == contract_id
+
+    def confirming_type(self, primary_signal_type: str) -> str:
+        return self.signal_type_match or primary_signal_type
+
+
+def compile_rules(rules: List[Dict[str, Any]]) -> Dict[str, List[CompiledRule]]:
+    """Enabled rules grouped by primary_timeframe, in configuration order."""
+    by_timeframe: Dict[str, List[CompiledRule]] = {}
+    for rule in rules:
+        if not rule.get("enabled", False):
+            continue
+        type_match = rule.get("signal_type_match")
+        by_timeframe.setdefault(rule.get("primary_timeframe"), []).append(CompiledRule(
+            name=rule.get("rule_name"),
+            contract_id=rule.get("contract_id"),
+            confirming_timeframe=rule.get("confirming_timeframe"),
+            min_offset=datetime.timedelta(minutes=rule.get("min_time_offset_minutes", 0)),
+            max_offset=datetime.timedelta(minutes=rule.get("max_time_offset_minutes", 60)),
+            # Add other signal_type_match logic here if needed (e.g., opposite_trend)
+            signal_type_match=None if type_match == "any_matching_trend" else type_match,
+        ))
+    return by_timeframe
@@ -0,0 +1,278 @@
+"""
+Multi-timeframe OHLC aggregation for the live ingester.
+
+One ContractBarAggregator handles every configured timeframe of a contract. Ticks only
+touch a single base bar, whose period is the greatest common divisor of the timeframes
+(the smallest timeframe in the usual 60/300/900 setup); every timeframe is rolled up
+from completed base bars. The per-tick cost is therefore the same however many
+timeframes are configured, and the work proportional to the number of timeframes only
+happens once per base period.
+
+Prices are whatever the ingester hands over: integer tick counts when the contract has a
+tick_size (converted back to Decimal prices when a bar is emitted), or Decimal otherwise.
+
+Bars are closed by the first tick past their end or, on quiet contracts and at session
+close, by a BarCloseScheduler on wall-clock time once a grace period for late ticks has
+passed.
+"""
+import datetime
+import decimal
+import heapq
+import logging
+import threading
+import time
+from math import gcd
+
+logger = logging.getLogger("LiveIngester")
+
+UTC = datetime.timezone.utc
+
+
+def timeframe_unit_and_value(timeframe_seconds):
+    """Maps a timeframe in seconds to the ohlc_bars (timeframe_unit, timeframe_value) pair: 1=S, 2=M, 3=H."""
+    if timeframe_seconds >= 3600 and timeframe_seconds % 3600 == 0:
+        return 3, timeframe_seconds // 3600
+    if timeframe_seconds >= 60 and timeframe_seconds % 60 == 0:
+        return 2, timeframe_seconds // 60
+    return 1, timeframe_seconds
+
+def timeframe_seconds_from_unit(timeframe_unit, timeframe_value):
+    """Inverse of timeframe_unit_and_value."""
+    return timeframe_value * {1: 1, 2: 60, 3: 3600}[timeframe_unit]
+
+
+class PartialBar:
+    """An in-progress bar: [start, end) in epoch seconds plus OHLCV."""
+    __slots__ = ("start", "end", "open", "high", "low", "close", "volume")
+
+    def __init__(self, start, end, price, volume):
+        self.start = start
+        self.end = end
+        self.open = self.high = self.low = self.close = price
+        self.volume = volume
+
+    def merge(self, other):
+        """Folds a later bar of the same period into this one."""
+        if other.high > self.high:
+            self.high = other.high
+        if other.low < self.low:
+            self.low = other.low
+        self.close = other.close
+        self.volume += other.volume
+
+
+class _Timeframe:
+    __slots__ = ("seconds", "unit", "value", "partial")
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.unit, self.value = timeframe_unit_and_value(seconds)
+        self.partial = None
+
+
+class ContractBarAggregator:
+    """
+    Aggregates one contract's ticks into bars for all of its timeframes.
+
+    bar_completion_callback is called as
+    callback(contract_id, bar_start, open, high, low, close, volume, timeframe_unit, timeframe_value)
+    with a UTC datetime and Decimal prices/volume, in ascending timeframe order.
+
+    add_tick and close_due_bars may be called from different threads. Once bars have been
+    closed up to some time, ticks stamped before it are late: they are counted and go
+    into the bar that is open at that time, as late ticks already did within a bar.
+    """
+
+    def __init__(self, contract_id, timeframes_seconds, bar_completion_callback, tick_size=None):
+        seconds = sorted({int(tf) for tf in timeframes_seconds})
+        if not seconds or seconds[0] <= 0:
+            raise ValueError(f"Timeframes for {contract_id} must be positive, got {list(timeframes_seconds)}")
+        self.contract_id = contract_id
+        self.bar_completion_callback = bar_completion_callback
+        self.tick_size = float(tick_size) if tick_size else None
+        self._tick_size_decimal = decimal.Decimal(str(tick_size)) if tick_size else None
+        self.base_seconds = 0
+        for tf in seconds:
+            self.base_seconds = gcd(self.base_seconds, tf)
+        self.timeframes = [_Timeframe(tf) for tf in seconds]
+        self._base = None # PartialBar of the current base period
+        self._closed_until = 0 # Epoch second up to which bars have been closed on wall-clock time
+        self._lock = threading.Lock()
+        self.late_ticks = 0
+
+    @property
+    def timeframes_seconds(self):
+        return [tf.seconds for tf in self.timeframes]
+
+    def add_tick(self, timestamp, price, volume_tick=0, tick_type=None):
+        """
+        Adds a tick. timestamp is a datetime (naive is taken as UTC); price is an integer
+        tick count when the aggregator has a tick_size, else a Decimal.
+        """
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=UTC)
+        epoch = int(timestamp.timestamp())
+        with self._lock:
+            base = self._base
+            # Ticks before the current base bar's end (including late ones) belong to it
+            if base is not None and epoch < base.end:
+                if price > base.high:
+                    base.high = price
+                elif price < base.low:
+                    base.low = price
+                base.close = price
+                base.volume += volume_tick
+                return
+            if base is not None:
+                self._roll_base()
+                self._emit_due(epoch)
+            if epoch < self._closed_until:
+                self.late_ticks += 1
+                epoch = self._closed_until
+            start = epoch - epoch % self.base_seconds
+            self._base = PartialBar(start, start + self.base_seconds, price, volume_tick)
+
+    def close_due_bars(self, cutoff_epoch):
+        """
+        Closes (emits) every bar that ends at or before cutoff_epoch, without waiting for
+        a tick. Returns the number of bars emitted.
+        """
+        with self._lock:
+            base = self._base
+            if base is not None and base.end > cutoff_epoch:
+                return 0 # Every open bar contains the open base bar, so none is due
+            if base is not None:
+                self._roll_base()
+            if cutoff_epoch > self._closed_until:
+                self._closed_until = cutoff_epoch
+            return self._emit_due(cutoff_epoch)
+
+    def _roll_base(self):
+        """Folds the completed base bar into every timeframe's open bar."""
+        base = self._base
+        self._base = None
+        for tf in self.timeframes:
+            partial = tf.partial
+            if partial is None:
+                start = base.start - base.start % tf.seconds
+                partial = tf.partial = PartialBar(start, start + tf.seconds, base.open, base.volume)
+                partial.high, partial.low, partial.close = base.high, base.low, base.close
+            else:
+                partial.merge(base)
+
+    def _emit_due(self, epoch):
+        """Emits the open bars that end at or before epoch, in ascending timeframe order."""
+        emitted = 0
+        for tf in self.timeframes:
+            partial = tf.partial
+            if partial is not None and epoch >= partial.end:
+                tf.partial = None
+                self._emit(tf, partial)
+                emitted += 1
+        return emitted
+
+    def _emit(self, tf, bar):
+        bar_start = datetime.datetime.fromtimestamp(bar.start, tz=UTC)
+        o, h, l, c = bar.open, bar.high, bar.low, bar.close
+        if self._tick_size_decimal is not None:
+            o, h, l, c = (decimal.Decimal(ticks) * self._tick_size_decimal for ticks in (o, h, l, c))
+        volume = bar.volume if isinstance(bar.volume, decimal.Decimal) else decimal.Decimal(bar.volume)
+        logger.info(
+            f"[{self.contract_id} TF:{tf.seconds}s] Bar completed for {bar_start}: "
+            f"O:{o} H:{h} L:{l} C:{c} V:{volume}"
+        )
+        if self.bar_completion_callback:
+            self.bar_completion_callback(self.contract_id, bar_start, o, h, l, c, volume, tf.unit, tf.value)
+
+
+class BarCloseScheduler:
+    """
+    Closes due bars of all registered aggregators on wall-clock time.
+
+    One thread keeps a heap of (deadline, aggregator) entries, where the deadline is the
+    aggregator's next base-bar boundary plus grace_seconds. It sleeps until the earliest
+    deadline, asks that aggregator to close everything ending by (now - grace_seconds)
+    and reschedules it at its following boundary. A bar is therefore closed at most
+    grace_seconds (plus scheduling jitter) after its end even if no tick arrives, while
+    ticks up to grace_seconds late still land in it.
+    """
+
+    def __init__(self, grace_seconds=2.0, clock=time.time):
+        if grace_seconds < 0:
+            raise ValueError("grace_seconds must not be negative")
+        self.grace_seconds = grace_seconds
+        self.clock = clock
+        self._heap = []
+        self._seq = 0 # Tie-breaker so the heap never compares aggregators
+        self._heap_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.timer_closed_bars = 0
+        self.max_close_delay_seconds = 0.0 # Worst (close time - bar end) seen for timer-closed bars
+
+    def add(self, aggregator):
+        with self._heap_lock:
+            self._push(aggregator, self.clock())
+        self._wakeup.set()
+
+    def _push(self, aggregator, now):
+        cutoff = now - self.grace_seconds
+        boundary = (int(cutoff) // aggregator.base_seconds + 1) * aggregator.base_seconds
+        self._seq += 1
+        heapq.heappush(self._heap, (boundary + self.grace_seconds, self._seq, aggregator))
+
+    def next_deadline(self):
+        with self._heap_lock:
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now=None):
+        """Closes the bars of every aggregator whose deadline has passed. Returns bars emitted."""
+        now = self.clock() if now is None else now
+        cutoff = int(now - self.grace_seconds)
+        emitted = 0
+        while True:
+            with self._heap_lock:
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                deadline, _, aggregator = heapq.heappop(self._heap)
+            try:
+                closed = aggregator.close_due_bars(cutoff)
+            except Exception as e:
+                logger.error(f"Error closing bars for {aggregator.contract_id} on timer: {e}", exc_info=True)
+                closed = 0
+            if closed:
+                emitted += closed
+                self.max_close_delay_seconds = max(self.max_close_delay_seconds, now - (deadline - self.grace_seconds))
+            with self._heap_lock:
+                self._push(aggregator, now)
+        self.timer_closed_bars += emitted
+        return emitted
+
+    def stats(self):
+        return {
+            "aggregators": len(self._heap),
+            "timer_closed_bars": self.timer_closed_bars,
+            "max_close_delay_ms": round(self.max_close_delay_seconds * 1000, 1),
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="BarCloseScheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Bar close scheduler started (grace {self.grace_seconds}s).")
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        logger.info(f"Bar close scheduler stopped. Stats: {self.stats()}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(deadline - self.clock(), 0.0)
+            if self._wakeup.wait(timeout):
+                self._wakeup.clear()
+                continue # Woken by add() or stop(): recompute the earliest deadline
+            self.run_due()
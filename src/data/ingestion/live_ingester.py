@@ -10,9 +10,18 @@ from dotenv import load_dotenv
 from signalrcore.hub_connection_builder import HubConnectionBuilder
 import psycopg2
 from psycopg2 import sql
+import psycopg2.extras
 import threading
+import queue
 from functools import partial # For callbacks
 import json # Added for NOTIFY payload
+from src.data.ingestion.tick_parsing import (
+    ZERO_VOLUME, parse_gateway_timestamp, get_field_extractor,
+    to_decimal, parse_trade_volume, build_contract_routes
+)
+from src.data.ingestion.bar_aggregation import (
+    ContractBarAggregator, BarCloseScheduler, timeframe_unit_and_value, timeframe_seconds_from_unit
+)
 
 # --- Constants ---
 SCRIPT_NAME = "LiveIngester"
@@ -26,8 +35,12 @@ logging.basicConfig(level=logging.DEBUG, # Temporarily DEBUG for detailed testin
 logger = logging.getLogger(SCRIPT_NAME)
 
 # --- Global Variables ---
-# Dictionary to hold OHLCAggregator instances, keyed by timeframe_seconds
+# ContractBarAggregator instances (one per contract, covering all its timeframes), keyed by contract_id
 ohlc_aggregators = {}
+# Precompiled {contract_id: ContractRoute} used to route each tick to its aggregators
+contract_routes = {}
+# Closes due bars on wall-clock time when no tick arrives to close them
+bar_close_scheduler = None
 # SignalR Hub Connection
 hub_connection = None
 # Lock for thread-safe operations on shared resources if needed, e.g., aggregators
@@ -138,16 +151,12 @@ def generate_jwt_token():
 # --- Database Operations ---
 DB_CONNECTION = None
 
-def get_db_connection():
-    """Establishes and returns a database connection."""
-    global DB_CONNECTION
-    if DB_CONNECTION and DB_CONNECTION.closed == 0:
-        return DB_CONNECTION
-
+def create_db_connection():
+    """Opens a new database connection, or returns None on failure."""
     db_conf = CONFIG['database']['active_ingestion_db']
     logger.info(f"Connecting to {CONFIG['database']['active_ingestion_db_type']} database: {db_conf['dbname']} on {db_conf['host']}:{db_conf['port']}")
     try:
-        DB_CONNECTION = psycopg2.connect(
+        conn = psycopg2.connect(
             host=db_conf['host'],
             port=db_conf['port'],
             dbname=db_conf['dbname'],
@@ -155,12 +164,20 @@ def get_db_connection():
             password=db_conf['password']
         )
         logger.info("Database connection successful.")
-        return DB_CONNECTION
+        return conn
     except psycopg2.Error as e:
         logger.error(f"Database connection error: {e}")
         # Consider a retry mechanism or exit
         return None
 
+def get_db_connection():
+    """Establishes and returns the shared database connection used for bar inserts."""
+    global DB_CONNECTION
+    if DB_CONNECTION and DB_CONNECTION.closed == 0:
+        return DB_CONNECTION
+    DB_CONNECTION = create_db_connection()
+    return DB_CONNECTION
+
 def log_last_known_bar_timestamp(contract_id, timeframe_seconds):
     """Queries and logs the timestamp of the most recent bar for a given contract and timeframe."""
     conn = get_db_connection()
@@ -168,16 +185,7 @@ def log_last_known_bar_timestamp(contract_id, timeframe_seconds):
         logger.warning(f"No DB connection to query last bar for {contract_id} / {timeframe_seconds}s.")
         return
 
-    # Calculate timeframe_unit and timeframe_value from timeframe_seconds
-    if timeframe_seconds >= 3600 and timeframe_seconds % 3600 == 0:
-        timeframe_unit = 3
-        timeframe_value = timeframe_seconds // 3600
-    elif timeframe_seconds >= 60 and timeframe_seconds % 60 == 0:
-        timeframe_unit = 2
-        timeframe_value = timeframe_seconds // 60
-    else:
-        timeframe_unit = 1
-        timeframe_value = timeframe_seconds
+    timeframe_unit, timeframe_value = timeframe_unit_and_value(timeframe_seconds)
 
     query = sql.SQL("""
         SELECT MAX(timestamp)
@@ -202,353 +210,432 @@ def log_last_known_bar_timestamp(contract_id, timeframe_seconds):
     except Exception as e:
         logger.error(f"Unexpected error querying last bar for {contract_id} / {timeframe_seconds}s: {e}")
 
-def insert_ohlc_bar(contract_id, ts, o, h, l, c, v, timeframe_unit, timeframe_value):
-    """Inserts an OHLC bar into the database and sends a NOTIFY signal."""
-    conn = get_db_connection()
-    if not conn:
-        logger.error("No database connection available for inserting OHLC bar.")
-        return
-
-    # Make sure timestamp is timezone-aware (UTC assumed from source or converted)
-    if ts.tzinfo is None:
-        ts = ts.replace(tzinfo=datetime.timezone.utc)
-
-    insert_query = sql.SQL("""
-        INSERT INTO ohlc_bars (contract_id, timestamp, open, high, low, close, volume, timeframe_unit, timeframe_value)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (contract_id, timestamp, timeframe_unit, timeframe_value) DO NOTHING;
-    """)
-    
-    row_inserted = False # Initialize
-    try:
-        with conn.cursor() as cur:
-            cur.execute(insert_query, (contract_id, ts, float(o), float(h), float(l), float(c), int(v), timeframe_unit, timeframe_value))
-            row_inserted = cur.rowcount > 0
-
-            if row_inserted:
-                logger.info(f"Inserted OHLC bar for {contract_id} at {ts} (TF Val: {timeframe_value}, Unit: {timeframe_unit}) O:{o} H:{h} L:{l} C:{c} V:{v}")
-            else:
-                logger.info(f"OHLC bar for {contract_id} at {ts} (TF Val: {timeframe_value}, Unit: {timeframe_unit}) likely already existed or no update needed based on ON CONFLICT.")
-
-            # Always prepare and send notification if the bar data is complete and valid
-            # The INSERT ON CONFLICT ensures the bar is in the DB (either new or existing)
-            logger.info(f"Attempting to send NOTIFY for completed bar: {contract_id} at {ts}")
-            notify_payload_dict = {
-                "type": "ohlc", 
-                "contract_id": contract_id,
-                "timestamp": ts.isoformat(),
-                "open": float(o),
-                "high": float(h),
-                "low": float(l),
-                "close": float(c),
-                "volume": int(v),
-                "timeframe_unit": timeframe_unit,
-                "timeframe_value": timeframe_value
-            }
-            notify_payload = json.dumps(notify_payload_dict)
-            notify_query = sql.SQL("SELECT pg_notify('ohlc_update', %s);")
-            cur.execute(notify_query, (notify_payload,))
-            logger.info(f"Executed NOTIFY ohlc_update for {contract_id} at {ts}")
-
-        conn.commit() 
-        logger.info(f"DB transaction committed for OHLC bar and NOTIFY for {contract_id} at {ts}. Row inserted: {row_inserted}")
-
-    except psycopg2.Error as e:
-        logger.error(f"Error during OHLC bar DB operation: {e}")
-        if conn: conn.rollback() # Rollback on error
-    except Exception as e:
-        logger.error(f"Unexpected error during OHLC bar DB operation: {e}")
-        if conn: conn.rollback()
-
-def send_tick_notification(contract_id_from_stream, timestamp_dt, price_decimal, volume, message_type):
-    """Sends a real-time tick notification via PostgreSQL pg_notify."""
-    conn = get_db_connection()
-    if not conn:
-        logger.error("No database connection available for sending tick notification.")
-        return
-
-    try:
-        payload_dict = {
-            "type": "tick", # To differentiate from OHLC bar messages
-            "contract_id": contract_id_from_stream,
-            "timestamp": timestamp_dt.isoformat(),
-            "price": float(price_decimal),
-            "tick_type": message_type # 'quote' or 'trade'
+def _ohlc_notify_payload(contract_id, ts, o, h, l, c, v, timeframe_unit, timeframe_value):
+    return json.dumps({
+        "type": "ohlc", 
+        "contract_id": contract_id,
+        "timestamp": ts.isoformat(),
+        "open": float(o),
+        "high": float(h),
+        "low": float(l),
+        "close": float(c),
+        "volume": int(v),
+        "timeframe_unit": timeframe_unit,
+        "timeframe_value": timeframe_value
+    })
+
+class OHLCBarWriter:
+    """
+    Persists completed OHLC bars from a background thread.
+
+    Aggregators call submit() (same signature as the old inline insert) from the SignalR
+    callback thread, which only enqueues the bar. The writer thread drains the queue and
+    writes everything pending across all aggregators as one multi-row INSERT plus one
+    batch of 'ohlc_update' NOTIFYs (one payload per bar, as the analyzer expects) in a
+    single transaction. Bars are written and notified in completion order, so delivery
+    per (contract, timeframe) stays ordered. Connection failures are retried with
+    exponential backoff without dropping or reordering bars.
+    """
+    def __init__(self, connection_factory, max_batch_size=500, backoff_initial_seconds=1.0, backoff_max_seconds=30.0):
+        self.connection_factory = connection_factory
+        self.max_batch_size = max_batch_size
+        self.backoff_initial_seconds = backoff_initial_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.bar_queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._abort_event = threading.Event() # Set when stop() gives up waiting; ends retries
+        self._thread = None
+        self._conn = None
+        self.written_bars = 0
+        self.failed_bars = 0
+        self.flushes = 0
+        # Bar end -> NOTIFY committed, per written bar
+        self.max_close_to_notify_seconds = 0.0
+        self._sum_close_to_notify_seconds = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="OHLCBarWriter", daemon=True)
+        self._thread.start()
+        logger.info(f"OHLC bar writer started (max batch {self.max_batch_size}).")
+
+    def stop(self, timeout=10.0):
+        """Stops the thread after writing what is already queued (bounded by timeout)."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning(f"OHLC bar writer did not finish within {timeout}s; {self.bar_queue.qsize()} bars still queued.")
+                self._abort_event.set()
+                self._thread.join(1.0)
+        if self._conn and self._conn.closed == 0:
+            self._conn.close()
+        logger.info(f"OHLC bar writer stopped. Stats: {self.stats()}")
+
+    def submit(self, contract_id, ts, o, h, l, c, v, timeframe_unit, timeframe_value):
+        """Queues a completed bar for writing; never blocks on the database."""
+        # Make sure timestamp is timezone-aware (UTC assumed from source or converted)
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=datetime.timezone.utc)
+        self.bar_queue.put((contract_id, ts, o, h, l, c, v, timeframe_unit, timeframe_value))
+
+    def stats(self):
+        return {
+            "queue_depth": self.bar_queue.qsize(),
+            "written_bars": self.written_bars,
+            "failed_bars": self.failed_bars,
+            "flushes": self.flushes,
+            "avg_close_to_notify_ms": round(1000 * self._sum_close_to_notify_seconds / self.written_bars, 1) if self.written_bars else None,
+            "max_close_to_notify_ms": round(1000 * self.max_close_to_notify_seconds, 1),
         }
-        if message_type == "trade":
-            payload_dict["volume"] = float(volume) # Volume is only for trades
 
-        notify_payload = json.dumps(payload_dict)
-        
+    def _next_batch(self):
+        try:
+            batch = [self.bar_queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.bar_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop_event.is_set() and self.bar_queue.empty()) and not self._abort_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write_with_retry(batch)
+
+    def _write_with_retry(self, batch):
+        """Writes the batch, reconnecting with exponential backoff until it succeeds or the writer stops."""
+        delay = self.backoff_initial_seconds
+        while True:
+            conn = self._conn if self._conn is not None and self._conn.closed == 0 else None
+            if conn is None:
+                conn = self._conn = self.connection_factory()
+            if conn is not None:
+                try:
+                    self._write_batch(conn, batch)
+                    return
+                except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                    logger.error(f"Database connection lost while writing {len(batch)} OHLC bars: {e}")
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+                    self._conn = None
+                except psycopg2.Error as e:
+                    # Not a connection problem: write bar by bar so one bad row doesn't block the rest
+                    logger.error(f"Error writing batch of {len(batch)} OHLC bars: {e}. Retrying bars individually.")
+                    conn.rollback()
+                    self._write_individually(conn, batch)
+                    return
+            if self._abort_event.is_set():
+                logger.error(f"Writer aborted with database unavailable; {len(batch)} OHLC bars not written.")
+                self.failed_bars += len(batch)
+                return
+            logger.info(f"Retrying OHLC bar write in {delay:.0f}s...")
+            self._abort_event.wait(delay)
+            delay = min(delay * 2, self.backoff_max_seconds)
+
+    def _write_individually(self, conn, batch):
+        for bar in batch:
+            try:
+                self._write_batch(conn, [bar])
+            except psycopg2.Error as e:
+                logger.error(f"Skipping OHLC bar {bar[0]} at {bar[1]} (TF Val: {bar[8]}, Unit: {bar[7]}): {e}")
+                conn.rollback()
+                self.failed_bars += 1
+
+    def _write_batch(self, conn, batch):
+        rows = [(contract_id, ts, float(o), float(h), float(l), float(c), int(v), timeframe_unit, timeframe_value)
+                for contract_id, ts, o, h, l, c, v, timeframe_unit, timeframe_value in batch]
+        # The INSERT ON CONFLICT ensures each bar is in the DB (either new or existing);
+        # a notification is sent for every completed bar either way
+        payloads = [_ohlc_notify_payload(*bar) for bar in batch]
         with conn.cursor() as cur:
-            # Use the new channel 'tick_data_channel'
-            notify_query = sql.SQL("SELECT pg_notify('tick_data_channel', %s);")
-            cur.execute(notify_query, (notify_payload,))
-            conn.commit() 
-            # Minimal logging for tick notifications to avoid flooding, maybe DEBUG level
-            # logger.debug(f"Sent NOTIFY on 'tick_data_channel' for {contract_id_from_stream} at {timestamp_dt}")
-
-    except psycopg2.Error as e:
-        logger.error(f"Error sending tick notification: {e}")
-        if conn: conn.rollback()
-    except Exception as e:
-        logger.error(f"Unexpected error sending tick notification: {e}")
-        if conn: conn.rollback()
-
-# --- OHLC Aggregator ---
-class OHLCAggregator:
-    def __init__(self, contract_id, timeframe_seconds, bar_completion_callback):
-        self.contract_id = contract_id
-        self.timeframe_seconds = timeframe_seconds
-        self.bar_completion_callback = bar_completion_callback # Callback function
-        self.current_bar_start_time = None
-        self.open = None
-        self.high = None
-        self.low = None
-        self.close = None
-        self.volume = decimal.Decimal('0') # Use Decimal for volume if fractional volume is possible or for consistency
-        
-        if self.timeframe_seconds >= 3600 and self.timeframe_seconds % 3600 == 0:
-            self.timeframe_unit = 3  # Hours
-            self.timeframe_value = self.timeframe_seconds // 3600
-        elif self.timeframe_seconds >= 60 and self.timeframe_seconds % 60 == 0:
-            self.timeframe_unit = 2  # Minutes
-            self.timeframe_value = self.timeframe_seconds // 60
-        else:
-            self.timeframe_unit = 1  # Seconds
-            self.timeframe_value = self.timeframe_seconds
-        
-        log_last_known_bar_timestamp(self.contract_id, self.timeframe_seconds)
-        logger.info(f"OHLC Aggregator initialized for {contract_id} with {timeframe_seconds}s timeframe (Unit: {self.timeframe_unit}, Value: {self.timeframe_value}).")
-
-    def _get_aligned_bar_start_time(self, timestamp):
-        """Calculates the start time of the bar this timestamp belongs to."""
-        if timestamp.tzinfo is None or timestamp.tzinfo.utcoffset(timestamp) is None:
-             timestamp = timestamp.replace(tzinfo=datetime.timezone.utc) 
-        elif timestamp.tzinfo != datetime.timezone.utc:
-            timestamp = timestamp.astimezone(datetime.timezone.utc)
-
-        current_epoch_seconds = int(timestamp.timestamp())
-        bar_start_epoch_seconds = current_epoch_seconds - (current_epoch_seconds % self.timeframe_seconds)
-        return datetime.datetime.fromtimestamp(bar_start_epoch_seconds, tz=datetime.timezone.utc)
-
-    def _reset_bar(self, bar_start_timestamp, price, volume_tick=decimal.Decimal('0')):
-        self.current_bar_start_time = bar_start_timestamp
-        # Ensure price is Decimal
-        price_decimal = decimal.Decimal(str(price)) if not isinstance(price, decimal.Decimal) else price
-        self.open = price_decimal
-        self.high = price_decimal
-        self.low = price_decimal
-        self.close = price_decimal # Will be updated by each tick
-        self.volume = decimal.Decimal(str(volume_tick)) if not isinstance(volume_tick, decimal.Decimal) else volume_tick
-        # logger.debug(f"[{self.contract_id} TF:{self.timeframe_seconds}s] Bar reset. Start: {self.current_bar_start_time}, O:{self.open}, V:{self.volume}") # Made too verbose
-
-    def timeframe_unit_char(self):
-        if self.timeframe_unit == 1: return "S"
-        if self.timeframe_unit == 2: return "M"
-        if self.timeframe_unit == 3: return "H"
-        return "Unknown"
-
-    def check_and_finalize_bar(self):
-        """Checks if the current bar is valid and calls the completion callback."""
-        if self.current_bar_start_time is None or self.open is None: # Bar was not even started
-            logger.debug(f"[{self.contract_id} TF:{self.timeframe_seconds}s] check_and_finalize_bar called, but no current bar to finalize or open is None.")
-            return
-
-        logger.info(
-            f"[{self.contract_id} TF:{self.timeframe_value}{self.timeframe_unit_char()}] Bar completed for {self.current_bar_start_time}: "
-            f"O:{self.open} H:{self.high} L:{self.low} C:{self.close} V:{self.volume}"
-        )
-        if self.bar_completion_callback:
-            # Ensure all OHLC values are not None before callback
-            if None not in [self.open, self.high, self.low, self.close] and self.volume is not None: # self.volume can be 0
-                self.bar_completion_callback(
-                    self.contract_id,
-                    self.current_bar_start_time, # This is the timestamp FOR the bar
-                    self.open, self.high, self.low, self.close, self.volume,
-                    self.timeframe_unit, self.timeframe_value
-                )
-            else:
-                logger.warning(f"[{self.contract_id} TF:{self.timeframe_seconds}s] Bar for {self.current_bar_start_time} completed but some OHLCV data is None. Skipping callback. Data: O:{self.open}, H:{self.high}, L:{self.low}, C:{self.close}, V:{self.volume}")
-
-    def add_tick(self, timestamp, price, volume_tick=decimal.Decimal('0'), tick_type=None):
-        """Adds a tick to the current bar or starts a new one. Calls callback if bar completes."""
-        # Ensure timestamp is timezone-aware and UTC
-        if timestamp.tzinfo is None or timestamp.tzinfo.utcoffset(timestamp) is None:
-            dt_timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
-        elif timestamp.tzinfo != datetime.timezone.utc:
-            dt_timestamp = timestamp.astimezone(datetime.timezone.utc)
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO ohlc_bars (contract_id, timestamp, open, high, low, close, volume, timeframe_unit, timeframe_value)
+                VALUES %s
+                ON CONFLICT (contract_id, timestamp, timeframe_unit, timeframe_value) DO NOTHING;
+            """, rows, page_size=len(rows))
+            rows_inserted = cur.rowcount
+            notify_query = sql.SQL("SELECT pg_notify('ohlc_update', payload) FROM unnest(%s::text[]) AS payload;")
+            cur.execute(notify_query, (payloads,))
+        conn.commit()
+        notified_at = time.time()
+        for contract_id, ts, o, h, l, c, v, timeframe_unit, timeframe_value in batch:
+            bar_end = ts.timestamp() + timeframe_seconds_from_unit(timeframe_unit, timeframe_value)
+            latency = notified_at - bar_end
+            self._sum_close_to_notify_seconds += latency
+            if latency > self.max_close_to_notify_seconds:
+                self.max_close_to_notify_seconds = latency
+        self.written_bars += len(batch)
+        self.flushes += 1
+        for contract_id, ts, o, h, l, c, v, timeframe_unit, timeframe_value in batch:
+            logger.info(f"Wrote OHLC bar and NOTIFY for {contract_id} at {ts} (TF Val: {timeframe_value}, Unit: {timeframe_unit}) O:{o} H:{h} L:{l} C:{c} V:{v}")
+        logger.info(f"DB transaction committed for {len(batch)} OHLC bars ({rows_inserted} new rows).")
+
+# Created in main(); aggregators hand completed bars to bar_writer.submit
+bar_writer = None
+
+# --- Tick Notification Publishing ---
+# NOTIFY payloads must stay below PostgreSQL's 8000-byte limit
+MAX_NOTIFY_PAYLOAD_BYTES = 7900
+
+def _tick_payload_item(timestamp_dt, price_decimal, volume, message_type):
+    item = {
+        "timestamp": timestamp_dt.isoformat(),
+        "price": float(price_decimal),
+        "tick_type": message_type # 'quote' or 'trade'
+    }
+    if message_type == "trade":
+        item["volume"] = float(volume) # Volume is only for trades
+    return item
+
+def build_tick_batch_payloads(contract_id, ticks, max_payload_bytes=MAX_NOTIFY_PAYLOAD_BYTES):
+    """
+    Serialises one contract's ticks as 'tick_batch' NOTIFY payloads, splitting the ticks
+    over several payloads when one would exceed max_payload_bytes.
+    """
+    envelope_bytes = len(json.dumps({"type": "tick_batch", "contract_id": contract_id, "ticks": []}))
+    payloads = []
+    chunk, chunk_bytes = [], envelope_bytes
+    for tick in ticks:
+        tick_json = json.dumps(tick)
+        if chunk and chunk_bytes + len(tick_json) + 2 > max_payload_bytes:
+            payloads.append(json.dumps({"type": "tick_batch", "contract_id": contract_id, "ticks": chunk}))
+            chunk, chunk_bytes = [], envelope_bytes
+        chunk.append(tick)
+        chunk_bytes += len(tick_json) + 2
+    if chunk:
+        payloads.append(json.dumps({"type": "tick_batch", "contract_id": contract_id, "ticks": chunk}))
+    return payloads
+
+def coalesce_ticks(pending):
+    """
+    Reduces a micro-window of queued (contract_id, timestamp_dt, price, volume, message_type)
+    ticks to {contract_id: [payload items]}: all trades plus only the latest quote per
+    contract, in timestamp order. Returns (ticks_by_contract, number of quotes superseded).
+    """
+    trades_by_contract = {}
+    latest_quote = {}
+    superseded = 0
+    for contract_id, timestamp_dt, price_decimal, volume, message_type in pending:
+        if message_type == "quote":
+            if contract_id in latest_quote:
+                superseded += 1
+            latest_quote[contract_id] = (timestamp_dt, price_decimal, volume, message_type)
         else:
-            dt_timestamp = timestamp
-            
-        # Ensure price and volume are Decimal
-        price_decimal = decimal.Decimal(str(price)) if not isinstance(price, decimal.Decimal) else price
-        volume_decimal = decimal.Decimal(str(volume_tick)) if not isinstance(volume_tick, decimal.Decimal) else volume_tick
-
-        # logger.debug(f"[{self.contract_id} TF:{self.timeframe_seconds}s] Received tick: {dt_timestamp} P:{price_decimal} V:{volume_decimal} Type: {tick_type}") # Made too verbose
+            trades_by_contract.setdefault(contract_id, []).append((timestamp_dt, price_decimal, volume, message_type))
+    ticks_by_contract = {}
+    for contract_id in set(trades_by_contract) | set(latest_quote):
+        ticks = trades_by_contract.get(contract_id, [])
+        if contract_id in latest_quote:
+            ticks.append(latest_quote[contract_id])
+        ticks.sort(key=lambda tick: tick[0])
+        ticks_by_contract[contract_id] = [_tick_payload_item(*tick) for tick in ticks]
+    return ticks_by_contract, superseded
+
+class TickNotificationPublisher:
+    """
+    Publishes tick notifications on 'tick_data_channel' from a background thread.
 
-        new_bar_start_time = self._get_aligned_bar_start_time(dt_timestamp)
+    The SignalR callback thread only enqueues ticks (never blocking on the DB). The
+    publisher collects ticks for a micro-window, coalesces them per contract (latest quote
+    plus all trades) and sends one 'tick_batch' payload per contract, all in a single
+    transaction on its own connection. When the bounded queue is full new ticks are
+    dropped and counted.
+    """
+    def __init__(self, connection_factory, window_seconds=0.05, max_queue_size=10000):
+        self.connection_factory = connection_factory
+        self.window_seconds = window_seconds
+        self.tick_queue = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._conn = None
+        self._counters_lock = threading.Lock()
+        self.dropped_ticks = 0
+        self.superseded_quotes = 0
+        self.published_ticks = 0
+        self.published_payloads = 0
+        self.failed_batches = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="TickNotificationPublisher", daemon=True)
+        self._thread.start()
+        logger.info(f"Tick notification publisher started (window {self.window_seconds * 1000:.0f} ms, queue size {self.tick_queue.maxsize}).")
+
+    def stop(self, timeout=5.0):
+        """Stops the thread after flushing what is already queued."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._conn and self._conn.closed == 0:
+            self._conn.close()
+        logger.info(f"Tick notification publisher stopped. Stats: {self.stats()}")
+
+    def submit(self, contract_id, timestamp_dt, price_decimal, volume, message_type):
+        """Enqueues a tick without blocking; returns False if it was dropped because the queue is full."""
+        try:
+            self.tick_queue.put_nowait((contract_id, timestamp_dt, price_decimal, volume, message_type))
+            return True
+        except queue.Full:
+            with self._counters_lock:
+                self.dropped_ticks += 1
+            return False
+
+    def stats(self):
+        with self._counters_lock:
+            return {
+                "queue_depth": self.tick_queue.qsize(),
+                "dropped_ticks": self.dropped_ticks,
+                "superseded_quotes": self.superseded_quotes,
+                "published_ticks": self.published_ticks,
+                "published_payloads": self.published_payloads,
+                "failed_batches": self.failed_batches,
+            }
 
-        if self.current_bar_start_time is None:
-            # This is the first tick ever for this aggregator
-            self.current_bar_start_time = new_bar_start_time # Use the correctly aligned time
-            self._reset_bar(new_bar_start_time, price_decimal, volume_decimal)
-            # logger.debug(f"[{self.contract_id} TF:{self.timeframe_seconds}s] First tick for this aggregator. New bar starting at {self.current_bar_start_time} based on tick at {dt_timestamp}.") # Made too verbose
+    def _collect_window(self):
+        """Blocks for the first tick, then gathers everything that arrives within the window."""
+        try:
+            pending = [self.tick_queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.window_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self.tick_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Whatever queued up meanwhile belongs to this window too
+        while True:
+            try:
+                pending.append(self.tick_queue.get_nowait())
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self):
+        while not (self._stop_event.is_set() and self.tick_queue.empty()):
+            pending = self._collect_window()
+            if pending:
+                self._publish(pending)
+
+    def _get_connection(self):
+        if self._conn is None or self._conn.closed != 0:
+            self._conn = self.connection_factory()
+        return self._conn
+
+    def _publish(self, pending):
+        ticks_by_contract, superseded = coalesce_ticks(pending)
+        payloads = []
+        for contract_id, ticks in ticks_by_contract.items():
+            payloads.extend(build_tick_batch_payloads(contract_id, ticks))
+        published = sum(len(ticks) for ticks in ticks_by_contract.values())
+
+        conn = self._get_connection()
+        if not conn:
+            logger.error(f"No database connection available for tick notifications. Dropping {len(pending)} ticks.")
+            with self._counters_lock:
+                self.failed_batches += 1
+                self.dropped_ticks += len(pending)
             return
+        try:
+            with conn.cursor() as cur:
+                # One statement (one round trip) for every payload of the window
+                notify_query = sql.SQL("SELECT pg_notify('tick_data_channel', payload) FROM unnest(%s::text[]) AS payload;")
+                cur.execute(notify_query, (payloads,))
+            conn.commit() # NOTIFYs are delivered together on commit
+            with self._counters_lock:
+                self.superseded_quotes += superseded
+                self.published_ticks += published
+                self.published_payloads += len(payloads)
+        except psycopg2.Error as e:
+            logger.error(f"Error sending tick notifications: {e}")
+            with self._counters_lock:
+                self.failed_batches += 1
+                self.dropped_ticks += len(pending)
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._conn = None # Reconnect on the next batch
+        except Exception as e:
+            logger.error(f"Unexpected error sending tick notifications: {e}")
+            with self._counters_lock:
+                self.failed_batches += 1
+                self.dropped_ticks += len(pending)
+            if conn: conn.rollback()
 
-        # Check if the current tick belongs to a new bar period
-        expected_bar_end_time = self.current_bar_start_time + datetime.timedelta(seconds=self.timeframe_seconds)
-
-        if dt_timestamp >= expected_bar_end_time:
-            # Current tick is for the next bar or later. Finalize the current one.
-            logger.debug(f"[{self.contract_id} TF:{self.timeframe_seconds}s] Tick at {dt_timestamp} crossed boundary for bar starting {self.current_bar_start_time} (expected end {expected_bar_end_time}). Finalizing old bar.")
-            self.check_and_finalize_bar() # Finalize the existing bar
-            
-            # Start a new bar with the current tick's data
-            previous_bar_start_time = self.current_bar_start_time # For logging
-            self.current_bar_start_time = new_bar_start_time # Use the correctly aligned time for the new bar
-            self._reset_bar(new_bar_start_time, price_decimal, volume_decimal)
-            # logger.debug(f"[{self.contract_id} TF:{self.timeframe_seconds}s] New bar initiated at {self.current_bar_start_time} (was {previous_bar_start_time}) due to tick at {dt_timestamp}.") # Made too verbose
-            return # Bar reset, no further processing on this tick for the *old* bar
-
-        # Tick belongs to the current bar, update HLCV
-        if self.open is None: # Should ideally be caught by the first tick logic, but as a safeguard
-             self._reset_bar(new_bar_start_time, price_decimal, volume_decimal) # or self.current_bar_start_time
-        
-        # Update H, L, C, V
-        # Ensure all values are Decimal for comparison and arithmetic
-        current_high = self.high if self.high is not None else decimal.Decimal('-Infinity')
-        current_low = self.low if self.low is not None else decimal.Decimal('Infinity')
-
-        self.high = max(current_high, price_decimal)
-        self.low = min(current_low, price_decimal)
-        self.close = price_decimal # Last price becomes the close
-        self.volume += volume_decimal
-        # logger.debug(f"[{self.contract_id} TF:{self.timeframe_seconds}s] Tick updated bar. H:{self.high}, L:{self.low}, C:{self.close}, V:{self.volume}") # Made too verbose
+# Created in main() from the 'tick_notifications' settings
+tick_publisher = None
 
+def send_tick_notification(contract_id_from_stream, timestamp_dt, price_decimal, volume, message_type):
+    """Queues a real-time tick for the background NOTIFY publisher (never blocks on the DB)."""
+    if tick_publisher is None:
+        logger.error("Tick notification publisher not started; dropping tick notification.")
+        return
+    tick_publisher.submit(contract_id_from_stream, timestamp_dt, price_decimal, volume, message_type)
 
 # --- SignalR Message Handlers ---
 def process_single_data_item(data_item, contract_id_from_stream, message_type):
     """Processes a single quote or trade data item."""
     # data_item is a dictionary representing one quote or one trade.
-    # contract_id_from_stream is the contract ID received from the SignalR message argument.
-
-    price = None
-    volume = decimal.Decimal('0')
-    timestamp_str = None
-    # The actual contract ID within the payload might be different (e.g. "symbol" or "symbolId")
-    # but we primarily trust contract_id_from_stream for routing to aggregators.
-    # We can log if they differ for diagnostics.
-    
-    payload_contract_id_key = "contractId" # Default, might vary, check specific message_type if needed
-
-    if message_type == "quote":
-        # Quote structure from logs: {"symbol":"F.US.MES","bestBid":5984.75,"bestAsk":5985.00,"lastUpdated":"...", "timestamp":"..."}
-        # Sometimes also "lastPrice" is present.
-        
-        if "lastPrice" in data_item and data_item["lastPrice"] is not None: # Prefer lastPrice if available
-            price = data_item.get("lastPrice")
-        elif "last" in data_item and data_item["last"] is not None: # Fallback for "last" if "lastPrice" is not there
-            price = data_item.get("last")
-        # Use bestBid and bestAsk for mid-price calculation or direct use
-        elif "bestAsk" in data_item and data_item["bestAsk"] is not None and \
-             "bestBid" in data_item and data_item["bestBid"] is not None:
-            try:
-                # Ensure both are convertible to Decimal before calculation
-                best_ask_decimal = decimal.Decimal(str(data_item["bestAsk"]))
-                best_bid_decimal = decimal.Decimal(str(data_item["bestBid"]))
-                price = (best_ask_decimal + best_bid_decimal) / 2
-            except (TypeError, decimal.InvalidOperation) as e:
-                logger.warning(f"Could not calculate mid-price from bestBid/bestAsk: {data_item.get('bestBid')}/{data_item.get('bestAsk')}. Error: {e}")
-                return # Skip this tick if mid-price calculation fails
-        elif "price" in data_item and data_item["price"] is not None: # Another common key for price
-            price = data_item.get("price")
-        elif "bestAsk" in data_item and data_item["bestAsk"] is not None: # Use bestAsk if available and others failed
-            price = data_item.get("bestAsk")
-        elif "bestBid" in data_item and data_item["bestBid"] is not None: # Use bestBid if available and others failed
-            price = data_item.get("bestBid")
-        # Fallback to older keys if absolutely necessary, though less likely with current logs
-        elif "ask" in data_item and data_item["ask"] is not None:
-             price = data_item.get("ask")
-        elif "bid" in data_item and data_item["bid"] is not None:
-             price = data_item.get("bid")
-
-        # Timestamp for quotes: prioritize "lastUpdated" as it's more likely to be current.
-        # "timestamp" might be an older (e.g., last trade) timestamp.
-        timestamp_str = data_item.get("lastUpdated") 
-        if not timestamp_str: timestamp_str = data_item.get("timestamp") # Fallback to "timestamp"
-        if not timestamp_str: timestamp_str = data_item.get("DateTime") # Older fallback
-
-    elif message_type == "trade":
-        # Trade structure from logs: {"symbolId":"F.US.MES","price":5984.75,"timestamp":"...","type":1,"volume":1}
-        # contract_id_in_payload = data_item.get("symbolId") # Example
-        
-        price = data_item.get("price")
-        if price is None: price = data_item.get("Price")
-        
-        raw_volume = data_item.get("volume")
-        if raw_volume is None: raw_volume = data_item.get("Volume")
-
-        if raw_volume is not None:
-            try:
-                volume = decimal.Decimal(str(raw_volume))
-            except decimal.InvalidOperation:
-                logger.warning(f"Invalid volume format in trade data: {raw_volume} for {contract_id_from_stream}")
-                volume = decimal.Decimal('0')
-        
-        timestamp_str = data_item.get("timestamp")
-        if not timestamp_str: timestamp_str = data_item.get("DateTime")
-
-    else:
+    # contract_id_from_stream is the contract ID received from the SignalR message argument;
+    # it is what ticks are routed by (the payload's own "symbol"/"symbolId" may differ).
+    # Quote structure from logs: {"symbol":"F.US.MES","bestBid":5984.75,"bestAsk":5985.00,"lastUpdated":"...", "timestamp":"..."}
+    # Trade structure from logs: {"symbolId":"F.US.MES","price":5984.75,"timestamp":"...","type":1,"volume":1}
+    if message_type != "quote" and message_type != "trade":
         logger.warning(f"process_single_data_item called with unknown message_type: {message_type}")
         return
 
+    route = contract_routes.get(contract_id_from_stream)
+    if route is None or route.aggregator is None:
+        logger.warning(f"No route configured for {contract_id_from_stream} when processing single data item.")
+        return
+
+    # With a tick_size the extractor returns integer tick counts; otherwise prices become Decimal
+    tick_size = route.tick_size
+    try:
+        price, raw_volume, timestamp_str = get_field_extractor(message_type, data_item).extract(data_item, tick_size)
+    except (TypeError, ValueError, decimal.InvalidOperation) as e:
+        logger.error(f"Invalid price format in {message_type} data_item for {contract_id_from_stream}. Error: {e}. Data: {data_item}")
+        return # Skip this tick if the price (or bid/ask mid-price) cannot be converted
+
     if price is None or timestamp_str is None:
         logger.warning(f"Missing price or timestamp in {message_type} data_item for {contract_id_from_stream}: Price='{price}', Timestamp='{timestamp_str}'. Data: {data_item}")
         return
 
     try:
-        if timestamp_str.endswith('Z'):
-            timestamp_dt = datetime.datetime.fromisoformat(timestamp_str[:-1] + '+00:00')
-        # Handle timestamps that might have more than 6 microsecond digits (Python's fromisoformat limitation)
-        elif '.' in timestamp_str and '+' in timestamp_str.split('.')[1]: # e.g., 2025-05-19T17:15:26.1199235+00:00
-            base_part, micro_tz_part = timestamp_str.split('.')
-            micro_part = micro_tz_part[:6] # Truncate to 6 digits
-            tz_part = micro_tz_part[len(micro_part):]
-            timestamp_dt = datetime.datetime.fromisoformat(f"{base_part}.{micro_part}{tz_part}")
-        elif '.' in timestamp_str and 'Z' in timestamp_str.split('.')[1]: # e.g., 2025-05-19T17:15:26.1199235Z
-            base_part, micro_z_part = timestamp_str.split('.')
-            micro_part = micro_z_part[:6] # Truncate to 6 digits
-            timestamp_dt = datetime.datetime.fromisoformat(f"{base_part}.{micro_part}+00:00") # Assume Z is UTC
-        else:
-            timestamp_dt = datetime.datetime.fromisoformat(timestamp_str)
-    except ValueError as e:
+        timestamp_dt = parse_gateway_timestamp(timestamp_str)
+    except (TypeError, ValueError) as e:
         logger.error(f"Could not parse timestamp '{timestamp_str}' for {contract_id_from_stream}. Error: {e}. Data: {data_item}")
         return
 
-    if timestamp_dt.tzinfo is None or timestamp_dt.tzinfo.utcoffset(timestamp_dt) is None:
-        timestamp_dt = timestamp_dt.replace(tzinfo=datetime.timezone.utc)
-    elif timestamp_dt.tzinfo != datetime.timezone.utc:
-        timestamp_dt = timestamp_dt.astimezone(datetime.timezone.utc)
-        
-    try:
-        price_decimal = decimal.Decimal(str(price))
-    except decimal.InvalidOperation:
-        logger.error(f"Invalid price format: {price} for {contract_id_from_stream}. Data: {data_item}")
-        return
+    if tick_size is not None:
+        notify_price = price * tick_size
+    else:
+        try:
+            price = notify_price = to_decimal(price)
+        except decimal.InvalidOperation:
+            logger.error(f"Invalid price format: {price} for {contract_id_from_stream}. Data: {data_item}")
+            return
+
+    volume = ZERO_VOLUME
+    if message_type == "trade":
+        try:
+            volume = parse_trade_volume(raw_volume)
+        except decimal.InvalidOperation:
+            logger.warning(f"Invalid volume format in trade data: {raw_volume} for {contract_id_from_stream}")
 
     # Send raw tick notification before passing to aggregators
-    send_tick_notification(contract_id_from_stream, timestamp_dt, price_decimal, volume, message_type)
-
-    # Pass to aggregators
-    for contract_config in CONFIG.get('live_contracts', []):
-        if contract_config['contract_id'] == contract_id_from_stream: # Use the ID from the SignalR stream args for routing
-            for tf_seconds in contract_config.get('timeframes_seconds', []):
-                aggregator_key = (contract_id_from_stream, tf_seconds)
-                if aggregator_key in ohlc_aggregators:
-                    ohlc_aggregators[aggregator_key].add_tick(timestamp_dt, price_decimal, volume, tick_type=message_type)
-                else:
-                    logger.warning(f"No aggregator found for key: {aggregator_key} when processing single data item.")
+    send_tick_notification(contract_id_from_stream, timestamp_dt, notify_price, volume, message_type)
+
+    # Pass to the contract's aggregator (all timeframes)
+    route.aggregator.add_tick(timestamp_dt, price, volume, tick_type=message_type)
 
 def on_market_data_message(message_type, args):
     """Generic handler to process incoming market data (quotes or trades).
@@ -568,8 +655,7 @@ def on_market_data_message(message_type, args):
         return
         
     # Filter for the contracts we are interested in
-    subscribed_contracts = [c['contract_id'] for c in CONFIG.get('live_contracts', [])]
-    if contract_id_from_stream not in subscribed_contracts:
+    if contract_id_from_stream not in contract_routes:
         # logger.debug(f"Ignoring {message_type} for unsubscribed contract: {contract_id_from_stream}")
         return
 
@@ -666,7 +752,11 @@ def on_signalr_open():
 # --- Main Application Logic ---
 def main():
     global ohlc_aggregators # Make sure it's the global one
+    global contract_routes
+    global bar_close_scheduler
     global hub_connection
+    global tick_publisher
+    global bar_writer
 
     logger.info(f"Starting {SCRIPT_NAME}...")
     
@@ -675,9 +765,22 @@ def main():
         logger.error("Failed to connect to the database. Exiting.")
         sys.exit(1)
 
-    # Initialize OHLCAggregators for each configured contract and timeframe
-    # The key for the dictionary will be a tuple (contract_id, timeframe_seconds)
-    # to uniquely identify each aggregator.
+    # Tick NOTIFYs go through a background publisher on its own connection
+    tick_conf = CONFIG.get('tick_notifications', {})
+    tick_publisher = TickNotificationPublisher(
+        connection_factory=create_db_connection,
+        window_seconds=tick_conf.get('coalesce_window_ms', 50) / 1000.0,
+        max_queue_size=tick_conf.get('max_queue_size', 10000)
+    )
+    tick_publisher.start()
+
+    # Completed bars are persisted by a writer thread, not on the SignalR callback thread
+    bar_writer = OHLCBarWriter(connection_factory=create_db_connection)
+    bar_writer.start()
+    stats_log_interval = tick_conf.get('stats_log_interval_seconds', 60)
+
+    # Initialize one ContractBarAggregator per configured contract, covering all of its
+    # timeframes; it is keyed by contract_id.
     ohlc_aggregators = {} # Reset if main is called multiple times (e.g. in a loop/restart)
     
     live_contracts_config = CONFIG.get('live_contracts', [])
@@ -686,33 +789,45 @@ def main():
     
     for contract_config in live_contracts_config:
         contract_id = contract_config['contract_id']
-        timeframes = contract_config.get('timeframes_seconds', [])
-        if not timeframes:
-            logger.warning(f"No 'timeframes_seconds' configured for contract {contract_id}. Skipping.")
-            continue
-        for tf_seconds in timeframes:
+        timeframes = []
+        for tf_seconds in contract_config.get('timeframes_seconds', []):
             try:
                 tf_s = int(tf_seconds)
-                if tf_s <= 0:
-                    logger.error(f"Invalid timeframe {tf_s}s for {contract_id}. Must be positive. Skipping.")
-                    continue
-                
-                # Define the callback function for this specific aggregator
-                # It will call insert_ohlc_bar with all necessary parameters
-                # `partial` could be used here, or a lambda, or a nested function.
-                # For simplicity, insert_ohlc_bar is designed to accept all these.
-                
-                aggregator_key = (contract_id, tf_s)
-                ohlc_aggregators[aggregator_key] = OHLCAggregator(
-                    contract_id=contract_id,
-                    timeframe_seconds=tf_s,
-                    bar_completion_callback=insert_ohlc_bar # Pass the DB insert function directly
-                )
-                logger.info(f"Initialized aggregator for {contract_id} - {tf_s}s.")
-            except ValueError:
+            except (TypeError, ValueError):
                 logger.error(f"Invalid timeframe value '{tf_seconds}' for {contract_id}. Must be an integer. Skipping.")
-            except Exception as e:
-                logger.error(f"Error initializing aggregator for {contract_id} - {tf_seconds}s: {e}")
+                continue
+            if tf_s <= 0:
+                logger.error(f"Invalid timeframe {tf_s}s for {contract_id}. Must be positive. Skipping.")
+                continue
+            timeframes.append(tf_s)
+        if not timeframes:
+            logger.warning(f"No valid 'timeframes_seconds' configured for contract {contract_id}. Skipping.")
+            continue
+        try:
+            # Completed bars are queued on the writer; submit() takes the bar fields directly
+            aggregator = ContractBarAggregator(
+                contract_id=contract_id,
+                timeframes_seconds=timeframes,
+                bar_completion_callback=bar_writer.submit,
+                tick_size=contract_config.get('tick_size')
+            )
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error initializing aggregator for {contract_id} - {timeframes}: {e}")
+            continue
+        ohlc_aggregators[contract_id] = aggregator
+        for tf_s in aggregator.timeframes_seconds:
+            log_last_known_bar_timestamp(contract_id, tf_s)
+        logger.info(f"Initialized aggregator for {contract_id} - {aggregator.timeframes_seconds}s (base period {aggregator.base_seconds}s, tick_size {aggregator.tick_size}).")
+
+    contract_routes = build_contract_routes(live_contracts_config, ohlc_aggregators)
+
+    # Bars are also closed on wall-clock time, so quiet contracts and the session close
+    # don't hold a completed bar back until the next tick
+    bar_close_conf = CONFIG.get('bar_closing', {})
+    bar_close_scheduler = BarCloseScheduler(grace_seconds=bar_close_conf.get('grace_seconds', 2.0))
+    for aggregator in ohlc_aggregators.values():
+        bar_close_scheduler.add(aggregator)
+    bar_close_scheduler.start()
 
     if not ohlc_aggregators:
         logger.warning("No aggregators were initialized. Live Ingester will be idle.")
@@ -766,8 +881,15 @@ def main():
         hub_connection.start()
         logger.info("SignalR connection process initiated.")
         
+        last_stats_log = time.monotonic()
         while True:
             time.sleep(1) 
+            if time.monotonic() - last_stats_log >= stats_log_interval:
+                logger.info(f"Tick notification publisher stats: {tick_publisher.stats()}")
+                logger.info(f"OHLC bar writer stats: {bar_writer.stats()}")
+                late_ticks = {contract_id: agg.late_ticks for contract_id, agg in ohlc_aggregators.items()}
+                logger.info(f"Bar close scheduler stats: {bar_close_scheduler.stats()}, late ticks: {late_ticks}")
+                last_stats_log = time.monotonic()
 
     except KeyboardInterrupt:
         logger.info("Shutdown signal received (KeyboardInterrupt).")
@@ -782,6 +904,13 @@ def main():
                 logger.info("SignalR hub connection stopped.")
             except Exception as e:
                 logger.error(f"Error stopping SignalR connection: {e}")
+
+        if bar_close_scheduler:
+            bar_close_scheduler.stop()
+        if tick_publisher:
+            tick_publisher.stop()
+        if bar_writer:
+            bar_writer.stop()
         
         if DB_CONNECTION:
             try:
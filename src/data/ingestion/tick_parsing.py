@@ -0,0 +1,179 @@
+"""
+Per-tick parsing helpers for the live ingester.
+
+Kept free of configuration and DB access so the hot path (field extraction, timestamp
+parsing, price conversion, routing) can be unit tested and benchmarked on its own:
+    python scripts/benchmark_tick_parsing.py
+"""
+import datetime
+import decimal
+import logging
+
+logger = logging.getLogger("LiveIngester")
+
+UTC = datetime.timezone.utc
+ZERO_VOLUME = decimal.Decimal('0')
+
+# Placeholder in a quote extractor's price candidates for the bestBid/bestAsk mid-price
+_MID_PRICE = object()
+
+# Price keys in priority order (lastPrice, then last, then the bid/ask mid-price, ...)
+_QUOTE_PRICE_KEYS = ("lastPrice", "last", _MID_PRICE, "price", "bestAsk", "bestBid", "ask", "bid")
+# "lastUpdated" is more likely to be current; "timestamp" might be an older (e.g. last trade) timestamp
+_QUOTE_TIMESTAMP_KEYS = ("lastUpdated", "timestamp", "DateTime")
+_TRADE_PRICE_KEYS = ("price", "Price")
+_TRADE_VOLUME_KEYS = ("volume", "Volume")
+_TRADE_TIMESTAMP_KEYS = ("timestamp", "DateTime")
+
+
+# --- Timestamps ---
+def _parse_timestamp_fallback(timestamp_str):
+    """Handles formats datetime.fromisoformat rejects on older Pythons (7-digit fractions, 'Z')."""
+    if timestamp_str.endswith('Z'):
+        timestamp_str = timestamp_str[:-1] + '+00:00'
+    if '.' in timestamp_str:
+        base_part, fraction_tz = timestamp_str.split('.', 1)
+        digits = 0
+        while digits < len(fraction_tz) and fraction_tz[digits].isdigit():
+            digits += 1
+        # Truncate the fraction to the 6 digits datetime supports
+        timestamp_str = f"{base_part}.{fraction_tz[:min(digits, 6)]}{fraction_tz[digits:]}"
+    return datetime.datetime.fromisoformat(timestamp_str)
+
+def parse_gateway_timestamp(timestamp_str):
+    """
+    Parses a gateway timestamp such as '2025-05-19T17:15:26.1199235+00:00' or '...Z' into
+    a UTC datetime (naive timestamps are taken as UTC). Raises ValueError if unparseable.
+
+    datetime.fromisoformat (C, Python 3.11+) accepts the 7-digit fraction and 'Z'
+    directly; other inputs go through the slower normalising fallback.
+    """
+    try:
+        timestamp_dt = datetime.datetime.fromisoformat(timestamp_str)
+    except ValueError:
+        timestamp_dt = _parse_timestamp_fallback(timestamp_str)
+    tzinfo = timestamp_dt.tzinfo
+    if tzinfo is UTC:
+        return timestamp_dt
+    if tzinfo is None or tzinfo.utcoffset(timestamp_dt) is None:
+        return timestamp_dt.replace(tzinfo=UTC)
+    return timestamp_dt.astimezone(UTC)
+
+
+# --- Field extraction ---
+class TickFieldExtractor:
+    """
+    Pulls (price, volume, timestamp string) out of one quote/trade payload shape.
+
+    The candidate keys for each field are filtered once to those present in the shape,
+    keeping the priority order, so extraction is a short scan for the first non-empty
+    value instead of a cascade of key probes.
+    """
+    __slots__ = ("message_type", "price_keys", "volume_keys", "timestamp_keys")
+
+    def __init__(self, message_type, keys):
+        present = set(keys)
+        self.message_type = message_type
+        if message_type == "quote":
+            has_mid = "bestAsk" in present and "bestBid" in present
+            self.price_keys = tuple(k for k in _QUOTE_PRICE_KEYS if (k is _MID_PRICE and has_mid) or k in present)
+            self.volume_keys = ()
+            self.timestamp_keys = tuple(k for k in _QUOTE_TIMESTAMP_KEYS if k in present)
+        else:
+            self.price_keys = tuple(k for k in _TRADE_PRICE_KEYS if k in present)
+            self.volume_keys = tuple(k for k in _TRADE_VOLUME_KEYS if k in present)
+            self.timestamp_keys = tuple(k for k in _TRADE_TIMESTAMP_KEYS if k in present)
+
+    def extract(self, data_item, tick_size=None):
+        """
+        Returns (price, raw_volume, timestamp_str); missing fields are None. price is the
+        raw payload value (a Decimal for a bid/ask mid-price), or, when tick_size is given,
+        an integer count of tick_size increments (see price_to_ticks).
+        """
+        price = None
+        for key in self.price_keys:
+            if key is _MID_PRICE:
+                best_ask, best_bid = data_item["bestAsk"], data_item["bestBid"]
+                if best_ask is not None and best_bid is not None:
+                    if tick_size is not None:
+                        price = price_to_ticks((float(best_ask) + float(best_bid)) / 2, tick_size)
+                    else:
+                        price = (decimal.Decimal(str(best_ask)) + decimal.Decimal(str(best_bid))) / 2
+                    break
+            else:
+                price = data_item[key]
+                if price is not None:
+                    if tick_size is not None:
+                        price = price_to_ticks(price, tick_size)
+                    break
+        raw_volume = None
+        for key in self.volume_keys:
+            raw_volume = data_item[key]
+            if raw_volume is not None:
+                break
+        timestamp_str = None
+        for key in self.timestamp_keys:
+            timestamp_str = data_item[key]
+            if timestamp_str:
+                break
+        return price, raw_volume, timestamp_str or None
+
+_extractor_cache = {}
+
+def get_field_extractor(message_type, data_item):
+    """Returns the cached extractor for this message type and payload key layout."""
+    cache_key = (message_type, tuple(data_item))
+    extractor = _extractor_cache.get(cache_key)
+    if extractor is None:
+        if len(_extractor_cache) > 1024: # Guard against unbounded growth from odd payloads
+            _extractor_cache.clear()
+        extractor = _extractor_cache[cache_key] = TickFieldExtractor(message_type, cache_key[1])
+    return extractor
+
+
+# --- Prices and volumes ---
+def to_decimal(value):
+    return value if isinstance(value, decimal.Decimal) else decimal.Decimal(str(value))
+
+def price_to_ticks(price, tick_size):
+    """
+    Converts a price to an integer number of tick_size increments (nearest increment).
+    Bid/ask mid-prices fall on half ticks, so use half the exchange tick to keep them exact.
+    Raises TypeError/ValueError for non-numeric prices.
+    """
+    return int(round(float(price) / tick_size))
+
+def parse_trade_volume(raw_volume):
+    """Trade volume as an int when the gateway sends one (the common case), else a Decimal. Raises decimal.InvalidOperation."""
+    if raw_volume is None:
+        return ZERO_VOLUME
+    if type(raw_volume) is int:
+        return raw_volume
+    return decimal.Decimal(str(raw_volume))
+
+
+# --- Routing ---
+class ContractRoute:
+    """The aggregator fed by one contract's ticks, plus its optional integer-tick price scale."""
+    __slots__ = ("contract_id", "aggregator", "tick_size")
+
+    def __init__(self, contract_id, aggregator, tick_size=None):
+        self.contract_id = contract_id
+        self.aggregator = aggregator
+        self.tick_size = tick_size
+
+def build_contract_routes(live_contracts, aggregators):
+    """
+    Precompiles {contract_id: ContractRoute} from the live_contracts config and the
+    {contract_id: aggregator} mapping, so each tick is routed with one dict lookup.
+    Contracts without an aggregator get a route with aggregator None (ticks are skipped).
+    """
+    routes = {}
+    for contract_config in live_contracts:
+        contract_id = contract_config['contract_id']
+        aggregator = aggregators.get(contract_id)
+        if aggregator is None:
+            logger.warning(f"No aggregator found for {contract_id} when building routes.")
+        tick_size = contract_config.get('tick_size')
+        routes[contract_id] = ContractRoute(contract_id, aggregator, float(tick_size) if tick_size else None)
+    return routes
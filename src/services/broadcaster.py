@@ -7,9 +7,15 @@ import asyncpg
 import websockets
 import json
 import logging
+import multiprocessing
 import os
+import tempfile
+from http import HTTPStatus
 from dotenv import load_dotenv
 
+from src.services.fanout import FanoutHub, parse_timeframe_label
+from src.services.feed_bus import FeedPublisher, subscribe_feed
+
 sys.stderr.write("Broadcaster.py: Imports done (stderr)\n")
 sys.stderr.flush()
 
@@ -18,6 +24,8 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger("OHLCBroadcaster")
 logger.info("Broadcaster.py: Logging configured.") # This uses the logger
 logger.setLevel(logging.ERROR) # Set level for OHLCBroadcaster to ERROR to silence INFO logs
+metrics_logger = logging.getLogger("OHLCBroadcaster.Metrics")
+metrics_logger.setLevel(logging.INFO) # The periodic fan-out metrics are still wanted
 
 # --- Add File Handler ---
 log_file_path = os.path.join(os.path.dirname(__file__), '..', '..', 'logs', 'broadcaster.log')
@@ -47,6 +55,17 @@ def load_db_config():
 DB_CONFIG = load_db_config()
 WEBSOCKET_HOST = os.getenv("WEBSOCKET_HOST", "localhost") # Or "0.0.0.0" to listen on all interfaces
 WEBSOCKET_PORT = int(os.getenv("WEBSOCKET_PORT", 8765))
+# Fan-out: one frame per client per flush interval; clients lagging past the limits are disconnected
+FLUSH_INTERVAL_MS = float(os.getenv("BROADCAST_FLUSH_INTERVAL_MS", 50))
+MAX_CLIENT_QUEUE = int(os.getenv("BROADCAST_MAX_CLIENT_QUEUE", 1000))
+MAX_CLIENT_LAG_SECONDS = float(os.getenv("BROADCAST_MAX_CLIENT_LAG_SECONDS", 10))
+SNAPSHOT_BARS = int(os.getenv("BROADCAST_SNAPSHOT_BARS", 500)) # Bars kept per (contract, timeframe) for snapshot-on-subscribe
+METRICS_LOG_INTERVAL_SECONDS = 60
+# Multi-process mode: BROADCAST_WORKERS > 1 runs that many WebSocket worker processes on the same
+# port (SO_REUSEPORT), fed by this process's single LISTEN connection over a Unix socket
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", 1))
+FEED_SOCKET_PATH = os.getenv("BROADCAST_FEED_SOCKET", os.path.join(tempfile.gettempdir(), f"broadcaster-feed-{WEBSOCKET_PORT}.sock"))
+WORKER_CHECK_INTERVAL_SECONDS = 5
 
 # Ensure password is loaded
 if DB_CONFIG.get('password') is None:
@@ -55,53 +74,83 @@ if DB_CONFIG.get('password') is None:
     # For now, it will fail when trying to connect.
 
 # --- WebSocket Handling ---
-connected_clients = set()
+async def load_ohlc_snapshot(topic, limit):
+    """The latest `limit` stored bars of an ('ohlc', contract_id, timeframe) topic as (timestamp, NOTIFY-style payload), ascending."""
+    _, contract_id, timeframe = topic
+    timeframe_unit, timeframe_value = parse_timeframe_label(timeframe)
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        rows = await conn.fetch("""
+            SELECT timestamp, open, high, low, close, volume FROM ohlc_bars
+            WHERE contract_id = $1 AND timeframe_unit = $2 AND timeframe_value = $3
+            ORDER BY timestamp DESC LIMIT $4;
+        """, contract_id, timeframe_unit, timeframe_value, limit)
+    finally:
+        await conn.close()
+    bars = []
+    for row in reversed(rows):
+        timestamp = row['timestamp'].isoformat()
+        # Same layout as the ingester's ohlc_update payloads
+        bars.append((timestamp, json.dumps({
+            "type": "ohlc",
+            "contract_id": contract_id,
+            "timestamp": timestamp,
+            "open": float(row['open']),
+            "high": float(row['high']),
+            "low": float(row['low']),
+            "close": float(row['close']),
+            "volume": int(row['volume'] or 0),
+            "timeframe_unit": timeframe_unit,
+            "timeframe_value": timeframe_value
+        })))
+    return bars
+
+fanout_hub = FanoutHub(flush_interval=FLUSH_INTERVAL_MS / 1000.0, max_queue_size=MAX_CLIENT_QUEUE,
+                       max_lag_seconds=MAX_CLIENT_LAG_SECONDS, snapshot_size=SNAPSHOT_BARS,
+                       snapshot_loader=load_ohlc_snapshot)
 
 async def register_client(websocket):
-    connected_clients.add(websocket)
-    logger.info(f"Client connected: {websocket.remote_address}. Total clients: {len(connected_clients)}")
+    logger.info(f"Client connected: {websocket.remote_address}. Total clients: {len(fanout_hub.channels) + 1}")
     try:
-        # Keep the connection open and listen for any messages from the client (optional)
-        # If you expect client messages, you'd have a loop here: async for message in websocket:
-        await websocket.wait_closed() # Keeps the handler alive until connection closes
+        # Runs the client's sender loop and handles its subscribe/unsubscribe messages until
+        # the connection closes or the client is dropped as too slow
+        channel = await fanout_hub.serve_client(websocket)
+        if channel.close_reason:
+            logger.info(f"Client {websocket.remote_address} closed: {channel.close_reason}")
     except websockets.exceptions.ConnectionClosedError:
         logger.info(f"Client connection closed error (expected): {websocket.remote_address}")
     except Exception as e:
         logger.error(f"Error during client handling {websocket.remote_address}: {e}")
     finally:
-        connected_clients.remove(websocket)
-        logger.info(f"Client disconnected: {websocket.remote_address}. Total clients: {len(connected_clients)}")
+        logger.info(f"Client disconnected: {websocket.remote_address}. Total clients: {len(fanout_hub.channels)}")
 
-async def broadcast_message(message_json_str):
-    if not connected_clients:
-        return
+worker_id = None # Set in worker processes of the multi-process mode
 
-    # Create a list of tasks for sending messages to avoid blocking on one slow client
-    # We send the raw JSON string as received from NOTIFY
-    tasks = [client.send(message_json_str) for client in connected_clients]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+def metrics_request(connection, request):
+    """
+    Answers plain HTTP GET /metrics on the WebSocket port with the fan-out metrics as JSON
+    (in multi-process mode, those of the worker the connection landed on).
+    """
+    if request.path == "/metrics":
+        metrics = fanout_hub.metrics()
+        if worker_id is not None:
+            metrics.update(worker=worker_id, pid=os.getpid())
+        return connection.respond(HTTPStatus.OK, json.dumps(metrics) + "\n")
+    return None # Everything else continues with the WebSocket handshake
 
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            # A client might have disconnected abruptly or there was a network issue
-            # You could log the specific client if you store them in a way that allows retrieval here
-            logger.warning(f"Failed to send message to a client: {result}. Consider removing client if persistent.")
-            # Potentially remove problematic clients from connected_clients here
+async def log_metrics_periodically():
+    while True:
+        await asyncio.sleep(METRICS_LOG_INTERVAL_SECONDS)
+        metrics_logger.info(f"Fan-out metrics: {fanout_hub.metrics()}")
 
 # --- PostgreSQL LISTEN/NOTIFY Handling ---
+# Where NOTIFY payloads go: this process's clients, or the feed publisher in multi-process mode
+notification_sink = fanout_hub.publish
+
 async def pg_notification_handler(connection, pid, channel, payload_str):
-    logger.info(f"Received NOTIFY on channel '{channel}'") # Payload: {payload_str[:150]}...")
     try:
-        # Payload is already a JSON string.
-        # Validate it's JSON just in case.
-        json.loads(payload_str) # This will raise JSONDecodeError if invalid
-        
-        # Broadcast the raw JSON string payload to all connected WebSocket clients.
-        # Using create_task to ensure this handler returns quickly.
-        asyncio.create_task(broadcast_message(payload_str))
-        # logger.debug(f"Scheduled broadcast for channel '{channel}': {payload_str[:100]}...") # Generic log
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to decode JSON payload from NOTIFY: {e}. Payload: {payload_str}")
+        # The raw JSON string is queued for every client; the per-client sender loops do the sending
+        notification_sink(payload_str)
     except Exception as e:
         logger.error(f"Error in pg_notification_handler: {e}. Payload: {payload_str}", exc_info=True)
 
@@ -147,25 +196,99 @@ async def listen_for_db_notifications(): # Renamed from listen_for_ohlc_updates
         await asyncio.sleep(10)
 
 # --- Main Server ---
+async def serve_websockets(reuse_port=False):
+    async with websockets.serve(register_client, WEBSOCKET_HOST, WEBSOCKET_PORT, process_request=metrics_request,
+                                reuse_port=reuse_port) as server:
+        logger.info(f"WebSocket server started on ws://{WEBSOCKET_HOST}:{WEBSOCKET_PORT} (metrics: http://{WEBSOCKET_HOST}:{WEBSOCKET_PORT}/metrics)")
+        await asyncio.Future() # Keep the server running indefinitely until an error or manual stop
+
 async def main():
     # Start the PostgreSQL listener
     listener_task = asyncio.create_task(listen_for_db_notifications()) # Renamed
+    metrics_task = asyncio.create_task(log_metrics_periodically())
     # Start the WebSocket server
-    async with websockets.serve(register_client, WEBSOCKET_HOST, WEBSOCKET_PORT) as server:
-        logger.info(f"WebSocket server started on ws://{WEBSOCKET_HOST}:{WEBSOCKET_PORT}")
-        await asyncio.Future() # Keep the server running indefinitely until an error or manual stop
-    # If serve() exits, it means the server stopped (e.g. due to an unhandled error in serve itself)
-    # Ensure listener_task is handled if main execution somehow continues past `await asyncio.Future()`
-    if not listener_task.done():
+    try:
+        await serve_websockets()
+    finally:
+        # If serve() exits, it means the server stopped (e.g. due to an unhandled error in serve itself)
+        metrics_task.cancel()
+        if not listener_task.done():
+            listener_task.cancel()
+            try:
+                await listener_task
+            except asyncio.CancelledError:
+                logger.info("PostgreSQL listener task cancelled because server stopped.")
+
+# --- Multi-process mode ---
+# The kernel spreads incoming connections over the workers by a hash of the connection's
+# address/port tuple; a client stays on its worker for the life of the connection, and as
+# every worker gets every payload and keeps its own snapshots, any worker can serve any client.
+def _parent_alive():
+    parent = multiprocessing.parent_process()
+    return parent is None or parent.is_alive()
+
+async def worker_main(worker_number, feed_path):
+    global worker_id
+    worker_id = worker_number
+    metrics_task = asyncio.create_task(log_metrics_periodically())
+    feed_task = asyncio.create_task(subscribe_feed(feed_path, fanout_hub.publish, should_continue=_parent_alive))
+    server_task = asyncio.create_task(serve_websockets(reuse_port=True))
+    try:
+        # The feed loop only returns once the feed process is gone
+        await asyncio.wait((feed_task, server_task), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (metrics_task, feed_task, server_task):
+            task.cancel()
+    logger.warning(f"Broadcaster worker {worker_number} exiting: feed process gone.")
+
+def run_worker(worker_number, feed_path=FEED_SOCKET_PATH):
+    """Entry point of a worker process."""
+    try:
+        asyncio.run(worker_main(worker_number, feed_path))
+    except KeyboardInterrupt:
+        pass
+
+def start_worker(context, worker_number, feed_path=FEED_SOCKET_PATH):
+    process = context.Process(target=run_worker, args=(worker_number, feed_path),
+                              name=f"BroadcasterWorker-{worker_number}", daemon=True)
+    process.start()
+    return process
+
+async def feed_main(workers):
+    """Holds the LISTEN connection, publishes the payloads to the workers and restarts workers that die."""
+    global notification_sink
+    publisher = FeedPublisher(FEED_SOCKET_PATH)
+    await publisher.start()
+    notification_sink = publisher.publish
+    context = multiprocessing.get_context("spawn")
+    processes = [start_worker(context, number) for number in range(workers)]
+    metrics_logger.info(f"Broadcaster started {workers} workers on ws://{WEBSOCKET_HOST}:{WEBSOCKET_PORT} (feed: {FEED_SOCKET_PATH})")
+    listener_task = asyncio.create_task(listen_for_db_notifications())
+    elapsed = 0
+    try:
+        while True:
+            await asyncio.sleep(WORKER_CHECK_INTERVAL_SECONDS)
+            for number, process in enumerate(processes):
+                if not process.is_alive():
+                    logger.error(f"Broadcaster worker {number} exited with code {process.exitcode}; restarting it.")
+                    processes[number] = start_worker(context, number)
+            elapsed += WORKER_CHECK_INTERVAL_SECONDS
+            if elapsed % METRICS_LOG_INTERVAL_SECONDS == 0:
+                metrics_logger.info(f"Feed metrics: {publisher.stats()}")
+    finally:
         listener_task.cancel()
-        try:
-            await listener_task
-        except asyncio.CancelledError:
-            logger.info("PostgreSQL listener task cancelled because server stopped.")
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(5)
+        await publisher.close()
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if BROADCAST_WORKERS > 1:
+            asyncio.run(feed_main(BROADCAST_WORKERS))
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Broadcaster shutting down (KeyboardInterrupt).")
     except Exception as e:
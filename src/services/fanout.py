@@ -0,0 +1,454 @@
+"""
+Per-client fan-out with backpressure for the WebSocket broadcaster.
+
+Every connected client gets a ClientChannel: a bounded queue of pending payloads and
+one long-lived sender task. Publishing a NOTIFY payload only appends it to each
+channel's queue (no task per client per message). The sender flushes at most once per
+flush interval and packs everything pending into one WebSocket frame: a single
+payload is sent as-is, several are sent as a JSON array of the payloads.
+
+Tick payloads ('tick_batch'/'tick') are latest-value-wins per contract: a newer one
+replaces an older one still waiting in the queue (the dropped one is counted). Other
+payloads (completed 'ohlc' bars) are never dropped; a client whose queue overflows, or
+whose oldest pending payload is older than the lag threshold, is disconnected instead.
+
+Clients choose what they receive by sending subscribe/unsubscribe messages; a payload is
+only queued for the channels subscribed to its topic. Topics are (type, contract_id,
+timeframe) with type 'ohlc' (timeframe like "5m", as the web app labels them) or 'tick'
+(all of a contract's tick payloads; no timeframe):
+
+    {"action": "subscribe", "topics": [{"type": "ohlc", "contract_id": "CON.F.US.MES.M25", "timeframe": "5m"},
+                                       {"type": "tick", "contract_id": "CON.F.US.MES.M25"}],
+     "snapshot": 300}
+    {"action": "unsubscribe", "topics": [...]}
+
+Subscribing to an 'ohlc' topic first queues a snapshot of its last bars (up to "snapshot",
+default and maximum the hub's snapshot_size) from an in-memory ring buffer kept per topic:
+    {"type": "snapshot", "contract_id": "...", "timeframe": "5m", "bars": [<ohlc payload>, ...]}
+The ring buffer is filled by the live bars and, the first time a topic is asked for, by
+the hub's snapshot_loader. Clients that never subscribe keep receiving every payload.
+"""
+import asyncio
+import collections
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger("OHLCBroadcaster")
+
+TICK_TYPES = frozenset(('tick_batch', 'tick'))
+# Ingester payloads are json.dumps'ed dicts starting with "type" and "contract_id"
+_HEADER_RE = re.compile(r'\{"type": "([^"]*)", "contract_id": "([^"]*)"')
+
+DEFAULT_FLUSH_INTERVAL_SECONDS = 0.05
+DEFAULT_MAX_QUEUE_SIZE = 1000
+DEFAULT_MAX_LAG_SECONDS = 10.0
+DEFAULT_SNAPSHOT_SIZE = 500
+
+# ohlc_bars timeframe_unit <-> the web app's timeframe suffix
+TIMEFRAME_UNIT_CHARS = {1: 's', 2: 'm', 3: 'h', 4: 'd', 5: 'w'}
+_TIMEFRAME_UNITS = {char: unit for unit, char in TIMEFRAME_UNIT_CHARS.items()}
+
+
+def timeframe_label(timeframe_unit, timeframe_value):
+    """(2, 5) -> "5m"."""
+    return f"{timeframe_value}{TIMEFRAME_UNIT_CHARS.get(timeframe_unit, '')}"
+
+def parse_timeframe_label(label):
+    """"5m" -> (2, 5). Raises ValueError for anything else."""
+    unit = _TIMEFRAME_UNITS.get(label[-1:]) if isinstance(label, str) else None
+    if unit is None or not label[:-1].isdigit() or int(label[:-1]) <= 0:
+        raise ValueError(f"Invalid timeframe {label!r}; expected e.g. '1m', '4h' or '1d'")
+    return unit, int(label[:-1])
+
+def make_topic(msg_type, contract_id, timeframe=None):
+    """Routing key of a payload or subscription; every tick payload type maps to 'tick'."""
+    if msg_type in TICK_TYPES:
+        return ('tick', contract_id, None)
+    return (msg_type, contract_id, timeframe)
+
+
+def payload_header(payload_str):
+    """
+    (type, contract_id) of a NOTIFY payload; either may be None. Reads the fixed prefix
+    the ingester writes and only falls back to json.loads for other layouts. Raises
+    ValueError for a payload that is not a JSON object.
+    """
+    match = _HEADER_RE.match(payload_str)
+    if match:
+        return match.group(1), match.group(2)
+    message = json.loads(payload_str)
+    if not isinstance(message, dict):
+        raise ValueError("NOTIFY payload is not a JSON object")
+    return message.get('type'), message.get('contract_id')
+
+
+def classify_payload(payload_str):
+    """
+    (topic, bar timestamp) of a NOTIFY payload; the timestamp is only set for 'ohlc' bars,
+    which are fully parsed (they are rare next to ticks). Raises ValueError like payload_header.
+    """
+    msg_type, contract_id = payload_header(payload_str)
+    if msg_type != 'ohlc':
+        return make_topic(msg_type, contract_id), None
+    bar = json.loads(payload_str)
+    timeframe = timeframe_label(bar.get('timeframe_unit'), bar.get('timeframe_value'))
+    return make_topic(msg_type, contract_id, timeframe), bar.get('timestamp')
+
+
+class BarRing:
+    """The last `size` bar payloads of one ohlc topic, in timestamp order."""
+
+    def __init__(self, size):
+        self.bars = collections.deque(maxlen=size) # (timestamp, payload)
+        self.seeded = False
+
+    def append(self, timestamp, payload):
+        if self.bars and timestamp is not None:
+            last_timestamp = self.bars[-1][0]
+            if timestamp == last_timestamp:
+                self.bars[-1] = (timestamp, payload) # Re-sent bar replaces the buffered one
+                return
+            if timestamp < last_timestamp:
+                return # An older bar re-notified; the snapshot already covers its time
+        self.bars.append((timestamp, payload))
+
+    def seed(self, older_bars):
+        """Puts bars loaded from the database, ascending, in front of the buffered live bars."""
+        first_live = self.bars[0][0] if self.bars else None
+        merged = [bar for bar in older_bars if first_live is None or bar[0] < first_live]
+        merged.extend(self.bars)
+        self.bars.clear()
+        self.bars.extend(merged) # maxlen keeps the newest
+        self.seeded = True
+
+    def payloads(self, limit):
+        bars = list(self.bars)[-limit:] if limit > 0 else []
+        return [payload for _, payload in bars]
+
+
+class OutboundMessage:
+    __slots__ = ('payload', 'msg_type', 'contract_id', 'received_at', 'tick_key')
+
+    def __init__(self, payload, msg_type, contract_id, received_at):
+        self.payload = payload
+        self.msg_type = msg_type
+        self.contract_id = contract_id
+        self.received_at = received_at
+        self.tick_key = (msg_type, contract_id) if msg_type in TICK_TYPES else None
+
+
+class FanoutStats:
+    """Counters shared by all channels of a hub."""
+
+    def __init__(self):
+        self.published = 0
+        self.delivered_messages = 0
+        self.frames = 0
+        self.superseded_ticks = 0
+        self.slow_disconnects = 0
+        self.send_errors = 0
+        self.latency_sum_seconds = 0.0
+        self.latency_max_seconds = 0.0
+
+    def record_frame(self, count, latency_sum, latency_max):
+        self.frames += 1
+        self.delivered_messages += count
+        self.latency_sum_seconds += latency_sum
+        if latency_max > self.latency_max_seconds:
+            self.latency_max_seconds = latency_max
+
+
+class ClientChannel:
+    """Bounded, coalescing send queue plus sender loop for one WebSocket client."""
+
+    def __init__(self, websocket, stats, flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS,
+                 max_queue_size=DEFAULT_MAX_QUEUE_SIZE, max_lag_seconds=DEFAULT_MAX_LAG_SECONDS, clock=time.monotonic):
+        self.websocket = websocket
+        self.stats = stats
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.max_lag_seconds = max_lag_seconds
+        self.clock = clock
+        self._queue = collections.deque() # OutboundMessage, or None where a tick was superseded
+        self._pending_ticks = {} # tick_key -> OutboundMessage still in the queue
+        self._depth = 0 # Live (not superseded) messages in the queue
+        self._oldest_pending = None # received_at of the oldest undelivered message
+        self._ready = asyncio.Event()
+        self._last_flush = float('-inf')
+        self.topics = set()
+        self.subscribed = False # Until the first subscribe the client gets every payload
+        self.closed = False
+        self.close_reason = None
+
+    @property
+    def queue_depth(self):
+        return self._depth
+
+    def enqueue(self, message):
+        """Queues a message; disconnects the client if it has fallen too far behind. Never blocks."""
+        if self.closed:
+            return
+        if self._oldest_pending is not None and message.received_at - self._oldest_pending > self.max_lag_seconds:
+            self._disconnect_slow(f"lagging {message.received_at - self._oldest_pending:.1f}s behind")
+            return
+        if message.tick_key is not None:
+            previous = self._pending_ticks.get(message.tick_key)
+            if previous is not None:
+                # Latest value wins; the new tick goes to the back so ordering against bars is kept
+                self._queue[self._queue.index(previous)] = None
+                self._depth -= 1
+                self.stats.superseded_ticks += 1
+            self._pending_ticks[message.tick_key] = message
+        elif self._depth >= self.max_queue_size:
+            self._disconnect_slow(f"send queue full ({self._depth} messages)")
+            return
+        self._queue.append(message)
+        self._depth += 1
+        if self._oldest_pending is None:
+            self._oldest_pending = message.received_at
+        self._ready.set()
+
+    def _drain(self):
+        """Takes everything pending as one frame: (frame, messages in it); frame is None if nothing is pending."""
+        messages = [message for message in self._queue if message is not None]
+        self._queue.clear()
+        self._pending_ticks.clear()
+        self._depth = 0
+        self._oldest_pending = None
+        if not messages:
+            return None, []
+        if len(messages) == 1:
+            return messages[0].payload, messages
+        return '[' + ','.join(message.payload for message in messages) + ']', messages
+
+    async def run(self):
+        """Sender loop; returns when the channel is closed or a send fails."""
+        try:
+            while not self.closed:
+                await self._ready.wait()
+                self._ready.clear()
+                delay = self._last_flush + self.flush_interval - self.clock()
+                if delay > 0:
+                    await asyncio.sleep(delay) # Collect more messages into this frame
+                if self.closed:
+                    break
+                frame, messages = self._drain()
+                if frame is None:
+                    continue
+                self._last_flush = self.clock()
+                await self.websocket.send(frame)
+                sent_at = self.clock()
+                latencies = [sent_at - message.received_at for message in messages]
+                self.stats.record_frame(len(messages), sum(latencies), max(latencies))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats.send_errors += 1
+            self.closed = True
+            self.close_reason = f"send failed: {e}"
+            logger.warning(f"Send to {getattr(self.websocket, 'remote_address', '?')} failed: {e}")
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    def _disconnect_slow(self, reason):
+        self.stats.slow_disconnects += 1
+        self.close_reason = reason
+        self.close()
+        logger.warning(f"Disconnecting slow client {getattr(self.websocket, 'remote_address', '?')}: {reason}")
+        # 1013 "Try Again Later"; close() is awaited in the background so publishing never blocks
+        asyncio.ensure_future(self._close_socket(1013, reason))
+
+    async def _close_socket(self, code, reason):
+        try:
+            await self.websocket.close(code=code, reason=reason[:120])
+        except Exception as e:
+            logger.debug(f"Error closing slow client: {e}")
+
+
+class FanoutHub:
+    """The client channels, the topic -> subscribers index and the per-topic bar snapshots."""
+
+    def __init__(self, flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS, max_queue_size=DEFAULT_MAX_QUEUE_SIZE,
+                 max_lag_seconds=DEFAULT_MAX_LAG_SECONDS, snapshot_size=DEFAULT_SNAPSHOT_SIZE,
+                 snapshot_loader=None, clock=time.monotonic):
+        """
+        snapshot_loader, if given, is `async loader(topic, limit)` returning up to `limit`
+        (timestamp, payload) pairs of the topic's most recent stored bars, ascending. It is
+        awaited once per topic, the first time a client subscribes to it.
+        """
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.max_lag_seconds = max_lag_seconds
+        self.snapshot_size = snapshot_size
+        self.snapshot_loader = snapshot_loader
+        self.clock = clock
+        self.channels = set()
+        self.firehose = set() # Channels that have not subscribed to anything yet
+        self.subscribers = {} # topic -> set of channels
+        self.snapshots = {} # ohlc topic -> BarRing
+        self._seeding = {} # ohlc topic -> Future of the running snapshot_loader call
+        self.stats = FanoutStats()
+
+    def add_client(self, websocket):
+        channel = ClientChannel(websocket, self.stats, self.flush_interval, self.max_queue_size,
+                                self.max_lag_seconds, self.clock)
+        self.channels.add(channel)
+        self.firehose.add(channel)
+        return channel
+
+    def remove_client(self, channel):
+        channel.close()
+        self.channels.discard(channel)
+        self.firehose.discard(channel)
+        for topic in channel.topics:
+            self._unsubscribe(channel, topic)
+        channel.topics.clear()
+
+    async def serve_client(self, websocket):
+        """
+        Runs a client's sender loop and handles its subscribe/unsubscribe messages until
+        the socket closes or the client is dropped as too slow.
+        """
+        channel = self.add_client(websocket)
+        sender = asyncio.ensure_future(channel.run())
+        receiver = asyncio.ensure_future(self._receive(channel))
+        try:
+            await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.remove_client(channel)
+            for task in (sender, receiver):
+                task.cancel()
+        return channel
+
+    async def _receive(self, channel):
+        try:
+            async for raw in channel.websocket: # Ends when the connection closes
+                await self.handle_client_message(channel, raw)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Receive loop of {getattr(channel.websocket, 'remote_address', '?')} ended: {e}")
+
+    async def handle_client_message(self, channel, raw):
+        """Applies a subscribe/unsubscribe message; protocol errors are answered with an 'error' message."""
+        try:
+            request = json.loads(raw)
+            if not isinstance(request, dict) or request.get('action') not in ('subscribe', 'unsubscribe'):
+                raise ValueError("Expected {\"action\": \"subscribe\" | \"unsubscribe\", \"topics\": [...]}")
+            topics = [self._parse_topic(topic) for topic in request.get('topics') or ()]
+            snapshot = request.get('snapshot', self.snapshot_size)
+            if not isinstance(snapshot, int) or isinstance(snapshot, bool) or snapshot < 0:
+                raise ValueError("snapshot must be a non-negative integer")
+        except ValueError as e: # json.JSONDecodeError is a ValueError
+            self._send_to(channel, json.dumps({"type": "error", "error": str(e)}))
+            return
+        if request['action'] == 'unsubscribe':
+            for topic in topics:
+                if topic in channel.topics:
+                    channel.topics.discard(topic)
+                    self._unsubscribe(channel, topic)
+            return
+        channel.subscribed = True
+        self.firehose.discard(channel)
+        for topic in topics:
+            if topic in channel.topics:
+                continue
+            if topic[0] == 'ohlc' and snapshot:
+                await self._ensure_seeded(topic)
+                if channel.closed:
+                    return
+                # Snapshot and subscription in one step, so no live bar falls between them
+                bars = self.snapshots[topic].payloads(min(snapshot, self.snapshot_size))
+                self._send_to(channel, '{"type": "snapshot", "contract_id": %s, "timeframe": %s, "bars": [%s]}' % (
+                    json.dumps(topic[1]), json.dumps(topic[2]), ','.join(bars)))
+            channel.topics.add(topic)
+            self.subscribers.setdefault(topic, set()).add(channel)
+
+    @staticmethod
+    def _parse_topic(topic):
+        if not isinstance(topic, dict) or not isinstance(topic.get('contract_id'), str):
+            raise ValueError(f"Invalid topic {topic!r}; expected {{\"type\", \"contract_id\", \"timeframe\"}}")
+        if topic.get('type') == 'ohlc':
+            parse_timeframe_label(topic.get('timeframe'))
+            return make_topic('ohlc', topic['contract_id'], topic['timeframe'])
+        if topic.get('type') in TICK_TYPES:
+            return make_topic('tick', topic['contract_id'])
+        raise ValueError(f"Unknown topic type {topic.get('type')!r}; expected 'ohlc' or 'tick'")
+
+    def _unsubscribe(self, channel, topic):
+        subscribers = self.subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(channel)
+            if not subscribers:
+                del self.subscribers[topic]
+
+    def _send_to(self, channel, payload):
+        channel.enqueue(OutboundMessage(payload, None, None, self.clock()))
+
+    def _snapshot_ring(self, topic):
+        ring = self.snapshots.get(topic)
+        if ring is None:
+            ring = self.snapshots[topic] = BarRing(self.snapshot_size)
+        return ring
+
+    async def _ensure_seeded(self, topic):
+        ring = self._snapshot_ring(topic)
+        if ring.seeded or self.snapshot_loader is None:
+            return
+        future = self._seeding.get(topic)
+        if future is None:
+            future = self._seeding[topic] = asyncio.ensure_future(self.snapshot_loader(topic, self.snapshot_size))
+            try:
+                ring.seed(await future)
+            except Exception as e:
+                logger.error(f"Loading the {topic} snapshot failed: {e}") # Serve the live bars; retried next time
+            finally:
+                del self._seeding[topic]
+        else:
+            try:
+                await asyncio.shield(future)
+            except Exception:
+                pass # Reported by the caller that started the load
+
+    def publish(self, payload_str, received_at=None):
+        """Queues a NOTIFY payload for its topic's subscribers. Returns False if the payload was rejected."""
+        try:
+            topic, bar_timestamp = classify_payload(payload_str)
+        except ValueError as e: # json.JSONDecodeError is a ValueError
+            logger.error(f"Failed to decode JSON payload from NOTIFY: {e}. Payload: {payload_str[:200]}")
+            return False
+        self.stats.published += 1
+        if topic[0] == 'ohlc':
+            self._snapshot_ring(topic).append(bar_timestamp, payload_str)
+        message = OutboundMessage(payload_str, topic[0], topic[1], self.clock() if received_at is None else received_at)
+        subscribers = self.subscribers.get(topic)
+        if subscribers:
+            for channel in tuple(subscribers):
+                channel.enqueue(message)
+        for channel in tuple(self.firehose):
+            channel.enqueue(message)
+        return True
+
+    def metrics(self):
+        stats = self.stats
+        depths = [channel.queue_depth for channel in self.channels]
+        return {
+            'clients': len(depths),
+            'unsubscribed_clients': len(self.firehose),
+            'topics': len(self.subscribers),
+            'snapshot_topics': len(self.snapshots),
+            'queue_depth_total': sum(depths),
+            'queue_depth_max': max(depths, default=0),
+            'published': stats.published,
+            'delivered_messages': stats.delivered_messages,
+            'frames': stats.frames,
+            'dropped_superseded_ticks': stats.superseded_ticks,
+            'slow_client_disconnects': stats.slow_disconnects,
+            'send_errors': stats.send_errors,
+            'fanout_latency_avg_ms': round(1000 * stats.latency_sum_seconds / stats.delivered_messages, 2) if stats.delivered_messages else None,
+            'fanout_latency_max_ms': round(1000 * stats.latency_max_seconds, 2),
+        }
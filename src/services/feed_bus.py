@@ -0,0 +1,126 @@
+"""
+Local pub/sub between the broadcaster's feed process and its WebSocket workers.
+
+In multi-process mode one process per host holds the PostgreSQL LISTEN connection and
+publishes every NOTIFY payload on a Unix socket; each worker process subscribes once and
+hands the payloads to its own FanoutHub. Frames are a fixed header (payload length and the
+time.monotonic() at which the feed received the payload, so workers can report fan-out
+latency from the feed) followed by the UTF-8 payload. CLOCK_MONOTONIC is system-wide on
+Linux, so the stamp is comparable across processes.
+"""
+import asyncio
+import logging
+import os
+import struct
+import time
+
+logger = logging.getLogger("OHLCBroadcaster")
+
+_HEADER = struct.Struct('!Id') # payload length, feed receive time (monotonic seconds)
+DEFAULT_MAX_SUBSCRIBER_BUFFER = 32 * 1024 * 1024
+
+
+def encode_frame(payload_str, received_at):
+    data = payload_str.encode()
+    return _HEADER.pack(len(data), received_at) + data
+
+
+class FeedPublisher:
+    """
+    Unix socket server that sends every published payload to all connected subscribers.
+    A subscriber whose unsent backlog exceeds max_subscriber_buffer bytes is disconnected
+    (it reconnects and carries on from the current payload) rather than buffered without bound.
+    """
+
+    def __init__(self, path, max_subscriber_buffer=DEFAULT_MAX_SUBSCRIBER_BUFFER, clock=time.monotonic):
+        self.path = path
+        self.max_subscriber_buffer = max_subscriber_buffer
+        self.clock = clock
+        self._server = None
+        self._subscribers = set()
+        self._handlers = set()
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path) # Left behind by a previous run
+        self._server = await asyncio.start_unix_server(self._on_subscriber, path=self.path)
+        logger.info(f"Feed publisher listening on {self.path}")
+
+    async def close(self):
+        for writer in tuple(self._subscribers):
+            writer.close()
+        self._subscribers.clear()
+        await asyncio.gather(*self._handlers, return_exceptions=True) # They return at the EOF of the close
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _on_subscriber(self, reader, writer):
+        self._subscribers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            await reader.read() # Subscribers never send; returns at EOF
+        except ConnectionError:
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            self._subscribers.discard(writer)
+            writer.close()
+
+    def publish(self, payload_str, received_at=None):
+        """Sends a payload to every subscriber without waiting for them."""
+        self.published += 1
+        if not self._subscribers:
+            return
+        frame = encode_frame(payload_str, self.clock() if received_at is None else received_at)
+        for writer in tuple(self._subscribers):
+            if writer.transport.get_write_buffer_size() > self.max_subscriber_buffer:
+                logger.error(f"Feed subscriber is {writer.transport.get_write_buffer_size()} bytes behind; disconnecting it.")
+                self.dropped_subscribers += 1
+                self._subscribers.discard(writer)
+                writer.transport.abort()
+                continue
+            writer.write(frame)
+
+    def stats(self):
+        return {
+            'subscribers': len(self._subscribers),
+            'published': self.published,
+            'dropped_subscribers': self.dropped_subscribers,
+        }
+
+
+async def subscribe_feed(path, on_payload, retry_seconds=1.0, should_continue=lambda: True):
+    """
+    Connects to a FeedPublisher and calls on_payload(payload_str, received_at) for every
+    frame, reconnecting after retry_seconds whenever the connection is lost, for as long as
+    should_continue() is true.
+    """
+    while should_continue():
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+        except OSError as e:
+            logger.warning(f"Feed at {path} unavailable ({e}); retrying in {retry_seconds}s.")
+            await asyncio.sleep(retry_seconds)
+            continue
+        logger.info(f"Subscribed to feed at {path}")
+        try:
+            while True:
+                length, received_at = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                on_payload((await reader.readexactly(length)).decode(), received_at)
+        except asyncio.IncompleteReadError:
+            logger.warning("Feed connection closed.")
+        except ConnectionError as e:
+            logger.warning(f"Feed connection lost: {e}")
+        finally:
+            writer.close()
+        await asyncio.sleep(retry_seconds)
@@ -0,0 +1,293 @@
+"""
+Long-lived trend analysis server for the web API.
+
+The Next.js /api/trend-analysis route used to spawn `python3 src/strategies/trend_start_finder.py`
+for every request, paying interpreter start-up and the pandas import each time and parsing
+`str(dict)` lines back out of stdout. This server stays up instead: requests are JSON over
+HTTP, the analysis runs on a pool of pre-warmed worker processes, and results are cached
+by a hash of the request's bar series.
+
+Endpoints:
+    POST /trend-starts      generate_trend_starts over the bars
+    POST /forward-analysis  ForwardTrendAnalyzer fed the bars one at a time
+    GET  /health            worker pool and cache stats
+
+Request body (both POST endpoints):
+    {"contract_id": "...", "timeframe": "1h", "debug": false,
+     "bars": [{"timestamp": "...", "open": ..., "high": ..., "low": ..., "close": ..., "volume": ...}, ...]}
+  or, columnar (cheaper to build and parse for long series):
+    {"contract_id": "...", "timeframe": "1h",
+     "columns": {"timestamp": [...], "open": [...], "high": [...], "low": [...], "close": [...], "volume": [...]}}
+Response:
+    {"signals": [...], "debug_logs": [...], "metadata": {"total_bars", "total_signals", "contract_id",
+     "timeframe", "cached", "elapsed_ms"}}
+
+Usage (from the project root):
+    python3 -m src.services.trend_analysis_server
+Environment: TREND_ANALYSIS_HOST (127.0.0.1), TREND_ANALYSIS_PORT (8766),
+TREND_ANALYSIS_WORKERS (CPU count, max 4), TREND_ANALYSIS_CACHE_SIZE (256).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+from src.strategies.trend_start_finder import generate_trend_starts, serialize_for_json
+from trend_analysis import trend_utils
+from trend_analysis.bar_store import BarStore
+from trend_analysis.trend_start_forward_test import ForwardTrendAnalyzer
+
+logger = logging.getLogger("TrendAnalysisServer")
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+DEFAULT_CACHE_SIZE = 256
+
+
+# --- Request parsing and cache keys ---
+def parse_bar_columns(payload):
+    """
+    Returns {'timestamp': [str, ...], 'open': [float, ...], ...} from a request's "bars"
+    (list of row objects) or "columns" (object of lists). Missing volume becomes 0.0.
+    Raises ValueError for a missing/empty series, missing columns or non-numeric prices.
+    """
+    if payload.get('columns') is not None:
+        source = payload['columns']
+        if not isinstance(source, dict):
+            raise ValueError("columns must be an object of equal-length arrays")
+        timestamps = source.get('timestamp')
+        if not isinstance(timestamps, list) or not timestamps:
+            raise ValueError("columns.timestamp is required and must not be empty")
+        columns = {'timestamp': [str(ts) for ts in timestamps]}
+        for name in PRICE_COLUMNS:
+            values = source.get(name)
+            if values is None and name == 'volume':
+                values = [0.0] * len(timestamps)
+            if not isinstance(values, list) or len(values) != len(timestamps):
+                raise ValueError(f"columns.{name} must be an array with one value per timestamp")
+            columns[name] = values
+    else:
+        rows = payload.get('bars')
+        if not isinstance(rows, list) or not rows:
+            raise ValueError("bars array is required and must not be empty")
+        try:
+            columns = {'timestamp': [str(row['timestamp']) for row in rows]}
+            for name in ('open', 'high', 'low', 'close'):
+                columns[name] = [row[name] for row in rows]
+            columns['volume'] = [row.get('volume') or 0.0 for row in rows]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Each bar needs timestamp, open, high, low and close (missing {e})")
+    for name in PRICE_COLUMNS:
+        try:
+            columns[name] = np.asarray(columns[name], dtype=np.float64).tolist()
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} values must be numbers")
+    return columns
+
+def series_hash(kind, contract_id, timeframe, debug, columns):
+    """sha256 over the request kind, labels and the bar series (timestamps plus float64 column bytes)."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([kind, contract_id, timeframe, bool(debug), len(columns['timestamp'])]).encode())
+    digest.update('\n'.join(columns['timestamp']).encode())
+    for name in PRICE_COLUMNS:
+        digest.update(np.asarray(columns[name], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU of analysis results keyed by series_hash."""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# --- Worker functions (run in the pool processes) ---
+def _columns_to_dataframe(columns):
+    bars_df = pd.DataFrame(columns)
+    bars_df['timestamp'] = pd.to_datetime(bars_df['timestamp'], utc=True) # Naive timestamps are taken as UTC
+    return bars_df
+
+def run_trend_starts(columns, contract_id, timeframe, debug=False):
+    signals, debug_logs = generate_trend_starts(_columns_to_dataframe(columns), contract_id, timeframe, debug=debug)
+    return {'signals': serialize_for_json(signals), 'debug_logs': serialize_for_json(debug_logs)}
+
+def run_forward_analysis(columns, contract_id, timeframe, debug=False):
+    debug_collector = None
+    if debug:
+        debug_collector = trend_utils.DebugLogCollector(active=True, start_index=1, end_index=len(columns['timestamp']))
+    analyzer = ForwardTrendAnalyzer(contract_id, timeframe, debug_collector=debug_collector)
+    for view in BarStore.from_dataframe(_columns_to_dataframe(columns)):
+        analyzer.process_new_bar(analyzer.make_next_bar(view.timestamp, view.o, view.h, view.l, view.c, view.volume))
+    return {'signals': serialize_for_json(analyzer.get_all_signals()),
+            'debug_logs': serialize_for_json(analyzer.get_debug_logs())}
+
+ANALYSIS_FUNCTIONS = {
+    'trend-starts': run_trend_starts,
+    'forward-analysis': run_forward_analysis,
+}
+
+def _init_worker():
+    # The per-call INFO logs of the analysis are not wanted for every request
+    logging.getLogger().setLevel(logging.WARNING)
+
+def _warm_up_worker():
+    """Runs a tiny analysis so the first real request doesn't pay for lazy imports and caches."""
+    columns = {'timestamp': ['2025-01-01T00:00:00Z', '2025-01-01T01:00:00Z', '2025-01-01T02:00:00Z'],
+               'open': [1.0, 2.0, 3.0], 'high': [2.0, 3.0, 4.0], 'low': [0.5, 1.5, 2.5],
+               'close': [1.5, 2.5, 3.5], 'volume': [0.0, 0.0, 0.0]}
+    run_trend_starts(columns, 'WARMUP', '1h')
+    run_forward_analysis(columns, 'WARMUP', '1h')
+
+
+# --- HTTP server ---
+class TrendAnalysisServer:
+    """
+    aiohttp application serving the analysis endpoints. The event loop only parses,
+    hashes and caches; analyses run on `executor` (a ProcessPoolExecutor by default).
+    Concurrent requests for the same series share one computation.
+    """
+
+    def __init__(self, workers=None, cache_size=DEFAULT_CACHE_SIZE, executor=None):
+        self.workers = workers or min(os.cpu_count() or 1, 4)
+        self.executor = executor
+        self._owns_executor = executor is None
+        self.cache = ResultCache(cache_size)
+        self._inflight = {}
+        self.requests = 0
+        self.computed = 0
+
+    def make_app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/trend-starts', self.handle_trend_starts)
+        app.router.add_post('/forward-analysis', self.handle_forward_analysis)
+        app.router.add_get('/health', self.handle_health)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _warm_up_worker) for _ in range(self.workers)))
+        logger.info(f"Trend analysis workers ready ({self.workers}).")
+
+    async def _on_cleanup(self, app):
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_trend_starts(self, request):
+        return await self._handle_analysis(request, 'trend-starts')
+
+    async def handle_forward_analysis(self, request):
+        return await self._handle_analysis(request, 'forward-analysis')
+
+    async def handle_health(self, request):
+        return web.json_response({
+            'status': 'ok',
+            'workers': self.workers,
+            'requests': self.requests,
+            'computed': self.computed,
+            'inflight': len(self._inflight),
+            'cache_entries': len(self.cache),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+        })
+
+    async def _handle_analysis(self, request, kind):
+        started = time.perf_counter()
+        self.requests += 1
+        try:
+            payload = await request.json()
+        except json.JSONDecodeError as e:
+            return web.json_response({'error': f'Invalid JSON body: {e}'}, status=400)
+        if not isinstance(payload, dict):
+            return web.json_response({'error': 'Request body must be a JSON object'}, status=400)
+        contract_id, timeframe = payload.get('contract_id'), payload.get('timeframe')
+        if not contract_id or not timeframe:
+            return web.json_response({'error': 'contract_id and timeframe are required'}, status=400)
+        debug = bool(payload.get('debug', False))
+        try:
+            columns = parse_bar_columns(payload)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        key = series_hash(kind, contract_id, timeframe, debug, columns)
+        result = self.cache.get(key)
+        cached = result is not None
+        if not cached:
+            try:
+                result = await self._compute(key, kind, columns, contract_id, timeframe, debug)
+            except Exception as e:
+                logger.error(f"{kind} failed for {contract_id} {timeframe} ({len(columns['timestamp'])} bars): {e}", exc_info=True)
+                return web.json_response({'error': 'Failed to analyze trend data', 'details': str(e)}, status=500)
+
+        return web.json_response({
+            'signals': result['signals'],
+            'debug_logs': result['debug_logs'],
+            'metadata': {
+                'total_bars': len(columns['timestamp']),
+                'total_signals': len(result['signals']),
+                'contract_id': contract_id,
+                'timeframe': timeframe,
+                'cached': cached,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            },
+        })
+
+    async def _compute(self, key, kind, columns, contract_id, timeframe, debug):
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, ANALYSIS_FUNCTIONS[kind], columns, contract_id, timeframe, debug)
+            self._inflight[key] = future
+            try:
+                result = await future
+            finally:
+                self._inflight.pop(key, None)
+            self.computed += 1
+            self.cache.put(key, result)
+            return result
+        return await asyncio.shield(future)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    host = os.getenv("TREND_ANALYSIS_HOST", "127.0.0.1")
+    port = int(os.getenv("TREND_ANALYSIS_PORT", 8766))
+    workers = int(os.getenv("TREND_ANALYSIS_WORKERS", 0)) or None
+    cache_size = int(os.getenv("TREND_ANALYSIS_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+    server = TrendAnalysisServer(workers=workers, cache_size=cache_size)
+    logger.info(f"Starting trend analysis server on http://{host}:{port} ({server.workers} workers, cache {cache_size}).")
+    web.run_app(server.make_app(), host=host, port=port, print=None)
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from typing import List, Dict, Optional, Any, Tuple
 # Import the refactored components
 from trend_analysis.trend_models import Bar, State # State may not be directly used here but good to have if Bar needs it implicitly
 from trend_analysis import trend_utils
+from trend_analysis.bar_store import BarStore
 from trend_analysis import trend_start_og_fixed # For process_trend_logic
 
 logger = logging.getLogger(__name__)
@@ -20,7 +21,7 @@ def generate_trend_starts(
     contract_id: str, 
     timeframe_str: str,
     config: Optional[Dict[str, Any]] = None, # Keep for API compatibility, though not used by new core logic directly
-    debug: bool = False # This will now be controlled by trend_utils.DEBUG_MODE_ACTIVE via script args
+    debug: bool = False # Debug-log every bar of this call; otherwise trend_utils.DEBUG_* flags apply
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """
     Generates trend start signals (CUS/CDS) using the refactored trend_analysis logic.
@@ -31,7 +32,7 @@ def generate_trend_starts(
         contract_id (str): Contract identifier for enriching signal data.
         timeframe_str (str): Timeframe identifier for enriching signal data.
         config (Optional[Dict[str, Any]]): Optional configuration (currently unused by core logic).
-        debug (bool): Controls debug log generation (now through trend_utils global flags).
+        debug (bool): If True, collect debug logs for every bar of this call (per-call collector).
 
     Returns:
         Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: 
@@ -40,66 +41,26 @@ def generate_trend_starts(
     """
     log_prefix = f"[generate_trend_starts_v2][{contract_id}][{timeframe_str}]"
     
-    initial_debug_active = trend_utils.DEBUG_MODE_ACTIVE
-    initial_debug_start = trend_utils.DEBUG_START_INDEX
-    initial_debug_end = trend_utils.DEBUG_END_INDEX
-
+    # Debug range for this call only; module-level DEBUG_* flags are left untouched
+    debug_collector = trend_utils.DebugLogCollector()
     if debug: 
-        trend_utils.DEBUG_MODE_ACTIVE = True
-        trend_utils.DEBUG_START_INDEX = 1 
-        trend_utils.DEBUG_END_INDEX = len(bars_df) if not bars_df.empty else 1
-        logger.info(f"{log_prefix} Debug mode explicitly enabled for this call. Start: {trend_utils.DEBUG_START_INDEX}, End: {trend_utils.DEBUG_END_INDEX}")
+        debug_collector = trend_utils.DebugLogCollector(
+            active=True, start_index=1, end_index=len(bars_df) if not bars_df.empty else 1
+        )
+        logger.info(f"{log_prefix} Debug mode explicitly enabled for this call. Start: {debug_collector.start_index}, End: {debug_collector.end_index}")
 
     if bars_df.empty or len(bars_df) < MIN_BARS_FOR_TREND_START:
         logger.info(f"{log_prefix} Not enough bars ({len(bars_df)}). Min: {MIN_BARS_FOR_TREND_START}.")
-        if debug: 
-            trend_utils.DEBUG_MODE_ACTIVE = initial_debug_active
-            trend_utils.DEBUG_START_INDEX = initial_debug_start
-            trend_utils.DEBUG_END_INDEX = initial_debug_end
         return [], []
 
-    all_bars: List[Bar] = []
-    for i, row_tuple in enumerate(bars_df.itertuples(index=False)):
-        try:
-            bar_ts = row_tuple.timestamp
-            if not isinstance(bar_ts, datetime.datetime):
-                 bar_ts = pd.to_datetime(bar_ts).to_pydatetime()
-            if bar_ts.tzinfo is None:
-                bar_ts = bar_ts.replace(tzinfo=timezone.utc)
-            
-            o = float(row_tuple.open)
-            h = float(row_tuple.high)
-            l = float(row_tuple.low)
-            c = float(row_tuple.close)
-            vol = float(row_tuple.volume) if hasattr(row_tuple, 'volume') and row_tuple.volume is not None else 0.0
-
-            all_bars.append(Bar(
-                timestamp=bar_ts,
-                o=o, h=h, l=l, c=c,
-                volume=vol,
-                index=i + 1, 
-            ))
-        except AttributeError as e:
-            logger.error(f"{log_prefix} Error processing row {i} from DataFrame: Missing attribute {e}. Row: {row_tuple}")
-            if debug: 
-                trend_utils.DEBUG_MODE_ACTIVE = initial_debug_active
-                trend_utils.DEBUG_START_INDEX = initial_debug_start
-                trend_utils.DEBUG_END_INDEX = initial_debug_end
-            return [], [] 
-        except ValueError as e:
-            logger.error(f"{log_prefix} Error processing row {i} from DataFrame: Value error {e}. Row: {row_tuple}")
-            if debug: 
-                trend_utils.DEBUG_MODE_ACTIVE = initial_debug_active
-                trend_utils.DEBUG_START_INDEX = initial_debug_start
-                trend_utils.DEBUG_END_INDEX = initial_debug_end
-            return [], []
-
-    if not all_bars:
-        logger.info(f"{log_prefix} No bars could be constructed from DataFrame.")
-        if debug: 
-            trend_utils.DEBUG_MODE_ACTIVE = initial_debug_active
-            trend_utils.DEBUG_START_INDEX = initial_debug_start
-            trend_utils.DEBUG_END_INDEX = initial_debug_end
+    # Zero-copy column grab; the rules read bars through the store's cached views
+    try:
+        all_bars = BarStore.from_dataframe(bars_df)
+    except KeyError as e:
+        logger.error(f"{log_prefix} Error preparing bars from DataFrame: Missing column {e}. Columns: {list(bars_df.columns)}")
+        return [], []
+    except (ValueError, TypeError) as e:
+        logger.error(f"{log_prefix} Error preparing bars from DataFrame: Value error {e}.")
         return [], []
 
     logger.info(f"{log_prefix} Successfully prepared {len(all_bars)} bars for trend analysis.")
@@ -107,20 +68,29 @@ def generate_trend_starts(
     signals_found, debug_log_entries = trend_start_og_fixed.process_trend_logic(
         all_bars, 
         contract_id=contract_id, 
-        timeframe_str=timeframe_str
+        timeframe_str=timeframe_str,
+        debug_collector=debug_collector
     )
 
     logger.info(f"{log_prefix} Finished. Generated {len(signals_found)} signals.")
     if debug_log_entries:
         logger.info(f"{log_prefix} Collected {len(debug_log_entries)} debug log entries.")
     
-    if debug: 
-        trend_utils.DEBUG_MODE_ACTIVE = initial_debug_active
-        trend_utils.DEBUG_START_INDEX = initial_debug_start
-        trend_utils.DEBUG_END_INDEX = initial_debug_end
-
     return signals_found, debug_log_entries
 
+def serialize_for_json(obj):
+    """Converts timestamps in (nested) signal/debug-log dicts and lists to ISO strings."""
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    elif isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    elif isinstance(obj, dict):
+        return {k: serialize_for_json(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [serialize_for_json(item) for item in obj]
+    else:
+        return obj
+
 def process_api_input():
     """Process input from stdin for API integration"""
     try:
@@ -157,19 +127,6 @@ def process_api_input():
             debug=debug
         )
         
-        # Helper function to serialize timestamps and other non-JSON types
-        def serialize_for_json(obj):
-            if isinstance(obj, pd.Timestamp):
-                return obj.isoformat()
-            elif isinstance(obj, datetime.datetime):
-                return obj.isoformat()
-            elif isinstance(obj, dict):
-                return {k: serialize_for_json(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [serialize_for_json(item) for item in obj]
-            else:
-                return obj
-        
         # Output results in parseable format
         print("\n--- Signals Found ---")
         if signals:
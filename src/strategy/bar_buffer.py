@@ -0,0 +1,144 @@
+"""
+Fixed-capacity bar history for the rule engine.
+
+BarRingBuffer keeps the most recent bars of one contract/timeframe in preallocated
+NumPy arrays, so appending a bar never reallocates or copies the history. Bars are
+addressed by logical index (0 = oldest retained bar, -1 = newest); once the buffer
+is full each append overwrites the oldest bar.
+"""
+
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CAPACITY = 5000
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+_COLUMN_POS = {name: pos for pos, name in enumerate(PRICE_COLUMNS)}
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _to_utc(timestamp: datetime) -> datetime:
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
+
+
+def _epoch_ns(timestamp: datetime) -> int:
+    """Exact nanoseconds since the Unix epoch (integer arithmetic, no float rounding)."""
+    delta = timestamp - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+class BarRingBuffer:
+    """
+    Ring buffer of OHLCV bars plus the uptrendStart/downtrendStart flags the rule engine
+    assigns to them. Append, replace-last and point lookups are O(1); lookups by
+    timestamp are O(log n).
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("BarRingBuffer capacity must be at least 1")
+        self.capacity = capacity
+        self._values = np.zeros((capacity, len(PRICE_COLUMNS)), dtype=np.float64)
+        self._epoch_ns = np.zeros(capacity, dtype=np.int64)
+        self._timestamps: List[Optional[datetime]] = [None] * capacity
+        self._uptrend = np.zeros(capacity, dtype=bool)
+        self._downtrend = np.zeros(capacity, dtype=bool)
+        self._start = 0
+        self._len = 0
+        self.total_appended = 0  # Monotonic count of appends, survives eviction
+
+    def __len__(self):
+        return self._len
+
+    def _slot(self, i: int) -> int:
+        """Physical slot of logical index i (negative counts from the newest bar)."""
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(f"Bar index {i} out of range for buffer of {self._len} bars")
+        return (self._start + i) % self.capacity
+
+    def _write(self, slot: int, timestamp: datetime, o: float, h: float, l: float, c: float, v: float):
+        timestamp = _to_utc(timestamp)
+        self._timestamps[slot] = timestamp
+        self._epoch_ns[slot] = _epoch_ns(timestamp)
+        self._values[slot] = (o, h, l, c, v)
+        self._uptrend[slot] = False
+        self._downtrend[slot] = False
+
+    def append(self, timestamp: datetime, o: float, h: float, l: float, c: float, v: float = 0.0) -> int:
+        """Appends a bar (evicting the oldest when full) and returns its logical index."""
+        if self._len < self.capacity:
+            slot = (self._start + self._len) % self.capacity
+            self._len += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._write(slot, timestamp, o, h, l, c, v)
+        self.total_appended += 1
+        return self._len - 1
+
+    def replace_last(self, timestamp: datetime, o: float, h: float, l: float, c: float, v: float = 0.0):
+        """Overwrites the newest bar (an in-progress bar update); its trend flags are cleared."""
+        self._write(self._slot(-1), timestamp, o, h, l, c, v)
+
+    def index_of_sequence(self, seq: int) -> int:
+        """Logical index of the bar that was the seq-th append (0-based), or -1 if evicted."""
+        i = seq - (self.total_appended - self._len)
+        return i if 0 <= i < self._len else -1
+
+    def timestamp(self, i: int) -> datetime:
+        return self._timestamps[self._slot(i)]
+
+    @property
+    def last_timestamp(self) -> Optional[datetime]:
+        return self._timestamps[self._slot(-1)] if self._len else None
+
+    def value(self, column: str, i: int) -> float:
+        """Value of an OHLCV column ('open', 'high', 'low', 'close', 'volume') at logical index i."""
+        return float(self._values[self._slot(i), _COLUMN_POS[column]])
+
+    def is_uptrend_start(self, i: int) -> bool:
+        return bool(self._uptrend[self._slot(i)])
+
+    def is_downtrend_start(self, i: int) -> bool:
+        return bool(self._downtrend[self._slot(i)])
+
+    def set_trend_flags(self, i: int, uptrend_start: bool, downtrend_start: bool):
+        slot = self._slot(i)
+        self._uptrend[slot] = uptrend_start
+        self._downtrend[slot] = downtrend_start
+
+    def index_at_or_before(self, timestamp: datetime) -> int:
+        """Logical index of the newest bar at or before timestamp, or -1 if there is none."""
+        target = _epoch_ns(_to_utc(timestamp))
+        lo, hi = 0, self._len
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._epoch_ns[(self._start + mid) % self.capacity] <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def tail_frame(self, count: Optional[int] = None) -> pd.DataFrame:
+        """
+        DataFrame of the newest count bars (all bars if None), oldest first, with the
+        columns the hybrid detector expects: timestamp, OHLCV, uptrendStart, downtrendStart.
+        """
+        first = 0 if count is None else max(self._len - count, 0)
+        slots = (self._start + np.arange(first, self._len)) % self.capacity
+        values = self._values[slots]
+        columns = {'timestamp': [self._timestamps[slot] for slot in slots.tolist()]}
+        for pos, name in enumerate(PRICE_COLUMNS):
+            columns[name] = values[:, pos]
+        columns['uptrendStart'] = self._uptrend[slots]
+        columns['downtrendStart'] = self._downtrend[slots]
+        return pd.DataFrame(columns)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """All retained bars as a DataFrame, oldest first."""
+        return self.tail_frame()
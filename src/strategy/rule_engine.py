@@ -22,6 +22,7 @@ from live_hybrid_detector import LiveHybridDetector
 from hybrid_trend_detector import detect_pattern
 
 from src.data.models import Bar
+from src.strategy.bar_buffer import BarRingBuffer, DEFAULT_CAPACITY
 from src.strategy.indicators.trend_start import TrendDetector
 from src.strategy.strategy_models import (
     RuleType, TrendRule, PriceComparisonRule, RuleSet, 
@@ -30,6 +31,13 @@ from src.strategy.strategy_models import (
 
 logger = logging.getLogger(__name__)
 
+# SQLite database holding reference trend points
+REFERENCE_DB_PATH = 'projectx.db'
+# Need at least 4 bars for trend detection
+MIN_BARS_FOR_TREND_DETECTION = 4
+# Bars of history handed to detect_pattern when evaluating a new bar (it looks back at most 5)
+PATTERN_CONTEXT_BARS = 20
+
 
 class ComparisonOperator(str, enum.Enum):
     GREATER_THAN = ">"
@@ -353,18 +361,33 @@ class RuleEngine:
     Rule Engine processes market data and evaluates trading rules.
     """
     
-    def __init__(self):
-        """Initialize the rule engine."""
+    def __init__(self, max_bars_per_series: int = DEFAULT_CAPACITY):
+        """
+        Initialize the rule engine.
+
+        Args:
+            max_bars_per_series: Bars retained per contract/timeframe; older bars are evicted
+        """
         self.logger = logging.getLogger(__name__)
+        self.max_bars_per_series = max_bars_per_series
         self.rule_sets: Dict[str, RuleSet] = {}
-        self.data_cache: Dict[str, Dict[str, pd.DataFrame]] = {}  # contract_id -> {timeframe -> DataFrame}
+        self.bar_buffers: Dict[str, Dict[str, BarRingBuffer]] = {}  # contract_id -> {timeframe -> BarRingBuffer}
         self.trend_detectors: Dict[str, Dict[str, Union[TrendDetector, LiveHybridDetector]]] = {}  # contract_id -> {timeframe -> TrendDetector or LiveHybridDetector}
+        self._series_progress: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (contract_id, timeframe) -> next bar to evaluate, trend state before the last bar
+        self._reference_points_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
         
     def reset(self):
         """Reset the rule engine state."""
         self.rule_sets = {}
-        self.data_cache = {}
+        self.bar_buffers = {}
         self.trend_detectors = {}
+        self._series_progress = {}
+        self._reference_points_cache = {}
+
+    def get_dataframe(self, contract_id: str, timeframe: str) -> Optional[pd.DataFrame]:
+        """Buffered bars and trend flags for contract/timeframe as a DataFrame (a copy), or None."""
+        buffer = self.bar_buffers.get(contract_id, {}).get(timeframe)
+        return buffer.to_dataframe() if buffer is not None else None
         
     def add_rule_set(self, rule_set: RuleSet) -> None:
         """
@@ -395,173 +418,214 @@ class RuleEngine:
     def update_with_bar(self, bar: Bar) -> None:
         """
         Update rule engine with a new bar.
-        
+
+        The bar is appended to (or, for an update of the newest bar, replaces the last entry
+        of) the contract/timeframe ring buffer, and only that bar is evaluated against the
+        detector's stored last_trend. Cost per bar is O(1) amortized; use recompute_trends
+        for a full-history pass.
+
         Args:
             bar: New price bar
         """
-        # Ensure cache entry exists for this contract and timeframe
         contract_id = bar.contract_id
         timeframe = f"{bar.timeframe_value}{self._get_timeframe_unit_str(bar.timeframe_unit)}"
-        
-        # Initialize cache for this contract if needed
-        if contract_id not in self.data_cache:
-            self.data_cache[contract_id] = {}
+        buffer = self._get_or_create_series(contract_id, timeframe)
+        progress = self._series_progress[(contract_id, timeframe)]
+        volume = bar.v if bar.v is not None else 0
+
+        if len(buffer) > 0 and buffer.last_timestamp == bar.t:
+            # Bar update: rewind the trend state to before the last bar and evaluate it again
+            buffer.replace_last(bar.t, bar.o, bar.h, bar.l, bar.c, volume)
+            if progress["next_seq"] == buffer.total_appended:
+                self._restore_trend_state(contract_id, timeframe, progress["state_before_last"])
+                progress["next_seq"] -= 1
+        else:
+            buffer.append(bar.t, bar.o, bar.h, bar.l, bar.c, volume)
+
+        if len(buffer) < MIN_BARS_FOR_TREND_DETECTION:
+            return
+
+        # Bars not evaluated yet: normally just the new one, all of them once the series
+        # first reaches MIN_BARS_FOR_TREND_DETECTION
+        first = max(buffer.index_of_sequence(progress["next_seq"]), 0)
+        for i in range(first, len(buffer)):
+            progress["state_before_last"] = self._capture_trend_state(contract_id, timeframe)
+            self._evaluate_new_bar(contract_id, timeframe, buffer, i)
+        progress["next_seq"] = buffer.total_appended
+
+    def _get_or_create_series(self, contract_id: str, timeframe: str) -> BarRingBuffer:
+        """Returns the bar buffer for contract/timeframe, creating it and its detector on first use."""
+        if contract_id not in self.bar_buffers:
+            self.bar_buffers[contract_id] = {}
             self.trend_detectors[contract_id] = {}
-            
-        # Create dataframe if it doesn't exist
-        if timeframe not in self.data_cache[contract_id]:
-            self.data_cache[contract_id][timeframe] = pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        if timeframe not in self.bar_buffers[contract_id]:
+            self.bar_buffers[contract_id][timeframe] = BarRingBuffer(self.max_bars_per_series)
             # Initialize hybrid trend detector instead of basic trend detector
-            self.trend_detectors[contract_id][timeframe] = LiveHybridDetector(
-                lookback_window=100, 
-                timeframe=timeframe
-            )
-            
-        # Convert bar to dict and append to dataframe
-        bar_dict = {
-            'timestamp': bar.t,
-            'open': bar.o,
-            'high': bar.h,
-            'low': bar.l,
-            'close': bar.c,
-            'volume': bar.v if bar.v is not None else 0
+            detector = LiveHybridDetector(lookback_window=100, timeframe=timeframe)
+            # Bars before the buffer's first bar are only known through the reference points
+            reference = self._get_cached_reference_points(contract_id, timeframe)
+            detector.last_trend = reference["last_trend_type"]
+            self.trend_detectors[contract_id][timeframe] = detector
+            self._series_progress[(contract_id, timeframe)] = {"next_seq": 0, "state_before_last": None}
+        return self.bar_buffers[contract_id][timeframe]
+
+    def _capture_trend_state(self, contract_id: str, timeframe: str) -> Tuple[Optional[str], Any, Any]:
+        detector = self.trend_detectors[contract_id][timeframe]
+        return (getattr(detector, "last_trend", None), getattr(detector, "last_trend_date", None),
+                getattr(detector, "last_trend_price", None))
+
+    def _restore_trend_state(self, contract_id: str, timeframe: str, state: Tuple[Optional[str], Any, Any]) -> None:
+        if state is None:
+            return
+        detector = self.trend_detectors[contract_id][timeframe]
+        detector.last_trend, detector.last_trend_date, detector.last_trend_price = state
+
+    def _evaluate_new_bar(self, contract_id: str, timeframe: str, buffer: BarRingBuffer, i: int) -> None:
+        """Marks bar i as a trend start from the reference points or the pattern detector, alternating with last_trend."""
+        hybrid_timeframe = self._get_hybrid_timeframe(timeframe)
+        reference = self._get_cached_reference_points(contract_id, timeframe)
+        detector = self.trend_detectors[contract_id][timeframe]
+        date_key = self._date_key(buffer.timestamp(i), hybrid_timeframe)
+
+        is_uptrend = date_key in reference["uptrend_dates"]
+        is_downtrend = date_key in reference["downtrend_dates"]
+        if is_uptrend or is_downtrend:
+            self.logger.debug(f"Marked reference {'uptrend' if is_uptrend else 'downtrend'} at {date_key}")
+        elif reference["last_ref_date"] is None or date_key > reference["last_ref_date"]:
+            # detect_pattern only looks a few bars back, so a short tail of the buffer is enough
+            window = buffer.tail_frame(PATTERN_CONTEXT_BARS + (len(buffer) - 1 - i))
+            pos = len(window) - 1 - (len(buffer) - 1 - i)
+            can_be_uptrend, can_be_downtrend = detect_pattern(window, pos, hybrid_timeframe)
+
+            # Apply alternating pattern rule exactly as in hybrid_trend_detector.py
+            if detector.last_trend != 'uptrend' and can_be_uptrend:
+                is_uptrend = True
+                self.logger.debug(f"Detected new uptrend at {date_key}")
+            elif detector.last_trend != 'downtrend' and can_be_downtrend:
+                is_downtrend = True
+                self.logger.debug(f"Detected new downtrend at {date_key}")
+
+        if not (is_uptrend or is_downtrend):
+            return
+        buffer.set_trend_flags(i, is_uptrend, is_downtrend)
+        detector.last_trend = 'uptrend' if is_uptrend else 'downtrend'
+        detector.last_trend_date = buffer.timestamp(i)
+        detector.last_trend_price = buffer.value('close', i)
+
+    def recompute_trends(self, contract_id: str, timeframe: str) -> None:
+        """
+        Re-runs trend detection over every buffered bar of contract/timeframe, newest to
+        oldest, as hybrid_trend_detector.py does for a full history. O(n) per call; intended
+        for resynchronising after reference points change, not for every bar.
+        """
+        buffer = self.bar_buffers.get(contract_id, {}).get(timeframe)
+        if buffer is None or len(buffer) < MIN_BARS_FOR_TREND_DETECTION:
+            return
+        hybrid_timeframe = self._get_hybrid_timeframe(timeframe)
+        reference = self._get_cached_reference_points(contract_id, timeframe)
+        ref_uptrend_dates = reference["uptrend_dates"]
+        ref_downtrend_dates = reference["downtrend_dates"]
+        last_ref_date = reference["last_ref_date"]
+
+        df = buffer.to_dataframe()
+        df['date_key'] = [self._date_key(ts, hybrid_timeframe) for ts in df['timestamp']]
+
+        # First, mark all bars that match reference dates
+        df['uptrendStart'] = df['date_key'].isin(ref_uptrend_dates)
+        df['downtrendStart'] = df['date_key'].isin(ref_downtrend_dates)
+
+        # Then apply pattern detection, newest to oldest, to bars after the last reference date
+        last_trend = reference["last_trend_type"] if last_ref_date is not None else None
+        for i in range(len(df) - 1, -1, -1):
+            if df.at[i, 'uptrendStart'] or df.at[i, 'downtrendStart']:
+                continue
+            if last_ref_date is not None and df.at[i, 'date_key'] <= last_ref_date:
+                continue
+            can_be_uptrend, can_be_downtrend = detect_pattern(df, i, hybrid_timeframe)
+            if last_trend != 'uptrend' and can_be_uptrend:
+                df.at[i, 'uptrendStart'] = True
+                last_trend = 'uptrend'
+            elif last_trend != 'downtrend' and can_be_downtrend:
+                df.at[i, 'downtrendStart'] = True
+                last_trend = 'downtrend'
+
+        for i, (up, down) in enumerate(zip(df['uptrendStart'], df['downtrendStart'])):
+            buffer.set_trend_flags(i, bool(up), bool(down))
+
+        # Update the detector's internal state to match the latest trend
+        detector = self.trend_detectors[contract_id][timeframe]
+        marked = np.flatnonzero(df['uptrendStart'].to_numpy() | df['downtrendStart'].to_numpy())
+        if len(marked) > 0:
+            last = int(marked[-1])
+            detector.last_trend = 'uptrend' if df.at[last, 'uptrendStart'] else 'downtrend'
+            detector.last_trend_date = df.at[last, 'timestamp']
+            detector.last_trend_price = df.at[last, 'close']
+        progress = self._series_progress[(contract_id, timeframe)]
+        progress["next_seq"] = buffer.total_appended
+        progress["state_before_last"] = None
+
+    @staticmethod
+    def _date_key(timestamp: datetime, hybrid_timeframe: str) -> str:
+        """Key used to match bars with reference trend points."""
+        return timestamp.strftime("%Y-%m-%d") if hybrid_timeframe == "1d" else timestamp.strftime("%Y-%m-%d %H:%M")
+
+    def _get_cached_reference_points(self, contract_id: str, timeframe: str) -> Dict[str, Any]:
+        """
+        Reference trend points for contract/timeframe, pre-processed into date-key sets.
+
+        Loaded from the database once and reused until invalidate_reference_points is
+        called or the database file's modification time changes.
+        """
+        key = (contract_id, timeframe)
+        try:
+            db_mtime = os.path.getmtime(REFERENCE_DB_PATH)
+        except OSError:
+            db_mtime = None
+        cached = self._reference_points_cache.get(key)
+        if cached is not None and cached["db_mtime"] == db_mtime:
+            return cached
+
+        hybrid_timeframe = self._get_hybrid_timeframe(timeframe)
+        ref_uptrend_dates = set()
+        ref_downtrend_dates = set()
+        last_ref_date = None
+        last_trend_type = None
+        for point in self._get_reference_trend_points(contract_id, timeframe):
+            date_key = self._date_key(point["timestamp"], hybrid_timeframe)
+            if point["type"] == "uptrendStart":
+                ref_uptrend_dates.add(date_key)
+                last_trend_type = "uptrend"
+            elif point["type"] == "downtrendStart":
+                ref_downtrend_dates.add(date_key)
+                last_trend_type = "downtrend"
+            if last_ref_date is None or date_key > last_ref_date:
+                last_ref_date = date_key
+        if ref_uptrend_dates or ref_downtrend_dates:
+            self.logger.info(f"Found {len(ref_uptrend_dates)} uptrend and {len(ref_downtrend_dates)} downtrend reference points")
+            self.logger.info(f"Last reference date: {last_ref_date}, last trend: {last_trend_type}")
+
+        cached = {
+            "db_mtime": db_mtime,
+            "uptrend_dates": ref_uptrend_dates,
+            "downtrend_dates": ref_downtrend_dates,
+            "last_ref_date": last_ref_date,
+            "last_trend_type": last_trend_type,
         }
-        
-        # Check if this timestamp already exists (bar update)
-        df = self.data_cache[contract_id][timeframe]
-        if len(df) > 0 and df.iloc[-1]['timestamp'] == bar.t:
-            # Update the last row
-            self.data_cache[contract_id][timeframe].iloc[-1] = bar_dict
-        else:
-            # Append as new row
-            self.data_cache[contract_id][timeframe] = pd.concat([
-                self.data_cache[contract_id][timeframe], 
-                pd.DataFrame([bar_dict])
-            ], ignore_index=True)
-            
-        # Use the current data to reprocess all trends using the hybrid approach for consistency
-        df = self.data_cache[contract_id][timeframe]
-        if len(df) >= 4:  # Need at least 4 bars for trend detection
-            # Map timeframe to the format expected by the hybrid detector
-            hybrid_timeframe = self._get_hybrid_timeframe(timeframe)
-            
-            # Try to load reference trend points from the database for this contract and timeframe
-            # Note: This implementation assumes existence of a method to fetch trend points
-            reference_trend_points = self._get_reference_trend_points(contract_id, timeframe)
-            
-            # Process reference points for matching
-            ref_uptrend_dates = set()
-            ref_downtrend_dates = set()
-            last_ref_date = None
-            last_trend_type = None
-            
-            if reference_trend_points:
-                for point in reference_trend_points:
-                    date_key = point["timestamp"].strftime("%Y-%m-%d %H:%M") if hybrid_timeframe != "1d" else point["timestamp"].strftime("%Y-%m-%d")
-                    
-                    if point["type"] == "uptrendStart":
-                        ref_uptrend_dates.add(date_key)
-                        last_trend_type = "uptrend"
-                    elif point["type"] == "downtrendStart":
-                        ref_downtrend_dates.add(date_key)
-                        last_trend_type = "downtrend"
-                    
-                    if last_ref_date is None or date_key > last_ref_date:
-                        last_ref_date = date_key
-                        
-                self.logger.info(f"Found {len(ref_uptrend_dates)} uptrend and {len(ref_downtrend_dates)} downtrend reference points")
-                self.logger.info(f"Last reference date: {last_ref_date}, last trend: {last_trend_type}")
-            
-            # Reset all trend indicators first
-            df['uptrendStart'] = False
-            df['downtrendStart'] = False
-            
-            # Sort by timestamp (oldest first)
-            df = df.sort_values('timestamp').reset_index(drop=True)
-            
-            # Add date key for matching with reference
-            df['date_key'] = df['timestamp'].apply(
-                lambda x: x.strftime("%Y-%m-%d") if hybrid_timeframe == "1d" else x.strftime("%Y-%m-%d %H:%M")
-            )
-            
-            # First, mark all bars that match reference dates
-            for i in range(len(df)):
-                date_key = df.iloc[i]['date_key']
-                
-                if date_key in ref_uptrend_dates:
-                    df.loc[df.index[i], 'uptrendStart'] = True
-                    self.logger.debug(f"Marked reference uptrend at {date_key}")
-                
-                if date_key in ref_downtrend_dates:
-                    df.loc[df.index[i], 'downtrendStart'] = True
-                    self.logger.debug(f"Marked reference downtrend at {date_key}")
-            
-            # Now apply pattern detection for bars after the last reference date
-            if last_ref_date is not None:
-                # Start with the last known trend type from reference
-                last_trend = last_trend_type
-                
-                # Process in reverse chronological order (newest to oldest)
-                for i in range(len(df) - 1, -1, -1):
-                    # Skip if already marked or before/at the last reference date
-                    if df.iloc[i]['uptrendStart'] or df.iloc[i]['downtrendStart'] or df.iloc[i]['date_key'] <= last_ref_date:
-                        continue
-                    
-                    # Detect patterns using the imported function from hybrid_trend_detector.py
-                    can_be_uptrend, can_be_downtrend = detect_pattern(df, i, hybrid_timeframe)
-                    
-                    # Apply alternating pattern rule exactly as in hybrid_trend_detector.py
-                    if last_trend != 'uptrend' and can_be_uptrend:
-                        df.loc[df.index[i], 'uptrendStart'] = True
-                        last_trend = 'uptrend'
-                        self.logger.debug(f"Detected new uptrend at {df.iloc[i]['date_key']}")
-                    elif last_trend != 'downtrend' and can_be_downtrend:
-                        df.loc[df.index[i], 'downtrendStart'] = True
-                        last_trend = 'downtrend'
-                        self.logger.debug(f"Detected new downtrend at {df.iloc[i]['date_key']}")
-            else:
-                # No reference data, analyze from scratch
-                self.logger.info("No reference data found, applying pattern detection to all bars")
-                
-                # Process in reverse chronological order (newest to oldest)
-                last_trend = None
-                for i in range(len(df) - 1, -1, -1):
-                    # Skip if already marked
-                    if df.iloc[i]['uptrendStart'] or df.iloc[i]['downtrendStart']:
-                        continue
-                    
-                    # Detect patterns using the imported function
-                    can_be_uptrend, can_be_downtrend = detect_pattern(df, i, hybrid_timeframe)
-                    
-                    # Apply alternating pattern rule
-                    if last_trend != 'uptrend' and can_be_uptrend:
-                        df.loc[df.index[i], 'uptrendStart'] = True
-                        last_trend = 'uptrend'
-                        self.logger.debug(f"Detected uptrend at {df.iloc[i]['date_key']}")
-                    elif last_trend != 'downtrend' and can_be_downtrend:
-                        df.loc[df.index[i], 'downtrendStart'] = True
-                        last_trend = 'downtrend'
-                        self.logger.debug(f"Detected downtrend at {df.iloc[i]['date_key']}")
-            
-            # For compatibility with existing trend detection system
-            df['uptrend_start'] = df['uptrendStart']
-            df['downtrend_start'] = df['downtrendStart']
-            
-            # Update the detector's internal state to match the latest trend
-            detector = self.trend_detectors[contract_id][timeframe]
-            last_trends = df[(df['uptrendStart'] | df['downtrendStart'])].sort_values('timestamp', ascending=False)
-            if len(last_trends) > 0:
-                last_trend_row = last_trends.iloc[0]
-                if last_trend_row['uptrendStart']:
-                    detector.last_trend = 'uptrend'
-                elif last_trend_row['downtrendStart']:
-                    detector.last_trend = 'downtrend'
-                detector.last_trend_date = last_trend_row['timestamp']
-                detector.last_trend_price = last_trend_row['close']
-                
-            # Update the cache with the modified dataframe
-            self.data_cache[contract_id][timeframe] = df
-    
+        self._reference_points_cache[key] = cached
+        return cached
+
+    def invalidate_reference_points(self, contract_id: Optional[str] = None, timeframe: Optional[str] = None) -> None:
+        """
+        Drops cached reference trend points so the next bar reloads them.
+
+        Args:
+            contract_id: Only invalidate this contract (default: all)
+            timeframe: Only invalidate this timeframe (default: all)
+        """
+        for key in list(self._reference_points_cache):
+            if (contract_id is None or key[0] == contract_id) and (timeframe is None or key[1] == timeframe):
+                del self._reference_points_cache[key]
+
     def _get_reference_trend_points(self, contract_id: str, timeframe: str) -> List[Dict]:
         """
         Load reference trend points from database for a specific contract and timeframe.
@@ -580,7 +644,7 @@ class RuleEngine:
             import sqlite3
             
             # Connect to SQLite database
-            conn = sqlite3.connect('projectx.db')
+            conn = sqlite3.connect(REFERENCE_DB_PATH)
             cursor = conn.cursor()
             
             # Query trend points
@@ -698,7 +762,7 @@ class RuleEngine:
         """
         # Check data availability
         for contract_id in rule.contracts:
-            if contract_id not in self.data_cache or rule.timeframe not in self.data_cache[contract_id]:
+            if contract_id not in self.bar_buffers or rule.timeframe not in self.bar_buffers[contract_id]:
                 return {
                     "triggered": False,
                     "message": f"No data available for {contract_id} {rule.timeframe}"
@@ -706,23 +770,23 @@ class RuleEngine:
                 
         # Use first contract for now (could be extended to check all)
         contract_id = rule.contracts[0]
-        df = self.data_cache[contract_id][rule.timeframe]
+        buffer = self.bar_buffers[contract_id][rule.timeframe]
         
         # Get index to evaluate at
-        idx = -1  # Default to latest
+        idx = len(buffer) - 1  # Default to latest
         if timestamp:
             # Find closest timestamp before the given one
-            idx = df[df['timestamp'] <= timestamp].index[-1] if len(df) > 0 else -1
+            idx = buffer.index_at_or_before(timestamp)
             
         # Not enough data
-        if len(df) < rule.lookback_bars:
+        if len(buffer) < rule.lookback_bars:
             return {
                 "triggered": False,
-                "message": f"Not enough data (need {rule.lookback_bars}, have {len(df)})"
+                "message": f"Not enough data (need {rule.lookback_bars}, have {len(buffer)})"
             }
             
         # Check if we're at a valid index
-        if idx < 0 or idx >= len(df):
+        if idx < 0 or idx >= len(buffer):
             return {
                 "triggered": False,
                 "message": f"Invalid data index: {idx}"
@@ -730,25 +794,23 @@ class RuleEngine:
             
         # Evaluate based on rule type
         if rule.rule_type == RuleType.UPTREND_START:
-            # Using the new column name from LiveHybridDetector
-            triggered = df['uptrendStart'].iloc[idx] if 'uptrendStart' in df.columns else df['uptrend_start'].iloc[idx]
+            triggered = buffer.is_uptrend_start(idx)
             message = f"Uptrend start {'detected' if triggered else 'not detected'}"
             
         elif rule.rule_type == RuleType.DOWNTREND_START:
-            # Using the new column name from LiveHybridDetector
-            triggered = df['downtrendStart'].iloc[idx] if 'downtrendStart' in df.columns else df['downtrend_start'].iloc[idx]
+            triggered = buffer.is_downtrend_start(idx)
             message = f"Downtrend start {'detected' if triggered else 'not detected'}"
             
         elif rule.rule_type == RuleType.UNBROKEN_UPTREND:
-            triggered = df['unbroken_uptrend_start'].iloc[idx] if 'unbroken_uptrend_start' in df.columns else False
+            triggered = False  # Not produced by the hybrid detector
             message = f"Unbroken uptrend {'detected' if triggered else 'not detected'}"
             
         elif rule.rule_type == RuleType.HIGHEST_DOWNTREND:
-            triggered = df['highest_downtrend_start'].iloc[idx] if 'highest_downtrend_start' in df.columns else False
+            triggered = False  # Not produced by the hybrid detector
             message = f"Highest downtrend {'detected' if triggered else 'not detected'}"
             
         elif rule.rule_type == RuleType.UPTREND_TO_HIGH:
-            triggered = df['uptrend_to_high'].iloc[idx] if 'uptrend_to_high' in df.columns else False
+            triggered = False  # Not produced by the hybrid detector
             message = f"Uptrend to high {'detected' if triggered else 'not detected'}"
             
         else:
@@ -758,7 +820,7 @@ class RuleEngine:
         return {
             "triggered": triggered,
             "message": message,
-            "timestamp": df['timestamp'].iloc[idx]
+            "timestamp": buffer.timestamp(idx)
         }
         
     def _evaluate_price_comparison_rule(self, rule: PriceComparisonRule, timestamp: Optional[datetime] = None) -> Dict[str, Any]:
@@ -774,7 +836,7 @@ class RuleEngine:
         """
         # Check data availability
         for contract_id in rule.contracts:
-            if contract_id not in self.data_cache or rule.timeframe not in self.data_cache[contract_id]:
+            if contract_id not in self.bar_buffers or rule.timeframe not in self.bar_buffers[contract_id]:
                 return {
                     "triggered": False,
                     "message": f"No data available for {contract_id} {rule.timeframe}"
@@ -782,16 +844,16 @@ class RuleEngine:
                 
         # Use first contract for now
         contract_id = rule.contracts[0]
-        df = self.data_cache[contract_id][rule.timeframe]
+        buffer = self.bar_buffers[contract_id][rule.timeframe]
         
         # Get index to evaluate at
-        idx = -1  # Default to latest
+        idx = len(buffer) - 1  # Default to latest
         if timestamp:
             # Find closest timestamp before the given one
-            idx = df[df['timestamp'] <= timestamp].index[-1] if len(df) > 0 else -1
+            idx = buffer.index_at_or_before(timestamp)
             
         # Check if we're at a valid index
-        if idx < 0 or idx >= len(df):
+        if idx < 0 or idx >= len(buffer):
             return {
                 "triggered": False,
                 "message": f"Invalid data index: {idx}"
@@ -807,7 +869,7 @@ class RuleEngine:
                 "message": f"Not enough data for left operand lookback ({left_lookback})"
             }
             
-        left_value = df[left_column].iloc[idx - left_lookback]
+        left_value = buffer.value(left_column, idx - left_lookback)
         
         # Get right value
         if isinstance(rule.right, PricePoint):
@@ -820,7 +882,7 @@ class RuleEngine:
                     "message": f"Not enough data for right operand lookback ({right_lookback})"
                 }
                 
-            right_value = df[right_column].iloc[idx - right_lookback]
+            right_value = buffer.value(right_column, idx - right_lookback)
         else:
             # Rule.right is a float
             right_value = float(rule.right)
@@ -842,7 +904,7 @@ class RuleEngine:
         return {
             "triggered": triggered,
             "message": f"{left_value} {rule.operator.value} {right_value} = {triggered}",
-            "timestamp": df['timestamp'].iloc[idx],
+            "timestamp": buffer.timestamp(idx),
             "left_value": left_value,
             "right_value": right_value
         }
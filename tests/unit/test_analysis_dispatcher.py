@@ -0,0 +1,101 @@
+"""
+Unit tests for the analyzer's concurrent ohlc_update dispatcher.
+"""
+
+import asyncio
+import datetime
+import unittest
+
+from src.analysis.dispatcher import AnalysisDispatcher, AnalysisTarget, build_target_map
+
+UTC = datetime.timezone.utc
+T0 = datetime.datetime(2025, 5, 19, 17, 0, tzinfo=UTC)
+
+TARGETS = [
+    {"analyzer_id": "windowed", "contract_id": "C", "timeframes": ["5m", "1h"], "strategy": "window"},
+    {"analyzer_id": "resident", "contract_id": "C", "timeframes": ["5m"], "strategy": "stream"},
+    {"analyzer_id": "other", "contract_id": "D", "timeframes": ["5m"], "strategy": "window"},
+    {"analyzer_id": "unknown", "contract_id": "C", "timeframes": ["5m"], "strategy": "missing"},
+    {"contract_id": "C", "timeframes": ["5m"]},
+]
+
+
+def _bar(minutes):
+    return T0 + datetime.timedelta(minutes=minutes)
+
+
+class TestBuildTargetMap(unittest.TestCase):
+
+    def test_targets_are_keyed_by_contract_and_timeframe(self):
+        targets = build_target_map(TARGETS, {"window": None, "stream": None})
+        self.assertEqual(sorted(targets), [("C", "1h"), ("C", "5m"), ("D", "5m")])
+        self.assertEqual([t.analyzer_id for t in targets[("C", "5m")]], ["windowed", "resident"])
+        self.assertEqual(targets[("C", "1h")], [AnalysisTarget("windowed", "C", "1h", "window")])
+
+
+class TestAnalysisDispatcher(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.runs = []
+        self.release = asyncio.Event()
+        self.running = 0
+        self.peak = 0
+
+        async def process_bar(target, bar_timestamp, payload):
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            try:
+                await self.release.wait()
+            finally:
+                self.running -= 1
+            self.runs.append((target.analyzer_id, bar_timestamp))
+            if payload.get("fail"):
+                raise RuntimeError("strategy failed")
+            return payload.get("signals", 0)
+
+        self.dispatcher = AnalysisDispatcher(
+            build_target_map(TARGETS, {"window": None, "stream": None}), process_bar,
+            coalesce=lambda target: target.strategy_name == "window", max_concurrent=2,
+        )
+
+    async def asyncTearDown(self):
+        await self.dispatcher.close()
+
+    async def test_busy_targets_coalesce_or_keep_every_bar(self):
+        self.assertEqual(self.dispatcher.submit("C", "5m", _bar(0), {}), 2)
+        await asyncio.sleep(0)
+        for minutes in (10, 5): # Arrive while the first bar is running, out of order
+            self.dispatcher.submit("C", "5m", _bar(minutes), {})
+        self.assertEqual(self.dispatcher.submit("X", "5m", _bar(0), {}), 0)
+        self.release.set()
+        await self.dispatcher.wait_idle()
+        self.assertEqual([ts for a, ts in self.runs if a == "windowed"], [_bar(0), _bar(10)])
+        self.assertEqual([ts for a, ts in self.runs if a == "resident"], [_bar(0), _bar(5), _bar(10)])
+        self.assertEqual(self.dispatcher.stats()["bars_coalesced"], 1)
+
+    async def test_concurrency_is_bounded_and_targets_are_serialized(self):
+        for contract_id, timeframe in (("C", "5m"), ("C", "1h"), ("D", "5m")):
+            self.dispatcher.submit(contract_id, timeframe, _bar(0), {})
+            self.dispatcher.submit(contract_id, timeframe, _bar(0), {}) # Same bar again: queued once
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.dispatcher.in_flight, 2)
+        self.release.set()
+        await self.dispatcher.wait_idle()
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(len(self.runs), 4)
+        self.assertEqual(self.dispatcher.stats()["in_flight"], 0)
+
+    async def test_failures_are_contained_and_latency_is_reported(self):
+        self.release.set()
+        self.dispatcher.submit("D", "5m", _bar(0), {"fail": True})
+        await self.dispatcher.wait_idle()
+        now = datetime.datetime.now(UTC)
+        self.dispatcher.submit("D", "5m", now, {"signals": 3})
+        await self.dispatcher.wait_idle()
+        stats = self.dispatcher.stats()
+        self.assertEqual((stats["runs"], stats["failed_runs"], stats["signals_stored"]), (1, 1, 3))
+        self.assertLess(stats["last_signal_latency_seconds"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
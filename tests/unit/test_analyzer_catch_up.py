@@ -0,0 +1,142 @@
+"""
+Unit tests for the analyzer's chunked backlog catch-up.
+"""
+
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from src.analysis import analyzer_service
+from trend_analysis.bar_store import BarStore
+from trend_analysis.trend_start_forward_test import ForwardTrendAnalyzer
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'CON.F.US.MES.M25_1h_ohlc.csv')
+
+
+def _load_bars():
+    df = pd.read_csv(DATA_PATH)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df.sort_values('timestamp').reset_index(drop=True)[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+
+
+class FakeCursor:
+    def __init__(self, records):
+        self.records = records
+        self.position = 0
+
+    async def fetch(self, count):
+        chunk = self.records[self.position:self.position + count]
+        self.position += len(chunk)
+        return chunk
+
+
+class FakeConnection:
+    def __init__(self, records):
+        self.records = records
+
+    def transaction(self, **kwargs):
+        return FakeContext(None)
+
+    async def cursor(self, query, contract_id, unit, value, after_timestamp):
+        return FakeCursor([r for r in self.records if r['timestamp'] > after_timestamp])
+
+
+class FakeContext:
+    def __init__(self, value):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakePool:
+    """ohlc_bars of one target behind pool.acquire(), plus the watermark and signal tables."""
+
+    def __init__(self, bars_df):
+        self.records = [
+            {**row, 'timestamp': row['timestamp'].to_pydatetime()} for row in bars_df.to_dict('records')
+        ]
+        self.bars_df = bars_df
+        self.watermark = None
+        self.watermark_updates = []
+        self.stored_signals = []
+
+    def acquire(self):
+        return FakeContext(FakeConnection(self.records))
+
+    async def get_watermark(self, pool, analyzer_id, contract_id, timeframe):
+        return self.watermark
+
+    async def update_watermark(self, pool, analyzer_id, contract_id, timeframe, new_timestamp):
+        self.watermark = new_timestamp
+        self.watermark_updates.append(new_timestamp)
+
+    async def store_signals(self, pool, analyzer_id, contract_id, unit, value, signals):
+        self.stored_signals.extend(signals)
+        return len(signals)
+
+    async def fetch_window(self, pool, contract_id, unit, value, end_timestamp, bar_count):
+        return self.bars_df[self.bars_df['timestamp'] <= end_timestamp].tail(bar_count).reset_index(drop=True)
+
+
+class TestChunkedCatchUp(unittest.TestCase):
+
+    def setUp(self):
+        self.bars_df = _load_bars()
+        self.pool = FakePool(self.bars_df)
+        patches = [
+            mock.patch.object(analyzer_service, 'get_analyzer_watermark', self.pool.get_watermark),
+            mock.patch.object(analyzer_service, 'update_analyzer_watermark', self.pool.update_watermark),
+            mock.patch.object(analyzer_service, 'store_signals', self.pool.store_signals),
+            mock.patch.object(analyzer_service, 'fetch_ohlc_bars_for_analysis_window', self.pool.fetch_window),
+            mock.patch.object(analyzer_service, 'write_strategy_debug_logs_to_csv', lambda *args: None),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def catch_up(self, chunk_size):
+        return asyncio.run(analyzer_service.catch_up_target_in_chunks(
+            self.pool, ForwardTrendAnalyzer, 'cus_cds_trend_finder', 'CON.F.US.MES.M25', '1h', chunk_size
+        ))
+
+    def test_chunked_signals_match_one_pass_over_the_backlog(self):
+        analyzer = ForwardTrendAnalyzer(contract_id='CON.F.US.MES.M25', timeframe_str='1h')
+        expected = []
+        for bar in BarStore.from_dataframe(self.bars_df):
+            expected.extend(analyzer.process_new_bar(bar))
+
+        summary = self.catch_up(chunk_size=97)
+
+        key = lambda s: (s['timestamp'], s['signal_type'])
+        self.assertTrue(expected)
+        self.assertEqual([key(s) for s in self.pool.stored_signals], [key(s) for s in expected])
+        self.assertEqual(summary['bars'], len(self.bars_df))
+        self.assertEqual(summary['chunks'], -(-len(self.bars_df) // 97))
+        self.assertEqual(summary['signals_stored'], len(expected))
+
+    def test_watermark_advances_to_the_end_of_every_chunk(self):
+        self.catch_up(chunk_size=200)
+
+        timestamps = self.bars_df['timestamp']
+        expected = [timestamps.iloc[min(end, len(timestamps)) - 1].to_pydatetime()
+                    for end in range(200, len(timestamps) + 200, 200)]
+        self.assertEqual(self.pool.watermark_updates, expected)
+
+    def test_resumes_after_the_watermark(self):
+        self.pool.watermark = self.bars_df['timestamp'].iloc[499].to_pydatetime()
+
+        summary = self.catch_up(chunk_size=100)
+
+        self.assertEqual(summary['bars'], len(self.bars_df) - 500)
+        self.assertEqual(self.pool.watermark, self.bars_df['timestamp'].iloc[-1].to_pydatetime())
+
+
+if __name__ == '__main__':
+    unittest.main()
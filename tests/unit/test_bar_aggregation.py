@@ -0,0 +1,125 @@
+"""
+Unit tests for the live ingester's multi-timeframe ContractBarAggregator.
+"""
+
+import decimal
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from src.data.ingestion.bar_aggregation import (
+    BarCloseScheduler, ContractBarAggregator, timeframe_unit_and_value, timeframe_seconds_from_unit
+)
+
+T0 = datetime(2025, 5, 19, 17, 0, tzinfo=timezone.utc)
+D = decimal.Decimal
+
+
+class TestContractBarAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.bars = []
+
+    def _callback(self, *bar):
+        self.bars.append(bar)
+
+    def test_timeframe_unit_and_value(self):
+        self.assertEqual(timeframe_unit_and_value(45), (1, 45))
+        self.assertEqual(timeframe_unit_and_value(300), (2, 5))
+        self.assertEqual(timeframe_unit_and_value(14400), (3, 4))
+        self.assertEqual(timeframe_unit_and_value(5400), (2, 90))
+        for seconds in (45, 300, 14400, 5400):
+            self.assertEqual(timeframe_seconds_from_unit(*timeframe_unit_and_value(seconds)), seconds)
+
+    def test_base_period_is_gcd(self):
+        self.assertEqual(ContractBarAggregator("C", [900, 60, 300], None).base_seconds, 60)
+        self.assertEqual(ContractBarAggregator("C", [60, 90], None).base_seconds, 30)
+        with self.assertRaises(ValueError):
+            ContractBarAggregator("C", [], None)
+
+    def test_higher_timeframes_roll_up_from_base(self):
+        agg = ContractBarAggregator("C", [60, 180], self._callback)
+        prices = [D("10"), D("12"), D("9"), D("11")]
+        for minute, price in enumerate(prices):
+            agg.add_tick(T0 + timedelta(minutes=minute, seconds=5), price, 1)
+            agg.add_tick(T0 + timedelta(minutes=minute, seconds=30), price + 1, 2)
+        agg.add_tick(T0 + timedelta(minutes=6), D("5"), 0)  # Closes minute 3 and the 3-minute bar at 17:03
+
+        one_minute = [bar for bar in self.bars if bar[8] == 1]
+        three_minute = [bar for bar in self.bars if bar[8] == 3]
+        self.assertEqual(len(one_minute), 4)
+        self.assertEqual(one_minute[1], ("C", T0 + timedelta(minutes=1), D("12"), D("13"), D("12"), D("13"), D("3"), 2, 1))
+        self.assertEqual(three_minute[0], ("C", T0, D("10"), D("13"), D("9"), D("10"), D("9"), 2, 3))
+        self.assertEqual(three_minute[1][1:7], (T0 + timedelta(minutes=3), D("11"), D("12"), D("11"), D("12"), D("3")))
+        # Within one tick, bars are emitted in ascending timeframe order
+        self.assertEqual([bar[8] for bar in self.bars[-2:]], [1, 3])
+
+    def test_tick_counts_are_emitted_as_decimal_prices(self):
+        agg = ContractBarAggregator("C", [60], self._callback, tick_size=0.125)
+        agg.add_tick(T0, 47878, 1)
+        agg.add_tick(T0 + timedelta(seconds=1), 47879, 2)
+        agg.add_tick(T0 + timedelta(seconds=61), 47870, 1)
+        self.assertEqual(self.bars, [("C", T0, D("5984.750"), D("5984.875"), D("5984.750"), D("5984.875"), D("3"), 2, 1)])
+        self.assertIsInstance(self.bars[0][6], decimal.Decimal)
+
+    def test_late_tick_joins_current_bar(self):
+        agg = ContractBarAggregator("C", [60], self._callback)
+        agg.add_tick(T0 + timedelta(seconds=65), D("10"), 0)
+        agg.add_tick(T0 + timedelta(seconds=50), D("8"), 0)
+        agg.add_tick(T0 + timedelta(seconds=125), D("9"), 0)
+        self.assertEqual(self.bars[0][1:6], (T0 + timedelta(minutes=1), D("10"), D("10"), D("8"), D("8")))
+
+    def test_naive_timestamps_are_utc(self):
+        agg = ContractBarAggregator("C", [60], self._callback)
+        agg.add_tick(T0.replace(tzinfo=None), D("1"), 0)
+        agg.add_tick(T0.replace(tzinfo=None) + timedelta(minutes=1), D("1"), 0)
+        self.assertEqual(self.bars[0][1], T0)
+
+
+class TestBarCloseScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.bars = []
+        self.now = T0.timestamp() + 10
+        self.aggregator = ContractBarAggregator("C", [60, 300], lambda *bar: self.bars.append(bar))
+        self.scheduler = BarCloseScheduler(grace_seconds=2, clock=lambda: self.now)
+        self.scheduler.add(self.aggregator)
+
+    def test_closes_bars_after_grace_without_ticks(self):
+        self.assertEqual(self.scheduler.next_deadline(), T0.timestamp() + 62)
+        self.aggregator.add_tick(T0 + timedelta(seconds=10), D("10"), 1)
+        self.assertEqual(self.scheduler.run_due(T0.timestamp() + 61), 0)  # Within the grace period
+        self.assertEqual(self.scheduler.run_due(T0.timestamp() + 62), 1)
+        self.assertEqual(self.bars[0][1:7], (T0, D("10"), D("10"), D("10"), D("10"), D("1")))
+        # The 5-minute bar is closed at its own boundary even though no tick arrived since
+        self.assertEqual(self.scheduler.run_due(T0.timestamp() + 240), 0)
+        self.assertEqual(self.scheduler.run_due(T0.timestamp() + 302), 1)
+        self.assertEqual(self.bars[1][8], 5)
+        self.assertEqual(self.scheduler.next_deadline(), T0.timestamp() + 362)
+
+    def test_ticks_within_grace_join_the_bar(self):
+        self.aggregator.add_tick(T0 + timedelta(seconds=10), D("10"), 1)
+        self.scheduler.run_due(T0.timestamp() + 61)
+        self.aggregator.add_tick(T0 + timedelta(seconds=59), D("12"), 1)  # Arrives during the grace period
+        self.scheduler.run_due(T0.timestamp() + 62)
+        self.assertEqual(self.bars[0][3], D("12"))
+
+    def test_late_ticks_after_close_go_to_the_open_bar(self):
+        self.aggregator.add_tick(T0 + timedelta(seconds=10), D("10"), 1)
+        self.scheduler.run_due(T0.timestamp() + 62)
+        self.aggregator.add_tick(T0 + timedelta(seconds=50), D("7"), 1)  # Bar 17:00 is already closed
+        self.aggregator.add_tick(T0 + timedelta(seconds=125), D("8"), 1)
+        self.assertEqual(self.aggregator.late_ticks, 1)
+        one_minute = [bar for bar in self.bars if bar[8] == 1]
+        self.assertEqual([bar[1] for bar in one_minute], [T0, T0 + timedelta(minutes=1)])
+        self.assertEqual(one_minute[1][2], D("7"))
+
+    def test_tick_closes_bar_before_timer(self):
+        self.aggregator.add_tick(T0 + timedelta(seconds=10), D("10"), 1)
+        self.aggregator.add_tick(T0 + timedelta(seconds=60), D("11"), 1)
+        self.assertEqual(len(self.bars), 1)
+        self.assertEqual(self.scheduler.run_due(T0.timestamp() + 62), 0)
+        self.assertEqual(self.scheduler.stats()["timer_closed_bars"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
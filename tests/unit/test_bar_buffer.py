@@ -0,0 +1,67 @@
+"""
+Unit tests for the rule engine's fixed-capacity bar ring buffer.
+"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from src.strategy.bar_buffer import BarRingBuffer
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _fill(buffer, count):
+    for k in range(count):
+        buffer.append(T0 + timedelta(minutes=k), o=k, h=k + 1, l=k - 1, c=k + 0.5, v=10 * k)
+
+
+class TestBarRingBuffer(unittest.TestCase):
+
+    def test_append_and_lookup(self):
+        buffer = BarRingBuffer(capacity=10)
+        _fill(buffer, 4)
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(buffer.value('close', -1), 3.5)
+        self.assertEqual(buffer.value('volume', 0), 0.0)
+        self.assertEqual(buffer.timestamp(2), T0 + timedelta(minutes=2))
+        self.assertEqual(buffer.last_timestamp, T0 + timedelta(minutes=3))
+
+    def test_eviction_keeps_newest_bars_in_order(self):
+        buffer = BarRingBuffer(capacity=5)
+        _fill(buffer, 12)
+        self.assertEqual(len(buffer), 5)
+        self.assertEqual(buffer.total_appended, 12)
+        self.assertEqual([buffer.value('open', i) for i in range(5)], [7.0, 8.0, 9.0, 10.0, 11.0])
+        self.assertEqual(list(buffer.to_dataframe()['open']), [7.0, 8.0, 9.0, 10.0, 11.0])
+        self.assertEqual(buffer.index_of_sequence(11), 4)
+        self.assertEqual(buffer.index_of_sequence(3), -1)
+
+    def test_replace_last_clears_flags(self):
+        buffer = BarRingBuffer(capacity=5)
+        _fill(buffer, 3)
+        buffer.set_trend_flags(-1, True, False)
+        buffer.replace_last(T0 + timedelta(minutes=2), o=5, h=6, l=4, c=4.5)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.value('close', -1), 4.5)
+        self.assertFalse(buffer.is_uptrend_start(-1))
+
+    def test_index_at_or_before(self):
+        buffer = BarRingBuffer(capacity=4)
+        _fill(buffer, 6)  # Retains minutes 2..5
+        self.assertEqual(buffer.index_at_or_before(T0 + timedelta(minutes=1)), -1)
+        self.assertEqual(buffer.index_at_or_before(T0 + timedelta(minutes=2)), 0)
+        self.assertEqual(buffer.index_at_or_before(T0 + timedelta(minutes=4, seconds=30)), 2)
+        self.assertEqual(buffer.index_at_or_before(T0 + timedelta(days=1)), 3)
+
+    def test_tail_frame(self):
+        buffer = BarRingBuffer(capacity=8)
+        _fill(buffer, 10)
+        buffer.set_trend_flags(-2, False, True)
+        frame = buffer.tail_frame(3)
+        self.assertEqual(list(frame.columns), ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'uptrendStart', 'downtrendStart'])
+        self.assertEqual(list(frame['open']), [7.0, 8.0, 9.0])
+        self.assertEqual(list(frame['downtrendStart']), [False, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
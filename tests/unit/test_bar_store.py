@@ -0,0 +1,84 @@
+"""
+Unit tests for the columnar BarStore and its BarView rows.
+"""
+
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from trend_analysis.trend_models import Bar
+from trend_analysis import trend_utils
+from trend_analysis.bar_store import BarStore
+from trend_analysis.range_index import RangeExtremumIndex
+from trend_analysis.trend_start_og_fixed import process_trend_logic
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+
+def _signal_key(sig):
+    details = sig['details']
+    return (sig['signal_type'], details['confirmed_signal_bar_index'],
+            details['triggering_bar_index'], details['rule_type'], sig['timestamp'])
+
+
+class TestBarStore(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.csv_path = os.path.join(DATA_DIR, "CON.F.US.MES.M25_4h_ohlc.csv")
+        cls.bars = trend_utils.load_bars_from_alt_csv(cls.csv_path, BarClass=Bar)
+        cls.df = pd.read_csv(cls.csv_path)
+        cls.df['timestamp'] = pd.to_datetime(cls.df['timestamp'], utc=True)
+
+    def test_views_match_bars(self):
+        """Each view carries the same values, index and timestamp as the CSV-loaded Bar."""
+        store = BarStore.from_dataframe(self.df)
+        self.assertEqual(len(store), len(self.bars))
+        for bar, view in zip(self.bars, store):
+            self.assertEqual((view.index, view.o, view.h, view.l, view.c, view.volume),
+                             (bar.index, bar.o, bar.h, bar.l, bar.c, bar.volume))
+            self.assertEqual(view.timestamp, bar.timestamp)
+            self.assertEqual(view.date, bar.date)
+
+    def test_views_are_cached(self):
+        """Rules compare bars by identity, so a position must always return the same view."""
+        store = BarStore.from_dataframe(self.df)
+        self.assertIs(store[5], store[5])
+        self.assertIs(store[-1], store[len(store) - 1])
+        self.assertIs(store[2:4][0], store[2])
+
+    def test_dataframe_columns_are_not_copied(self):
+        """float64 and datetime64[ns] columns are used in place."""
+        df = self.df.copy()
+        df['timestamp'] = df['timestamp'].dt.tz_convert(None).astype('datetime64[ns]')
+        store = BarStore.from_dataframe(df)
+        self.assertTrue(np.shares_memory(store.high, df['high'].to_numpy()))
+        self.assertTrue(np.shares_memory(store.epoch_ns, df['timestamp'].to_numpy()))
+
+    def test_missing_volume_defaults_to_zero(self):
+        store = BarStore.from_dataframe(self.df.drop(columns=['volume']))
+        self.assertEqual(store[0].volume, 0.0)
+
+    def test_missing_column_raises_key_error(self):
+        with self.assertRaises(KeyError):
+            BarStore.from_dataframe(self.df.drop(columns=['high']))
+
+    def test_vectorised_range_index_matches_appends(self):
+        store = BarStore.from_bars(self.bars)
+        appended = RangeExtremumIndex()
+        for bar in self.bars:
+            appended.append(bar.h, bar.l)
+        self.assertEqual(store.range_index._max_high, appended._max_high)
+        self.assertEqual(store.range_index._min_low, appended._min_low)
+
+    def test_signals_match_bar_list(self):
+        """process_trend_logic gives identical signals for a BarStore and a list of Bars."""
+        expected, _ = process_trend_logic(self.bars, "C", "4h")
+        actual, _ = process_trend_logic(BarStore.from_dataframe(self.df), "C", "4h")
+        self.assertEqual([_signal_key(s) for s in actual], [_signal_key(s) for s in expected])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Unit tests for the lazy debug logging path in trend_analysis.trend_utils.
+"""
+
+import os
+import threading
+import unittest
+
+from trend_analysis.trend_models import Bar
+from trend_analysis import trend_utils
+from trend_analysis.trend_start_og_fixed import process_trend_logic
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+
+class TestDebugLogging(unittest.TestCase):
+    """Debug messages are only formatted inside the debug range, and collectors are per run."""
+
+    def test_callable_message_only_invoked_in_range(self):
+        calls = []
+
+        def message():
+            calls.append(1)
+            return "built"
+
+        collector = trend_utils.DebugLogCollector(active=True, start_index=5, end_index=6)
+        with trend_utils.debug_collection(collector):
+            trend_utils.log_debug(4, message)
+            trend_utils.log_debug(5, message)
+            self.assertFalse(trend_utils.debug_enabled(7))
+        self.assertEqual(len(calls), 1)
+        entries = collector.get_and_clear()
+        self.assertEqual([e['message'] for e in entries], ["built"])
+        self.assertEqual(collector.get_and_clear(), [])
+
+    def test_inactive_collector_records_nothing(self):
+        bars = trend_utils.load_bars_from_alt_csv(os.path.join(DATA_DIR, "CON.F.US.MES.M25_1d_ohlc.csv"), BarClass=Bar)
+        _, logs = process_trend_logic(bars, debug_collector=trend_utils.DebugLogCollector(active=False))
+        self.assertEqual(logs, [])
+
+    def test_concurrent_runs_do_not_interleave(self):
+        bars = trend_utils.load_bars_from_alt_csv(os.path.join(DATA_DIR, "CON.F.US.MES.M25_4h_ohlc.csv"), BarClass=Bar)
+        ranges = {"a": (10, 40), "b": (200, 230)}
+        results = {}
+
+        def run(name):
+            start, end = ranges[name]
+            collector = trend_utils.DebugLogCollector(active=True, start_index=start, end_index=end)
+            _, logs = process_trend_logic(bars, debug_collector=collector)
+            results[name] = logs
+
+        threads = [threading.Thread(target=run, args=(name,)) for name in ranges]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for name, (start, end) in ranges.items():
+            self.assertTrue(results[name])
+            self.assertTrue(all(start <= e['processing_bar_index'] <= end for e in results[name]))
+        self.assertEqual(trend_utils.get_and_clear_debug_logs(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+"""
+Unit tests for the broadcaster's per-client fan-out (coalescing, batching, backpressure,
+topic subscriptions and snapshots).
+"""
+
+import asyncio
+import json
+import unittest
+
+from src.services.fanout import BarRing, FanoutHub, parse_timeframe_label, payload_header
+
+
+def _tick_batch(contract_id, price):
+    return json.dumps({"type": "tick_batch", "contract_id": contract_id, "ticks": [{"price": price}]})
+
+def _ohlc(contract_id, close, minute=0, timeframe_value=1):
+    return json.dumps({"type": "ohlc", "contract_id": contract_id, "timestamp": f"2025-05-19T17:{minute:02d}:00+00:00",
+                       "close": close, "timeframe_unit": 2, "timeframe_value": timeframe_value})
+
+def _subscribe(*topics, action="subscribe", **extra):
+    return json.dumps({"action": action, "topics": list(topics), **extra})
+
+
+class FakeWebSocket:
+    def __init__(self, send_delay=0.0):
+        self.send_delay = send_delay
+        self.frames = []
+        self.close_code = None
+        self.remote_address = ('127.0.0.1', 0)
+        self.inbound = asyncio.Queue()
+
+    async def send(self, frame):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.frames.append(frame)
+
+    async def close(self, code=1000, reason=''):
+        self.close_code = code
+        self.inbound.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.inbound.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    def messages(self):
+        decoded = []
+        for frame in self.frames:
+            parsed = json.loads(frame)
+            decoded.extend(parsed if isinstance(parsed, list) else [parsed])
+        return decoded
+
+
+class TestPayloadHeader(unittest.TestCase):
+
+    def test_reads_ingester_prefix_and_falls_back_to_json(self):
+        self.assertEqual(payload_header(_tick_batch("C", 1)), ("tick_batch", "C"))
+        self.assertEqual(payload_header('{"contract_id": "C", "type": "ohlc"}'), ("ohlc", "C"))
+        for bad in ('not json', '[1, 2]'):
+            with self.assertRaises(ValueError):
+                payload_header(bad)
+
+
+class TestFanoutHub(unittest.IsolatedAsyncioTestCase):
+
+    async def test_pending_messages_go_out_as_one_frame_with_latest_tick_per_contract(self):
+        hub = FanoutHub(flush_interval=0.01)
+        ws = FakeWebSocket()
+        channel = hub.add_client(ws)
+        for price in (1, 2, 3):
+            hub.publish(_tick_batch("A", price))
+        hub.publish(_ohlc("A", 10))
+        hub.publish(_tick_batch("B", 7))
+        hub.publish(_tick_batch("A", 4))
+        self.assertFalse(hub.publish('not json'))
+        self.assertEqual(channel.queue_depth, 3)
+
+        sender = asyncio.ensure_future(channel.run())
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(ws.frames), 1)
+        # The superseded A ticks are gone and the newest A tick is queued after the bar
+        self.assertEqual([(m['type'], m.get('close'), m.get('ticks')) for m in ws.messages()],
+                         [('ohlc', 10, None), ('tick_batch', None, [{'price': 7}]), ('tick_batch', None, [{'price': 4}])])
+
+        hub.publish(_ohlc("A", 11))
+        await asyncio.sleep(0.05)
+        self.assertEqual(json.loads(ws.frames[-1])['close'], 11)
+
+        metrics = hub.metrics()
+        self.assertEqual((metrics['published'], metrics['delivered_messages'], metrics['frames']), (7, 4, 2))
+        self.assertEqual(metrics['dropped_superseded_ticks'], 3)
+        self.assertEqual(metrics['queue_depth_total'], 0)
+        self.assertIsNotNone(metrics['fanout_latency_avg_ms'])
+        hub.remove_client(channel)
+        await asyncio.wait_for(sender, 1)
+
+    async def test_full_queue_disconnects_the_client(self):
+        hub = FanoutHub(flush_interval=0.01, max_queue_size=3)
+        ws = FakeWebSocket()
+        channel = hub.add_client(ws)
+        for close in range(4):
+            hub.publish(_ohlc("A", close))
+        await asyncio.sleep(0)
+        self.assertTrue(channel.closed)
+        self.assertEqual(ws.close_code, 1013)
+        self.assertEqual(hub.metrics()['slow_client_disconnects'], 1)
+
+    async def test_lagging_client_is_disconnected_without_holding_up_others(self):
+        now = [0.0]
+        hub = FanoutHub(flush_interval=0.0, max_lag_seconds=5, clock=lambda: now[0])
+        slow, fast = FakeWebSocket(send_delay=10), FakeWebSocket()
+        slow_task = asyncio.ensure_future(hub.serve_client(slow))
+        fast_task = asyncio.ensure_future(hub.serve_client(fast))
+        await asyncio.sleep(0)
+
+        hub.publish(_ohlc("A", 1))
+        await asyncio.sleep(0.01) # The slow client is now stuck in send()
+        now[0] = 1.0
+        hub.publish(_ohlc("A", 2))
+        await asyncio.sleep(0.01)
+        now[0] = 7.0
+        hub.publish(_ohlc("A", 3))
+        await asyncio.sleep(0.01)
+
+        self.assertEqual([m['close'] for m in fast.messages()], [1, 2, 3])
+        self.assertEqual(slow.close_code, 1013)
+        await asyncio.wait_for(slow_task, 1)
+        self.assertEqual(len(hub.channels), 1)
+        await fast.close()
+        await asyncio.wait_for(fast_task, 1)
+        self.assertEqual(len(hub.channels), 0)
+
+
+class TestTopicSubscriptions(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.loaded = []
+        self.hub = FanoutHub(flush_interval=0.0, snapshot_size=3, snapshot_loader=self._loader)
+        self.ws = FakeWebSocket()
+        self.client = asyncio.ensure_future(self.hub.serve_client(self.ws))
+        await asyncio.sleep(0)
+
+    async def asyncTearDown(self):
+        await self.ws.close()
+        await asyncio.wait_for(self.client, 1)
+
+    async def _loader(self, topic, limit):
+        self.loaded.append((topic, limit))
+        payloads = [_ohlc("A", close, minute) for minute, close in ((0, 100), (1, 101), (2, 102))]
+        return [(json.loads(p)['timestamp'], p) for p in payloads]
+
+    async def _send(self, message):
+        self.ws.inbound.put_nowait(message)
+        await asyncio.sleep(0.01)
+
+    def test_timeframe_labels(self):
+        self.assertEqual(parse_timeframe_label("5m"), (2, 5))
+        self.assertEqual(parse_timeframe_label("4h"), (3, 4))
+        for bad in ("5", "m", "0m", "5x", None):
+            with self.assertRaises(ValueError):
+                parse_timeframe_label(bad)
+
+    async def test_payloads_only_reach_subscribers_of_their_topic(self):
+        await self._send(_subscribe({"type": "ohlc", "contract_id": "A", "timeframe": "1m"},
+                                    {"type": "tick", "contract_id": "A"}, snapshot=0))
+        self.hub.publish(_ohlc("A", 1))
+        self.hub.publish(_ohlc("A", 2, timeframe_value=5))
+        self.hub.publish(_ohlc("B", 3))
+        self.hub.publish(_tick_batch("A", 4))
+        self.hub.publish(_tick_batch("B", 5))
+        await asyncio.sleep(0.01)
+        self.assertEqual([(m['type'], m['contract_id']) for m in self.ws.messages()], [('ohlc', 'A'), ('tick_batch', 'A')])
+        self.assertEqual(self.ws.messages()[0]['close'], 1)
+
+        await self._send(_subscribe({"type": "tick", "contract_id": "A"}, action="unsubscribe"))
+        self.hub.publish(_tick_batch("A", 6))
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(self.ws.messages()), 2)
+        self.assertEqual(set(self.hub.subscribers), {('ohlc', 'A', '1m')})
+
+    async def test_snapshot_merges_loaded_and_live_bars(self):
+        self.hub.publish(_ohlc("A", 202, minute=2)) # Newer version of a stored bar, already live
+        self.hub.publish(_ohlc("A", 203, minute=3))
+        await self._send(_subscribe({"type": "ohlc", "contract_id": "A", "timeframe": "1m"}))
+        snapshot = self.ws.messages()[-1] # After the two live bars sent before the client subscribed
+        self.assertEqual((snapshot['type'], snapshot['contract_id'], snapshot['timeframe']), ('snapshot', 'A', '1m'))
+        self.assertEqual([bar['close'] for bar in snapshot['bars']], [101, 202, 203])
+
+        # The ring buffer is loaded once per topic; later snapshots honour the requested size
+        second = FakeWebSocket()
+        second_client = asyncio.ensure_future(self.hub.serve_client(second))
+        await asyncio.sleep(0)
+        second.inbound.put_nowait(_subscribe({"type": "ohlc", "contract_id": "A", "timeframe": "1m"}, snapshot=1))
+        await asyncio.sleep(0.01)
+        self.assertEqual([bar['close'] for bar in second.messages()[0]['bars']], [203])
+        self.assertEqual(self.loaded, [(('ohlc', 'A', '1m'), 3)])
+        await second.close()
+        await asyncio.wait_for(second_client, 1)
+
+    async def test_invalid_requests_get_an_error_message(self):
+        for bad in ('not json', _subscribe({"type": "ohlc", "contract_id": "A"}),
+                    _subscribe({"type": "quotes", "contract_id": "A"}), json.dumps({"action": "list"})):
+            await self._send(bad)
+        self.assertEqual([m['type'] for m in self.ws.messages()], ['error'] * 4)
+        self.assertEqual(self.hub.subscribers, {})
+
+    def test_bar_ring_keeps_newest_bars_in_order(self):
+        ring = BarRing(2)
+        for timestamp, payload in (("t1", "a"), ("t2", "b"), ("t2", "b2"), ("t1", "late"), ("t3", "c")):
+            ring.append(timestamp, payload)
+        self.assertEqual(ring.payloads(5), ["b2", "c"])
+        self.assertEqual(ring.payloads(0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
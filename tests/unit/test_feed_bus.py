@@ -0,0 +1,72 @@
+"""
+Unit tests for the broadcaster's feed process -> worker pub/sub over a Unix socket.
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+from src.services.feed_bus import FeedPublisher, subscribe_feed
+
+
+class TestFeedBus(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'feed.sock')
+        self.publisher = FeedPublisher(self.path)
+        await self.publisher.start()
+
+    async def asyncTearDown(self):
+        await self.publisher.close()
+
+    async def _subscriber(self, received):
+        task = asyncio.ensure_future(subscribe_feed(self.path, lambda payload, at: received.append((payload, at)),
+                                                    retry_seconds=0.01))
+        while self.publisher.subscriber_count < 1:
+            await asyncio.sleep(0.01)
+        return task
+
+    async def test_every_subscriber_gets_every_payload_in_order(self):
+        first, second = [], []
+        tasks = [await self._subscriber(first)]
+        tasks.append(asyncio.ensure_future(subscribe_feed(self.path, lambda p, at: second.append((p, at)))))
+        while self.publisher.subscriber_count < 2:
+            await asyncio.sleep(0.01)
+        payloads = ['{"type": "tick_batch", "contract_id": "C", "n": %d}' % n for n in range(100)] + ['{"é": "ü"}']
+        for n, payload in enumerate(payloads):
+            self.publisher.publish(payload, received_at=float(n))
+        await asyncio.sleep(0.05)
+        self.assertEqual(first, [(payload, float(n)) for n, payload in enumerate(payloads)])
+        self.assertEqual(second, first)
+        for task in tasks:
+            task.cancel()
+
+    async def test_subscriber_reconnects_after_the_publisher_restarts(self):
+        received = []
+        task = await self._subscriber(received)
+        await self.publisher.close()
+        self.publisher = FeedPublisher(self.path)
+        await self.publisher.start()
+        while self.publisher.subscriber_count < 1:
+            await asyncio.sleep(0.01)
+        self.publisher.publish('{"type": "ohlc"}', received_at=1.0)
+        await asyncio.sleep(0.05)
+        self.assertEqual(received, [('{"type": "ohlc"}', 1.0)])
+        task.cancel()
+
+    async def test_lagging_subscriber_is_dropped(self):
+        self.publisher.max_subscriber_buffer = 0
+        reader, writer = await asyncio.open_unix_connection(self.path) # Never reads
+        while self.publisher.subscriber_count < 1:
+            await asyncio.sleep(0.01)
+        writer.transport.pause_reading()
+        for _ in range(2000):
+            self.publisher.publish('x' * 1000)
+        self.assertEqual(self.publisher.stats()['dropped_subscribers'], 1)
+        self.assertEqual(self.publisher.subscriber_count, 0)
+        writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
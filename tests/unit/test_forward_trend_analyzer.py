@@ -0,0 +1,88 @@
+"""
+Unit tests for the resident (bar-at-a-time) ForwardTrendAnalyzer.
+"""
+
+import json
+import os
+import unittest
+
+from trend_analysis.trend_models import Bar
+from trend_analysis import trend_utils
+from trend_analysis.trend_start_og_fixed import process_trend_logic
+from trend_analysis.trend_start_forward_test import ForwardTrendAnalyzer
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+
+def _signal_key(sig):
+    details = sig['details']
+    return (sig['signal_type'], details['confirmed_signal_bar_index'],
+            details['triggering_bar_index'], details['rule_type'], sig['timestamp'])
+
+
+class TestForwardTrendAnalyzer(unittest.TestCase):
+    """Streaming results must match a batch process_trend_logic run over the same bars."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bars_by_tf = {
+            tf: trend_utils.load_bars_from_alt_csv(
+                os.path.join(DATA_DIR, f"CON.F.US.MES.M25_{tf}_ohlc.csv"), BarClass=Bar)
+            for tf in ("1d", "4h", "1h")
+        }
+
+    def test_streaming_matches_batch(self):
+        """All signals emitted bar by bar equal the batch result."""
+        for tf, bars in self.bars_by_tf.items():
+            with self.subTest(timeframe=tf):
+                batch_signals, _ = process_trend_logic(bars, "C", tf)
+                analyzer = ForwardTrendAnalyzer("C", tf)
+                for bar in bars:
+                    analyzer.process_new_bar(bar)
+                self.assertEqual([_signal_key(s) for s in analyzer.get_all_signals()],
+                                 [_signal_key(s) for s in batch_signals])
+
+    def test_only_new_signals_are_emitted(self):
+        """No (confirmed bar, signal type) pair is emitted twice."""
+        analyzer = ForwardTrendAnalyzer("C", "1h")
+        emitted = []
+        for bar in self.bars_by_tf["1h"]:
+            for sig in analyzer.process_new_bar(bar):
+                self.assertEqual(sig['details']['triggering_bar_index'], bar.index)
+                emitted.append((sig['details']['confirmed_signal_bar_index'], sig['signal_type']))
+        self.assertEqual(len(emitted), len(set(emitted)))
+
+    def test_checkpoint_round_trip(self):
+        """An analyzer restored mid-stream continues exactly like an uninterrupted one."""
+        bars = self.bars_by_tf["4h"]
+        split = len(bars) // 2
+
+        uninterrupted = ForwardTrendAnalyzer("C", "4h")
+        for bar in bars:
+            uninterrupted.process_new_bar(bar)
+
+        first_half = ForwardTrendAnalyzer("C", "4h")
+        signals = []
+        for bar in bars[:split]:
+            signals.extend(first_half.process_new_bar(bar))
+        checkpoint = json.loads(json.dumps(first_half.to_checkpoint()))
+
+        restored = ForwardTrendAnalyzer.from_checkpoint(checkpoint)
+        self.assertEqual(restored.current_bar_index, split)
+        for bar in bars[split:]:
+            signals.extend(restored.process_new_bar(restored.make_next_bar(bar.timestamp, bar.o, bar.h, bar.l, bar.c, bar.volume)))
+
+        self.assertEqual(sorted(_signal_key(s) for s in signals),
+                         sorted(_signal_key(s) for s in uninterrupted.get_all_signals()))
+
+    def test_out_of_sequence_bar_rejected(self):
+        """Bars must be fed with consecutive 1-based indices."""
+        analyzer = ForwardTrendAnalyzer("C", "1d")
+        bars = self.bars_by_tf["1d"]
+        analyzer.process_new_bar(bars[0])
+        with self.assertRaises(ValueError):
+            analyzer.process_new_bar(bars[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
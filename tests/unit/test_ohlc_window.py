@@ -0,0 +1,123 @@
+"""
+Unit tests for the analyzer's resident OHLC window cache.
+"""
+
+import datetime
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.ohlc_window import OHLCWindow, OHLCWindowCache
+
+UTC = datetime.timezone.utc
+T0 = datetime.datetime(2025, 5, 19, 17, 0, tzinfo=UTC)
+STEP = datetime.timedelta(minutes=5)
+
+
+def _bar(n):
+    price = 100.0 + n
+    return {"timestamp": T0 + n * STEP, "open": price, "high": price + 2, "low": price - 1, "close": price + 1, "volume": n}
+
+
+class FakeBars:
+    """Stored bars of one contract/timeframe, served like the analyzer's fetch functions."""
+
+    def __init__(self, count):
+        self.bars = [_bar(n) for n in range(count)]
+        self.queries = []
+
+    def frame(self, bars):
+        df = pd.DataFrame(bars, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        return df
+
+    async def fetch_window(self, contract_id, unit, value, end_timestamp, bar_count):
+        self.queries.append("window")
+        return self.frame([b for b in self.bars if b["timestamp"] <= end_timestamp][-bar_count:])
+
+    async def fetch_since(self, contract_id, unit, value, after_timestamp):
+        self.queries.append("since")
+        return self.frame([b for b in self.bars if b["timestamp"] > after_timestamp])
+
+    def store(self, n):
+        bar = _bar(n)
+        self.bars = sorted(self.bars + [bar], key=lambda b: b["timestamp"])
+        return bar
+
+
+class TestOHLCWindow(unittest.TestCase):
+
+    def test_appends_evict_the_oldest_bars_and_frames_match_the_bars(self):
+        window = OHLCWindow(capacity=4, step_seconds=300)
+        window.load(FakeBars(2).frame([_bar(0), _bar(1)]), complete=True)
+        for n in range(2, 11):
+            window.append(window.last_timestamp_ns + window.step_ns, _bar(n))
+        self.assertEqual(len(window), 4)
+        self.assertFalse(window.complete)
+        frame = window.frame(int(pd.Timestamp(_bar(9)["timestamp"]).value), 3)
+        self.assertEqual(list(frame.columns), ['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(list(frame['timestamp']), [_bar(n)["timestamp"] for n in (7, 8, 9)])
+        self.assertEqual(list(frame['close']), [108.0, 109.0, 110.0])
+        self.assertIsNone(window.frame(int(pd.Timestamp(_bar(9)["timestamp"]).value), 4)) # Bar 6 was evicted
+
+    def test_short_history_is_served_only_when_complete(self):
+        window = OHLCWindow(capacity=10, step_seconds=300)
+        window.load(FakeBars(3).frame([_bar(0), _bar(1), _bar(2)]), complete=True)
+        self.assertEqual(len(window.frame(int(pd.Timestamp(_bar(5)["timestamp"]).value), 200)), 3)
+        window.complete = False
+        self.assertIsNone(window.frame(int(pd.Timestamp(_bar(5)["timestamp"]).value), 200))
+
+
+class TestOHLCWindowCache(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.db = FakeBars(30)
+        self.cache = OHLCWindowCache(self.db.fetch_window, self.db.fetch_since, capacity=20)
+        await self.cache.seed("C", 2, 5, _bar(29)["timestamp"])
+
+    async def _notify(self, n):
+        bar = self.db.store(n)
+        await self.cache.ingest("C", 2, 5, bar["timestamp"], bar)
+
+    async def _assert_matches_db(self, n, bar_count=10):
+        frame = self.cache.window("C", 2, 5, _bar(n)["timestamp"], bar_count)
+        expected = await self.db.fetch_window("C", 2, 5, _bar(n)["timestamp"], bar_count)
+        self.assertIsNotNone(frame)
+        self.assertTrue(np.array_equal(frame['timestamp'].to_numpy(), expected['timestamp'].to_numpy()))
+        self.assertTrue(np.array_equal(frame[['open', 'high', 'low', 'close', 'volume']].to_numpy(),
+                                       expected[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=float)))
+
+    async def test_contiguous_bars_are_appended_without_queries(self):
+        for n in range(30, 60):
+            await self._notify(n)
+            await self._assert_matches_db(n)
+        self.assertEqual(self.db.queries.count("window"), 1 + 30) # Seed, plus the expected results above
+        self.assertEqual(self.cache.stats()["db_queries"], 1)
+        self.assertEqual(self.cache.stats()["appended_bars"], 30)
+        self.assertEqual(self.cache.stats()["windows_served"], 30)
+
+    async def test_gaps_are_filled_and_out_of_order_bars_resync(self):
+        self.db.store(30) # Its NOTIFY was missed
+        await self._notify(31)
+        self.assertEqual(self.db.queries[-1], "since")
+        await self._assert_matches_db(31)
+        await self.cache.ingest("C", 2, 5, _bar(30)["timestamp"], _bar(30)) # Late duplicate: already held
+        await self._notify(40) # Session break; the fill just returns the bar
+        await self._assert_matches_db(40)
+        self.db.bars = [b for b in self.db.bars if b["timestamp"] != _bar(35)["timestamp"]] + [_bar(35)]
+        await self.cache.ingest("C", 2, 5, _bar(35)["timestamp"], _bar(35)) # Older and unknown: re-seed
+        await self._assert_matches_db(40)
+        stats = self.cache.stats()
+        self.assertEqual((stats["gap_fills"], stats["duplicate_bars"], stats["resyncs"]), (2, 1, 1))
+
+    async def test_unknown_windows_and_failed_fills_fall_back_to_the_database(self):
+        self.assertIsNone(self.cache.window("D", 2, 5, _bar(29)["timestamp"], 10))
+        self.db.bars = [] # The fill query "fails"
+        await self.cache.ingest("C", 2, 5, _bar(31)["timestamp"], _bar(31))
+        self.assertIsNone(self.cache.window("C", 2, 5, _bar(29)["timestamp"], 10))
+        self.assertEqual(self.cache.stats()["windows_missed"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Unit tests for the sparse-table range extremum index.
+"""
+
+import random
+import unittest
+from datetime import datetime, timezone
+
+from trend_analysis.trend_models import Bar
+from trend_analysis import trend_utils
+from trend_analysis.range_index import RangeExtremumIndex, BarSeries
+
+
+def _make_bars(count, seed=7):
+    rng = random.Random(seed)
+    ts = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    bars = []
+    for i in range(count):
+        # Coarse prices so ties are common
+        low = rng.randint(0, 20)
+        high = low + rng.randint(0, 5)
+        bars.append(Bar(timestamp=ts, o=low, h=high, l=low, c=high, volume=0, index=i + 1))
+    return bars
+
+
+class TestRangeExtremumIndex(unittest.TestCase):
+    """Range queries must agree with max()/min() over the same slice, including tie-breaking."""
+
+    def test_queries_match_brute_force_while_growing(self):
+        bars = _make_bars(70)
+        index = RangeExtremumIndex()
+        for n, bar in enumerate(bars, start=1):
+            index.append(bar.h, bar.l)
+            for first in range(n):
+                for last in range(first, n):
+                    window = bars[first:last + 1]
+                    self.assertIs(bars[index.argmax_high(first, last)], max(window, key=lambda b: b.h))
+                    self.assertIs(bars[index.argmin_low(first, last)], min(window, key=lambda b: b.l))
+
+    def test_helpers_agree_for_list_and_bar_series(self):
+        bars = _make_bars(40)
+        series = BarSeries(bars)
+        for first in range(-1, 43):
+            for last in range(first - 1, 43):
+                self.assertIs(trend_utils.range_max_high_bar(series, first, last),
+                              trend_utils.range_max_high_bar(bars, first, last))
+                self.assertIs(trend_utils.range_min_low_bar(series, first, last),
+                              trend_utils.range_min_low_bar(bars, first, last))
+                self.assertIs(trend_utils.first_bar_with_low_below(series, first, last, 5),
+                              next((b for b in bars[max(first - 1, 0):max(last, 0)] if b.l < 5), None))
+
+
+if __name__ == '__main__':
+    unittest.main()
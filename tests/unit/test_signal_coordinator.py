@@ -0,0 +1,109 @@
+"""
+Unit tests for the SignalCoordinator's LISTEN mode (notifications plus watermark catch-up).
+"""
+
+import asyncio
+import datetime
+import json
+import unittest
+
+from src.coordination.coordinator_service import SignalCoordinator, signal_from_notification
+
+UTC = datetime.timezone.utc
+T0 = datetime.datetime(2025, 5, 19, 17, 0, tzinfo=UTC)
+
+
+class FakeConfig:
+    def __init__(self, **coordination):
+        self.coordination = {"coordinator_id": "test", "db_fetch_limit": 2, "watermark_flush_seconds": 0.05, **coordination}
+
+    def get_coordination_config(self):
+        return self.coordination
+
+
+class FakePool:
+    """Just the queries the coordinator runs: the watermark row and detected_signals by signal_id."""
+
+    def __init__(self, signals, watermark=None):
+        self.signals = signals
+        self.watermark = watermark
+        self.watermark_writes = []
+
+    async def fetchval(self, query, coordinator_id):
+        return self.watermark
+
+    async def execute(self, query, coordinator_id, signal_id):
+        self.watermark = signal_id
+        self.watermark_writes.append(signal_id)
+
+    async def fetch(self, query, *params):
+        after, limit = (params[0], params[1]) if len(params) == 2 else (0, params[0])
+        return [s for s in self.signals if s["signal_id"] > after][:limit]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+
+def _signal(signal_id, minutes=0, timeframe="1h"):
+    return {"signal_id": signal_id, "timestamp": T0 + datetime.timedelta(minutes=minutes), "contract_id": "C",
+            "timeframe": timeframe, "signal_type": "uptrend_start", "signal_price": 100.0,
+            "analyzer_id": "a", "trigger_timestamp": datetime.datetime.now(UTC)}
+
+
+def _notification(signal):
+    return json.dumps({**signal, "timestamp": signal["timestamp"].isoformat(),
+                       "trigger_timestamp": signal["trigger_timestamp"].isoformat()})
+
+
+class TestListenMode(unittest.IsolatedAsyncioTestCase):
+
+    def _coordinator(self, pool):
+        coordinator = SignalCoordinator(FakeConfig(), pool)
+        self.processed = []
+
+        async def record(signals):
+            self.processed.append([s["signal_id"] for s in signals])
+        coordinator.process_signals = record
+        return coordinator
+
+    def test_notification_payload_is_parsed_like_a_fetched_row(self):
+        signal = _signal(7)
+        self.assertEqual(signal_from_notification(_notification(signal)), signal)
+        self.assertIsNone(signal_from_notification('{"signal_type": "x"}'))
+        self.assertIsNone(signal_from_notification('not json'))
+
+    async def test_catch_up_from_watermark_then_notifications(self):
+        pool = FakePool([_signal(i) for i in range(1, 6)], watermark=2)
+        coordinator = self._coordinator(pool)
+        await coordinator.catch_up()
+        self.assertEqual(self.processed, [[3, 4], [5]])
+        self.assertEqual(pool.watermark_writes, [5])
+
+        shutdown, conn = asyncio.Event(), FakeConnection()
+        consumer = asyncio.ensure_future(coordinator._consume_notifications(conn, shutdown))
+        coordinator._on_notification(None, 0, "signal_inserted", _notification(_signal(5))) # Already caught up
+        coordinator._on_notification(None, 0, "signal_inserted", _notification(_signal(7)))
+        coordinator._on_notification(None, 0, "signal_inserted", _notification(_signal(6)))
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.processed[-1], [6, 7])
+        self.assertLess(coordinator.max_latency_seconds, 1.0)
+        await asyncio.sleep(0.1) # Watermark is written on the flush interval, not per signal
+        self.assertEqual(pool.watermark_writes, [5, 7])
+        shutdown.set()
+        await asyncio.wait_for(consumer, 1)
+
+    async def test_catch_up_without_watermark_starts_from_the_oldest_signal(self):
+        pool = FakePool([_signal(i) for i in range(1, 4)])
+        coordinator = self._coordinator(pool)
+        await coordinator.catch_up()
+        self.assertEqual(sum(self.processed, []), [1, 2, 3])
+        self.assertEqual(pool.watermark, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
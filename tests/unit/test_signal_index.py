@@ -0,0 +1,105 @@
+"""
+Unit tests for the coordinator's time-indexed signal cache and compiled rules.
+"""
+
+import asyncio
+import datetime
+import unittest
+
+from src.coordination.coordinator_service import SignalCoordinator
+from src.coordination.signal_index import SignalCache, SignalTimeIndex, compile_rules
+
+UTC = datetime.timezone.utc
+T0 = datetime.datetime(2025, 5, 19, 17, 0, tzinfo=UTC)
+
+
+def _at(minutes):
+    return T0 + datetime.timedelta(minutes=minutes)
+
+def _signal(signal_id, minutes, timeframe="15m", signal_type="up", contract_id="C"):
+    return {"signal_id": signal_id, "timestamp": _at(minutes), "contract_id": contract_id,
+            "timeframe": timeframe, "signal_type": signal_type, "signal_price": 1.0}
+
+
+class TestSignalTimeIndex(unittest.TestCase):
+
+    def test_window_is_inclusive_and_ordered_with_out_of_order_adds(self):
+        index = SignalTimeIndex()
+        for signal_id, minutes in ((1, 0), (2, 10), (3, 5), (4, 10), (5, 20)):
+            index.add({"signal_id": signal_id, "timestamp": _at(minutes)})
+        self.assertEqual([e["signal_id"] for e in index.window(_at(5), _at(10))], [3, 2, 4])
+        self.assertEqual(index.window(_at(11), _at(19)), [])
+
+    def test_prune_drops_oldest_and_compacts(self):
+        index = SignalTimeIndex()
+        for minutes in range(10):
+            index.add({"signal_id": minutes, "timestamp": _at(minutes)})
+        self.assertEqual([e["signal_id"] for e in index.prune_before(_at(3))], [0, 1, 2])
+        self.assertEqual(len(index), 7)
+        index.prune_before(_at(8))
+        self.assertEqual(len(index._entries), 2) # Compacted once most of the list was dead
+        self.assertEqual([e["signal_id"] for e in index.window(_at(0), _at(100))], [8, 9])
+        index.add({"signal_id": 10, "timestamp": _at(7)})
+        self.assertEqual([e["signal_id"] for e in index.window(_at(0), _at(100))], [10, 8, 9])
+
+
+class TestSignalCache(unittest.TestCase):
+
+    def test_keys_by_type_dedupes_ids_and_prunes_lookup(self):
+        cache = SignalCache()
+        first = cache.add(_signal(1, 0))
+        self.assertIs(cache.add(_signal(1, 0)), first)
+        cache.add(_signal(2, 1, signal_type="down"))
+        cache.add({**_signal(3, 2), "timestamp": "2025-05-19T17:02:00"}) # Naive ISO string -> UTC
+        self.assertIsNone(cache.add({**_signal(4, 0), "timestamp": "yesterday"}))
+        self.assertEqual([e["signal_id"] for e in cache.window("C", "15m", "up", _at(0), _at(5))], [1, 3])
+        self.assertEqual(cache.prune_before(_at(2)), 2)
+        self.assertNotIn(1, cache)
+        self.assertEqual(len(cache), 1)
+
+    def test_compile_rules_groups_enabled_rules_by_primary_timeframe(self):
+        rules = compile_rules([
+            {"rule_name": "a", "enabled": True, "contract_id": "ALL", "primary_timeframe": "1h",
+             "confirming_timeframe": "15m", "signal_type_match": "any_matching_trend"},
+            {"rule_name": "b", "enabled": False, "primary_timeframe": "1h"},
+            {"rule_name": "c", "enabled": True, "contract_id": "X", "primary_timeframe": "15m",
+             "confirming_timeframe": "5m", "signal_type_match": "down", "min_time_offset_minutes": -5},
+        ])
+        self.assertEqual({tf: [r.name for r in group] for tf, group in rules.items()}, {"1h": ["a"], "15m": ["c"]})
+        self.assertEqual(rules["1h"][0].confirming_type("up"), "up")
+        self.assertEqual(rules["15m"][0].confirming_type("up"), "down")
+        self.assertEqual(rules["15m"][0].min_offset, datetime.timedelta(minutes=-5))
+        self.assertEqual(rules["1h"][0].max_offset, datetime.timedelta(minutes=60))
+        self.assertFalse(rules["15m"][0].applies_to("C"))
+
+
+class FakeConfig:
+    def __init__(self, rules):
+        self.rules = rules
+
+    def get_coordination_config(self):
+        return {"rules": self.rules}
+
+
+class TestCoordinatorMatching(unittest.TestCase):
+
+    def test_process_signals_matches_within_offset_window(self):
+        coordinator = SignalCoordinator(FakeConfig([
+            {"rule_name": "confluence", "enabled": True, "contract_id": "ALL", "primary_timeframe": "1h",
+             "confirming_timeframe": "15m", "min_time_offset_minutes": -10, "max_time_offset_minutes": 10,
+             "signal_type_match": "any_matching_trend"},
+        ]), None)
+        now = datetime.datetime.now(UTC).replace(microsecond=0)
+        offset = lambda signal, minutes: {**signal, "timestamp": now + datetime.timedelta(minutes=minutes)}
+        confirming = [offset(_signal(1, 0), -11), offset(_signal(2, 0), -10), offset(_signal(3, 0), 5),
+                      offset(_signal(4, 0, signal_type="down"), 0), offset(_signal(5, 0, contract_id="D"), 0)]
+        primary = offset(_signal(6, 0, timeframe="1h"), 0)
+        matches = asyncio.run(coordinator.process_signals(confirming + [primary]))
+        self.assertEqual(len(matches), 2)
+        self.assertIn("Confirming: ID 2 ", matches[0])
+        self.assertIn("Time Diff: -10.00 mins", matches[0])
+        self.assertIn("Confirming: ID 3 ", matches[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+Unit tests for the analyzer's batched signal sink pipeline.
+"""
+
+import asyncio
+import csv
+import datetime
+import os
+import tempfile
+import unittest
+
+from src.analysis.signal_sinks import SIGNAL_COLUMNS, CSVSignalSink, SignalSink, SignalSinkPipeline
+
+UTC = datetime.timezone.utc
+T0 = datetime.datetime(2025, 5, 19, 17, 0, tzinfo=UTC)
+
+
+def _row(n, analyzer_id="a1"):
+    ts = T0 + datetime.timedelta(minutes=5 * n)
+    return (analyzer_id, ts, ts, "CON.F.US.MES.M25", "5m", "uptrend_start", 100.0 + n,
+            100.0, 101.0, 99.0, 100.5, 10.0, "{}")
+
+
+class RecordingSink(SignalSink):
+    name = 'recording'
+
+    def __init__(self, fail=False, delay=0.0):
+        self.batches = []
+        self.fail = fail
+        self.delay = delay
+
+    async def write(self, rows):
+        await asyncio.sleep(self.delay)
+        self.batches.append(list(rows))
+        return 0 if self.fail else len(rows)
+
+
+class TestSignalSinkPipeline(unittest.TestCase):
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_concurrent_submissions_share_a_batch(self):
+        sink = RecordingSink(delay=0.01)
+
+        async def scenario():
+            pipeline = SignalSinkPipeline([sink], flush_interval=60)
+            pipeline.start()
+            # The first submission occupies the writer; the next three queue up behind it
+            results = await asyncio.gather(*(pipeline.submit([_row(n)]) for n in range(4)))
+            await pipeline.close()
+            return results, pipeline.stats()
+
+        results, stats = self.run_async(scenario())
+        self.assertEqual(results, [1, 1, 1, 1])
+        self.assertEqual([len(b) for b in sink.batches], [1, 3])
+        self.assertEqual(stats['rows_stored'], 4)
+        self.assertEqual(stats['queued_rows'], 0)
+
+    def test_batches_are_capped_at_max_batch_rows(self):
+        sink = RecordingSink(delay=0.01)
+
+        async def scenario():
+            pipeline = SignalSinkPipeline([sink], flush_interval=60, max_batch_rows=2)
+            pipeline.start()
+            await asyncio.gather(*(pipeline.submit([_row(n)]) for n in range(5)))
+            await pipeline.close()
+
+        self.run_async(scenario())
+        self.assertEqual([len(b) for b in sink.batches], [1, 2, 2])
+        self.assertEqual([row[6] for batch in sink.batches for row in batch], [100.0, 101.0, 102.0, 103.0, 104.0])
+
+    def test_failed_batch_resolves_submissions_with_zero(self):
+        async def scenario():
+            pipeline = SignalSinkPipeline([RecordingSink(fail=True)], flush_interval=60)
+            pipeline.start()
+            stored = await pipeline.submit([_row(0), _row(1)])
+            await pipeline.close()
+            return stored, pipeline.stats()
+
+        stored, stats = self.run_async(scenario())
+        self.assertEqual(stored, 0)
+        self.assertEqual(stats['failed_batches'], 1)
+
+    def test_csv_sink_appends_on_flush_with_headers_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "signals.csv")
+
+            async def scenario():
+                pipeline = SignalSinkPipeline([CSVSignalSink(path)], flush_interval=60)
+                pipeline.start()
+                await pipeline.submit([_row(0)])
+                self.assertFalse(os.path.exists(path)) # Buffered until the next flush
+                await pipeline.flush()
+                await pipeline.submit([_row(1), _row(2)])
+                await pipeline.close()
+
+            self.run_async(scenario())
+            with open(path, newline='') as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(rows[0], list(SIGNAL_COLUMNS))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][1], T0.isoformat())
+
+    def test_periodic_flush_writes_the_latest_debug_log_per_target(self):
+        written = []
+
+        async def scenario():
+            pipeline = SignalSinkPipeline([], flush_interval=0.05, debug_log_writer=lambda *args: written.append(args))
+            pipeline.start()
+            pipeline.submit_debug_logs([{"message": "old"}], "a1", "C", "5m")
+            pipeline.submit_debug_logs([{"message": "new"}], "a1", "C", "5m")
+            pipeline.submit_debug_logs([{"message": "other"}], "a1", "C", "1h")
+            await asyncio.sleep(0.2)
+            stats = pipeline.stats()
+            await pipeline.close()
+            return stats
+
+        stats = self.run_async(scenario())
+        self.assertEqual(sorted(written), [([{"message": "new"}], "a1", "C", "5m"), ([{"message": "other"}], "a1", "C", "1h")])
+        self.assertEqual(stats['debug_logs_superseded'], 1)
+        self.assertEqual(stats['pending_debug_logs'], 0)
+
+    def test_submit_waits_while_the_queue_is_full(self):
+        sink = RecordingSink(delay=0.02)
+
+        async def scenario():
+            pipeline = SignalSinkPipeline([sink], flush_interval=60, max_batch_rows=1, max_queued_rows=2)
+            pipeline.start()
+            tasks = [asyncio.ensure_future(pipeline.submit([_row(n)])) for n in range(6)]
+            await asyncio.sleep(0)
+            peak = pipeline.stats()['queued_rows']
+            await asyncio.gather(*tasks)
+            await pipeline.close()
+            return peak
+
+        self.assertLessEqual(self.run_async(scenario()), 2)
+        self.assertEqual(sum(len(b) for b in sink.batches), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
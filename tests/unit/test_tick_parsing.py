@@ -0,0 +1,102 @@
+"""
+Unit tests for the live ingester's per-tick parsing helpers.
+"""
+
+import decimal
+import unittest
+from datetime import datetime, timezone
+
+from src.data.ingestion.tick_parsing import (
+    ZERO_VOLUME, parse_gateway_timestamp, get_field_extractor,
+    price_to_ticks, parse_trade_volume, build_contract_routes
+)
+
+EXPECTED_TS = datetime(2025, 5, 19, 17, 15, 26, 119923, tzinfo=timezone.utc)
+
+
+class TestParseGatewayTimestamp(unittest.TestCase):
+
+    def test_seven_digit_fraction_is_truncated(self):
+        self.assertEqual(parse_gateway_timestamp("2025-05-19T17:15:26.1199235+00:00"), EXPECTED_TS)
+        self.assertEqual(parse_gateway_timestamp("2025-05-19T17:15:26.1199235Z"), EXPECTED_TS)
+
+    def test_result_is_utc(self):
+        parsed = parse_gateway_timestamp("2025-05-19T19:15:26.1199235+02:00")
+        self.assertEqual(parsed, EXPECTED_TS)
+        self.assertIs(parsed.tzinfo, timezone.utc)
+        self.assertIs(parse_gateway_timestamp("2025-05-19T17:15:26").tzinfo, timezone.utc)
+
+    def test_invalid_timestamp_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            parse_gateway_timestamp("not a timestamp")
+
+
+class TestFieldExtractor(unittest.TestCase):
+
+    def test_quote_price_priority(self):
+        quote = {"bestBid": 5984.75, "bestAsk": 5985.0, "lastUpdated": "2025-05-19T17:15:26Z"}
+        price, volume, ts = get_field_extractor("quote", quote).extract(quote)
+        self.assertEqual(price, decimal.Decimal("5984.875"))
+        self.assertIsNone(volume)
+        self.assertEqual(ts, "2025-05-19T17:15:26Z")
+
+        quote = dict(quote, lastPrice=5985.25)
+        self.assertEqual(get_field_extractor("quote", quote).extract(quote)[0], 5985.25)
+
+        quote = {"bestBid": None, "bestAsk": 5985.0, "timestamp": "t"}
+        self.assertEqual(get_field_extractor("quote", quote).extract(quote), (5985.0, None, "t"))
+
+    def test_quote_timestamp_falls_back_when_empty(self):
+        quote = {"price": 1.0, "lastUpdated": "", "timestamp": "t"}
+        self.assertEqual(get_field_extractor("quote", quote).extract(quote)[2], "t")
+
+    def test_trade_fields_and_ticks(self):
+        trade = {"Price": 5984.75, "Volume": 3, "DateTime": "t"}
+        extractor = get_field_extractor("trade", trade)
+        self.assertEqual(extractor.extract(trade), (5984.75, 3, "t"))
+        self.assertEqual(extractor.extract(trade, 0.125)[0], 47878)
+
+    def test_mid_price_in_ticks(self):
+        quote = {"bestBid": 5984.75, "bestAsk": 5985.0, "lastUpdated": "t"}
+        self.assertEqual(get_field_extractor("quote", quote).extract(quote, 0.125)[0], 47879)
+
+    def test_missing_fields_are_none(self):
+        trade = {"volume": 1}
+        self.assertEqual(get_field_extractor("trade", trade).extract(trade), (None, 1, None))
+
+    def test_extractor_is_cached_per_layout(self):
+        a = {"price": 1.0, "timestamp": "t"}
+        self.assertIs(get_field_extractor("trade", a), get_field_extractor("trade", dict(a)))
+        self.assertIsNot(get_field_extractor("trade", a), get_field_extractor("quote", a))
+
+
+class TestPricesAndRouting(unittest.TestCase):
+
+    def test_price_to_ticks_rounds_to_nearest(self):
+        self.assertEqual(price_to_ticks(5984.75, 0.25), 23939)
+        self.assertEqual(price_to_ticks("5984.74", 0.25), 23939)
+        with self.assertRaises(ValueError):
+            price_to_ticks("bad", 0.25)
+
+    def test_parse_trade_volume(self):
+        self.assertEqual(parse_trade_volume(2), 2)
+        self.assertIs(type(parse_trade_volume(2)), int)
+        self.assertEqual(parse_trade_volume(1.5), decimal.Decimal("1.5"))
+        self.assertIs(parse_trade_volume(None), ZERO_VOLUME)
+        with self.assertRaises(decimal.InvalidOperation):
+            parse_trade_volume("x")
+
+    def test_build_contract_routes(self):
+        routes = build_contract_routes([
+            {'contract_id': "A", 'timeframes_seconds': [60, 300], 'tick_size': 0.125},
+            {'contract_id': "B", 'timeframes_seconds': [60]},
+            {'contract_id': "C", 'timeframes_seconds': [60]},
+        ], {"A": "agg_a", "B": "agg_b"})
+        self.assertEqual(routes["A"].aggregator, "agg_a")
+        self.assertEqual(routes["A"].tick_size, 0.125)
+        self.assertIsNone(routes["B"].tick_size)
+        self.assertIsNone(routes["C"].aggregator)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Unit tests for the resident trend analysis server.
+"""
+
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.services.trend_analysis_server import (
+    ResultCache, TrendAnalysisServer, parse_bar_columns, series_hash
+)
+from src.strategies.trend_start_finder import generate_trend_starts, serialize_for_json
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+
+def _load_bars():
+    df = pd.read_csv(os.path.join(DATA_DIR, "CON.F.US.MES.M25_4h_ohlc.csv"))
+    return df, [{'timestamp': row.timestamp, 'open': row.open, 'high': row.high, 'low': row.low,
+                 'close': row.close, 'volume': row.volume} for row in df.itertuples()]
+
+
+class TestRequestParsing(unittest.TestCase):
+
+    def test_rows_and_columns_give_the_same_series(self):
+        rows = [{'timestamp': 't1', 'open': 1, 'high': 2, 'low': 0.5, 'close': 1.5},
+                {'timestamp': 't2', 'open': 1.5, 'high': 3, 'low': 1, 'close': 2, 'volume': 7}]
+        columns = {'timestamp': ['t1', 't2'], 'open': [1, 1.5], 'high': [2, 3], 'low': [0.5, 1],
+                   'close': [1.5, 2], 'volume': [0, 7]}
+        from_rows = parse_bar_columns({'bars': rows})
+        from_columns = parse_bar_columns({'columns': columns})
+        self.assertEqual(from_rows, from_columns)
+        self.assertEqual(from_rows['volume'], [0.0, 7.0])
+        self.assertEqual(series_hash('trend-starts', 'C', '1h', False, from_rows),
+                         series_hash('trend-starts', 'C', '1h', False, from_columns))
+        self.assertNotEqual(series_hash('trend-starts', 'C', '1h', False, from_rows),
+                            series_hash('trend-starts', 'C', '1h', True, from_rows))
+
+    def test_invalid_requests_raise_value_error(self):
+        for payload in ({}, {'bars': []}, {'bars': [{'timestamp': 't', 'open': 1}]},
+                        {'columns': {'timestamp': ['t'], 'open': [1], 'high': [1], 'low': [1]}},
+                        {'bars': [{'timestamp': 't', 'open': 'x', 'high': 1, 'low': 1, 'close': 1}]}):
+            with self.assertRaises(ValueError):
+                parse_bar_columns(payload)
+
+    def test_result_cache_evicts_least_recently_used(self):
+        cache = ResultCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+
+class TestTrendAnalysisServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.server = TrendAnalysisServer(workers=1, executor=self.executor)
+        self.client = TestClient(TestServer(self.server.make_app()))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        self.executor.shutdown()
+
+    async def test_trend_starts_match_direct_call_and_are_cached(self):
+        df, bars = _load_bars()
+        df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+        expected, _ = generate_trend_starts(df, 'C', '4h')
+
+        first = await self.client.post('/trend-starts', json={'bars': bars, 'contract_id': 'C', 'timeframe': '4h'})
+        self.assertEqual(first.status, 200)
+        body = await first.json()
+        self.assertEqual(body['signals'], serialize_for_json(expected))
+        self.assertFalse(body['metadata']['cached'])
+
+        second = await (await self.client.post('/trend-starts', json={'bars': bars, 'contract_id': 'C', 'timeframe': '4h'})).json()
+        self.assertTrue(second['metadata']['cached'])
+        self.assertEqual(second['signals'], body['signals'])
+        self.assertEqual(self.server.computed, 1)
+
+    async def test_forward_analysis_matches_batch(self):
+        _, bars = _load_bars()
+        payload = {'bars': bars[:120], 'contract_id': 'C', 'timeframe': '4h'}
+        batch = await (await self.client.post('/trend-starts', json=payload)).json()
+        forward = await (await self.client.post('/forward-analysis', json=payload)).json()
+        key = lambda s: (s['signal_type'], s['details']['confirmed_signal_bar_index'], s['details']['triggering_bar_index'])
+        self.assertEqual([key(s) for s in forward['signals']], [key(s) for s in batch['signals']])
+
+    async def test_bad_requests_return_400(self):
+        response = await self.client.post('/trend-starts', json={'bars': [], 'contract_id': 'C', 'timeframe': '4h'})
+        self.assertEqual(response.status, 400)
+        response = await self.client.post('/trend-starts', json={'bars': [{'timestamp': 't'}]})
+        self.assertEqual((await response.json())['error'], 'contract_id and timeframe are required')
+        response = await self.client.post('/forward-analysis', data=b'not json')
+        self.assertEqual(response.status, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
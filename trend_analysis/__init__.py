@@ -6,6 +6,7 @@ This package contains modules for analyzing price trends and generating trading
 
 # Import main classes and functions for easier access
 from .trend_models import Bar, State
+from .bar_store import BarStore, BarView
 from . import trend_utils
 from . import trend_patterns  
 from . import cus_rules
@@ -15,6 +16,8 @@ from . import signal_logic
 __all__ = [
     'Bar',
     'State', 
+    'BarStore',
+    'BarView',
     'trend_utils',
     'trend_patterns',
     'cus_rules', 
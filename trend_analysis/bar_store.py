@@ -0,0 +1,155 @@
+"""
+Columnar bar storage for the trend_analysis engine.
+
+BarStore keeps o/h/l/c/volume and epoch-nanosecond timestamps as NumPy arrays, so a
+DataFrame of bars can be handed to the engine by grabbing its columns instead of
+building one Bar per row. The rules still work on bar objects (``all_bars[idx - 1].h``);
+for them the store hands out BarView objects: ``__slots__`` views with the same
+attributes as trend_models.Bar, created on first access and cached so the same
+position always yields the same object.
+"""
+import datetime
+
+import numpy as np
+
+from .range_index import RangeExtremumIndex
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def epoch_ns_to_datetime(epoch_ns: int) -> datetime.datetime:
+    """Converts nanoseconds since the Unix epoch to a UTC datetime (microsecond precision)."""
+    return _EPOCH + datetime.timedelta(microseconds=epoch_ns // 1000)
+
+
+def datetime_to_epoch_ns(timestamp: datetime.datetime) -> int:
+    """Converts a datetime to nanoseconds since the Unix epoch; naive datetimes are taken as UTC."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    delta = timestamp - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+class BarView:
+    """
+    Read-only stand-in for trend_models.Bar backed by a BarStore row.
+
+    Prices, volume and index are plain Python numbers; ``timestamp`` and ``date`` are
+    only materialised when something asks for them.
+    """
+    __slots__ = ('o', 'h', 'l', 'c', 'volume', 'index', 'original_file_line', 'epoch_ns', '_timestamp')
+
+    def __init__(self, o: float, h: float, l: float, c: float, volume: float, index: int, epoch_ns: int, original_file_line: int = None):
+        self.o = o
+        self.h = h
+        self.l = l
+        self.c = c
+        self.volume = volume
+        self.index = index
+        self.epoch_ns = epoch_ns
+        self.original_file_line = original_file_line
+        self._timestamp = None
+
+    @property
+    def timestamp(self) -> datetime.datetime:
+        if self._timestamp is None:
+            self._timestamp = epoch_ns_to_datetime(self.epoch_ns)
+        return self._timestamp
+
+    @property
+    def date(self) -> str:
+        return self.timestamp.isoformat()
+
+    def __repr__(self):
+        return (f"Bar({self.index}, T:{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}, "
+                f"O:{self.o} H:{self.h} L:{self.l} C:{self.c} V:{self.volume})")
+
+
+class BarStore:
+    """
+    Immutable columnar series of bars with 1-based indices 1..n.
+
+    Columns are exposed as ``open``, ``high``, ``low``, ``close``, ``volume`` (float64)
+    and ``epoch_ns`` (int64) arrays. Indexing returns cached BarView objects, slicing
+    returns a list of them, and ``range_index`` is built from the high/low columns in
+    one vectorised pass, so the range helpers in trend_utils work on a BarStore exactly
+    as on a BarSeries. Streaming callers that append bars should keep using BarSeries.
+    """
+
+    def __init__(self, open, high, low, close, volume, epoch_ns):
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+        self.epoch_ns = np.asarray(epoch_ns, dtype=np.int64)
+        n = len(self.epoch_ns)
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            if len(getattr(self, name)) != n:
+                raise ValueError(f"BarStore column '{name}' has {len(getattr(self, name))} rows, expected {n}")
+        self._views = [None] * n
+        self._rows = None
+        self._range_index = None
+
+    @classmethod
+    def from_dataframe(cls, bars_df) -> "BarStore":
+        """
+        Builds a store from a DataFrame with 'timestamp', 'open', 'high', 'low', 'close'
+        and optionally 'volume' columns, in chronological order.
+
+        float64 price columns and a datetime64[ns] timestamp column are taken without
+        copying. Naive timestamps are treated as UTC; a missing volume column or missing
+        volume values become 0.0. Raises KeyError for a missing column and ValueError /
+        TypeError for values that cannot be converted.
+        """
+        import pandas as pd
+
+        timestamps = bars_df['timestamp']
+        if not pd.api.types.is_datetime64_any_dtype(timestamps):
+            timestamps = pd.to_datetime(timestamps, utc=True)
+        if getattr(timestamps.dt, 'tz', None) is not None:
+            timestamps = timestamps.dt.tz_convert(None)  # UTC wall time, same instants
+        epoch_ns = timestamps.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+        columns = {name: bars_df[name].to_numpy(dtype=np.float64) for name in ('open', 'high', 'low', 'close')}
+        if 'volume' in bars_df.columns:
+            volume = bars_df['volume'].to_numpy(dtype=np.float64, na_value=0.0)
+        else:
+            volume = np.zeros(len(bars_df), dtype=np.float64)
+        return cls(columns['open'], columns['high'], columns['low'], columns['close'], volume, epoch_ns)
+
+    @classmethod
+    def from_bars(cls, bars) -> "BarStore":
+        """Builds a store from Bar-like objects (anything with timestamp/o/h/l/c/volume)."""
+        bars = list(bars)
+        epoch_ns = [datetime_to_epoch_ns(bar.timestamp) for bar in bars]
+        return cls([bar.o for bar in bars], [bar.h for bar in bars], [bar.l for bar in bars],
+                   [bar.c for bar in bars], [bar.volume for bar in bars], epoch_ns)
+
+    def __len__(self):
+        return len(self._views)
+
+    def __iter__(self):
+        for pos in range(len(self._views)):
+            yield self[pos]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[pos] for pos in range(*item.indices(len(self._views)))]
+        view = self._views[item]
+        if view is None:
+            if item < 0:
+                item += len(self._views)
+            if self._rows is None:
+                # One bulk conversion to Python numbers; views then read plain lists
+                self._rows = (self.open.tolist(), self.high.tolist(), self.low.tolist(),
+                              self.close.tolist(), self.volume.tolist(), self.epoch_ns.tolist())
+            o, h, l, c, v, ns = self._rows
+            view = self._views[item] = BarView(o[item], h[item], l[item], c[item], v[item], item + 1, ns[item])
+        return view
+
+    @property
+    def range_index(self) -> RangeExtremumIndex:
+        if self._range_index is None:
+            self._range_index = RangeExtremumIndex.from_arrays(self.high, self.low)
+        return self._range_index
@@ -1,20 +1,26 @@
 from . import trend_utils
 from .trend_patterns import is_low_then_higher_close_bar, is_higher_ohlc_bar # Changed to relative import
 
+# --- Range Helpers ---
+def _no_higher_high_between(peak_bar, prev_bar, all_bars):
+    """True if no bar after peak_bar, up to and including prev_bar, made a high above peak_bar.h."""
+    highest_bar = trend_utils.range_max_high_bar(all_bars, peak_bar.index + 1, prev_bar.index)
+    return highest_bar is None or highest_bar.h <= peak_bar.h
+
+def _has_pullback_to_peak_low(peak_bar, prev_bar, all_bars):
+    """True if some bar after peak_bar, up to and including prev_bar, made a low at or below peak_bar.l."""
+    lowest_bar = trend_utils.range_min_low_bar(all_bars, peak_bar.index + 1, prev_bar.index)
+    return lowest_bar is not None and lowest_bar.l <= peak_bar.l
+
 # --- Detailed CDS Confirmation Check Functions ---
 def check_cds_confirmation_low_then_higher_close_vs_pds_open(current_bar, prev_bar, peak_bar, all_bars):
     """CDS Rule: LowThenHigherClose_vs_PDSOpen pattern."""
-    no_higher_high_for_low_then_higher_path = True
-    if peak_bar.index < prev_bar.index:
-        for j_1based_idx in range(peak_bar.index + 1, prev_bar.index + 1):
-            if all_bars[j_1based_idx - 1].h > peak_bar.h:
-                no_higher_high_for_low_then_higher_path = False
-                break
+    no_higher_high_for_low_then_higher_path = _no_higher_high_between(peak_bar, prev_bar, all_bars)
     result = is_low_then_higher_close_bar(current_bar, prev_bar) and \
            no_higher_high_for_low_then_higher_path and \
            current_bar.l < peak_bar.o
     if result:
-        trend_utils.log_debug(current_bar.index, f"CDS Rule 'check_cds_confirmation_low_then_higher_close_vs_pds_open' MET for PDS {peak_bar.index}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CDS Rule 'check_cds_confirmation_low_then_higher_close_vs_pds_open' MET for PDS {peak_bar.index}")
     return result
 
 def check_cds_confirmation_pattern_A(current_bar, prev_bar, peak_bar, all_bars):
@@ -38,26 +44,13 @@ def check_cds_confirmation_pattern_A(current_bar, prev_bar, peak_bar, all_bars):
     cond2 = current_bar.c > prev_bar.c
     cond3 = current_bar.l < peak_bar.l
 
-    no_higher_high_between = True
-    if peak_bar.index < prev_bar.index: 
-        for j_1based_idx in range(peak_bar.index + 1, prev_bar.index + 1):
-            if all_bars[j_1based_idx - 1].h > peak_bar.h:
-                no_higher_high_between = False
-                break
+    no_higher_high_between = _no_higher_high_between(peak_bar, prev_bar, all_bars)
     
-    found_pullback = False
-    if peak_bar.index < prev_bar.index + 1: 
-        start_idx = peak_bar.index + 1
-        end_idx = prev_bar.index 
-        if start_idx <= end_idx:
-             for j_1based_idx in range(start_idx, end_idx + 1):
-                if all_bars[j_1based_idx - 1].l <= peak_bar.l:
-                    found_pullback = True
-                    break
+    found_pullback = _has_pullback_to_peak_low(peak_bar, prev_bar, all_bars)
     
     result = found_pullback and cond1 and cond2 and no_higher_high_between and cond3
     if result:
-        trend_utils.log_debug(current_bar.index, f"CDS Rule 'check_cds_confirmation_pattern_A' MET for PDS {peak_bar.index}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CDS Rule 'check_cds_confirmation_pattern_A' MET for PDS {peak_bar.index}")
     return result
 
 def check_cds_confirmation_pattern_B(current_bar, prev_bar, peak_bar, all_bars):
@@ -83,26 +76,13 @@ def check_cds_confirmation_pattern_B(current_bar, prev_bar, peak_bar, all_bars):
     cond2 = current_bar.l >= prev_bar.l
     cond3 = current_bar.h > peak_bar.h
 
-    no_higher_high_between = True
-    if peak_bar.index < prev_bar.index: 
-        for j_1based_idx in range(peak_bar.index + 1, prev_bar.index + 1):
-            if all_bars[j_1based_idx - 1].h > peak_bar.h:
-                no_higher_high_between = False
-                break
+    no_higher_high_between = _no_higher_high_between(peak_bar, prev_bar, all_bars)
     
-    found_pullback = False
-    if peak_bar.index < prev_bar.index + 1: 
-        start_idx = peak_bar.index + 1
-        end_idx = prev_bar.index 
-        if start_idx <= end_idx:
-             for j_1based_idx in range(start_idx, end_idx + 1):
-                if all_bars[j_1based_idx - 1].l <= peak_bar.l:
-                    found_pullback = True
-                    break
+    found_pullback = _has_pullback_to_peak_low(peak_bar, prev_bar, all_bars)
     
     result = found_pullback and cond1 and cond2 and cond3 and no_higher_high_between
     if result:
-        trend_utils.log_debug(current_bar.index, f"CDS Rule 'check_cds_confirmation_pattern_B' MET for PDS {peak_bar.index}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CDS Rule 'check_cds_confirmation_pattern_B' MET for PDS {peak_bar.index}")
     return result
 
 def check_cds_confirmation_failed_rally(current_bar, prev_bar, peak_bar, all_bars):
@@ -123,12 +103,7 @@ def check_cds_confirmation_failed_rally(current_bar, prev_bar, peak_bar, all_bar
     Returns:
         bool: True if this CDS confirmation pattern is met, False otherwise.
     """
-    no_higher_high_between = True
-    if peak_bar.index < prev_bar.index: 
-        for j_1based_idx in range(peak_bar.index + 1, prev_bar.index + 1):
-            if all_bars[j_1based_idx - 1].h > peak_bar.h:
-                no_higher_high_between = False
-                break
+    no_higher_high_between = _no_higher_high_between(peak_bar, prev_bar, all_bars)
     if not no_higher_high_between:
         return False
 
@@ -147,7 +122,7 @@ def check_cds_confirmation_failed_rally(current_bar, prev_bar, peak_bar, all_bar
     current_bar_closes_down = current_bar.c < current_bar.o
     result = current_bar_closes_down 
     if result:
-        trend_utils.log_debug(current_bar.index, f"CDS Rule 'check_cds_confirmation_failed_rally' MET for PDS {peak_bar.index}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CDS Rule 'check_cds_confirmation_failed_rally' MET for PDS {peak_bar.index}")
     return result
 
 def check_cds_confirmation_pattern_G(current_bar, prev_bar, peak_bar, all_bars):
@@ -170,19 +145,14 @@ def check_cds_confirmation_pattern_G(current_bar, prev_bar, peak_bar, all_bars):
     if not is_higher_ohlc_bar(current_bar, prev_bar):
         return False
 
-    no_higher_high_between = True
-    if peak_bar.index < prev_bar.index: 
-        for j_1based_idx in range(peak_bar.index + 1, prev_bar.index + 1):
-            if all_bars[j_1based_idx - 1].h > peak_bar.h:
-                no_higher_high_between = False
-                break
+    no_higher_high_between = _no_higher_high_between(peak_bar, prev_bar, all_bars)
     if not no_higher_high_between:
         return False
 
     prev_bar_broke_low = prev_bar.l < peak_bar.l
     result = prev_bar_broke_low
     if result:
-        trend_utils.log_debug(current_bar.index, f"CDS Rule 'check_cds_confirmation_pattern_G' MET for PDS {peak_bar.index}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CDS Rule 'check_cds_confirmation_pattern_G' MET for PDS {peak_bar.index}")
     return result
 
 def check_cds_confirmation_outside_bar(current_bar, prev_bar_is_peak):
@@ -206,7 +176,7 @@ def check_cds_confirmation_outside_bar(current_bar, prev_bar_is_peak):
     closes_stronger = current_bar.c > prev_bar_is_peak.c 
     result = higher_high and lower_low and closes_stronger
     if result:
-        trend_utils.log_debug(current_bar.index, f"CDS Rule 'check_cds_confirmation_outside_bar' MET for PDS {prev_bar_is_peak.index}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CDS Rule 'check_cds_confirmation_outside_bar' MET for PDS {prev_bar_is_peak.index}")
     return result
 
 # --- CDS Rule Wrapper Functions ---
@@ -276,7 +246,7 @@ def _evaluate_cds_rules(current_bar, prev_bar, initial_pds_candidate_bar_obj, al
     if state.in_containment and \
        state.containment_start_bar_index_for_log is not None and \
        current_bar.index > state.containment_start_bar_index_for_log + ALLOWED_BARS_INTO_CONTAINMENT_FOR_CDS_CONFIRM:
-        trend_utils.log_debug(current_bar.index, f"CDS Evaluation: Suppressed. Bar {current_bar.index} is > {ALLOWED_BARS_INTO_CONTAINMENT_FOR_CDS_CONFIRM} bars after containment start ({state.containment_start_bar_index_for_log}).")
+        trend_utils.log_debug(current_bar.index, lambda: f"CDS Evaluation: Suppressed. Bar {current_bar.index} is > {ALLOWED_BARS_INTO_CONTAINMENT_FOR_CDS_CONFIRM} bars after containment start ({state.containment_start_bar_index_for_log}).")
         return False, None
 
     can_confirm_cds = False
@@ -284,14 +254,14 @@ def _evaluate_cds_rules(current_bar, prev_bar, initial_pds_candidate_bar_obj, al
 
     if initial_pds_candidate_bar_obj is not None:
         for rule_name, rule_func in CDS_RULE_DEFINITIONS:
-            trend_utils.log_debug(current_bar.index, f"CDS Evaluation: Checking rule '{rule_name}' for PDS on Bar {initial_pds_candidate_bar_obj.index}.")
+            trend_utils.log_debug(current_bar.index, lambda: f"CDS Evaluation: Checking rule '{rule_name}' for PDS on Bar {initial_pds_candidate_bar_obj.index}.")
             if rule_func(current_bar, prev_bar, initial_pds_candidate_bar_obj, all_bars):
                 can_confirm_cds = True
                 cds_trigger_rule_type = rule_name
-                trend_utils.log_debug(current_bar.index, f"CDS Evaluation: Rule '{rule_name}' MET for PDS on Bar {initial_pds_candidate_bar_obj.index}.")
+                trend_utils.log_debug(current_bar.index, lambda: f"CDS Evaluation: Rule '{rule_name}' MET for PDS on Bar {initial_pds_candidate_bar_obj.index}.")
                 break
             else:
-                trend_utils.log_debug(current_bar.index, f"CDS Evaluation: Rule '{rule_name}' NOT MET for PDS on Bar {initial_pds_candidate_bar_obj.index}.")
+                trend_utils.log_debug(current_bar.index, lambda: f"CDS Evaluation: Rule '{rule_name}' NOT MET for PDS on Bar {initial_pds_candidate_bar_obj.index}.")
     else:
         trend_utils.log_debug(current_bar.index, "CDS Evaluation: No initial PDS candidate to evaluate.")
             
@@ -306,9 +276,9 @@ def _apply_cds_confirmation(confirmed_bar_for_this_cds, state, all_bars, initial
 
     if state.pus_candidate_for_cus_bar_index is not None and \
        state.pus_candidate_for_cus_bar_index < confirmed_bar_for_this_cds.index:
-        trend_utils.log_debug(confirmed_bar_for_this_cds.index, f"Apply CDS: PUS candidate strictly before CDS Bar {confirmed_bar_for_this_cds.index} (PUS at {state.pus_candidate_for_cus_bar_index}) is being reset.")
+        trend_utils.log_debug(confirmed_bar_for_this_cds.index, lambda: f"Apply CDS: PUS candidate strictly before CDS Bar {confirmed_bar_for_this_cds.index} (PUS at {state.pus_candidate_for_cus_bar_index}) is being reset.")
         state._reset_all_pending_uptrend_states()
     
     if state.pds_candidate_for_cds_bar_index == confirmed_bar_for_this_cds.index:
-        trend_utils.log_debug(confirmed_bar_for_this_cds.index, f"Apply CDS: PDS candidate on CDS Bar {confirmed_bar_for_this_cds.index} is being reset as it is now confirmed.")
+        trend_utils.log_debug(confirmed_bar_for_this_cds.index, lambda: f"Apply CDS: PDS candidate on CDS Bar {confirmed_bar_for_this_cds.index} is being reset as it is now confirmed.")
         state._reset_all_pending_downtrend_states() 
\ No newline at end of file
@@ -27,7 +27,7 @@ def check_cus_confirmation_low_undercut_high_respect(current_bar, prev_bar, pds_
     cond_closes_higher = current_bar.c > prev_bar.c
     result = cond_low_undercut and cond_high_respect and cond_closes_higher
     if result:
-        trend_utils.log_debug(current_bar.index, f"CUS Rule 'check_cus_confirmation_low_undercut_high_respect' MET for PDS cand {pds_candidate_bar.index if pds_candidate_bar else 'None'}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CUS Rule 'check_cus_confirmation_low_undercut_high_respect' MET for PDS cand {pds_candidate_bar.index if pds_candidate_bar else 'None'}")
     return result
 
 def check_cus_confirmation_higher_high_lower_low_down_close(current_bar, prev_bar):
@@ -77,7 +77,7 @@ def check_cus_confirmation_engulfing_up_with_pds_low_break(current_bar, prev_bar
     cond5_break_pds_low = current_bar.l < pds_candidate_bar_for_context.l
     result = cond1_higher_high and cond2_lower_low and cond3_closes_higher_than_prev_close and cond4_up_bar and cond5_break_pds_low
     if result:
-        trend_utils.log_debug(current_bar.index, f"CUS Rule 'check_cus_confirmation_engulfing_up_with_pds_low_break' MET for PDS cand {pds_candidate_bar_for_context.index if pds_candidate_bar_for_context else 'None'}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CUS Rule 'check_cus_confirmation_engulfing_up_with_pds_low_break' MET for PDS cand {pds_candidate_bar_for_context.index if pds_candidate_bar_for_context else 'None'}")
     return result
 
 # --- CUS Rule Wrapper Functions ---
@@ -93,7 +93,7 @@ def _cus_rule_exhaustion_reversal(current_bar, prev_bar, initial_pus_candidate_b
         return False
     if current_bar.index - initial_pus_candidate_bar_obj.index > CUS_EXHAUSTION_MAX_BARS_FROM_CANDIDATE:
         return False
-    trend_utils.log_debug(current_bar.index, f"CUS Rule '_cus_rule_exhaustion_reversal' MET for PUS {initial_pus_candidate_bar_obj.index}")
+    trend_utils.log_debug(current_bar.index, lambda: f"CUS Rule '_cus_rule_exhaustion_reversal' MET for PUS {initial_pus_candidate_bar_obj.index}")
     return True
 
 def _cus_rule_low_undercut_high_respect(current_bar, prev_bar, initial_pus_candidate_bar_obj, initial_pds_candidate_bar_obj, state, all_bars):
@@ -104,11 +104,11 @@ def _cus_rule_low_undercut_high_respect(current_bar, prev_bar, initial_pus_candi
             pds_context = all_bars[state.pds_candidate_for_cds_bar_index - 1]
 
     if not initial_pus_candidate_bar_obj or not pds_context:
-        trend_utils.log_debug(current_bar.index, f"CUS Rule 'LowUndercutHighRespect' REJECTED: Missing PUS ({initial_pus_candidate_bar_obj.index if initial_pus_candidate_bar_obj else 'None'}) or PDS context ({pds_context.index if pds_context else 'None'}).")
+        trend_utils.log_debug(current_bar.index, lambda: f"CUS Rule 'LowUndercutHighRespect' REJECTED: Missing PUS ({initial_pus_candidate_bar_obj.index if initial_pus_candidate_bar_obj else 'None'}) or PDS context ({pds_context.index if pds_context else 'None'}).")
         return False
 
     if pds_context.index <= initial_pus_candidate_bar_obj.index:
-        trend_utils.log_debug(current_bar.index, f"CUS Rule 'LowUndercutHighRespect' REJECTED: PDS context (Bar {pds_context.index}) not after PUS candidate (Bar {initial_pus_candidate_bar_obj.index}).")
+        trend_utils.log_debug(current_bar.index, lambda: f"CUS Rule 'LowUndercutHighRespect' REJECTED: PDS context (Bar {pds_context.index}) not after PUS candidate (Bar {initial_pus_candidate_bar_obj.index}).")
         return False
         
     return check_cus_confirmation_low_undercut_high_respect(current_bar, prev_bar, pds_context)
@@ -133,24 +133,23 @@ def _cus_rule_breakout_after_failed_low_v2(current_bar, prev_bar, initial_pus_ca
     6. Current bar is an up-bar (closes above its open).
     """
     if not initial_pus_candidate_bar_obj or not initial_pds_candidate_bar_obj:
-        trend_utils.log_debug(current_bar.index, f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' REJECTED: No initial PUS ({initial_pus_candidate_bar_obj.index if initial_pus_candidate_bar_obj else 'None'}) or PDS ({initial_pds_candidate_bar_obj.index if initial_pds_candidate_bar_obj else 'None'}) candidate.")
+        trend_utils.log_debug(current_bar.index, lambda: f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' REJECTED: No initial PUS ({initial_pus_candidate_bar_obj.index if initial_pus_candidate_bar_obj else 'None'}) or PDS ({initial_pds_candidate_bar_obj.index if initial_pds_candidate_bar_obj else 'None'}) candidate.")
         return False
     if not (initial_pds_candidate_bar_obj.index > initial_pus_candidate_bar_obj.index):
-        trend_utils.log_debug(current_bar.index, f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' REJECTED: PDS candidate Bar {initial_pds_candidate_bar_obj.index} not after PUS candidate Bar {initial_pus_candidate_bar_obj.index}.")
+        trend_utils.log_debug(current_bar.index, lambda: f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' REJECTED: PDS candidate Bar {initial_pds_candidate_bar_obj.index} not after PUS candidate Bar {initial_pus_candidate_bar_obj.index}.")
         return False
 
     pus_low_respected = True
     check_from_1_based_idx = initial_pus_candidate_bar_obj.index + 1
     check_to_1_based_idx = current_bar.index - 1
-
-    if check_from_1_based_idx <= check_to_1_based_idx:
-        for bar_1_based_idx_to_check in range(check_from_1_based_idx, check_to_1_based_idx + 1):
-            bar_to_check_0_idx = bar_1_based_idx_to_check - 1
-            if 0 <= bar_to_check_0_idx < len(all_bars):
-                if all_bars[bar_to_check_0_idx].l < initial_pus_candidate_bar_obj.l:
-                    pus_low_respected = False
-                    trend_utils.log_debug(current_bar.index, f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' REJECTED: PUS_Low_Violated by Bar {all_bars[bar_to_check_0_idx].index} (L:{all_bars[bar_to_check_0_idx].l}) vs PUS Bar {initial_pus_candidate_bar_obj.index} (L:{initial_pus_candidate_bar_obj.l})")
-                    break
+    lowest_bar = trend_utils.range_min_low_bar(all_bars, check_from_1_based_idx, check_to_1_based_idx)
+    if lowest_bar is not None and lowest_bar.l < initial_pus_candidate_bar_obj.l:
+        pus_low_respected = False
+        if trend_utils.debug_enabled(current_bar.index):
+            violating_bar = trend_utils.first_bar_with_low_below(
+                all_bars, check_from_1_based_idx, check_to_1_based_idx, initial_pus_candidate_bar_obj.l
+            )
+            trend_utils.log_debug(current_bar.index, f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' REJECTED: PUS_Low_Violated by Bar {violating_bar.index} (L:{violating_bar.l}) vs PUS Bar {initial_pus_candidate_bar_obj.index} (L:{initial_pus_candidate_bar_obj.l})")
     if not pus_low_respected:
         return False
 
@@ -160,9 +159,9 @@ def _cus_rule_breakout_after_failed_low_v2(current_bar, prev_bar, initial_pus_ca
 
     result = cond_new_high_vs_pds and cond_closes_higher_prev and cond_up_bar
     if result:
-        trend_utils.log_debug(current_bar.index, f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' MET for PUS {initial_pus_candidate_bar_obj.index} and PDS {initial_pds_candidate_bar_obj.index}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' MET for PUS {initial_pus_candidate_bar_obj.index} and PDS {initial_pds_candidate_bar_obj.index}")
     else:
-        trend_utils.log_debug(current_bar.index, f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' NOT MET. PUS:{initial_pus_candidate_bar_obj.index if initial_pus_candidate_bar_obj else 'N/A'}, PDS:{initial_pds_candidate_bar_obj.index if initial_pds_candidate_bar_obj else 'N/A'}. cond_new_high_vs_pds:{cond_new_high_vs_pds}, cond_closes_higher_prev:{cond_closes_higher_prev}, cond_up_bar:{cond_up_bar}, pus_low_respected:{pus_low_respected}")
+        trend_utils.log_debug(current_bar.index, lambda: f"CUS Rule '_cus_rule_breakout_after_failed_low_v2' NOT MET. PUS:{initial_pus_candidate_bar_obj.index if initial_pus_candidate_bar_obj else 'N/A'}, PDS:{initial_pds_candidate_bar_obj.index if initial_pds_candidate_bar_obj else 'N/A'}. cond_new_high_vs_pds:{cond_new_high_vs_pds}, cond_closes_higher_prev:{cond_closes_higher_prev}, cond_up_bar:{cond_up_bar}, pus_low_respected:{pus_low_respected}")
     return result
 
 CUS_RULE_DEFINITIONS = [
@@ -183,21 +182,21 @@ def _evaluate_cus_rules(current_bar, prev_bar, initial_pus_candidate_bar_obj, in
     if state.in_containment and \
        state.containment_start_bar_index_for_log is not None and \
        current_bar.index > state.containment_start_bar_index_for_log + ALLOWED_BARS_INTO_CONTAINMENT_FOR_CUS_CONFIRM:
-        trend_utils.log_debug(current_bar.index, f"CUS Evaluation: Suppressed. Bar {current_bar.index} is > {ALLOWED_BARS_INTO_CONTAINMENT_FOR_CUS_CONFIRM} bars after containment start ({state.containment_start_bar_index_for_log}).")
+        trend_utils.log_debug(current_bar.index, lambda: f"CUS Evaluation: Suppressed. Bar {current_bar.index} is > {ALLOWED_BARS_INTO_CONTAINMENT_FOR_CUS_CONFIRM} bars after containment start ({state.containment_start_bar_index_for_log}).")
         return False, None
 
     can_confirm_cus = False
     cus_trigger_rule_type = None
     if initial_pus_candidate_bar_obj is not None: 
         for rule_name, rule_func in CUS_RULE_DEFINITIONS:
-            trend_utils.log_debug(current_bar.index, f"CUS Evaluation: Checking rule '{rule_name}' for PUS on Bar {initial_pus_candidate_bar_obj.index}.")
+            trend_utils.log_debug(current_bar.index, lambda: f"CUS Evaluation: Checking rule '{rule_name}' for PUS on Bar {initial_pus_candidate_bar_obj.index}.")
             if rule_func(current_bar, prev_bar, initial_pus_candidate_bar_obj, initial_pds_candidate_bar_obj, state, all_bars):
                 can_confirm_cus = True
                 cus_trigger_rule_type = rule_name
-                trend_utils.log_debug(current_bar.index, f"CUS Evaluation: Rule '{rule_name}' MET for PUS on Bar {initial_pus_candidate_bar_obj.index}.")
+                trend_utils.log_debug(current_bar.index, lambda: f"CUS Evaluation: Rule '{rule_name}' MET for PUS on Bar {initial_pus_candidate_bar_obj.index}.")
                 break
             else:
-                trend_utils.log_debug(current_bar.index, f"CUS Evaluation: Rule '{rule_name}' NOT MET for PUS on Bar {initial_pus_candidate_bar_obj.index}.")
+                trend_utils.log_debug(current_bar.index, lambda: f"CUS Evaluation: Rule '{rule_name}' NOT MET for PUS on Bar {initial_pus_candidate_bar_obj.index}.")
     else:
         trend_utils.log_debug(current_bar.index, "CUS Evaluation: No initial PUS candidate to evaluate.")
     return can_confirm_cus, cus_trigger_rule_type
@@ -212,11 +211,11 @@ def _apply_cus_confirmation(current_bar, confirmed_bar_for_this_cus, cus_trigger
 
     if cus_trigger_rule_type == "HigherHighLowerLowDownClose":
         prev_to_current_bar = all_bars[current_bar.index - 2] if current_bar.index > 1 else None
-        trend_utils.log_debug(current_bar.index, f"Apply CUS: Rule '{cus_trigger_rule_type}' triggered. Attempting PDS on current_bar ({current_bar.index}) due to pattern.")
+        trend_utils.log_debug(current_bar.index, lambda: f"Apply CUS: Rule '{cus_trigger_rule_type}' triggered. Attempting PDS on current_bar ({current_bar.index}) due to pattern.")
         state.set_new_pending_downtrend_signal(current_bar, prev_to_current_bar, current_bar_event_descriptions, 
                                               "(from HigherHighLowerLowDownClose pattern)")
     elif cus_trigger_rule_type == "EngulfingUpPDSLowBreak":
-        trend_utils.log_debug(current_bar.index, f"Apply CUS: Rule '{cus_trigger_rule_type}' triggered. No automatic PDS generation for this rule.")
+        trend_utils.log_debug(current_bar.index, lambda: f"Apply CUS: Rule '{cus_trigger_rule_type}' triggered. No automatic PDS generation for this rule.")
         pass
     else:
         cus_triggering_bar = current_bar
@@ -229,6 +228,6 @@ def _apply_cus_confirmation(current_bar, confirmed_bar_for_this_cus, cus_trigger
                     idx_before_confirmed_cus = confirmed_bar_for_this_cus.index - 2 
                     if idx_before_confirmed_cus >= 0 and idx_before_confirmed_cus < len(all_bars):
                         prev_to_confirmed_cus_bar = all_bars[idx_before_confirmed_cus]
-                trend_utils.log_debug(current_bar.index, f"Apply CUS: Rule '{cus_trigger_rule_type}' triggered. Attempting PDS on confirmed_cus_bar ({confirmed_bar_for_this_cus.index}) due to trigger by Bar {cus_triggering_bar.index}.")
+                trend_utils.log_debug(current_bar.index, lambda: f"Apply CUS: Rule '{cus_trigger_rule_type}' triggered. Attempting PDS on confirmed_cus_bar ({confirmed_bar_for_this_cus.index}) due to trigger by Bar {cus_triggering_bar.index}.")
                 state.set_new_pending_downtrend_signal(confirmed_bar_for_this_cus, prev_to_confirmed_cus_bar, current_bar_event_descriptions,
                                                      f"(due to trigger by Bar {cus_triggering_bar.index})") 
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Range max-high / min-low queries over a growing bar series.
+
+The CUS/CDS rules repeatedly ask "did any bar between X and Y make a higher high
+(or lower low) than Z?". Walking the bars for every evaluation makes the detector
+quadratic on long containment stretches. RangeExtremumIndex is a sparse table of
+arg-max highs and arg-min lows that supports O(log n) appends and O(1) queries.
+"""
+from typing import List
+
+import numpy as np
+
+
+class RangeExtremumIndex:
+    """
+    Sparse table over bar highs and lows.
+
+    Level k holds, for every start position i, the position of the highest high
+    (``_max_high[k][i]``) and lowest low (``_min_low[k][i]``) within
+    ``[i, i + 2**k)``. Ties resolve to the earliest position, matching
+    ``max()``/``min()`` over a list slice.
+    """
+
+    def __init__(self):
+        self._highs: List[float] = []
+        self._lows: List[float] = []
+        self._max_high: List[List[int]] = []
+        self._min_low: List[List[int]] = []
+
+    @classmethod
+    def from_arrays(cls, highs, lows) -> "RangeExtremumIndex":
+        """
+        Builds the index for a whole series at once, one vectorised pass per level.
+        The result is identical to appending the bars one by one and can be appended to.
+        """
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        index = cls()
+        index._highs = highs.tolist()
+        index._lows = lows.tolist()
+        n = len(highs)
+        if n == 0:
+            return index
+        max_high = min_low = np.arange(n)
+        index._max_high.append(max_high.tolist())
+        index._min_low.append(min_low.tolist())
+        level = 1
+        while (1 << level) <= n:
+            half, size = 1 << (level - 1), n - (1 << level) + 1
+            a, b = max_high[:size], max_high[half:half + size]
+            max_high = np.where(highs[a] >= highs[b], a, b)
+            a, b = min_low[:size], min_low[half:half + size]
+            min_low = np.where(lows[a] <= lows[b], a, b)
+            index._max_high.append(max_high.tolist())
+            index._min_low.append(min_low.tolist())
+            level += 1
+        return index
+
+    def __len__(self):
+        return len(self._highs)
+
+    def append(self, high: float, low: float):
+        """Adds the next bar's high/low, extending every level that gains a new window."""
+        pos = len(self._highs)
+        self._highs.append(high)
+        self._lows.append(low)
+        if not self._max_high:
+            self._max_high.append([])
+            self._min_low.append([])
+        self._max_high[0].append(pos)
+        self._min_low[0].append(pos)
+
+        highs, lows = self._highs, self._lows
+        level = 1
+        while True:
+            start = pos - (1 << level) + 1
+            if start < 0:
+                break
+            if level == len(self._max_high):
+                self._max_high.append([])
+                self._min_low.append([])
+            half = 1 << (level - 1)
+            prev_max, prev_min = self._max_high[level - 1], self._min_low[level - 1]
+            a, b = prev_max[start], prev_max[start + half]
+            self._max_high[level].append(a if highs[a] >= highs[b] else b)
+            a, b = prev_min[start], prev_min[start + half]
+            self._min_low[level].append(a if lows[a] <= lows[b] else b)
+            level += 1
+
+    def argmax_high(self, first: int, last: int) -> int:
+        """0-based position of the highest high in [first, last] (inclusive, 0-based)."""
+        level = (last - first + 1).bit_length() - 1
+        a = self._max_high[level][first]
+        b = self._max_high[level][last - (1 << level) + 1]
+        return a if self._highs[a] >= self._highs[b] else b
+
+    def argmin_low(self, first: int, last: int) -> int:
+        """0-based position of the lowest low in [first, last] (inclusive, 0-based)."""
+        level = (last - first + 1).bit_length() - 1
+        a = self._min_low[level][first]
+        b = self._min_low[level][last - (1 << level) + 1]
+        return a if self._lows[a] <= self._lows[b] else b
+
+
+class BarSeries(list):
+    """
+    A list of Bar objects that keeps a RangeExtremumIndex in step with appends.
+
+    Drop-in replacement for the plain ``all_bars`` lists passed through the rules;
+    ``trend_utils.range_max_high_bar``/``range_min_low_bar`` use the index when they
+    are given a BarSeries and fall back to a linear scan otherwise. Only ``append``
+    and ``extend`` are supported as mutations.
+    """
+
+    def __init__(self, bars=()):
+        super().__init__()
+        self.range_index = RangeExtremumIndex()
+        self.extend(bars)
+
+    def append(self, bar):
+        super().append(bar)
+        self.range_index.append(bar.h, bar.l)
+
+    def extend(self, bars):
+        for bar in bars:
+            self.append(bar)
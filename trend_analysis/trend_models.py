@@ -4,6 +4,8 @@ from . import trend_utils # For log_debug and find_intervening_bar_for_forced_tr
 
 class Bar:
     """Represents a single price bar (OHLC) with its timestamp and indices."""
+    __slots__ = ('timestamp', 'o', 'h', 'l', 'c', 'volume', 'original_file_line', 'index')
+
     def __init__(self, timestamp: datetime.datetime, o: float, h: float, l: float, c: float, volume: float, index: int, original_file_line: int = None): # Modified signature
         """
         Initializes a Bar object.
@@ -19,7 +21,6 @@ class Bar:
             original_file_line (int, optional): The original line number from an input file (for debugging).
         """
         self.timestamp = timestamp # Changed from date_str
-        self.date = timestamp.isoformat() # Keep original date string form if needed by other parts, like logging
         self.o = float(o)
         self.h = float(h)
         self.l = float(l)
@@ -28,6 +29,11 @@ class Bar:
         self.original_file_line = original_file_line 
         self.index = int(index) 
 
+    @property
+    def date(self):
+        """ISO date string of the timestamp, computed on demand (used by logging)."""
+        return self.timestamp.isoformat()
+
     def __repr__(self):
         return (f"Bar({self.index}, T:{self.timestamp.strftime('%Y-%m-%d %H:%M:%S') if self.timestamp else 'NoTime'}, " # Use timestamp
                 f"O:{self.o} H:{self.h} L:{self.l} C:{self.c} V:{self.volume})")
@@ -141,7 +147,7 @@ class State:
             return False # PDS not set or updated
 
         # DEBUG PRINT ADDED - Retaining for now, can be replaced/enhanced by new trend_utils.log_debug calls
-        trend_utils.log_debug(bar_obj.index, f"Attempting to set PDS on Bar {bar_obj.index}. Current PDS cand: {self.pds_candidate_for_cds_bar_index} (H:{self.pds_candidate_for_cds_high}). Prev bar H check passed.")
+        trend_utils.log_debug(bar_obj.index, lambda: f"Attempting to set PDS on Bar {bar_obj.index}. Current PDS cand: {self.pds_candidate_for_cds_bar_index} (H:{self.pds_candidate_for_cds_high}). Prev bar H check passed.")
 
         if self.pds_candidate_for_cds_bar_index is None or \
            bar_obj.h > self.pds_candidate_for_cds_high:
@@ -159,9 +165,9 @@ class State:
             # MODIFICATION: Allow a bar to be a PDS candidate even if it's also a PUS candidate.
             # if self.pus_candidate_for_cus_bar_index == bar_obj.index:
             #     self._reset_pus_candidate_state()
-            trend_utils.log_debug(bar_obj.index, f"PDS set/updated on Bar {bar_obj.index} (H:{bar_obj.h}, L:{bar_obj.l}). Cleared PUS on same bar if present.")
+            trend_utils.log_debug(bar_obj.index, lambda: f"PDS set/updated on Bar {bar_obj.index} (H:{bar_obj.h}, L:{bar_obj.l}). Cleared PUS on same bar if present.")
             return True
-        trend_utils.log_debug(bar_obj.index, f"PDS on Bar {bar_obj.index} not set/updated (existing cand Bar {self.pds_candidate_for_cds_bar_index} has H:{self.pds_candidate_for_cds_high}).")
+        trend_utils.log_debug(bar_obj.index, lambda: f"PDS on Bar {bar_obj.index} not set/updated (existing cand Bar {self.pds_candidate_for_cds_bar_index} has H:{self.pds_candidate_for_cds_high}).")
         return False
 
     def set_new_pending_uptrend_signal(self, bar_obj, event_descriptions_list, reason_message_suffix=""):
@@ -176,7 +182,7 @@ class State:
         self.pending_uptrend_start_anchor_low = bar_obj.l
         
         pus_candidate_updated = False
-        trend_utils.log_debug(bar_obj.index, f"Attempting to set PUS on Bar {bar_obj.index}. Current PUS cand: {self.pus_candidate_for_cus_bar_index} (L:{self.pus_candidate_for_cus_low}).")
+        trend_utils.log_debug(bar_obj.index, lambda: f"Attempting to set PUS on Bar {bar_obj.index}. Current PUS cand: {self.pus_candidate_for_cus_bar_index} (L:{self.pus_candidate_for_cus_low}).")
         if self.pus_candidate_for_cus_bar_index is None or \
            bar_obj.l < self.pus_candidate_for_cus_low:
             self.pus_candidate_for_cus_bar_index = bar_obj.index
@@ -188,9 +194,9 @@ class State:
                 log_message += f" {reason_message_suffix}"
             event_descriptions_list.append(log_message)
             pus_candidate_updated = True
-            trend_utils.log_debug(bar_obj.index, f"PUS set/updated on Bar {bar_obj.index} (L:{bar_obj.l}, H:{bar_obj.h}). Cleared PDS on same bar if present.")
+            trend_utils.log_debug(bar_obj.index, lambda: f"PUS set/updated on Bar {bar_obj.index} (L:{bar_obj.l}, H:{bar_obj.h}). Cleared PDS on same bar if present.")
         else:
-            trend_utils.log_debug(bar_obj.index, f"PUS on Bar {bar_obj.index} not set/updated (existing cand Bar {self.pus_candidate_for_cus_bar_index} has L:{self.pus_candidate_for_cus_low}).")
+            trend_utils.log_debug(bar_obj.index, lambda: f"PUS on Bar {bar_obj.index} not set/updated (existing cand Bar {self.pus_candidate_for_cus_bar_index} has L:{self.pus_candidate_for_cus_low}).")
 
         # FIX 1: Made consistent - clear both basic and candidate states for PDS
         if self.pending_downtrend_start_bar_index == bar_obj.index:
@@ -214,14 +220,14 @@ class State:
                 self.current_confirmed_trend_is_uptrend = False
                 self.last_confirmed_trend_type = 'downtrend'
                 self.last_confirmed_trend_bar_index = intervening_high_bar_for_forced_cds.index
-                trend_utils.log_debug(confirmed_cus_bar.index if confirmed_cus_bar else 0, f"FORCED CDS from Bar {intervening_high_bar_for_forced_cds.index} due to CUS at {confirmed_cus_bar.index if confirmed_cus_bar else 'N/A'}. Last confirmed: DOWNTREND at {self.last_confirmed_trend_bar_index}")
+                trend_utils.log_debug(confirmed_cus_bar.index if confirmed_cus_bar else 0, lambda: f"FORCED CDS from Bar {intervening_high_bar_for_forced_cds.index} due to CUS at {confirmed_cus_bar.index if confirmed_cus_bar else 'N/A'}. Last confirmed: DOWNTREND at {self.last_confirmed_trend_bar_index}")
 
         # FIX 4: Removed duplicate call - now log CUS and update state only once
         event_descriptions_list.append(f"Confirmed Uptrend Start from Bar {confirmed_cus_bar.index} ({confirmed_cus_bar.date})")
         self.current_confirmed_trend_is_uptrend = True 
         self.last_confirmed_trend_type = 'uptrend' 
         self.last_confirmed_trend_bar_index = confirmed_cus_bar.index
-        trend_utils.log_debug(confirmed_cus_bar.index, f"CUS Confirmed from Bar {confirmed_cus_bar.index}. Last confirmed: UPTREND at {self.last_confirmed_trend_bar_index}")
+        trend_utils.log_debug(confirmed_cus_bar.index, lambda: f"CUS Confirmed from Bar {confirmed_cus_bar.index}. Last confirmed: UPTREND at {self.last_confirmed_trend_bar_index}")
 
     def confirm_downtrend(self, confirmed_cds_bar, all_bars, event_descriptions_list):
         """
@@ -240,11 +246,11 @@ class State:
                 self.current_confirmed_trend_is_uptrend = True
                 self.last_confirmed_trend_type = 'uptrend'
                 self.last_confirmed_trend_bar_index = intervening_low_bar_for_forced_cus.index
-                trend_utils.log_debug(confirmed_cds_bar.index if confirmed_cds_bar else 0, f"FORCED CUS from Bar {intervening_low_bar_for_forced_cus.index} due to CDS at {confirmed_cds_bar.index if confirmed_cds_bar else 'N/A'}. Last confirmed: UPTREND at {self.last_confirmed_trend_bar_index}")
+                trend_utils.log_debug(confirmed_cds_bar.index if confirmed_cds_bar else 0, lambda: f"FORCED CUS from Bar {intervening_low_bar_for_forced_cus.index} due to CDS at {confirmed_cds_bar.index if confirmed_cds_bar else 'N/A'}. Last confirmed: UPTREND at {self.last_confirmed_trend_bar_index}")
 
         # FIX 4: Removed duplicate call - now log CDS and update state only once
         event_descriptions_list.append(f"Confirmed Downtrend Start from Bar {confirmed_cds_bar.index} ({confirmed_cds_bar.date})")
         self.current_confirmed_trend_is_uptrend = False 
         self.last_confirmed_trend_type = 'downtrend' 
         self.last_confirmed_trend_bar_index = confirmed_cds_bar.index
-        trend_utils.log_debug(confirmed_cds_bar.index, f"CDS Confirmed from Bar {confirmed_cds_bar.index}. Last confirmed: DOWNTREND at {self.last_confirmed_trend_bar_index}") 
\ No newline at end of file
+        trend_utils.log_debug(confirmed_cds_bar.index, lambda: f"CDS Confirmed from Bar {confirmed_cds_bar.index}. Last confirmed: DOWNTREND at {self.last_confirmed_trend_bar_index}") 
\ No newline at end of file
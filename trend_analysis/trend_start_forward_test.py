@@ -12,217 +12,129 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from trend_analysis.trend_models import Bar, State
+from trend_analysis.range_index import BarSeries
 import trend_analysis.trend_utils as trend_utils
 import trend_analysis.trend_patterns as trend_patterns
 import trend_analysis.cus_rules as cus_rules
 import trend_analysis.cds_rules as cds_rules
 import trend_analysis.signal_logic as signal_logic
+import trend_analysis.trend_start_og_fixed as trend_start_og_fixed
 
 class ForwardTrendAnalyzer:
     """
     Forward-testing trend analyzer that processes bars one at a time,
     only using historical data available up to the current bar.
+
+    The analyzer is resident: it keeps its ``State`` and bar history between calls, so
+    feeding it one new bar costs a single bar evaluation. It shares the per-bar step with
+    ``trend_start_og_fixed.process_trend_logic``, so after N bars ``get_all_signals()``
+    matches a batch run over the same N bars exactly. ``to_checkpoint()``/``from_checkpoint()``
+    round-trip the analyzer through a JSON-serialisable dict.
     """
     
-    def __init__(self, contract_id: str = "", timeframe_str: str = ""):
+    CHECKPOINT_VERSION = 1
+
+    def __init__(self, contract_id: str = "", timeframe_str: str = "", debug_collector: Optional[trend_utils.DebugLogCollector] = None):
         self.contract_id = contract_id
         self.timeframe_str = timeframe_str
-        self.state = State()
-        self.historical_bars: List[Bar] = []
+        # Each analyzer owns its debug log collector so resident analyzers don't share logs
+        self.debug_collector = debug_collector if debug_collector is not None else trend_utils.DebugLogCollector()
+        with trend_utils.debug_collection(self.debug_collector):
+            self.state = State()
+        self.historical_bars: BarSeries = BarSeries()
         self.signals_found: List[dict] = []
         self.current_bar_index = 0
-        
-        # Clear any existing debug logs
-        trend_utils.get_and_clear_debug_logs()
-    
-    def _create_signal_dict(self, bar_obj: Bar, signal_type: str, triggering_bar_index: int, rule_type: str) -> dict:
-        """Helper to create a standardized signal dictionary."""
-        return {
-            'timestamp': bar_obj.timestamp,
-            'contract_id': self.contract_id,
-            'timeframe': self.timeframe_str,
-            'signal_type': signal_type,  # 'uptrend_start' or 'downtrend_start'
-            'signal_price': bar_obj.c,
-            'signal_open': bar_obj.o,
-            'signal_high': bar_obj.h,
-            'signal_low': bar_obj.l,
-            'signal_close': bar_obj.c,
-            'signal_volume': bar_obj.volume,
-            'details': {
-                "confirmed_signal_bar_index": bar_obj.index,
-                "confirmed_signal_bar_date": bar_obj.date,
-                "triggering_bar_index": triggering_bar_index,
-                "rule_type": rule_type
-            }
-        }
+        # (confirmed_signal_bar_index, signal_type) of every signal already emitted
+        self._emitted_signal_keys = set()
     
+    @property
+    def last_bar_timestamp(self) -> Optional[datetime.datetime]:
+        """Timestamp of the most recently processed bar, or None if no bar has been seen."""
+        return self.historical_bars[-1].timestamp if self.historical_bars else None
+
+    def make_next_bar(self, timestamp: datetime.datetime, o: float, h: float, l: float, c: float, volume: float = 0.0) -> Bar:
+        """Builds a Bar carrying the next 1-based index this analyzer expects."""
+        return Bar(timestamp=timestamp, o=o, h=h, l=l, c=c, volume=volume, index=self.current_bar_index + 1)
+
     def process_new_bar(self, new_bar: Bar) -> List[dict]:
         """
-        Process a new bar as it arrives, returning any new trend start signals.
+        Process a new bar as it arrives, returning any newly confirmed trend start signals.
         Only uses historical data available up to this point.
+
+        Signals already emitted for an earlier bar (same confirmed bar and signal type)
+        are not repeated.
         
         Args:
-            new_bar (Bar): The new bar to process
+            new_bar (Bar): The new bar to process. Its index must be current_bar_index + 1.
             
         Returns:
             List[dict]: Any new trend start signals detected on this bar
         """
+        if new_bar.index != self.current_bar_index + 1:
+            raise ValueError(f"Expected bar index {self.current_bar_index + 1}, got {new_bar.index}")
+
         # Add the new bar to our historical record
         self.historical_bars.append(new_bar)
         self.current_bar_index += 1
-        
-        log_index_for_this_entry = self.current_bar_index
-        current_bar_event_descriptions = []
-        current_bar = new_bar
-        
-        # Log current bar processing
-        trend_utils.log_debug(log_index_for_this_entry, 
-                             f"Forward Test - Processing Bar {log_index_for_this_entry} ({current_bar.date})", 
-                             current_bar, self.state)
-        trend_utils.log_debug(log_index_for_this_entry, 
-                             f"Bar OHLCV: O:{current_bar.o} H:{current_bar.h} L:{current_bar.l} C:{current_bar.c} V:{current_bar.volume}", 
-                             current_bar, self.state)
-        
-        # First bar has no previous bars to compare
-        if len(self.historical_bars) == 1:
-            trend_utils.log_debug(log_index_for_this_entry, "First bar, no previous bar for comparison.", current_bar, self.state)
-            return []
-        
-        # Get previous bars (only historical data available)
-        prev_bar = self.historical_bars[-2]  # Previous bar
-        bar_before_prev_bar = self.historical_bars[-3] if len(self.historical_bars) >= 3 else None
-        
+
+        raw_signals: List[dict] = []
+        with trend_utils.debug_collection(self.debug_collector):
+            trend_start_og_fixed.process_bar_at_index(
+                self.current_bar_index - 1, self.historical_bars, self.state, raw_signals,
+                self.contract_id, self.timeframe_str
+            )
+
         signals_for_this_bar = []
-        cus_confirmed_this_iteration = False
-        cds_confirmed_this_iteration = False
-        
-        # Get current state
-        initial_pus_candidate_idx = self.state.pus_candidate_for_cus_bar_index
-        initial_pus_candidate_bar_obj = self.historical_bars[initial_pus_candidate_idx - 1] if initial_pus_candidate_idx else None
-        initial_pds_candidate_idx = self.state.pds_candidate_for_cds_bar_index
-        initial_pds_candidate_bar_obj = self.historical_bars[initial_pds_candidate_idx - 1] if initial_pds_candidate_idx else None
-        
-        # Log initial state
-        trend_utils.log_debug(log_index_for_this_entry, 
-            f"Initial State - PUS Candidate: Bar {initial_pus_candidate_idx if initial_pus_candidate_idx else 'None'} (L:{initial_pus_candidate_bar_obj.l if initial_pus_candidate_bar_obj else 'N/A'}) | "
-            f"PDS Candidate: Bar {initial_pds_candidate_idx if initial_pds_candidate_idx else 'None'} (H:{initial_pds_candidate_bar_obj.h if initial_pds_candidate_bar_obj else 'N/A'})",
-            current_bar, self.state)
-        
-        # --- PUS Invalidation due to Lower Low Break ---
-        # Only check among historical bars (no future data)
-        if initial_pus_candidate_bar_obj:
-            first_bar_to_check_1_based = initial_pus_candidate_bar_obj.index + 1
-            last_bar_to_check_1_based = current_bar.index - 2
-            
-            original_pus_candidate_index_for_log = initial_pus_candidate_bar_obj.index
-            
-            if first_bar_to_check_1_based <= last_bar_to_check_1_based:
-                for bar_1_idx_in_range in range(first_bar_to_check_1_based, last_bar_to_check_1_based + 1):
-                    bar_to_check_0_idx = bar_1_idx_in_range - 1
-                    if 0 <= bar_to_check_0_idx < len(self.historical_bars):
-                        if self.historical_bars[bar_to_check_0_idx].l < initial_pus_candidate_bar_obj.l:
-                            trend_utils.log_debug(log_index_for_this_entry, 
-                                      f"PUS Invalidation: PUS Candidate Bar {original_pus_candidate_index_for_log} (L:{initial_pus_candidate_bar_obj.l}) "
-                                      f"invalidated by Bar {self.historical_bars[bar_to_check_0_idx].index}'s Low ({self.historical_bars[bar_to_check_0_idx].l}).", 
-                                      current_bar, self.state)
-                            self.state._reset_all_pending_uptrend_states()
-                            current_bar_event_descriptions.append(
-                                f"PUS Candidate at Bar {original_pus_candidate_index_for_log} invalidated by lower low before Bar {current_bar.index}."
-                            )
-                            initial_pus_candidate_bar_obj = None
-                            initial_pus_candidate_idx = None
-                            break
-        
-        # Handle containment logic
-        signal_logic._handle_containment_logic(current_bar, self.state, initial_pds_candidate_bar_obj, initial_pus_candidate_bar_obj, current_bar_event_descriptions)
-        
-        # Evaluate CUS rules (only using historical bars)
-        can_confirm_cus, cus_trigger_rule_type = cus_rules._evaluate_cus_rules(
-            current_bar, prev_bar, initial_pus_candidate_bar_obj, initial_pds_candidate_bar_obj, self.state, self.historical_bars
-        )
-        
-        # Evaluate CDS rules (only using historical bars)
-        can_confirm_cds, cds_trigger_rule_type = cds_rules._evaluate_cds_rules(
-            current_bar, prev_bar, initial_pds_candidate_bar_obj, self.historical_bars, self.state
-        )
-        
-        # Process CUS confirmation
-        if can_confirm_cus:
-            cus_confirmed_this_iteration = True
-            confirmed_bar_for_this_cus = initial_pus_candidate_bar_obj
-            
-            # Handle forced alternation before primary CUS signal
-            if self.state.last_confirmed_trend_type == 'uptrend' and \
-               self.state.last_confirmed_trend_bar_index and confirmed_bar_for_this_cus and \
-               confirmed_bar_for_this_cus.index > self.state.last_confirmed_trend_bar_index:
-                forced_dt_bar = trend_utils.find_intervening_bar_for_forced_trend(
-                    self.historical_bars, self.state.last_confirmed_trend_bar_index, confirmed_bar_for_this_cus.index, find_lowest_low_for_forced_cus=False
-                )
-                if forced_dt_bar:
-                    forced_signal = self._create_signal_dict(forced_dt_bar, "downtrend_start", current_bar.index, f"FORCED_by_CUS_{cus_trigger_rule_type}")
-                    signals_for_this_bar.append(forced_signal)
-                    self.signals_found.append(forced_signal)
-                    current_bar_event_descriptions.append(f"Confirmed Downtrend Start from Bar {forced_dt_bar.index} ({forced_dt_bar.date}) # FORCED by CUS_{cus_trigger_rule_type} @ {confirmed_bar_for_this_cus.index}")
-            
-            # Add primary CUS signal
-            cus_signal = self._create_signal_dict(confirmed_bar_for_this_cus, "uptrend_start", current_bar.index, cus_trigger_rule_type)
-            signals_for_this_bar.append(cus_signal)
-            self.signals_found.append(cus_signal)
-            cus_rules._apply_cus_confirmation(current_bar, confirmed_bar_for_this_cus, cus_trigger_rule_type, self.state, self.historical_bars, current_bar_event_descriptions)
-        
-        # Process CDS confirmation
-        if can_confirm_cds:
-            cds_confirmed_this_iteration = True
-            confirmed_bar_for_this_cds = initial_pds_candidate_bar_obj
-            
-            # Handle forced alternation before primary CDS signal
-            if self.state.last_confirmed_trend_type == 'downtrend' and \
-               self.state.last_confirmed_trend_bar_index and confirmed_bar_for_this_cds and \
-               confirmed_bar_for_this_cds.index > self.state.last_confirmed_trend_bar_index:
-                forced_ut_bar = trend_utils.find_intervening_bar_for_forced_trend(
-                    self.historical_bars, self.state.last_confirmed_trend_bar_index, confirmed_bar_for_this_cds.index, find_lowest_low_for_forced_cus=True
-                )
-                if forced_ut_bar:
-                    forced_signal = self._create_signal_dict(forced_ut_bar, "uptrend_start", current_bar.index, f"FORCED_by_CDS_{cds_trigger_rule_type}")
-                    signals_for_this_bar.append(forced_signal)
-                    self.signals_found.append(forced_signal)
-                    current_bar_event_descriptions.append(f"Confirmed Uptrend Start from Bar {forced_ut_bar.index} ({forced_ut_bar.date}) # FORCED by CDS_{cds_trigger_rule_type} @ {confirmed_bar_for_this_cds.index}")
-            
-            # Add primary CDS signal
-            cds_signal = self._create_signal_dict(confirmed_bar_for_this_cds, "downtrend_start", current_bar.index, cds_trigger_rule_type)
-            signals_for_this_bar.append(cds_signal)
-            self.signals_found.append(cds_signal)
-            cds_rules._apply_cds_confirmation(confirmed_bar_for_this_cds, self.state, self.historical_bars, initial_pus_candidate_bar_obj, current_bar_event_descriptions)
-        
-        # Check for new pending signals
-        signal_logic._check_and_set_new_pending_signals(current_bar, prev_bar, bar_before_prev_bar, self.state, cds_confirmed_this_iteration, cus_confirmed_this_iteration, current_bar_event_descriptions)
-        
-        # Log summary for this bar
-        if current_bar_event_descriptions:
-            unique_events = trend_utils.get_unique_sorted_events(current_bar_event_descriptions)
-            final_log_text_for_bar = "; ".join(unique_events)
-            trend_utils.log_debug(log_index_for_this_entry, f"Bar Summary: {final_log_text_for_bar}", current_bar, self.state)
-        else:
-            trend_utils.log_debug(log_index_for_this_entry, "Bar Summary: Neutral (no specific events).", current_bar, self.state)
-        
+        for sig in raw_signals:
+            key = (sig['details']['confirmed_signal_bar_index'], sig['signal_type'])
+            if key not in self._emitted_signal_keys:
+                self._emitted_signal_keys.add(key)
+                signals_for_this_bar.append(sig)
+        self.signals_found.extend(signals_for_this_bar)
         return signals_for_this_bar
     
     def get_all_signals(self) -> List[dict]:
-        """Get all signals found so far."""
-        # Sort and de-duplicate signals
-        signals_sorted = sorted(self.signals_found, key=lambda s: (s['details']['confirmed_signal_bar_index'], 0 if s['signal_type'] == 'downtrend_start' else 1, s['details']['triggering_bar_index']))
-        unique_signals_deduped = []
-        seen_keys = set()
-        for sig in signals_sorted:
-            key = (sig['details']['confirmed_signal_bar_index'], sig['signal_type'])
-            if key not in seen_keys:
-                seen_keys.add(key)
-                unique_signals_deduped.append(sig)
-        return unique_signals_deduped
+        """Get all signals found so far, in the same order as process_trend_logic returns them."""
+        return sorted(self.signals_found, key=lambda s: (s['details']['confirmed_signal_bar_index'], 0 if s['signal_type'] == 'downtrend_start' else 1, s['details']['triggering_bar_index']))
     
     def get_debug_logs(self) -> List[dict]:
-        """Get debug logs collected during processing."""
-        return trend_utils.get_and_clear_debug_logs()
+        """Get (and clear) the debug logs collected by this analyzer since the last call."""
+        return self.debug_collector.get_and_clear()
+
+    def to_checkpoint(self) -> Dict[str, Any]:
+        """
+        Serialises the analyzer (state, bar history and emitted signal keys) to a
+        JSON-compatible dict. Signals themselves are not included; they have already
+        been handed to the caller.
+        """
+        state_fields = {k: v for k, v in vars(self.state).items() if k != 'log_entries'}
+        return {
+            'version': self.CHECKPOINT_VERSION,
+            'contract_id': self.contract_id,
+            'timeframe_str': self.timeframe_str,
+            'state': state_fields,
+            'bars': [
+                [b.timestamp.isoformat(), b.o, b.h, b.l, b.c, b.volume]
+                for b in self.historical_bars
+            ],
+            'emitted_signal_keys': sorted([idx, sig_type] for idx, sig_type in self._emitted_signal_keys),
+        }
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint: Dict[str, Any]) -> 'ForwardTrendAnalyzer':
+        """Restores an analyzer previously serialised with to_checkpoint()."""
+        if checkpoint.get('version') != cls.CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {checkpoint.get('version')}")
+        analyzer = cls(checkpoint.get('contract_id', ''), checkpoint.get('timeframe_str', ''))
+        for field_name, value in checkpoint['state'].items():
+            setattr(analyzer.state, field_name, value)
+        for i, (ts_str, o, h, l, c, volume) in enumerate(checkpoint['bars']):
+            analyzer.historical_bars.append(Bar(
+                timestamp=datetime.datetime.fromisoformat(ts_str), o=o, h=h, l=l, c=c, volume=volume, index=i + 1
+            ))
+        analyzer.current_bar_index = len(analyzer.historical_bars)
+        analyzer._emitted_signal_keys = {(idx, sig_type) for idx, sig_type in checkpoint['emitted_signal_keys']}
+        return analyzer
 
 def run_forward_test_simulation(all_bars: List[Bar], contract_id: str = "", timeframe_str: str = "") -> Tuple[List[dict], List[dict]]:
     """
@@ -12,6 +12,8 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from trend_analysis.trend_models import Bar, State
+from trend_analysis.range_index import BarSeries
+from trend_analysis.bar_store import BarStore
 import trend_analysis.trend_utils as trend_utils
 import trend_analysis.trend_patterns as trend_patterns
 import trend_analysis.cus_rules as cus_rules
@@ -46,14 +48,158 @@ def _create_signal_dict(bar_obj: Bar, signal_type: str, triggering_bar_index: in
         }
     }
 
-def process_trend_logic(all_bars: List[Bar], contract_id: str = "", timeframe_str: str = ""):
+def process_bar_at_index(k: int, all_bars: List[Bar], state: State, signals_found: List[dict], contract_id: str = "", timeframe_str: str = ""):
+    """
+    Runs the trend logic for a single bar, ``all_bars[k]``, against the running ``state``.
+
+    This is the per-bar step shared by the batch loop in ``process_trend_logic`` and the
+    bar-at-a-time ``ForwardTrendAnalyzer``, so both paths produce identical signals.
+    Only ``all_bars[:k + 1]`` is read.
+
+    Args:
+        k (int): 0-based position of the bar to process in all_bars.
+        all_bars (list[Bar]): Bars in chronological order (bar.index == position + 1).
+        state (State): The running analysis state, mutated in place.
+        signals_found (list[dict]): Raw (not yet de-duplicated) signals are appended here.
+        contract_id (str): Optional contract ID for enriching signal data.
+        timeframe_str (str): Optional timeframe string for enriching signal data.
+    """
+    log_index_for_this_entry = k + 1
+    current_bar_event_descriptions = []
+    current_bar = all_bars[k]
+
+    # Pass current_bar and state to log_debug for richer context
+    trend_utils.log_debug(log_index_for_this_entry, lambda: f"Processing Bar {log_index_for_this_entry} ({current_bar.date})", current_bar, state)
+    trend_utils.log_debug(log_index_for_this_entry, lambda: f"Bar OHLCV: O:{current_bar.o} H:{current_bar.h} L:{current_bar.l} C:{current_bar.c} V:{current_bar.volume}", current_bar, state)
+
+    if k == 0:
+        # state.log_entries.append(f"{log_index_for_this_entry}. Nothing") # Old log style
+        trend_utils.log_debug(log_index_for_this_entry, "First bar, no previous bar for comparison.", current_bar, state)
+        return
+    
+    prev_bar = all_bars[k-1]
+    bar_before_prev_bar = all_bars[k-2] if k >= 2 else None
+    
+    cus_confirmed_this_iteration = False
+    cds_confirmed_this_iteration = False
+
+    initial_pus_candidate_idx = state.pus_candidate_for_cus_bar_index
+    initial_pus_candidate_bar_obj = all_bars[initial_pus_candidate_idx - 1] if initial_pus_candidate_idx else None
+    initial_pds_candidate_idx = state.pds_candidate_for_cds_bar_index
+    initial_pds_candidate_bar_obj = all_bars[initial_pds_candidate_idx - 1] if initial_pds_candidate_idx else None
+
+    trend_utils.log_debug(log_index_for_this_entry, 
+        lambda: f"Initial State - PUS Candidate: Bar {initial_pus_candidate_idx if initial_pus_candidate_idx else 'None'} (L:{initial_pus_candidate_bar_obj.l if initial_pus_candidate_bar_obj else 'N/A'}) | "
+        f"PDS Candidate: Bar {initial_pds_candidate_idx if initial_pds_candidate_idx else 'None'} (H:{initial_pds_candidate_bar_obj.h if initial_pds_candidate_bar_obj else 'N/A'})",
+        current_bar, state)
+    trend_utils.log_debug(log_index_for_this_entry, lambda: f"Initial State - Last Confirmed Trend: {state.last_confirmed_trend_type} at Bar {state.last_confirmed_trend_bar_index if state.last_confirmed_trend_bar_index else 'None'}", current_bar, state)
+    trend_utils.log_debug(log_index_for_this_entry, lambda: f"Initial State - Containment: {state.in_containment} (Ref Bar: {state.containment_ref_bar_index if state.containment_ref_bar_index else 'None'}, H:{state.containment_ref_high if state.containment_ref_high else 'N/A'}, L:{state.containment_ref_low if state.containment_ref_low else 'N/A'}, Start Bar: {state.containment_start_bar_index_for_log if state.containment_start_bar_index_for_log else 'None'}, Consecutive Inside: {state.containment_consecutive_bars_inside})", current_bar, state)
+
+    # --- PUS Invalidation due to Lower Low Break ---
+    # Check if the initial PUS candidate (if any) has been invalidated by a lower low
+    # occurring between the PUS candidate bar and the bar *before* current_bar.
+    if initial_pus_candidate_bar_obj: # A PUS candidate must exist to be invalidated
+        # Determine the range of bars to check for a lower low
+        # Start checking from the bar immediately *after* the PUS candidate
+        # PUS candidate bar has 1-based index: initial_pus_candidate_bar_obj.index
+        # So, its 0-based index in all_bars is initial_pus_candidate_bar_obj.index - 1
+        
+        # We check bars from (PUS_candidate_index + 1) up to (current_bar_index - 1) [1-based indices]
+        first_bar_to_check_1_based = initial_pus_candidate_bar_obj.index + 1
+        # MODIFICATION: Check up to bar_before_prev_bar, so prev_bar (potential CUS trigger) is not included
+        last_bar_to_check_1_based = current_bar.index - 2
+
+        original_pus_candidate_index_for_log = initial_pus_candidate_bar_obj.index # Store for logging
+
+        # Range min-low query instead of walking every bar in between
+        lowest_bar_in_range = trend_utils.range_min_low_bar(all_bars, first_bar_to_check_1_based, last_bar_to_check_1_based)
+        if lowest_bar_in_range is not None and lowest_bar_in_range.l < initial_pus_candidate_bar_obj.l:
+            if trend_utils.debug_enabled(log_index_for_this_entry):
+                # The first offending bar is only needed for the log message
+                invalidating_bar = trend_utils.first_bar_with_low_below(
+                    all_bars, first_bar_to_check_1_based, last_bar_to_check_1_based, initial_pus_candidate_bar_obj.l
+                )
+                trend_utils.log_debug(log_index_for_this_entry, 
+                          f"PUS Invalidation: PUS Candidate Bar {original_pus_candidate_index_for_log} (L:{initial_pus_candidate_bar_obj.l}) "
+                          f"invalidated by Bar {invalidating_bar.index}'s Low ({invalidating_bar.l}).", current_bar, state)
+            state._reset_all_pending_uptrend_states()
+            current_bar_event_descriptions.append(
+                f"PUS Candidate at Bar {original_pus_candidate_index_for_log} invalidated by lower low before Bar {current_bar.index}."
+            )
+            initial_pus_candidate_bar_obj = None # Nullify for current iteration's CUS eval
+            initial_pus_candidate_idx = None     # Nullify its 1-based index too
+
+    signal_logic._handle_containment_logic(current_bar, state, initial_pds_candidate_bar_obj, initial_pus_candidate_bar_obj, current_bar_event_descriptions)
+
+    can_confirm_cus, cus_trigger_rule_type = cus_rules._evaluate_cus_rules(
+        current_bar, prev_bar, initial_pus_candidate_bar_obj, initial_pds_candidate_bar_obj, state, all_bars
+    )
+
+    can_confirm_cds, cds_trigger_rule_type = cds_rules._evaluate_cds_rules(
+        current_bar, prev_bar, initial_pds_candidate_bar_obj, all_bars, state
+    )
+
+    if can_confirm_cus:
+        cus_confirmed_this_iteration = True
+        confirmed_bar_for_this_cus = initial_pus_candidate_bar_obj
+        
+        # Handle forced alternation before primary CUS signal
+        if state.last_confirmed_trend_type == 'uptrend' and \
+           state.last_confirmed_trend_bar_index and confirmed_bar_for_this_cus and \
+           confirmed_bar_for_this_cus.index > state.last_confirmed_trend_bar_index:
+            forced_dt_bar = trend_utils.find_intervening_bar_for_forced_trend(
+                all_bars, state.last_confirmed_trend_bar_index, confirmed_bar_for_this_cus.index, find_lowest_low_for_forced_cus=False
+            )
+            if forced_dt_bar:
+                signals_found.append(_create_signal_dict(forced_dt_bar, "downtrend_start", current_bar.index, f"FORCED_by_CUS_{cus_trigger_rule_type}", contract_id, timeframe_str))
+                current_bar_event_descriptions.append(f"Confirmed Downtrend Start from Bar {forced_dt_bar.index} ({forced_dt_bar.date}) # FORCED by CUS_{cus_trigger_rule_type} @ {confirmed_bar_for_this_cus.index}")
+                # This forced signal also updates the last_confirmed_trend in state via state.confirm_downtrend if we call it here
+                # For now, State.confirm_uptrend will handle its own alternation check too.
+
+        signals_found.append(_create_signal_dict(confirmed_bar_for_this_cus, "uptrend_start", current_bar.index, cus_trigger_rule_type, contract_id, timeframe_str))
+        cus_rules._apply_cus_confirmation(current_bar, confirmed_bar_for_this_cus, cus_trigger_rule_type, state, all_bars, current_bar_event_descriptions)
+    
+    if can_confirm_cds:
+        cds_confirmed_this_iteration = True
+        confirmed_bar_for_this_cds = initial_pds_candidate_bar_obj
+
+        # Handle forced alternation before primary CDS signal
+        if state.last_confirmed_trend_type == 'downtrend' and \
+           state.last_confirmed_trend_bar_index and confirmed_bar_for_this_cds and \
+           confirmed_bar_for_this_cds.index > state.last_confirmed_trend_bar_index:
+            forced_ut_bar = trend_utils.find_intervening_bar_for_forced_trend(
+                all_bars, state.last_confirmed_trend_bar_index, confirmed_bar_for_this_cds.index, find_lowest_low_for_forced_cus=True
+            )
+            if forced_ut_bar:
+                signals_found.append(_create_signal_dict(forced_ut_bar, "uptrend_start", current_bar.index, f"FORCED_by_CDS_{cds_trigger_rule_type}", contract_id, timeframe_str))
+                current_bar_event_descriptions.append(f"Confirmed Uptrend Start from Bar {forced_ut_bar.index} ({forced_ut_bar.date}) # FORCED by CDS_{cds_trigger_rule_type} @ {confirmed_bar_for_this_cds.index}")
+
+        signals_found.append(_create_signal_dict(confirmed_bar_for_this_cds, "downtrend_start", current_bar.index, cds_trigger_rule_type, contract_id, timeframe_str))
+        cds_rules._apply_cds_confirmation(confirmed_bar_for_this_cds, state, all_bars, initial_pus_candidate_bar_obj, current_bar_event_descriptions)
+
+    signal_logic._check_and_set_new_pending_signals(current_bar, prev_bar, bar_before_prev_bar, state, cds_confirmed_this_iteration, cus_confirmed_this_iteration, current_bar_event_descriptions)
+
+    # Log final unique events for this bar for traceability if needed, though debug logs are primary now
+    if not trend_utils.debug_enabled(log_index_for_this_entry):
+        return
+    if current_bar_event_descriptions:
+        unique_events = trend_utils.get_unique_sorted_events(current_bar_event_descriptions)
+        final_log_text_for_bar = "; ".join(unique_events)
+        trend_utils.log_debug(log_index_for_this_entry, f"Bar Summary: {final_log_text_for_bar}", current_bar, state)
+    else:
+        trend_utils.log_debug(log_index_for_this_entry, "Bar Summary: Neutral (no specific events).", current_bar, state)
+
+def process_trend_logic(all_bars: List[Bar], contract_id: str = "", timeframe_str: str = "", debug_collector: trend_utils.DebugLogCollector = None):
     """
     Main logic for processing bars to identify price direction signals and confirmations.
 
     Args:
-        all_bars (list[Bar]): A list of Bar objects, in chronological order.
+        all_bars (list[Bar] | BarStore): Bars in chronological order. A BarStore is used
+            as-is; a plain list is wrapped in a BarSeries to get the range index.
         contract_id (str): Optional contract ID for enriching signal data.
         timeframe_str (str): Optional timeframe string for enriching signal data.
+        debug_collector (DebugLogCollector, optional): Collector (and debug range) for this run.
+            Defaults to a fresh collector that follows the module-level DEBUG_* flags.
 
     Returns:
         tuple: (list[dict], list[dict])
@@ -63,135 +209,20 @@ def process_trend_logic(all_bars: List[Bar], contract_id: str = "", timeframe_st
     if not all_bars:
         return [], []
 
-    state = State()
-    signals_found = []
-    # Ensure debug logs are cleared at the start of processing for this run
-    trend_utils.get_and_clear_debug_logs() # Clear any prior logs
-
-    for k in range(len(all_bars)):
-        log_index_for_this_entry = k + 1
-        current_bar_event_descriptions = []
-        current_bar = all_bars[k]
-
-        # Pass current_bar and state to log_debug for richer context
-        trend_utils.log_debug(log_index_for_this_entry, f"Processing Bar {log_index_for_this_entry} ({current_bar.date})", current_bar, state)
-        trend_utils.log_debug(log_index_for_this_entry, f"Bar OHLCV: O:{current_bar.o} H:{current_bar.h} L:{current_bar.l} C:{current_bar.c} V:{current_bar.volume}", current_bar, state)
-
-        if k == 0:
-            # state.log_entries.append(f"{log_index_for_this_entry}. Nothing") # Old log style
-            trend_utils.log_debug(log_index_for_this_entry, "First bar, no previous bar for comparison.", current_bar, state)
-            continue
-        
-        prev_bar = all_bars[k-1]
-        bar_before_prev_bar = all_bars[k-2] if k >= 2 else None
-        
-        cus_confirmed_this_iteration = False
-        cds_confirmed_this_iteration = False
-
-        initial_pus_candidate_idx = state.pus_candidate_for_cus_bar_index
-        initial_pus_candidate_bar_obj = all_bars[initial_pus_candidate_idx - 1] if initial_pus_candidate_idx else None
-        initial_pds_candidate_idx = state.pds_candidate_for_cds_bar_index
-        initial_pds_candidate_bar_obj = all_bars[initial_pds_candidate_idx - 1] if initial_pds_candidate_idx else None
-
-        trend_utils.log_debug(log_index_for_this_entry, 
-            f"Initial State - PUS Candidate: Bar {initial_pus_candidate_idx if initial_pus_candidate_idx else 'None'} (L:{initial_pus_candidate_bar_obj.l if initial_pus_candidate_bar_obj else 'N/A'}) | "
-            f"PDS Candidate: Bar {initial_pds_candidate_idx if initial_pds_candidate_idx else 'None'} (H:{initial_pds_candidate_bar_obj.h if initial_pds_candidate_bar_obj else 'N/A'})",
-            current_bar, state)
-        trend_utils.log_debug(log_index_for_this_entry, f"Initial State - Last Confirmed Trend: {state.last_confirmed_trend_type} at Bar {state.last_confirmed_trend_bar_index if state.last_confirmed_trend_bar_index else 'None'}", current_bar, state)
-        trend_utils.log_debug(log_index_for_this_entry, f"Initial State - Containment: {state.in_containment} (Ref Bar: {state.containment_ref_bar_index if state.containment_ref_bar_index else 'None'}, H:{state.containment_ref_high if state.containment_ref_high else 'N/A'}, L:{state.containment_ref_low if state.containment_ref_low else 'N/A'}, Start Bar: {state.containment_start_bar_index_for_log if state.containment_start_bar_index_for_log else 'None'}, Consecutive Inside: {state.containment_consecutive_bars_inside})", current_bar, state)
-
-        # --- PUS Invalidation due to Lower Low Break ---
-        # Check if the initial PUS candidate (if any) has been invalidated by a lower low
-        # occurring between the PUS candidate bar and the bar *before* current_bar.
-        if initial_pus_candidate_bar_obj: # A PUS candidate must exist to be invalidated
-            # Determine the range of bars to check for a lower low
-            # Start checking from the bar immediately *after* the PUS candidate
-            # PUS candidate bar has 1-based index: initial_pus_candidate_bar_obj.index
-            # So, its 0-based index in all_bars is initial_pus_candidate_bar_obj.index - 1
-            
-            # We check bars from (PUS_candidate_index + 1) up to (current_bar_index - 1) [1-based indices]
-            first_bar_to_check_1_based = initial_pus_candidate_bar_obj.index + 1
-            # MODIFICATION: Check up to bar_before_prev_bar, so prev_bar (potential CUS trigger) is not included
-            last_bar_to_check_1_based = current_bar.index - 2
-
-            original_pus_candidate_index_for_log = initial_pus_candidate_bar_obj.index # Store for logging
-
-            if first_bar_to_check_1_based <= last_bar_to_check_1_based: # Ensure there's a valid range
-                for bar_1_idx_in_range in range(first_bar_to_check_1_based, last_bar_to_check_1_based + 1):
-                    bar_to_check_0_idx = bar_1_idx_in_range -1 # Convert to 0-based for all_bars access
-                    if 0 <= bar_to_check_0_idx < len(all_bars): # Bounds check
-                        if all_bars[bar_to_check_0_idx].l < initial_pus_candidate_bar_obj.l:
-                            trend_utils.log_debug(log_index_for_this_entry, 
-                                      f"PUS Invalidation: PUS Candidate Bar {original_pus_candidate_index_for_log} (L:{initial_pus_candidate_bar_obj.l}) "
-                                      f"invalidated by Bar {all_bars[bar_to_check_0_idx].index}'s Low ({all_bars[bar_to_check_0_idx].l}).", current_bar, state)
-                            state._reset_all_pending_uptrend_states()
-                            current_bar_event_descriptions.append(
-                                f"PUS Candidate at Bar {original_pus_candidate_index_for_log} invalidated by lower low before Bar {current_bar.index}."
-                            )
-                            initial_pus_candidate_bar_obj = None # Nullify for current iteration's CUS eval
-                            initial_pus_candidate_idx = None     # Nullify its 1-based index too
-                            break # Stop checking once invalidated
-
-        signal_logic._handle_containment_logic(current_bar, state, initial_pds_candidate_bar_obj, initial_pus_candidate_bar_obj, current_bar_event_descriptions)
-
-        can_confirm_cus, cus_trigger_rule_type = cus_rules._evaluate_cus_rules(
-            current_bar, prev_bar, initial_pus_candidate_bar_obj, initial_pds_candidate_bar_obj, state, all_bars
-        )
-
-        can_confirm_cds, cds_trigger_rule_type = cds_rules._evaluate_cds_rules(
-            current_bar, prev_bar, initial_pds_candidate_bar_obj, all_bars, state
-        )
-
-        if can_confirm_cus:
-            cus_confirmed_this_iteration = True
-            confirmed_bar_for_this_cus = initial_pus_candidate_bar_obj
-            
-            # Handle forced alternation before primary CUS signal
-            if state.last_confirmed_trend_type == 'uptrend' and \
-               state.last_confirmed_trend_bar_index and confirmed_bar_for_this_cus and \
-               confirmed_bar_for_this_cus.index > state.last_confirmed_trend_bar_index:
-                forced_dt_bar = trend_utils.find_intervening_bar_for_forced_trend(
-                    all_bars, state.last_confirmed_trend_bar_index, confirmed_bar_for_this_cus.index, find_lowest_low_for_forced_cus=False
-                )
-                if forced_dt_bar:
-                    signals_found.append(_create_signal_dict(forced_dt_bar, "downtrend_start", current_bar.index, f"FORCED_by_CUS_{cus_trigger_rule_type}", contract_id, timeframe_str))
-                    current_bar_event_descriptions.append(f"Confirmed Downtrend Start from Bar {forced_dt_bar.index} ({forced_dt_bar.date}) # FORCED by CUS_{cus_trigger_rule_type} @ {confirmed_bar_for_this_cus.index}")
-                    # This forced signal also updates the last_confirmed_trend in state via state.confirm_downtrend if we call it here
-                    # For now, State.confirm_uptrend will handle its own alternation check too.
-
-            signals_found.append(_create_signal_dict(confirmed_bar_for_this_cus, "uptrend_start", current_bar.index, cus_trigger_rule_type, contract_id, timeframe_str))
-            cus_rules._apply_cus_confirmation(current_bar, confirmed_bar_for_this_cus, cus_trigger_rule_type, state, all_bars, current_bar_event_descriptions)
-        
-        if can_confirm_cds:
-            cds_confirmed_this_iteration = True
-            confirmed_bar_for_this_cds = initial_pds_candidate_bar_obj
-
-            # Handle forced alternation before primary CDS signal
-            if state.last_confirmed_trend_type == 'downtrend' and \
-               state.last_confirmed_trend_bar_index and confirmed_bar_for_this_cds and \
-               confirmed_bar_for_this_cds.index > state.last_confirmed_trend_bar_index:
-                forced_ut_bar = trend_utils.find_intervening_bar_for_forced_trend(
-                    all_bars, state.last_confirmed_trend_bar_index, confirmed_bar_for_this_cds.index, find_lowest_low_for_forced_cus=True
-                )
-                if forced_ut_bar:
-                    signals_found.append(_create_signal_dict(forced_ut_bar, "uptrend_start", current_bar.index, f"FORCED_by_CDS_{cds_trigger_rule_type}", contract_id, timeframe_str))
-                    current_bar_event_descriptions.append(f"Confirmed Uptrend Start from Bar {forced_ut_bar.index} ({forced_ut_bar.date}) # FORCED by CDS_{cds_trigger_rule_type} @ {confirmed_bar_for_this_cds.index}")
-
-            signals_found.append(_create_signal_dict(confirmed_bar_for_this_cds, "downtrend_start", current_bar.index, cds_trigger_rule_type, contract_id, timeframe_str))
-            cds_rules._apply_cds_confirmation(confirmed_bar_for_this_cds, state, all_bars, initial_pus_candidate_bar_obj, current_bar_event_descriptions)
+    if not isinstance(all_bars, (BarSeries, BarStore)):
+        all_bars = BarSeries(all_bars) # Builds the range max-high/min-low index used by the rules
 
-        signal_logic._check_and_set_new_pending_signals(current_bar, prev_bar, bar_before_prev_bar, state, cds_confirmed_this_iteration, cus_confirmed_this_iteration, current_bar_event_descriptions)
-
-        # Log final unique events for this bar for traceability if needed, though debug logs are primary now
-        if current_bar_event_descriptions:
-            unique_events = trend_utils.get_unique_sorted_events(current_bar_event_descriptions)
-            final_log_text_for_bar = "; ".join(unique_events)
-            trend_utils.log_debug(log_index_for_this_entry, f"Bar Summary: {final_log_text_for_bar}", current_bar, state)
-        else:
-            trend_utils.log_debug(log_index_for_this_entry, "Bar Summary: Neutral (no specific events).", current_bar, state)
+    # Per-run collector so concurrent analyses don't interleave their debug logs
+    if debug_collector is None:
+        debug_collector = trend_utils.DebugLogCollector()
+    signals_found = []
+    with trend_utils.debug_collection(debug_collector):
+        state = State()
+        for k in range(len(all_bars)):
+            process_bar_at_index(k, all_bars, state, signals_found, contract_id, timeframe_str)
 
-    # Collect all debug logs from trend_utils
-    debug_log_entries = trend_utils.get_and_clear_debug_logs()
+    # Collect all debug logs from this run's collector
+    debug_log_entries = debug_collector.get_and_clear()
     
     # Sort and de-duplicate signals before returning
     signals_found.sort(key=lambda s: (s['details']['confirmed_signal_bar_index'], 0 if s['signal_type'] == 'downtrend_start' else 1, s['details']['triggering_bar_index']))
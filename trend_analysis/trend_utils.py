@@ -1,56 +1,114 @@
+import contextlib
+import contextvars
 import csv
 import datetime
 
-# Global debug flags, to be set by command-line arguments
+# Global debug flags, to be set by command-line arguments.
+# These are the defaults for any DebugLogCollector that does not set its own range.
 DEBUG_MODE_ACTIVE = False
 DEBUG_START_INDEX = -1
 DEBUG_END_INDEX = -1
 
-# List to store debug log entries
-_debug_log_entries_collector = []
+# --- Debug Log Collection ---
+class DebugLogCollector:
+    """
+    Collects debug log entries for one analysis run.
+
+    Each run (a process_trend_logic call, a ForwardTrendAnalyzer) owns its collector, so
+    concurrent analyses do not interleave their logs. ``active``/``start_index``/``end_index``
+    left as None fall back to the module-level DEBUG_* flags at check time.
+    """
+    def __init__(self, active=None, start_index=None, end_index=None):
+        self.active = active
+        self.start_index = start_index
+        self.end_index = end_index
+        self.entries = []
+
+    def enabled_for(self, bar_index):
+        """True if a log_debug call for bar_index would record an entry."""
+        active = DEBUG_MODE_ACTIVE if self.active is None else self.active
+        if not active:
+            return False
+        start = DEBUG_START_INDEX if self.start_index is None else self.start_index
+        end = DEBUG_END_INDEX if self.end_index is None else self.end_index
+        return start <= bar_index <= end
+
+    def get_and_clear(self):
+        """Returns all collected entries and clears the collector."""
+        entries, self.entries = self.entries, []
+        return entries
+
+# Used by log_debug when no run has installed its own collector via debug_collection()
+_default_debug_collector = DebugLogCollector()
+_active_debug_collector = contextvars.ContextVar('trend_analysis_debug_collector', default=None)
+
+def _current_debug_collector():
+    return _active_debug_collector.get() or _default_debug_collector
+
+@contextlib.contextmanager
+def debug_collection(collector):
+    """Routes log_debug calls in the current context (thread / asyncio task) to collector."""
+    token = _active_debug_collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _active_debug_collector.reset(token)
+
+def debug_enabled(bar_index):
+    """Cheap guard for callers that need to do extra work only when bar_index is being debugged."""
+    return _current_debug_collector().enabled_for(bar_index)
 
 # --- Debug Helper Function ---
 def log_debug(bar_index, message, current_bar_obj=None, state_obj=None):
-    """Adds a debug message to the collector if the current bar_index is within the debug range."""
-    global _debug_log_entries_collector
-    if DEBUG_MODE_ACTIVE and (DEBUG_START_INDEX <= bar_index <= DEBUG_END_INDEX):
-        entry = {
-            "event_timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-            "event_type": "STRATEGY_DEBUG",
-            "processing_bar_index": bar_index,
-            "message": message,
-        }
-        if current_bar_obj:
-            entry["processing_bar_timestamp"] = current_bar_obj.timestamp.isoformat()
-            entry["processing_bar_ohlc"] = f"O:{current_bar_obj.o},H:{current_bar_obj.h},L:{current_bar_obj.l},C:{current_bar_obj.c},V:{current_bar_obj.volume}"
-        if state_obj:
-            # Add relevant state fields to the debug entry
-            entry.update({
-                "pds_potential_idx": state_obj.pending_downtrend_start_bar_index,
-                "pds_anchor_h": state_obj.pending_downtrend_start_anchor_high,
-                "pds_candidate_idx": state_obj.pds_candidate_for_cds_bar_index,
-                "pds_candidate_h": state_obj.pds_candidate_for_cds_high,
-                "pds_candidate_l": state_obj.pds_candidate_for_cds_low,
-                "pus_potential_idx": state_obj.pending_uptrend_start_bar_index,
-                "pus_anchor_l": state_obj.pending_uptrend_start_anchor_low,
-                "pus_candidate_idx": state_obj.pus_candidate_for_cus_bar_index,
-                "pus_candidate_l": state_obj.pus_candidate_for_cus_low,
-                "pus_candidate_h": state_obj.pus_candidate_for_cus_high,
-                "in_containment": state_obj.in_containment,
-                "containment_ref_idx": state_obj.containment_ref_bar_index,
-                "containment_ref_type": state_obj.containment_ref_type,
-                "last_trend_type": state_obj.last_confirmed_trend_type,
-                "last_trend_idx": state_obj.last_confirmed_trend_bar_index,
-                "overall_trend_up": state_obj.current_confirmed_trend_is_uptrend
-            })
-        _debug_log_entries_collector.append(entry)
+    """
+    Adds a debug message to the current collector if bar_index is within the debug range.
+
+    ``message`` may be a string or a zero-argument callable returning one (e.g.
+    ``lambda: f"..."``); a callable is only invoked, and the bar/state snapshot only taken,
+    when the entry is actually recorded.
+    """
+    collector = _active_debug_collector.get() or _default_debug_collector
+    # Inlined "active" test keeps the disabled path to a single context lookup
+    if not (DEBUG_MODE_ACTIVE if collector.active is None else collector.active):
+        return
+    if not collector.enabled_for(bar_index):
+        return
+    if callable(message):
+        message = message()
+    entry = {
+        "event_timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "event_type": "STRATEGY_DEBUG",
+        "processing_bar_index": bar_index,
+        "message": message,
+    }
+    if current_bar_obj:
+        entry["processing_bar_timestamp"] = current_bar_obj.timestamp.isoformat()
+        entry["processing_bar_ohlc"] = f"O:{current_bar_obj.o},H:{current_bar_obj.h},L:{current_bar_obj.l},C:{current_bar_obj.c},V:{current_bar_obj.volume}"
+    if state_obj:
+        # Add relevant state fields to the debug entry
+        entry.update({
+            "pds_potential_idx": state_obj.pending_downtrend_start_bar_index,
+            "pds_anchor_h": state_obj.pending_downtrend_start_anchor_high,
+            "pds_candidate_idx": state_obj.pds_candidate_for_cds_bar_index,
+            "pds_candidate_h": state_obj.pds_candidate_for_cds_high,
+            "pds_candidate_l": state_obj.pds_candidate_for_cds_low,
+            "pus_potential_idx": state_obj.pending_uptrend_start_bar_index,
+            "pus_anchor_l": state_obj.pending_uptrend_start_anchor_low,
+            "pus_candidate_idx": state_obj.pus_candidate_for_cus_bar_index,
+            "pus_candidate_l": state_obj.pus_candidate_for_cus_low,
+            "pus_candidate_h": state_obj.pus_candidate_for_cus_high,
+            "in_containment": state_obj.in_containment,
+            "containment_ref_idx": state_obj.containment_ref_bar_index,
+            "containment_ref_type": state_obj.containment_ref_type,
+            "last_trend_type": state_obj.last_confirmed_trend_type,
+            "last_trend_idx": state_obj.last_confirmed_trend_bar_index,
+            "overall_trend_up": state_obj.current_confirmed_trend_is_uptrend
+        })
+    collector.entries.append(entry)
 
 def get_and_clear_debug_logs():
-    """Returns all collected debug logs and clears the internal collector."""
-    global _debug_log_entries_collector
-    logs_to_return = list(_debug_log_entries_collector)
-    _debug_log_entries_collector.clear()
-    return logs_to_return
+    """Returns all debug logs from the current collector and clears it."""
+    return _current_debug_collector().get_and_clear()
 
 # --- General Helper Functions ---
 def load_bars_from_alt_csv(filename="trend_analysis/data/CON.F.US.MES.M25_1d_ohlc.csv", BarClass=None):
@@ -146,11 +204,56 @@ def find_intervening_bar_for_forced_trend(all_bars, prev_confirmed_trend_bar_idx
     search_end_0idx = end_0idx - 1
     if search_start_0idx > search_end_0idx:
         return None
-    relevant_slice = all_bars[search_start_0idx : search_end_0idx + 1]
-    if not relevant_slice:
-        return None
     if find_lowest_low_for_forced_cus:
-        chosen_bar =  min(relevant_slice, key=lambda bar: bar.l)
+        chosen_bar = range_min_low_bar(all_bars, search_start_0idx + 1, search_end_0idx + 1)
     else:
-        chosen_bar = max(relevant_slice, key=lambda bar: bar.h)
-    return chosen_bar 
\ No newline at end of file
+        chosen_bar = range_max_high_bar(all_bars, search_start_0idx + 1, search_end_0idx + 1)
+    return chosen_bar
+
+# --- Range Extremum Helpers ---
+def _clamp_1based_range(all_bars, first_1based, last_1based):
+    """Converts an inclusive 1-based range to 0-based bounds clipped to all_bars."""
+    return max(first_1based - 1, 0), min(last_1based - 1, len(all_bars) - 1)
+
+def range_max_high_bar(all_bars, first_1based, last_1based):
+    """
+    Returns the bar with the highest high among bars first_1based..last_1based (inclusive,
+    1-based), or None if the range is empty. Ties resolve to the earliest bar.
+    Uses the sparse-table index when all_bars is a BarSeries, otherwise scans the slice.
+    """
+    first, last = _clamp_1based_range(all_bars, first_1based, last_1based)
+    if first > last:
+        return None
+    range_index = getattr(all_bars, 'range_index', None)
+    if range_index is not None:
+        return all_bars[range_index.argmax_high(first, last)]
+    return max(all_bars[first:last + 1], key=lambda bar: bar.h)
+
+def range_min_low_bar(all_bars, first_1based, last_1based):
+    """
+    Returns the bar with the lowest low among bars first_1based..last_1based (inclusive,
+    1-based), or None if the range is empty. Ties resolve to the earliest bar.
+    Uses the sparse-table index when all_bars is a BarSeries, otherwise scans the slice.
+    """
+    first, last = _clamp_1based_range(all_bars, first_1based, last_1based)
+    if first > last:
+        return None
+    range_index = getattr(all_bars, 'range_index', None)
+    if range_index is not None:
+        return all_bars[range_index.argmin_low(first, last)]
+    return min(all_bars[first:last + 1], key=lambda bar: bar.l)
+
+def first_bar_with_low_below(all_bars, first_1based, last_1based, threshold):
+    """
+    Returns the earliest bar among first_1based..last_1based (inclusive, 1-based) whose low
+    is strictly below threshold, or None. The range minimum is checked first, so the linear
+    walk only happens when such a bar exists.
+    """
+    lowest = range_min_low_bar(all_bars, first_1based, last_1based)
+    if lowest is None or not lowest.l < threshold:
+        return None
+    first, _ = _clamp_1based_range(all_bars, first_1based, last_1based)
+    for bar in all_bars[first:lowest.index]:
+        if bar.l < threshold:
+            return bar
+    return lowest
@@ -16,6 +16,10 @@ interface TrendAnalysisRequest {
   debug?: boolean;
 }
 
+// Long-lived analysis server (python3 -m src.services.trend_analysis_server); when it is not
+// reachable the route falls back to spawning trend_start_finder.py per request
+const TREND_ANALYSIS_SERVER_URL = process.env.TREND_ANALYSIS_SERVER_URL || 'http://127.0.0.1:8766';
+
 interface TrendStartSignal {
   signal_type: 'CUS' | 'CDS' | 'PUS' | 'PDS' | 'FORCED_CUS' | 'FORCED_CDS';
   bar_index: number;
@@ -41,16 +45,25 @@ export async function POST(request: NextRequest) {
     console.log(`[TrendAnalysis API] First 3 bars:`, body.bars.slice(0, 3));
     console.log(`[TrendAnalysis API] Last 3 bars:`, body.bars.slice(-3));
 
-    // Prepare data for Python script
-    const pythonInput = {
+    // Prefer the resident analysis server; spawn the Python script only if it is down
+    let signals = await callTrendAnalysisServer({
       bars: body.bars,
       contract_id: body.contract_id,
       timeframe: body.timeframe,
-      debug: true // Force debug mode to see what's happening
-    };
+      debug: body.debug ?? false
+    });
+    if (signals === null) {
+      // Prepare data for Python script
+      const pythonInput = {
+        bars: body.bars,
+        contract_id: body.contract_id,
+        timeframe: body.timeframe,
+        debug: true // Force debug mode to see what's happening
+      };
 
-    // Call Python trend_start_finder.py
-    const signals = await callPythonTrendFinder(pythonInput);
+      // Call Python trend_start_finder.py
+      signals = await callPythonTrendFinder(pythonInput);
+    }
     
     console.log(`[TrendAnalysis API] Generated ${signals.length} trend signals`);
     if (signals.length > 0) {
@@ -76,6 +89,26 @@ export async function POST(request: NextRequest) {
   }
 }
 
+async function callTrendAnalysisServer(input: any): Promise<TrendStartSignal[] | null> {
+  let response: Response;
+  try {
+    response = await fetch(`${TREND_ANALYSIS_SERVER_URL}/trend-starts`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(input)
+    });
+  } catch (error) {
+    console.warn(`[TrendAnalysis API] Analysis server unreachable at ${TREND_ANALYSIS_SERVER_URL}, spawning Python instead:`, error);
+    return null;
+  }
+  const data = await response.json();
+  if (!response.ok) {
+    throw new Error(data.details || data.error || `Analysis server returned ${response.status}`);
+  }
+  console.log(`[TrendAnalysis API] Analysis server: ${data.metadata.total_signals} signals in ${data.metadata.elapsed_ms}ms (cached: ${data.metadata.cached})`);
+  return data.signals;
+}
+
 async function callPythonTrendFinder(input: any): Promise<TrendStartSignal[]> {
   return new Promise((resolve, reject) => {
     // Path to your Python trend_start_finder.py - Updated to correct location
@@ -267,14 +267,35 @@ const TrendsPage: React.FC = () => {
 
     ws.onopen = () => {
       console.log(`WebSocket connection established for ${selectedContract} ${selectedTimeframe}`);
+      // Only this chart's bars and ticks; the snapshot fills any bars completed since the REST load
+      ws.send(JSON.stringify({
+        action: 'subscribe',
+        topics: [
+          { type: 'ohlc', contract_id: selectedContract, timeframe: selectedTimeframe },
+          { type: 'tick', contract_id: selectedContract },
+        ],
+      }));
     };
 
-    ws.onmessage = (event) => {
-      try {
-        const message = JSON.parse(event.data as string);
-        // console.log('WS Message:', message);
-
-        if (message.type === 'ohlc' && message.contract_id === selectedContract) {
+    // eslint-disable-next-line @typescript-eslint/no-explicit-any
+    const handleMessage = (message: any) => {
+        if (message.type === 'snapshot' && message.contract_id === selectedContract && message.timeframe === selectedTimeframe) {
+          const snapshotBars: OhlcDataForChart[] = (message.bars || []).map((bar: { timestamp: string; open: number; high: number; low: number; close: number }) => ({
+            time: (new Date(bar.timestamp).getTime() / 1000) as UTCTimestamp,
+            open: Number(bar.open),
+            high: Number(bar.high),
+            low: Number(bar.low),
+            close: Number(bar.close),
+          }));
+          if (snapshotBars.length === 0) return;
+          setSeriesData(currentData => {
+            const byTime = new Map(currentData.map(bar => [bar.time, bar]));
+            snapshotBars.forEach(bar => byTime.set(bar.time, bar));
+            const newData = Array.from(byTime.values()).sort((a, b) => a.time - b.time);
+            series.setData(newData);
+            return newData;
+          });
+        } else if (message.type === 'ohlc' && message.contract_id === selectedContract) {
           const incomingTimeframe = `${message.timeframe_value}${getTimeframeUnitChar(message.timeframe_unit)}`;
           if (incomingTimeframe === selectedTimeframe) {
             const barData: OhlcDataForChart = {
@@ -299,6 +320,27 @@ const TrendsPage: React.FC = () => {
               }
             });
           }
+        } else if (message.type === 'tick_batch' && message.contract_id === selectedContract) {
+          // Coalesced ticks from the ingester (timestamp order): fold them into the forming bar in one update
+          const prices: number[] = (message.ticks || []).map((tick: { price: number }) => Number(tick.price));
+          if (prices.length === 0) return;
+          setSeriesData(currentData => {
+            if (currentData.length === 0) return currentData;
+
+            const lastBar = currentData[currentData.length - 1];
+            const updatedLastBar: OhlcDataForChart = {
+              ...lastBar,
+              high: Math.max(lastBar.high, ...prices),
+              low: Math.min(lastBar.low, ...prices),
+              close: prices[prices.length - 1],
+            };
+
+            series.update(updatedLastBar);
+
+            const newData = [...currentData];
+            newData[newData.length - 1] = updatedLastBar;
+            return newData;
+          });
         } else if (message.type === 'tick' && message.contract_id === selectedContract) {
           // Tick applies to the currently forming bar of the *selectedTimeframe*
           setSeriesData(currentData => {
@@ -327,6 +369,16 @@ const TrendsPage: React.FC = () => {
             return newData;
           });
         }
+    };
+
+    ws.onmessage = (event) => {
+      try {
+        const parsed = JSON.parse(event.data as string);
+        // The broadcaster packs everything queued during a flush interval into one frame as a JSON array
+        const messages = Array.isArray(parsed) ? parsed : [parsed];
+        for (const message of messages) {
+          handleMessage(message);
+        }
       } catch (error) {
         console.error('Error processing WebSocket message or updating chart:', error, event.data);
       }